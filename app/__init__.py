@@ -4,7 +4,7 @@ Factory Pattern para criacao da aplicacao com blueprints modulares
 """
 
 import os
-from flask import Flask
+from flask import Flask, request
 
 
 def create_app(config=None):
@@ -37,6 +37,17 @@ def create_app(config=None):
     # Registrar blueprints
     _register_blueprints(app)
 
+    # Alteracoes de demanda/parametros/eventos descartam os pedidos em cache
+    from app.utils.cache_pedido import BLUEPRINTS_INVALIDAM_PEDIDO, invalidar_cache_pedido
+
+    @app.after_request
+    def _invalidar_cache_pedido(response):
+        if (request.method in ('POST', 'PUT', 'PATCH', 'DELETE')
+                and request.blueprint in BLUEPRINTS_INVALIDAM_PEDIDO
+                and response.status_code < 400):
+            invalidar_cache_pedido()
+        return response
+
     return app
 
 
@@ -114,3 +125,7 @@ def _register_blueprints(app):
     # Blueprint: Acuracia de Previsao
     from app.blueprints.acuracia import acuracia_bp
     app.register_blueprint(acuracia_bp)
+
+    # Blueprint: Jobs assincronos de calculo de pedido
+    from app.blueprints.pedido_jobs import pedido_jobs_bp
+    app.register_blueprint(pedido_jobs_bp)
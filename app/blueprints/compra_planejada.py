@@ -22,6 +22,9 @@ from app.utils.demanda_pre_calculada import (
     obter_demanda_do_cache,
     calcular_proporcoes_vendas_por_loja
 )
+from app.utils.universo_produtos import resolver_universo_produtos, valores_filtro
+from app.utils.jobs_pedido import submeter_job_pedido, dados_exportacao, reportar_progresso, faixa_progresso
+from app.utils.cache_pedido import cache_resultado_pedido
 
 compra_planejada_bp = Blueprint('compra_planejada', __name__)
 
@@ -93,6 +96,7 @@ def api_compra_planejada_lead_time():
 # =====================================================================
 
 @compra_planejada_bp.route('/api/compra_planejada/calcular', methods=['POST'])
+@cache_resultado_pedido('compra_planejada')
 def api_compra_planejada_calcular():
     """
     Calcula compra planejada para periodos futuros.
@@ -104,7 +108,9 @@ def api_compra_planejada_calcular():
         "destino_tipo": "LOJA" ou "CD",
         "datas_entrega": ["2026-04-15", "2026-05-15", "2026-06-15"],
         "linha1": "TODAS" ou filtro,
-        "linha3": "TODAS" ou filtro
+        "linha3": "TODAS" ou filtro,
+        "assincrono": true para calcular em background (resposta 202 com job_id),
+        "usar_cache": false para ignorar o resultado guardado (app.utils.cache_pedido)
     }
 
     Fase 1 (1a data): calculo completo via processar_item (estoque, ES, transferencias)
@@ -113,6 +119,10 @@ def api_compra_planejada_calcular():
     try:
         dados = request.get_json()
 
+        # Modo assincrono: calculo em background, resposta imediata com job_id
+        if dados and dados.get('assincrono'):
+            return submeter_job_pedido('compra_planejada', request.path, dados)
+
         # ---- Parametros ----
         fornecedor_filtro = dados.get('fornecedor', 'TODOS')
         linha1_filtro = dados.get('linha1', 'TODAS')
@@ -194,94 +204,21 @@ def api_compra_planejada_calcular():
             is_destino_cd = destino_tipo == 'CD'
             cod_destino = 80
 
-        # ---- Buscar fornecedores ----
-        fornecedores_a_processar = []
-        if isinstance(fornecedor_filtro, list):
-            if 'TODOS' in fornecedor_filtro:
-                fornecedor_filtro = 'TODOS'
-            else:
-                fornecedores_a_processar = fornecedor_filtro
-
-        if not fornecedores_a_processar:
-            if fornecedor_filtro == 'TODOS':
-                query = """
-                    SELECT DISTINCT nome_fornecedor
-                    FROM cadastro_produtos_completo
-                    WHERE ativo = TRUE AND nome_fornecedor IS NOT NULL AND TRIM(nome_fornecedor) != ''
-                """
-                params = []
-                if linha1_filtro != 'TODAS':
-                    if isinstance(linha1_filtro, list):
-                        ph = ','.join(['%s'] * len(linha1_filtro))
-                        query += f" AND categoria IN ({ph})"
-                        params.extend(linha1_filtro)
-                    else:
-                        query += " AND categoria = %s"
-                        params.append(linha1_filtro)
-                if linha3_filtro != 'TODAS':
-                    if isinstance(linha3_filtro, list):
-                        ph = ','.join(['%s'] * len(linha3_filtro))
-                        query += f" AND codigo_linha IN ({ph})"
-                        params.extend(linha3_filtro)
-                    else:
-                        query += " AND codigo_linha = %s"
-                        params.append(linha3_filtro)
-                query += " ORDER BY nome_fornecedor"
-                df_forn = pd.read_sql(query, conn, params=params if params else None)
-                fornecedores_a_processar = df_forn['nome_fornecedor'].tolist()
-            else:
-                fornecedores_a_processar = [fornecedor_filtro]
-
-        if not fornecedores_a_processar:
-            conn.close()
-            return jsonify({'success': False, 'erro': 'Nenhum fornecedor encontrado.'}), 400
-
-        # ---- Buscar produtos ----
-        df_produtos_total = pd.DataFrame()
-        for nome_fornecedor in fornecedores_a_processar:
-            query_p = """
-                SELECT DISTINCT
-                    p.cod_produto as codigo,
-                    p.descricao,
-                    p.categoria as linha1,
-                    p.codigo_linha as linha3,
-                    p.descricao_linha as linha3_descricao,
-                    'B' as curva_abc,
-                    p.cnpj_fornecedor as codigo_fornecedor,
-                    p.nome_fornecedor,
-                    COALESCE(pf.lead_time_dias, 15) as lead_time_dias,
-                    COALESCE(pf.ciclo_pedido_dias, 7) as ciclo_pedido_dias,
-                    COALESCE(pf.pedido_minimo_valor, 0) as pedido_minimo_valor,
-                    CASE WHEN pf.id IS NOT NULL THEN TRUE ELSE FALSE END as fornecedor_cadastrado
-                FROM cadastro_produtos_completo p
-                LEFT JOIN parametros_fornecedor pf ON p.cnpj_fornecedor = pf.cnpj_fornecedor
-                    AND pf.cod_empresa = %s AND pf.ativo = TRUE
-                WHERE p.ativo = TRUE AND p.nome_fornecedor = %s
-            """
-            params_p = [cod_destino, nome_fornecedor]
-
-            if linha1_filtro != 'TODAS':
-                if isinstance(linha1_filtro, list):
-                    ph = ','.join(['%s'] * len(linha1_filtro))
-                    query_p += f" AND p.categoria IN ({ph})"
-                    params_p.extend(linha1_filtro)
-                else:
-                    query_p += " AND p.categoria = %s"
-                    params_p.append(linha1_filtro)
-
-            if linha3_filtro != 'TODAS':
-                if isinstance(linha3_filtro, list):
-                    ph = ','.join(['%s'] * len(linha3_filtro))
-                    query_p += f" AND p.codigo_linha IN ({ph})"
-                    params_p.extend(linha3_filtro)
-                else:
-                    query_p += " AND p.codigo_linha = %s"
-                    params_p.append(linha3_filtro)
+        # ---- Buscar produtos (todos os fornecedores numa unica query) ----
+        df_produtos_total = resolver_universo_produtos(
+            conn,
+            fornecedores=fornecedor_filtro,
+            linha1=linha1_filtro,
+            linha3=linha3_filtro,
+            cod_destino=cod_destino
+        )
 
-            query_p += " ORDER BY p.cod_produto"
-            df_f = pd.read_sql(query_p, conn, params=params_p)
-            if not df_f.empty:
-                df_produtos_total = pd.concat([df_produtos_total, df_f], ignore_index=True)
+        fornecedores_a_processar = valores_filtro(fornecedor_filtro, 'TODOS')
+        if fornecedores_a_processar is None:
+            fornecedores_a_processar = df_produtos_total['nome_fornecedor'].drop_duplicates().tolist()
+            if not fornecedores_a_processar:
+                conn.close()
+                return jsonify({'success': False, 'erro': 'Nenhum fornecedor encontrado.'}), 400
 
         df_produtos = df_produtos_total.drop_duplicates(subset=['codigo'], keep='first')
 
@@ -470,11 +407,14 @@ def api_compra_planejada_calcular():
         print(f"  [FASE 1] Payload: destino={destino_tipo}, cod_empresa={cod_empresa_payload}, cobertura={cobertura_dias}, data_ref={datas_entrega[0].isoformat()}")
 
         # Chamar a API internamente via test_client
-        with current_app.test_client() as client:
-            resp = client.post(
-                '/api/pedido_fornecedor_integrado',
-                json=payload_pedido
-            )
+        # Andamento: cada fase vale len(df_produtos); a Fase 1 reporta dentro da sua faixa
+        total_progresso = len(periodos) * len(df_produtos)
+        with faixa_progresso(0, len(df_produtos), total_progresso, f'Fase 1 de {len(periodos)}'):
+            with current_app.test_client() as client:
+                resp = client.post(
+                    '/api/pedido_fornecedor_integrado',
+                    json=payload_pedido
+                )
 
         resp_data = resp.get_json()
 
@@ -785,6 +725,8 @@ def api_compra_planejada_calcular():
             # FASES 2+: OUL com sazonalidade mensal (logica original)
             for fase_idx in range(1, len(periodos)):
                 periodo = periodos[fase_idx]
+                reportar_progresso(fase_idx * len(df_produtos), total_progresso,
+                                   f'Fase {fase_idx + 1} de {len(periodos)}')
                 itens_fase = []
                 dias_ate_entrega = (periodo['data_entrega'] - hoje).days
                 dias_periodo = periodo['dias']
@@ -1014,6 +956,8 @@ def api_compra_planejada_calcular():
 
             for fase_idx in range(1, len(periodos)):
                 periodo = periodos[fase_idx]
+                reportar_progresso(fase_idx * len(df_produtos), total_progresso,
+                                   f'Fase {fase_idx + 1} de {len(periodos)}')
                 itens_fase = []
 
                 dias_ate_entrega = (periodo['data_entrega'] - hoje).days
@@ -1558,6 +1502,9 @@ def api_compra_planejada_exportar():
         from openpyxl.utils import get_column_letter
 
         dados = request.get_json()
+        dados, erro_job = dados_exportacao(dados)
+        if erro_job:
+            return jsonify({'success': False, 'erro': erro_job}), 400
         if not dados:
             return jsonify({'success': False, 'erro': 'Dados nao fornecidos'}), 400
 
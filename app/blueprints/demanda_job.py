@@ -5,6 +5,7 @@ Rotas: /api/demanda_job/*
 Endpoints para:
 - Recalculo manual de demanda por fornecedor
 - Status do job de calculo
+- Perfil de tempo/memoria por etapa do job
 - Ajustes manuais de demanda
 """
 
@@ -16,6 +17,8 @@ from flask import Blueprint, request, jsonify
 from app.utils.db_connection import get_db_connection
 from app.utils.demanda_pre_calculada import (
     verificar_dados_disponiveis,
+    colunas_progresso_execucao_existem,
+    COLUNAS_PROGRESSO_EXECUCAO,
     registrar_ajuste_manual,
     limpar_ajuste_manual,
     buscar_demanda_pre_calculada,
@@ -24,6 +27,52 @@ from app.utils.demanda_pre_calculada import (
 
 demanda_job_bp = Blueprint('demanda_job', __name__)
 
+STATUS_EXECUCAO_FINALIZADA = ('concluido', 'sucesso', 'parcial', 'erro')
+
+COLUNAS_EXECUCAO = (
+    'id', 'data_execucao', 'tipo', 'status',
+    'total_itens_processados', 'total_itens_erro',
+    'total_fornecedores', 'tempo_execucao_ms',
+    'cnpj_fornecedor_filtro',
+)
+
+
+def calcular_percentual_concluido(execucao: dict):
+    """
+    Percentual de fornecedores ja gravados (checkpoints) de uma execucao.
+    Retorna None para execucoes sem progresso registrado (anteriores a V58).
+    """
+    if execucao.get('status') in STATUS_EXECUCAO_FINALIZADA:
+        return 100.0
+    previstos = execucao.get('total_fornecedores_previstos')
+    if not previstos:
+        return None
+    concluidos = execucao.get('fornecedores_concluidos') or 0
+    return round(min(concluidos / previstos, 1.0) * 100, 1)
+
+
+def colunas_status_execucao(conn) -> str:
+    """
+    Colunas de demanda_calculo_execucao lidas pelos endpoints de status.
+    As colunas de progresso so entram quando a migration V58 foi aplicada.
+    """
+    colunas = COLUNAS_EXECUCAO
+    if colunas_progresso_execucao_existem(conn):
+        colunas += COLUNAS_PROGRESSO_EXECUCAO
+    return ', '.join(colunas)
+
+
+def formatar_execucao(execucao: dict) -> dict:
+    """Converte datas para string e calcula o progresso (None sem a V58)."""
+    for campo in ('data_execucao', 'atualizado_em'):
+        if execucao.get(campo):
+            execucao[campo] = execucao[campo].isoformat()
+    if 'total_fornecedores_previstos' in execucao:
+        execucao['percentual_concluido'] = calcular_percentual_concluido(execucao)
+    else:
+        execucao['percentual_concluido'] = None
+    return execucao
+
 
 @demanda_job_bp.route('/api/demanda_job/status', methods=['GET'])
 def api_demanda_job_status():
@@ -42,22 +91,15 @@ def api_demanda_job_status():
         stats = verificar_dados_disponiveis(conn)
 
         # Ultimas execucoes
-        cursor.execute("""
-            SELECT
-                id, data_execucao, tipo, status,
-                total_itens_processados, total_itens_erro,
-                total_fornecedores, tempo_execucao_ms,
-                cnpj_fornecedor_filtro
+        cursor.execute(f"""
+            SELECT {colunas_status_execucao(conn)}
             FROM demanda_calculo_execucao
             ORDER BY data_execucao DESC
             LIMIT 10
         """)
-        execucoes = [dict(row) for row in cursor.fetchall()]
 
-        # Converter datetime para string
-        for exec in execucoes:
-            if exec.get('data_execucao'):
-                exec['data_execucao'] = exec['data_execucao'].isoformat()
+        # Converter datetime para string e calcular progresso
+        execucoes = [formatar_execucao(dict(row)) for row in cursor.fetchall()]
 
         cursor.close()
         conn.close()
@@ -65,7 +107,8 @@ def api_demanda_job_status():
         return jsonify({
             'success': True,
             'estatisticas': stats,
-            'ultimas_execucoes': execucoes
+            'ultimas_execucoes': execucoes,
+            'percentual_concluido': execucoes[0]['percentual_concluido'] if execucoes else None
         })
 
     except Exception as e:
@@ -94,12 +137,8 @@ def api_demanda_job_status_fornecedor(cnpj_fornecedor):
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
         # Buscar ultima execucao deste fornecedor
-        cursor.execute("""
-            SELECT
-                id, data_execucao, tipo, status,
-                total_itens_processados, total_itens_erro,
-                total_fornecedores, tempo_execucao_ms,
-                cnpj_fornecedor_filtro
+        cursor.execute(f"""
+            SELECT {colunas_status_execucao(conn)}
             FROM demanda_calculo_execucao
             WHERE cnpj_fornecedor_filtro = %s
             ORDER BY data_execucao DESC
@@ -116,11 +155,8 @@ def api_demanda_job_status_fornecedor(cnpj_fornecedor):
                 'mensagem': 'Nenhuma execucao encontrada para este fornecedor'
             })
 
-        execucao = dict(execucao)
-
-        # Converter datetime para string
-        if execucao.get('data_execucao'):
-            execucao['data_execucao'] = execucao['data_execucao'].isoformat()
+        # Converter datetime para string e calcular progresso
+        execucao = formatar_execucao(dict(execucao))
 
         # Contar registros atuais para este fornecedor
         cursor.execute("""
@@ -147,6 +183,7 @@ def api_demanda_job_status_fornecedor(cnpj_fornecedor):
             'is_concluido': is_concluido,
             'is_erro': is_erro,
             'is_processando': is_processando,
+            'percentual_concluido': execucao['percentual_concluido'],
             'execucao': execucao,
             'dados_atuais': {
                 'total_registros': contagem['total_registros'] if contagem else 0,
@@ -161,6 +198,94 @@ def api_demanda_job_status_fornecedor(cnpj_fornecedor):
         }), 500
 
 
+@demanda_job_bp.route('/api/demanda_job/perfil', methods=['GET'])
+def api_demanda_job_perfil():
+    """
+    Retorna o perfil por etapa (tempo, itens, memoria) de uma execucao do job,
+    comparado com a execucao anterior do mesmo tipo.
+
+    Query params:
+        execucao_id: ID da execucao (default: ultima com perfil)
+        top: Quantidade de fornecedores mais lentos a retornar (default 20)
+
+    Returns:
+        JSON com etapas agregadas, variacao vs anterior e fornecedores mais lentos
+    """
+    try:
+        execucao_id = request.args.get('execucao_id', type=int)
+        top = request.args.get('top', 20, type=int)
+
+        conn = get_db_connection()
+        from psycopg2.extras import RealDictCursor
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+        filtro = "AND id = %s" if execucao_id else ""
+        cursor.execute(f"""
+            SELECT id, data_execucao, tipo, status, tempo_execucao_ms,
+                   detalhes->'perfil' as perfil
+            FROM demanda_calculo_execucao
+            WHERE detalhes ? 'perfil' {filtro}
+            ORDER BY data_execucao DESC
+            LIMIT 1
+        """, (execucao_id,) if execucao_id else None)
+        execucao = cursor.fetchone()
+
+        if not execucao:
+            cursor.close()
+            conn.close()
+            return jsonify({
+                'success': False,
+                'erro': 'Nenhuma execucao com perfil encontrada'
+            }), 404
+
+        execucao = dict(execucao)
+        perfil = execucao.pop('perfil') or {}
+
+        # Execucao anterior do mesmo tipo (base de comparacao por etapa)
+        cursor.execute("""
+            SELECT id, detalhes->'perfil'->'etapas' as etapas
+            FROM demanda_calculo_execucao
+            WHERE detalhes ? 'perfil' AND tipo = %s AND data_execucao < %s
+            ORDER BY data_execucao DESC
+            LIMIT 1
+        """, (execucao['tipo'], execucao['data_execucao']))
+        anterior = cursor.fetchone()
+
+        cursor.close()
+        conn.close()
+
+        etapas_anteriores = (anterior['etapas'] or {}) if anterior else {}
+        etapas = {}
+        for etapa, valores in (perfil.get('etapas') or {}).items():
+            valores = dict(valores)
+            tempo_anterior = (etapas_anteriores.get(etapa) or {}).get('tempo_ms')
+            valores['tempo_ms_anterior'] = tempo_anterior
+            valores['variacao_vs_anterior'] = (
+                round(valores['tempo_ms'] / tempo_anterior - 1, 4) if tempo_anterior else None
+            )
+            etapas[etapa] = valores
+
+        if execucao.get('data_execucao'):
+            execucao['data_execucao'] = execucao['data_execucao'].isoformat()
+
+        return jsonify({
+            'success': True,
+            'execucao': execucao,
+            'execucao_anterior_id': anterior['id'] if anterior else None,
+            'modo': perfil.get('modo'),
+            'tempo_total_ms': perfil.get('tempo_total_ms'),
+            'memoria_pico_mb': perfil.get('memoria_pico_mb'),
+            'etapas': etapas,
+            'fornecedores': (perfil.get('fornecedores') or [])[:top]
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'erro': str(e)
+        }), 500
+
+
 @demanda_job_bp.route('/api/demanda_job/recalcular', methods=['POST'])
 def api_demanda_job_recalcular():
     """
@@ -170,6 +295,7 @@ def api_demanda_job_recalcular():
     {
         "cnpj_fornecedor": "60620366000195" ou "NOME FORNECEDOR"  # Opcional
         "async": true  # Se true, executa em background e retorna imediatamente
+        "retomar_execucao_id": 1234  # Opcional: retoma execucao interrompida (checkpoints)
     }
 
     Returns:
@@ -188,6 +314,25 @@ def api_demanda_job_recalcular():
         dados = request.get_json() or {}
         cnpj_filtro = dados.get('cnpj_fornecedor')
         executar_async = dados.get('async', True)  # Por padrao, executa em background
+        retomar_execucao_id = dados.get('retomar_execucao_id')
+
+        # Retomada: tipo e filtro vem da execucao original, sempre em background
+        if retomar_execucao_id:
+            def retomar_em_background():
+                try:
+                    executar_calculo(retomar_execucao_id=int(retomar_execucao_id))
+                except Exception as e:
+                    print(f"[ERRO] Retomada em background: {e}")
+
+            thread = threading.Thread(target=retomar_em_background)
+            thread.daemon = True
+            thread.start()
+
+            return jsonify({
+                'success': True,
+                'async': True,
+                'mensagem': f'Retomando execucao #{retomar_execucao_id} em background'
+            })
 
         # Normalizar cnpj_filtro: se veio como lista, pegar o primeiro elemento
         if isinstance(cnpj_filtro, list):
@@ -15,11 +15,12 @@ from app.utils.db_connection import get_db_connection
 from app.utils.demanda_pre_calculada import (
     obter_demanda_diaria_efetiva,
     verificar_dados_disponiveis,
-    precarregar_demanda_em_lote,
-    obter_demanda_do_cache,
-    calcular_proporcoes_vendas_por_loja
+    obter_demanda_do_cache
 )
-from core.padrao_compra import get_dias_transferencia
+from app.utils.snapshot_pedido import carregar_snapshot_pedido
+from app.utils.universo_produtos import resolver_universo_produtos, valores_filtro
+from app.utils.jobs_pedido import submeter_job_pedido, dados_exportacao, reportar_progresso
+from app.utils.cache_pedido import cache_resultado_pedido
 
 pedido_fornecedor_bp = Blueprint('pedido_fornecedor', __name__)
 
@@ -31,6 +32,7 @@ def pedido_fornecedor_integrado_page():
 
 
 @pedido_fornecedor_bp.route('/api/pedido_fornecedor_integrado', methods=['POST'])
+@cache_resultado_pedido('pedido_fornecedor')
 def api_pedido_fornecedor_integrado():
     """
     API para gerar pedidos ao fornecedor integrado com previsao V2.
@@ -48,7 +50,9 @@ def api_pedido_fornecedor_integrado():
         "categoria": "TODAS" ou categoria especifica,
         "destino_tipo": "LOJA" ou "CD",
         "cod_empresa": codigo da loja/CD de destino (ou "TODAS"),
-        "cobertura_dias": null (automatico) ou numero especifico
+        "cobertura_dias": null (automatico) ou numero especifico,
+        "assincrono": true para calcular em background (resposta 202 com job_id),
+        "usar_cache": false para ignorar o resultado guardado (app.utils.cache_pedido)
     }
 
     Returns:
@@ -67,6 +71,10 @@ def api_pedido_fornecedor_integrado():
 
         dados = request.get_json()
 
+        # Modo assincrono: calculo em background, resposta imediata com job_id
+        if dados and dados.get('assincrono'):
+            return submeter_job_pedido('pedido_fornecedor', request.path, dados)
+
         # Parametros de filtro
         fornecedor_filtro = dados.get('fornecedor', 'TODOS')
         linha1_filtro = dados.get('linha1', 'TODAS')
@@ -155,171 +163,24 @@ def api_pedido_fornecedor_integrado():
             is_destino_cd = destino_tipo == 'CD'
             cod_destino = 80
 
-        # Determinar lista de fornecedores a processar
-        fornecedores_a_processar = []
-
-        if isinstance(fornecedor_filtro, list):
-            if 'TODOS' in fornecedor_filtro:
-                fornecedor_filtro = 'TODOS'
-            else:
-                fornecedores_a_processar = fornecedor_filtro
-
-        if not fornecedores_a_processar:
-            if fornecedor_filtro == 'TODOS':
-                query_fornecedores = """
-                    SELECT DISTINCT nome_fornecedor
-                    FROM cadastro_produtos_completo
-                    WHERE ativo = TRUE
-                    AND nome_fornecedor IS NOT NULL
-                    AND TRIM(nome_fornecedor) != ''
-                """
-                params_forn = []
-
-                # FILTRO LINHA1 para query de fornecedores
-                if linha1_filtro != 'TODAS':
-                    is_lista = isinstance(linha1_filtro, (list, tuple))
-                    if is_lista and len(linha1_filtro) > 1:
-                        placeholders = ','.join(['%s'] * len(linha1_filtro))
-                        query_fornecedores += f" AND categoria IN ({placeholders})"
-                        for v in linha1_filtro:
-                            params_forn.append(str(v) if not isinstance(v, str) else v)
-                    else:
-                        query_fornecedores += " AND categoria = %s"
-                        valor = linha1_filtro[0] if is_lista else linha1_filtro
-                        params_forn.append(str(valor) if not isinstance(valor, str) else valor)
-
-                # FILTRO LINHA3 para query de fornecedores
-                if linha3_filtro != 'TODAS':
-                    is_lista = isinstance(linha3_filtro, (list, tuple))
-                    if is_lista and len(linha3_filtro) > 1:
-                        placeholders = ','.join(['%s'] * len(linha3_filtro))
-                        query_fornecedores += f" AND codigo_linha IN ({placeholders})"
-                        for v in linha3_filtro:
-                            params_forn.append(str(v) if not isinstance(v, str) else v)
-                    else:
-                        query_fornecedores += " AND codigo_linha = %s"
-                        valor = linha3_filtro[0] if is_lista else linha3_filtro
-                        params_forn.append(str(valor) if not isinstance(valor, str) else valor)
-
-                query_fornecedores += " ORDER BY nome_fornecedor"
-                df_fornecedores = pd.read_sql(query_fornecedores, conn, params=params_forn if params_forn else None)
-                fornecedores_a_processar = df_fornecedores['nome_fornecedor'].tolist()
-            else:
-                fornecedores_a_processar = [fornecedor_filtro]
-
-        if not fornecedores_a_processar:
-            conn.close()
-            return jsonify({
-                'success': False,
-                'erro': 'Nenhum fornecedor encontrado com os filtros selecionados.'
-            }), 400
-
-        # Verificar se tabela parametros_fornecedor existe
-        cursor_check = conn.cursor()
-        cursor_check.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables
-                WHERE table_name = 'parametros_fornecedor'
-            )
-        """)
-        tabela_params_existe = cursor_check.fetchone()[0]
-        cursor_check.close()
-
-        df_produtos_total = pd.DataFrame()
-        total_produtos_por_fornecedor = {}
-
-        for idx_forn, nome_fornecedor in enumerate(fornecedores_a_processar):
-            if tabela_params_existe:
-                query_produtos = """
-                    SELECT DISTINCT
-                        p.cod_produto as codigo,
-                        p.descricao,
-                        p.categoria as linha1,
-                        p.codigo_linha as linha3,
-                        p.descricao_linha as linha3_descricao,
-                        'B' as curva_abc,
-                        p.cnpj_fornecedor as codigo_fornecedor,
-                        p.nome_fornecedor,
-                        COALESCE(pf.lead_time_dias, 15) as lead_time_dias,
-                        COALESCE(pf.ciclo_pedido_dias, 7) as ciclo_pedido_dias,
-                        COALESCE(pf.pedido_minimo_valor, 0) as pedido_minimo_valor,
-                        CASE WHEN pf.id IS NOT NULL THEN TRUE ELSE FALSE END as fornecedor_cadastrado
-                    FROM cadastro_produtos_completo p
-                    LEFT JOIN parametros_fornecedor pf ON p.cnpj_fornecedor = pf.cnpj_fornecedor
-                        AND pf.cod_empresa = %s AND pf.ativo = TRUE
-                    WHERE p.ativo = TRUE
-                        AND p.nome_fornecedor = %s
-                """
-                params = [cod_destino, nome_fornecedor]
-            else:
-                query_produtos = """
-                    SELECT DISTINCT
-                        p.cod_produto as codigo,
-                        p.descricao,
-                        p.categoria as linha1,
-                        p.codigo_linha as linha3,
-                        p.descricao_linha as linha3_descricao,
-                        'B' as curva_abc,
-                        p.cnpj_fornecedor as codigo_fornecedor,
-                        p.nome_fornecedor,
-                        15 as lead_time_dias,
-                        7 as ciclo_pedido_dias,
-                        0 as pedido_minimo_valor,
-                        FALSE as fornecedor_cadastrado
-                    FROM cadastro_produtos_completo p
-                    WHERE p.ativo = TRUE
-                        AND p.nome_fornecedor = %s
-                """
-                params = [nome_fornecedor]
-
-            # FILTRO LINHA1 (categoria) - com proteção contra arrays
-            if linha1_filtro != 'TODAS':
-                # DEBUG: mostrar estado do filtro antes de usar na query
-                is_lista = isinstance(linha1_filtro, (list, tuple))
-                print(f"      [QUERY] linha1_filtro: {linha1_filtro}, is_lista={is_lista}")
-
-                if is_lista and len(linha1_filtro) > 1:
-                    # Múltiplos valores: usar IN
-                    placeholders = ','.join(['%s'] * len(linha1_filtro))
-                    query_produtos += f" AND p.categoria IN ({placeholders})"
-                    # Garantir que cada valor é string
-                    for v in linha1_filtro:
-                        params.append(str(v) if not isinstance(v, str) else v)
-                else:
-                    # Valor único: usar = com string simples
-                    query_produtos += " AND p.categoria = %s"
-                    valor = linha1_filtro[0] if is_lista else linha1_filtro
-                    # GARANTIR que é string Python pura
-                    params.append(str(valor) if not isinstance(valor, str) else valor)
-                    print(f"      [QUERY] Adicionado param categoria: {params[-1]} (tipo={type(params[-1]).__name__})")
-
-            # FILTRO LINHA3 (codigo_linha) - com proteção contra arrays
-            if linha3_filtro != 'TODAS':
-                is_lista = isinstance(linha3_filtro, (list, tuple))
-                print(f"      [QUERY] linha3_filtro: {linha3_filtro}, is_lista={is_lista}")
-
-                if is_lista and len(linha3_filtro) > 1:
-                    placeholders = ','.join(['%s'] * len(linha3_filtro))
-                    query_produtos += f" AND p.codigo_linha IN ({placeholders})"
-                    for v in linha3_filtro:
-                        params.append(str(v) if not isinstance(v, str) else v)
-                else:
-                    query_produtos += " AND p.codigo_linha = %s"
-                    valor = linha3_filtro[0] if is_lista else linha3_filtro
-                    params.append(str(valor) if not isinstance(valor, str) else valor)
-                    print(f"      [QUERY] Adicionado param codigo_linha: {params[-1]} (tipo={type(params[-1]).__name__})")
-
-            query_produtos += " ORDER BY p.cod_produto"
-            df_forn = pd.read_sql(query_produtos, conn, params=params)
-
-            if not df_forn.empty:
-                total_produtos_por_fornecedor[nome_fornecedor] = len(df_forn)
-                df_produtos_total = pd.concat([df_produtos_total, df_forn], ignore_index=True)
-
-        df_produtos = df_produtos_total
+        # Universo de produtos: todos os fornecedores/linhas filtrados numa unica query,
+        # com os parametros do fornecedor no destino
+        df_produtos = resolver_universo_produtos(
+            conn,
+            fornecedores=fornecedor_filtro,
+            linha1=linha1_filtro,
+            linha3=linha3_filtro,
+            cod_destino=cod_destino
+        )
 
         if df_produtos.empty:
             conn.close()
+            if valores_filtro(fornecedor_filtro, 'TODOS') is None:
+                # 'TODOS' sem produtos: nenhum fornecedor atende aos filtros de linha
+                return jsonify({
+                    'success': False,
+                    'erro': 'Nenhum fornecedor encontrado com os filtros selecionados.'
+                }), 400
             return jsonify({
                 'success': False,
                 'erro': 'Nenhum item encontrado com os filtros selecionados.'
@@ -374,18 +235,12 @@ def api_pedido_fornecedor_integrado():
         processador = PedidoFornecedorIntegrado(conn)
 
         codigos_produtos = df_produtos['codigo'].astype(int).tolist()
-        processador.precarregar_situacoes_compra(codigos_produtos, lojas_demanda)
         # Incluir CD destino no pre-carregamento de estoque para pedido centralizado
         lojas_estoque = list(lojas_demanda)
         if is_destino_cd and cod_destino not in lojas_estoque:
             lojas_estoque.append(cod_destino)
-        processador.precarregar_estoque(codigos_produtos, lojas_estoque)
-        processador.precarregar_historico_vendas(codigos_produtos, lojas_demanda)
-        processador.precarregar_embalagens(codigos_produtos)
-        processador.precarregar_produtos(codigos_produtos)
 
-        # PRE-CARREGAR DEMANDA EM LOTE (otimizacao: 1 query em vez de N queries)
-        # Usar demanda do mes de entrega estimado (nao do mes atual)
+        # Periodo da demanda pre-carregada: mes de entrega estimado (nao o mes atual)
         # data_referencia explicita (Compra Planejada) ou calculo automatico pelo lead time
         ano_ref = None
         mes_ref = None
@@ -412,33 +267,36 @@ def api_pedido_fornecedor_integrado():
             except Exception:
                 pass
 
-        # Agrupar produtos por CNPJ do fornecedor
-        cache_demanda_global = {}
-        cnpjs_unicos = df_produtos['codigo_fornecedor'].unique()
-        for cnpj_forn in cnpjs_unicos:
-            if cnpj_forn:
-                produtos_deste_fornecedor = df_produtos[df_produtos['codigo_fornecedor'] == cnpj_forn]['codigo'].tolist()
-                cache_demanda = precarregar_demanda_em_lote(
-                    conn,
-                    produtos_deste_fornecedor,
-                    cnpj_forn,
-                    cod_empresas=lojas_demanda if is_pedido_multiloja else None,
-                    ano=ano_ref,
-                    mes=mes_ref
-                )
-                cache_demanda_global.update(cache_demanda)
+        # ==============================================================================
+        # PRE-CARREGAMENTO CONCORRENTE (snapshot_pedido)
+        # Situacoes de compra, estoque, historico, embalagens, produtos, demanda
+        # pre-calculada (todos os fornecedores numa query), proporcoes por loja,
+        # ultima venda (V31), SOLIs (V46), estoque dos CDs (V29/V30), grupos de
+        # transferencia e transit time do CD: consultas em paralelo no pool
+        # ==============================================================================
+        produtos_por_fornecedor = {
+            cnpj_forn: grupo['codigo'].tolist()
+            for cnpj_forn, grupo in df_produtos.groupby('codigo_fornecedor', sort=False)
+            if cnpj_forn
+        }
+        snapshot = carregar_snapshot_pedido(
+            codigos_produtos,
+            lojas_demanda,
+            lojas_estoque,
+            produtos_por_fornecedor,
+            is_multiloja=is_pedido_multiloja,
+            ano=ano_ref,
+            mes=mes_ref,
+            cod_destino_cd=cod_destino if is_destino_cd else None
+        )
+        snapshot.aplicar_no_processador(processador)
+
+        cache_demanda_global = snapshot.demanda
         print(f"  [CACHE] Demanda pre-carregada: {len(cache_demanda_global)} registros")
 
-        # PRE-CALCULAR PROPORCOES DE VENDAS POR LOJA (para rateio proporcional)
-        # Em vez de dividir uniformemente, rateia pela participacao de vendas de cada loja
-        cache_proporcoes = {}
+        # Proporcoes de vendas por loja (rateio proporcional da demanda consolidada)
+        cache_proporcoes = snapshot.proporcoes
         if is_pedido_multiloja:
-            cache_proporcoes = calcular_proporcoes_vendas_por_loja(
-                conn,
-                codigos_produtos,
-                lojas_demanda,
-                dias_historico=365  # Usa ultimo ano para proporcao
-            )
             print(f"  [CACHE] Proporcoes por loja calculadas: {len(cache_proporcoes)} registros")
 
         # ==============================================================================
@@ -447,39 +305,10 @@ def api_pedido_fornecedor_integrado():
         # ==============================================================================
         MESES_SEM_VENDA_BLOQUEIO = 12
         data_limite_v31 = (datetime.now() - timedelta(days=MESES_SEM_VENDA_BLOQUEIO * 30)).date()
-        itens_sem_venda_recente = set()  # set de (codigo, cod_loja)
-        ultima_venda_map = {}  # {(codigo, loja): date}
-
-        if codigos_produtos and lojas_demanda:
-            try:
-                conn_v31 = get_db_connection()
-                cursor_v31 = conn_v31.cursor()
-                cursor_v31.execute("""
-                    SELECT codigo, cod_empresa, MAX(data) as ultima_venda
-                    FROM historico_vendas_diario
-                    WHERE codigo = ANY(%s)
-                      AND cod_empresa = ANY(%s)
-                      AND qtd_venda > 0
-                    GROUP BY codigo, cod_empresa
-                """, (codigos_produtos, list(lojas_demanda)))
-
-                for row_v31 in cursor_v31.fetchall():
-                    ultima_venda_map[(int(row_v31[0]), int(row_v31[1]))] = row_v31[2]
-
-                # Identificar itens sem venda recente por loja
-                for cod in codigos_produtos:
-                    for loja in lojas_demanda:
-                        ultima = ultima_venda_map.get((cod, loja))
-                        if ultima is None or ultima < data_limite_v31:
-                            itens_sem_venda_recente.add((cod, loja))
-
-                cursor_v31.close()
-                conn_v31.close()
-
-                if itens_sem_venda_recente:
-                    print(f"  [V31] {len(itens_sem_venda_recente)} combinacoes item x loja sem vendas ha 12+ meses")
-            except Exception as e_v31:
-                print(f"  [V31] Erro ao verificar historico de vendas: {e_v31}")
+        ultima_venda_map = snapshot.ultima_venda or {}  # {(codigo, loja): date}
+        itens_sem_venda_recente = snapshot.itens_sem_venda_desde(codigos_produtos, lojas_demanda, data_limite_v31)
+        if itens_sem_venda_recente:
+            print(f"  [V31] {len(itens_sem_venda_recente)} combinacoes item x loja sem vendas ha 12+ meses")
 
         # ==============================================================================
         # TRANSIT TIME CD→LOJA (Proposta A)
@@ -488,7 +317,7 @@ def api_pedido_fornecedor_integrado():
         # ==============================================================================
         dias_transferencia_cd = 0
         if is_destino_cd:
-            dias_transferencia_cd = get_dias_transferencia(conn)
+            dias_transferencia_cd = snapshot.dias_transferencia_cd
             print(f"  [TRANSIT TIME] Destino CD: +{dias_transferencia_cd}d transit time adicionado ao lead time")
 
         # ==============================================================================
@@ -502,54 +331,45 @@ def api_pedido_fornecedor_integrado():
         solis_bloqueio = set()  # {(codigo, loja_a, loja_b)} para bloqueio V25/V29/V30
         total_solis_aplicadas = 0
 
-        try:
-            conn_soli = get_db_connection()
-            cursor_soli = conn_soli.cursor()
-            cursor_soli.execute("""
-                SELECT codigo, filial_origem, filial_destino, qtde
-                FROM solis_abertas
-                WHERE dt_confirmacao IS NOT NULL
-                  AND codigo = ANY(%s)
-            """, (codigos_produtos,))
-
-            for row_soli in cursor_soli.fetchall():
-                codigo_s, origem_s, destino_s, qtde_s = int(row_soli[0]), int(row_soli[1]), int(row_soli[2]), float(row_soli[3])
-                solis_por_item.setdefault(codigo_s, []).append((origem_s, destino_s, qtde_s))
-
-                # Bloqueio V25/V29/V30: par de lojas (ordenado) para o item
-                par = tuple(sorted([origem_s, destino_s]))
-                solis_bloqueio.add((codigo_s, par[0], par[1]))
-
-                # Ajustar cache de estoque - ORIGEM: subtrair do disponivel
-                key_origem = (codigo_s, origem_s)
-                if key_origem in processador._cache_estoque:
-                    entry = processador._cache_estoque[key_origem]
-                    entry['estoque_disponivel'] = max(0, entry['estoque_disponivel'] - qtde_s)
-                    entry['estoque_efetivo'] = entry['estoque_disponivel'] + entry['estoque_transito']
-                    total_solis_aplicadas += 1
-
-                # Ajustar cache de estoque - DESTINO: somar ao transito
-                key_destino = (codigo_s, destino_s)
-                if key_destino in processador._cache_estoque:
-                    entry = processador._cache_estoque[key_destino]
-                    entry['estoque_transito'] += qtde_s
-                    entry['estoque_efetivo'] = entry['estoque_disponivel'] + entry['estoque_transito']
-                    total_solis_aplicadas += 1
-
-            cursor_soli.close()
-            conn_soli.close()
-
-            if solis_por_item:
-                print(f"  [V46] SOLIs carregadas: {sum(len(v) for v in solis_por_item.values())} movimentacoes para {len(solis_por_item)} itens ({total_solis_aplicadas} ajustes de estoque)")
-                print(f"  [V46] Bloqueios de transferencia: {len(solis_bloqueio)} pares item/lojas")
-        except Exception as e_soli:
-            print(f"  [V46] Aviso: nao foi possivel carregar SOLIs ({e_soli}). Continuando sem ajuste.")
+        for codigo_s, origem_s, destino_s, qtde_s in snapshot.solis:
+            solis_por_item.setdefault(codigo_s, []).append((origem_s, destino_s, qtde_s))
+
+            # Bloqueio V25/V29/V30: par de lojas (ordenado) para o item
+            par = tuple(sorted([origem_s, destino_s]))
+            solis_bloqueio.add((codigo_s, par[0], par[1]))
+
+            # Ajustar cache de estoque - ORIGEM: subtrair do disponivel
+            key_origem = (codigo_s, origem_s)
+            if key_origem in processador._cache_estoque:
+                entry = processador._cache_estoque[key_origem]
+                entry['estoque_disponivel'] = max(0, entry['estoque_disponivel'] - qtde_s)
+                entry['estoque_efetivo'] = entry['estoque_disponivel'] + entry['estoque_transito']
+                total_solis_aplicadas += 1
+
+            # Ajustar cache de estoque - DESTINO: somar ao transito
+            key_destino = (codigo_s, destino_s)
+            if key_destino in processador._cache_estoque:
+                entry = processador._cache_estoque[key_destino]
+                entry['estoque_transito'] += qtde_s
+                entry['estoque_efetivo'] = entry['estoque_disponivel'] + entry['estoque_transito']
+                total_solis_aplicadas += 1
+
+        if solis_por_item:
+            print(f"  [V46] SOLIs carregadas: {sum(len(v) for v in solis_por_item.values())} movimentacoes para {len(solis_por_item)} itens ({total_solis_aplicadas} ajustes de estoque)")
+            print(f"  [V46] Bloqueios de transferencia: {len(solis_bloqueio)} pares item/lojas")
 
         resultados = []
         itens_sem_historico = 0
         itens_sem_demanda = 0
-
-        for idx, row in df_produtos.iterrows():
+        # Itens a calcular: o pedido e calculado em lote apos o laco
+        # (processar_itens_lote); resultados guarda a posicao de cada um
+        pendentes_calculo = []
+
+        # Andamento: um passo por item, mais o calculo em lote e a consolidacao
+        total_itens = len(df_produtos)
+        total_passos = total_itens + 2
+        for posicao, (idx, row) in enumerate(df_produtos.iterrows()):
+            reportar_progresso(posicao, total_passos, 'Preparando itens')
             try:
                 codigo = row['codigo']
                 lead_time_forn = int(row.get('lead_time_dias', 15))
@@ -673,70 +493,32 @@ def api_pedido_fornecedor_integrado():
                                 desvio_padrao = 0
                                 metadata = {'metodo_usado': 'sem_historico', 'fonte': 'sem_dados'}
 
-                        resultado = processador.processar_item(
-                            codigo=codigo,
-                            cod_empresa=loja_cod,
-                            previsao_diaria=demanda_diaria,
-                            desvio_padrao=desvio_padrao,
-                            cobertura_dias=cobertura_dias,
-                            lead_time_dias=lead_time_forn + dias_transferencia_cd,
-                            ciclo_pedido_dias=ciclo_pedido_forn,
-                            pedido_minimo_valor=pedido_min_forn,
-                            aplicar_limitador_cobertura=is_tsb,
-                            dias_ate_entrega=dias_ate_entrega_override
-                        )
-
-                        if 'erro' in resultado:
-                            resultado = {
+                        pendentes_calculo.append({
+                            'posicao': len(resultados),
+                            'item': {
                                 'codigo': codigo,
-                                'descricao': row.get('descricao', ''),
-                                'nome_fornecedor': row.get('nome_fornecedor', ''),
-                                'curva_abc': row.get('curva_abc', 'B'),
-                                'estoque_atual': 0,
-                                'estoque_transito': 0,
-                                'demanda_prevista': 0,
-                                'demanda_prevista_diaria': 0,
-                                'cobertura_atual_dias': 999,
-                                'cobertura_pos_pedido_dias': 999,
-                                'quantidade_pedido': 0,
-                                'valor_pedido': 0,
-                                'preco_custo': 0,
-                                'cue': 0,
-                                'deve_pedir': False,
-                                'bloqueado': False
-                            }
-
-                        resultado['cod_loja'] = loja_cod
-                        resultado['nome_loja'] = loja_nome
-                        resultado['codigo_fornecedor'] = row.get('codigo_fornecedor', '')
-                        resultado['metodo_previsao'] = metadata.get('metodo_usado', 'auto')
-                        resultado['fonte_demanda'] = metadata.get('fonte', 'tempo_real')  # pre_calculada ou tempo_real
-                        resultado['metodo_rateio'] = metadata.get('metodo_rateio')  # proporcional ou uniforme
-                        resultado['proporcao_loja'] = metadata.get('proporcao_loja')  # 0.0 a 1.0
-                        resultado['tem_ajuste_manual'] = metadata.get('editado_manualmente', False)
-                        resultado['lojas_consideradas'] = 1
-                        resultado['fornecedor_cadastrado'] = fornecedor_cadastrado
-                        resultado['lead_time_usado'] = lead_time_forn + dias_transferencia_cd
-                        resultado['dias_transferencia_cd'] = dias_transferencia_cd
-                        resultado['ciclo_pedido_usado'] = ciclo_pedido_forn
-                        resultado['pedido_minimo_fornecedor'] = pedido_min_forn
-                        resultado['sem_demanda_loja'] = demanda_diaria <= 0
-
-                        # V46: Adicionar info de SOLIs ao resultado
-                        solis_item = solis_por_item.get(codigo, [])
-                        solis_loja = [(o, d, q) for o, d, q in solis_item if o == loja_cod or d == loja_cod]
-                        if solis_loja:
-                            resultado['solis_abertas'] = solis_loja
-                            resultado['soli_saida'] = sum(q for o, d, q in solis_loja if o == loja_cod)
-                            resultado['soli_entrada'] = sum(q for o, d, q in solis_loja if d == loja_cod)
-
-                        # DEBUG: Qualquer item com cobertura insuficiente
-                        cobertura_alvo_debug = cobertura_dias if cobertura_dias else 21
-                        cobertura_pos = resultado.get('cobertura_pos_pedido_dias', 999)
-                        if cobertura_pos < cobertura_alvo_debug and resultado.get('quantidade_pedido', 0) > 0:
-                            print(f"  [DEBUG COBERTURA] Item {codigo} Loja {loja_cod}: demanda_dia={demanda_diaria:.3f}, estoque={resultado.get('estoque_atual',0)}, ES={resultado.get('estoque_seguranca',0)}, demanda_periodo={resultado.get('demanda_prevista',0)}, qtd_pedido={resultado.get('quantidade_pedido',0)}, cobertura_alvo={cobertura_alvo_debug}d, cobertura_pos={cobertura_pos:.1f}d, fonte={metadata.get('fonte', 'N/A')}")
-
-                        resultados.append(resultado)
+                                'cod_empresa': loja_cod,
+                                'previsao_diaria': demanda_diaria,
+                                'desvio_padrao': desvio_padrao,
+                                'cobertura_dias': cobertura_dias,
+                                'lead_time_dias': lead_time_forn + dias_transferencia_cd,
+                                'ciclo_pedido_dias': ciclo_pedido_forn,
+                                'pedido_minimo_valor': pedido_min_forn,
+                                'aplicar_limitador_cobertura': is_tsb,
+                                'dias_ate_entrega': dias_ate_entrega_override
+                            },
+                            'multiloja': True,
+                            'row': row,
+                            'cod_loja': loja_cod,
+                            'nome_loja': loja_nome,
+                            'metadata': metadata,
+                            'demanda_diaria': demanda_diaria,
+                            'fornecedor_cadastrado': fornecedor_cadastrado,
+                            'lead_time_forn': lead_time_forn,
+                            'ciclo_pedido_forn': ciclo_pedido_forn,
+                            'pedido_min_forn': pedido_min_forn
+                        })
+                        resultados.append(None)
                 else:
                     # V31: Verificar se item tem vendas recentes nesta loja
                     if (codigo, cod_destino) in itens_sem_venda_recente:
@@ -825,18 +607,120 @@ def api_pedido_fornecedor_integrado():
                         itens_sem_demanda += 1
                         continue
 
-                    resultado = processador.processar_item(
-                        codigo=codigo,
-                        cod_empresa=cod_destino,
-                        previsao_diaria=demanda_diaria,
-                        desvio_padrao=desvio_padrao,
-                        cobertura_dias=cobertura_dias,
-                        lead_time_dias=lead_time_forn + dias_transferencia_cd,
-                        ciclo_pedido_dias=ciclo_pedido_forn,
-                        pedido_minimo_valor=pedido_min_forn,
-                        dias_ate_entrega=dias_ate_entrega_override
-                    )
+                    pendentes_calculo.append({
+                        'posicao': len(resultados),
+                        'item': {
+                            'codigo': codigo,
+                            'cod_empresa': cod_destino,
+                            'previsao_diaria': demanda_diaria,
+                            'desvio_padrao': desvio_padrao,
+                            'cobertura_dias': cobertura_dias,
+                            'lead_time_dias': lead_time_forn + dias_transferencia_cd,
+                            'ciclo_pedido_dias': ciclo_pedido_forn,
+                            'pedido_minimo_valor': pedido_min_forn,
+                            'dias_ate_entrega': dias_ate_entrega_override
+                        },
+                        'multiloja': False,
+                        'row': row,
+                        'cod_loja': cod_destino,
+                        'nome_loja': nome_destino,
+                        'metadata': metadata,
+                        'demanda_diaria': demanda_diaria,
+                        'fornecedor_cadastrado': fornecedor_cadastrado,
+                        'lead_time_forn': lead_time_forn,
+                        'ciclo_pedido_forn': ciclo_pedido_forn,
+                        'pedido_min_forn': pedido_min_forn
+                    })
+                    resultados.append(None)
+
+            except Exception as e:
+                print(f"  [AVISO] Erro ao processar item {row.get('codigo')}: {e}")
+                continue
 
+        # Calculo dos pedidos em lote: mesmo resultado de processar_item item a item,
+        # numa unica passada vetorizada e com os eventos lidos uma vez por periodo
+        reportar_progresso(total_itens, total_passos, 'Calculo do pedido em lote')
+        calculados = []
+        if pendentes_calculo:
+            try:
+                calculados = processador.processar_itens_lote([p['item'] for p in pendentes_calculo])
+            except Exception as e_lote:
+                print(f"  [AVISO] Calculo em lote falhou ({e_lote}). Calculando item a item.")
+                calculados = []
+                for pendente in pendentes_calculo:
+                    try:
+                        calculados.append(processador.processar_item(**pendente['item']))
+                    except Exception as e:
+                        print(f"  [AVISO] Erro ao processar item {pendente['item']['codigo']}: {e}")
+                        calculados.append(None)
+
+        for pendente, resultado in zip(pendentes_calculo, calculados):
+            if resultado is None:
+                continue
+            codigo = pendente['item']['codigo']
+            row = pendente['row']
+            metadata = pendente['metadata']
+            demanda_diaria = pendente['demanda_diaria']
+            fornecedor_cadastrado = pendente['fornecedor_cadastrado']
+            lead_time_forn = pendente['lead_time_forn']
+            ciclo_pedido_forn = pendente['ciclo_pedido_forn']
+            pedido_min_forn = pendente['pedido_min_forn']
+            try:
+                if pendente['multiloja']:
+                    loja_cod = pendente['cod_loja']
+                    loja_nome = pendente['nome_loja']
+                    if 'erro' in resultado:
+                        resultado = {
+                            'codigo': codigo,
+                            'descricao': row.get('descricao', ''),
+                            'nome_fornecedor': row.get('nome_fornecedor', ''),
+                            'curva_abc': row.get('curva_abc', 'B'),
+                            'estoque_atual': 0,
+                            'estoque_transito': 0,
+                            'demanda_prevista': 0,
+                            'demanda_prevista_diaria': 0,
+                            'cobertura_atual_dias': 999,
+                            'cobertura_pos_pedido_dias': 999,
+                            'quantidade_pedido': 0,
+                            'valor_pedido': 0,
+                            'preco_custo': 0,
+                            'cue': 0,
+                            'deve_pedir': False,
+                            'bloqueado': False
+                        }
+
+                    resultado['cod_loja'] = loja_cod
+                    resultado['nome_loja'] = loja_nome
+                    resultado['codigo_fornecedor'] = row.get('codigo_fornecedor', '')
+                    resultado['metodo_previsao'] = metadata.get('metodo_usado', 'auto')
+                    resultado['fonte_demanda'] = metadata.get('fonte', 'tempo_real')  # pre_calculada ou tempo_real
+                    resultado['metodo_rateio'] = metadata.get('metodo_rateio')  # proporcional ou uniforme
+                    resultado['proporcao_loja'] = metadata.get('proporcao_loja')  # 0.0 a 1.0
+                    resultado['tem_ajuste_manual'] = metadata.get('editado_manualmente', False)
+                    resultado['lojas_consideradas'] = 1
+                    resultado['fornecedor_cadastrado'] = fornecedor_cadastrado
+                    resultado['lead_time_usado'] = lead_time_forn + dias_transferencia_cd
+                    resultado['dias_transferencia_cd'] = dias_transferencia_cd
+                    resultado['ciclo_pedido_usado'] = ciclo_pedido_forn
+                    resultado['pedido_minimo_fornecedor'] = pedido_min_forn
+                    resultado['sem_demanda_loja'] = demanda_diaria <= 0
+
+                    # V46: Adicionar info de SOLIs ao resultado
+                    solis_item = solis_por_item.get(codigo, [])
+                    solis_loja = [(o, d, q) for o, d, q in solis_item if o == loja_cod or d == loja_cod]
+                    if solis_loja:
+                        resultado['solis_abertas'] = solis_loja
+                        resultado['soli_saida'] = sum(q for o, d, q in solis_loja if o == loja_cod)
+                        resultado['soli_entrada'] = sum(q for o, d, q in solis_loja if d == loja_cod)
+
+                    # DEBUG: Qualquer item com cobertura insuficiente
+                    cobertura_alvo_debug = cobertura_dias if cobertura_dias else 21
+                    cobertura_pos = resultado.get('cobertura_pos_pedido_dias', 999)
+                    if cobertura_pos < cobertura_alvo_debug and resultado.get('quantidade_pedido', 0) > 0:
+                        print(f"  [DEBUG COBERTURA] Item {codigo} Loja {loja_cod}: demanda_dia={demanda_diaria:.3f}, estoque={resultado.get('estoque_atual',0)}, ES={resultado.get('estoque_seguranca',0)}, demanda_periodo={resultado.get('demanda_prevista',0)}, qtd_pedido={resultado.get('quantidade_pedido',0)}, cobertura_alvo={cobertura_alvo_debug}d, cobertura_pos={cobertura_pos:.1f}d, fonte={metadata.get('fonte', 'N/A')}")
+
+                    resultados[pendente['posicao']] = resultado
+                else:
                     if 'erro' not in resultado:
                         resultado['nome_loja'] = nome_destino
                         resultado['cod_loja'] = cod_destino
@@ -859,11 +743,13 @@ def api_pedido_fornecedor_integrado():
                             resultado['soli_saida'] = sum(q for o, d, q in solis_loja_s if o == cod_destino)
                             resultado['soli_entrada'] = sum(q for o, d, q in solis_loja_s if d == cod_destino)
 
-                        resultados.append(resultado)
+                        resultados[pendente['posicao']] = resultado
 
             except Exception as e:
-                print(f"  [AVISO] Erro ao processar item {row.get('codigo')}: {e}")
-                continue
+                print(f"  [AVISO] Erro ao processar item {codigo}: {e}")
+
+        resultados = [r for r in resultados if r is not None]
+        reportar_progresso(total_itens + 1, total_passos, 'Consolidando pedido')
 
         conn.close()
 
@@ -934,66 +820,30 @@ def api_pedido_fornecedor_integrado():
             # V30: Para pedidos direto loja, verificar estoque em TODOS os CDs
             # Mesmo fornecedores com padrao direto loja podem ter estoque nos CDs
             # (negociacoes comerciais, compras de oportunidade, etc.)
-            try:
-                conn_cd_check = get_db_connection()
-                cursor_cd_check = conn_cd_check.cursor()
-                cursor_cd_check.execute("""
-                    SELECT cod_empresa, codigo,
-                           COALESCE(estoque, 0) as estoque
-                    FROM estoque_posicao_atual
-                    WHERE cod_empresa >= 80
-                      AND codigo = ANY(%s)
-                      AND COALESCE(estoque, 0) > 0
-                """, (codigos_produtos,))
-                for row in cursor_cd_check.fetchall():
-                    cod_cd = int(row[0])
-                    cod_item = int(row[1])
-                    # Mapear item ao CD que tem estoque
-                    # Se multiplos CDs tem estoque do mesmo item, pegar o primeiro
-                    if cod_item not in cd_por_item:
-                        cd_por_item[cod_item] = cod_cd
-                        cds_detectados.add(cod_cd)
-                cursor_cd_check.close()
-                conn_cd_check.close()
-                if cds_detectados:
-                    print(f"  [CD V30] Estoque CD detectado para direto-loja: {len(cd_por_item)} itens em CDs {sorted(cds_detectados)}")
-            except Exception as e_cd30:
-                print(f"  [CD V30] Erro ao verificar estoque CDs: {e_cd30}")
+            for cod_cd, cod_item, estoque_item, _, _, _ in snapshot.estoque_cds:
+                # Mapear item ao CD que tem estoque
+                # Se multiplos CDs tem estoque do mesmo item, pegar o primeiro
+                if cod_cd >= 80 and estoque_item > 0 and cod_item not in cd_por_item:
+                    cd_por_item[cod_item] = cod_cd
+                    cds_detectados.add(cod_cd)
+            if cds_detectados:
+                print(f"  [CD V30] Estoque CD detectado para direto-loja: {len(cd_por_item)} itens em CDs {sorted(cds_detectados)}")
 
         # Carregar estoque de TODOS os CDs detectados
         if cds_detectados and codigos_produtos:
-            try:
-                conn_cd = get_db_connection()
-                cursor_cd = conn_cd.cursor()
-                cds_list = list(cds_detectados)
-                cursor_cd.execute("""
-                    SELECT cod_empresa, codigo,
-                           COALESCE(estoque, 0) as estoque,
-                           COALESCE(qtd_pendente, 0) as qtd_pendente,
-                           COALESCE(qtd_pend_transf, 0) as qtd_pend_transf,
-                           COALESCE(cue, 0) as cue
-                    FROM estoque_posicao_atual
-                    WHERE cod_empresa = ANY(%s) AND codigo = ANY(%s)
-                """, (cds_list, codigos_produtos))
-                for row in cursor_cd.fetchall():
-                    cod_cd = int(row[0])
-                    cod_item = int(row[1])
-                    # Indexar por item (cada item tem 1 CD via padrao_compra)
-                    if cd_por_item.get(cod_item) == cod_cd:
-                        estoque_cd[cod_item] = {
-                            'cod_cd': cod_cd,
-                            'estoque': float(row[2]),
-                            'qtd_pendente': float(row[3]),
-                            'qtd_pend_transf': float(row[4]),
-                            'cue': float(row[5])
-                        }
-                cursor_cd.close()
-                conn_cd.close()
-                for cd in sorted(cds_detectados):
-                    itens_cd = [k for k, v in estoque_cd.items() if v.get('cod_cd') == cd]
-                    print(f"  [CD V29] Estoque CD {cd} carregado: {len(itens_cd)} itens")
-            except Exception as e_cd:
-                print(f"  [CD V29] Erro ao carregar estoque CD: {e_cd}")
+            for cod_cd, cod_item, estoque_item, qtd_pendente, qtd_pend_transf, cue_cd in snapshot.estoque_cds:
+                # Indexar por item (cada item tem 1 CD via padrao_compra)
+                if cd_por_item.get(cod_item) == cod_cd:
+                    estoque_cd[cod_item] = {
+                        'cod_cd': cod_cd,
+                        'estoque': estoque_item,
+                        'qtd_pendente': qtd_pendente,
+                        'qtd_pend_transf': qtd_pend_transf,
+                        'cue': cue_cd
+                    }
+            for cd in sorted(cds_detectados):
+                itens_cd = [k for k, v in estoque_cd.items() if v.get('cod_cd') == cd]
+                print(f"  [CD V29] Estoque CD {cd} carregado: {len(itens_cd)} itens")
 
         # Variavel de compatibilidade (usado no JSON de resposta)
         cd_destino_v29 = sorted(cds_detectados)[0] if cds_detectados else None
@@ -1281,18 +1131,10 @@ def api_pedido_fornecedor_integrado():
                 # CARREGAR GRUPOS REGIONAIS DE TRANSFERENCIA
                 # ==============================================================================
                 # Transferencias so podem ocorrer entre lojas do MESMO grupo regional
-                cursor_grupos = conn_transf.cursor()
-                cursor_grupos.execute("""
-                    SELECT lg.cod_empresa, g.id as grupo_id, g.nome as grupo_nome
-                    FROM lojas_grupo_transferencia lg
-                    JOIN grupos_transferencia g ON lg.grupo_id = g.id
-                    WHERE lg.ativo = TRUE AND g.ativo = TRUE
-                """)
-                grupos_por_loja = {}
-                for row in cursor_grupos.fetchall():
-                    cod_empresa, grupo_id, grupo_nome = row
-                    grupos_por_loja[cod_empresa] = {'grupo_id': grupo_id, 'grupo_nome': grupo_nome}
-                cursor_grupos.close()
+                # (pre-carregados no snapshot; sem grupos nao ha transferencia)
+                if snapshot.grupos_por_loja is None:
+                    raise RuntimeError('grupos regionais indisponiveis')
+                grupos_por_loja = snapshot.grupos_por_loja
 
                 print(f"  [TRANSFERENCIAS] Grupos regionais carregados: {len(set(g['grupo_id'] for g in grupos_por_loja.values()))} grupos, {len(grupos_por_loja)} lojas mapeadas")
 
@@ -2004,6 +1846,9 @@ def api_pedido_fornecedor_integrado_exportar():
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
         dados = request.get_json()
+        dados, erro_job = dados_exportacao(dados)
+        if erro_job:
+            return jsonify({'success': False, 'erro': erro_job}), 400
 
         if not dados:
             return jsonify({'success': False, 'erro': 'Dados nao fornecidos'}), 400
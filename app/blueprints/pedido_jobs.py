@@ -0,0 +1,42 @@
+"""
+Blueprint: Jobs assincronos de calculo de pedido
+Rotas: /api/pedido_jobs/<job_id>, /api/pedido_jobs/<job_id>/resultado
+"""
+
+from flask import Blueprint, jsonify
+
+from app.utils.jobs_pedido import obter_job, STATUS_FINALIZADOS
+
+pedido_jobs_bp = Blueprint('pedido_jobs', __name__)
+
+
+@pedido_jobs_bp.route('/api/pedido_jobs/<job_id>', methods=['GET'])
+def api_pedido_job_status(job_id):
+    """
+    Andamento de um calculo de pedido enviado com "assincrono": true.
+
+    Returns:
+        JSON com status, itens processados / total e percentual
+    """
+    job = obter_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'erro': 'Job nao encontrado ou expirado'}), 404
+    return jsonify({'success': True, **job.como_dict()})
+
+
+@pedido_jobs_bp.route('/api/pedido_jobs/<job_id>/resultado', methods=['GET'])
+def api_pedido_job_resultado(job_id):
+    """
+    Resultado de um calculo de pedido (mesmo JSON do modo sincrono).
+
+    Returns:
+        JSON do endpoint de calculo; 202 enquanto o job nao terminou
+    """
+    job = obter_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'erro': 'Job nao encontrado ou expirado'}), 404
+    if job.status not in STATUS_FINALIZADOS:
+        return jsonify({'success': True, **job.como_dict()}), 202
+    if job.resultado is None:
+        return jsonify({'success': False, 'erro': job.erro}), 500
+    return jsonify(job.resultado), job.status_http
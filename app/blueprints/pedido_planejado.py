@@ -13,6 +13,9 @@ from psycopg2.extras import RealDictCursor
 
 from app.utils.db_connection import get_db_connection
 from app.utils.demanda_pre_calculada import calcular_proporcoes_vendas_por_loja
+from app.utils.universo_produtos import resolver_universo_produtos
+from app.utils.jobs_pedido import submeter_job_pedido, dados_exportacao, reportar_progresso
+from app.utils.cache_pedido import cache_resultado_pedido
 from decimal import Decimal
 
 pedido_planejado_bp = Blueprint('pedido_planejado', __name__)
@@ -39,6 +42,7 @@ def to_int(value, default=0):
 
 
 @pedido_planejado_bp.route('/api/pedido_planejado', methods=['POST'])
+@cache_resultado_pedido('pedido_planejado')
 def api_pedido_planejado():
     """
     Gera pedido planejado para um periodo futuro.
@@ -57,6 +61,10 @@ def api_pedido_planejado():
 
         dados = request.get_json()
 
+        # Modo assincrono: calculo em background, resposta imediata com job_id
+        if dados and dados.get('assincrono'):
+            return submeter_job_pedido('pedido_planejado', request.path, dados)
+
         # Parametros de filtro
         fornecedor_filtro = dados.get('fornecedor', 'TODOS')
         linha1_filtro = dados.get('linha1', 'TODAS')
@@ -175,12 +183,27 @@ def api_pedido_planejado():
 
         num_lojas = len(lojas_selecionadas)
 
+        # Produtos filtrados de todas as lojas numa unica query
+        # (parametros_fornecedor de cada loja na coluna cod_destino)
+        df_universo = resolver_universo_produtos(
+            conn,
+            fornecedores=fornecedor_filtro,
+            linha1=linha1_filtro,
+            linha3=linha3_filtro,
+            cod_destino=lojas_selecionadas,
+            somente_com_fornecedor=False
+        ).rename(columns={'codigo_fornecedor': 'cnpj_fornecedor'})
+        produtos_por_loja = {
+            int(cod_loja): grupo for cod_loja, grupo in df_universo.groupby('cod_destino', sort=False)
+        }
+
         # Processar por loja
         processador = PedidoFornecedorIntegrado(conn)
         resultados = []
         itens_com_demanda_validada = 0
 
-        for cod_loja in lojas_selecionadas:
+        for posicao_loja, cod_loja in enumerate(lojas_selecionadas):
+            reportar_progresso(posicao_loja, num_lojas, f'Loja {cod_loja}')
             # Buscar demanda validada se habilitado
             demanda_validada = {}
             if usar_demanda_validada:
@@ -209,57 +232,8 @@ def api_pedido_planejado():
                         }
                 cursor.close()
 
-            # Buscar produtos do fornecedor
-            query_produtos = """
-                SELECT DISTINCT
-                    p.cod_produto as codigo,
-                    p.descricao,
-                    p.categoria as linha1,
-                    p.codigo_linha as linha3,
-                    p.cnpj_fornecedor,
-                    p.nome_fornecedor,
-                    COALESCE(pf.lead_time_dias, 15) as lead_time_dias,
-                    COALESCE(pf.ciclo_pedido_dias, 7) as ciclo_pedido_dias,
-                    COALESCE(pf.pedido_minimo_valor, 0) as pedido_minimo_valor
-                FROM cadastro_produtos_completo p
-                LEFT JOIN parametros_fornecedor pf ON p.cnpj_fornecedor = pf.cnpj_fornecedor
-                    AND pf.cod_empresa = %s AND pf.ativo = TRUE
-                WHERE p.ativo = TRUE
-            """
-            params = [cod_loja]
-
-            if fornecedor_filtro != 'TODOS':
-                if isinstance(fornecedor_filtro, list):
-                    placeholders = ','.join(['%s'] * len(fornecedor_filtro))
-                    query_produtos += f" AND p.nome_fornecedor IN ({placeholders})"
-                    params.extend(fornecedor_filtro)
-                else:
-                    query_produtos += " AND p.nome_fornecedor = %s"
-                    params.append(fornecedor_filtro)
-
-            if linha1_filtro != 'TODAS':
-                is_lista = isinstance(linha1_filtro, (list, tuple))
-                if is_lista and len(linha1_filtro) > 1:
-                    placeholders = ','.join(['%s'] * len(linha1_filtro))
-                    query_produtos += f" AND p.categoria IN ({placeholders})"
-                    params.extend([str(v) for v in linha1_filtro])
-                else:
-                    query_produtos += " AND p.categoria = %s"
-                    valor = linha1_filtro[0] if is_lista else linha1_filtro
-                    params.append(str(valor) if not isinstance(valor, str) else valor)
-
-            if linha3_filtro != 'TODAS':
-                is_lista = isinstance(linha3_filtro, (list, tuple))
-                if is_lista and len(linha3_filtro) > 1:
-                    placeholders = ','.join(['%s'] * len(linha3_filtro))
-                    query_produtos += f" AND p.codigo_linha IN ({placeholders})"
-                    params.extend([str(v) for v in linha3_filtro])
-                else:
-                    query_produtos += " AND p.codigo_linha = %s"
-                    valor = linha3_filtro[0] if is_lista else linha3_filtro
-                    params.append(str(valor) if not isinstance(valor, str) else valor)
-
-            df_produtos = pd.read_sql(query_produtos, conn, params=params)
+            # Produtos do fornecedor com os parametros desta loja
+            df_produtos = produtos_por_loja.get(cod_loja, df_universo.iloc[0:0])
 
             # Buscar nome da loja
             cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -445,6 +419,9 @@ def api_pedido_planejado_exportar():
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
         dados = request.get_json()
+        dados, erro_job = dados_exportacao(dados)
+        if erro_job:
+            return jsonify({'success': False, 'erro': erro_job}), 400
 
         if not dados:
             return jsonify({'success': False, 'erro': 'Dados nao fornecidos'}), 400
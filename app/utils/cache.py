@@ -193,16 +193,30 @@ def clear_all_caches():
     get_categorias_cached.cache_clear()
     get_classificacao_abc_cached.cache_clear()
 
+    from core.cache_previsao import get_cache_previsao
+    cache_previsao = get_cache_previsao()
+    if cache_previsao is not None:
+        cache_previsao.limpar()
+
+    from app.utils.cache_pedido import invalidar_cache_pedido
+    invalidar_cache_pedido()
+
 
 def get_cache_stats():
     """
     Retorna estatísticas de uso dos caches.
     """
+    from core.cache_previsao import get_cache_previsao
+    from app.utils import cache_pedido
+    cache_previsao = get_cache_previsao()
+
     return {
         'fornecedores': get_fornecedores_cached.cache_info()._asdict(),
         'empresas': get_empresas_cached.cache_info()._asdict(),
         'categorias': get_categorias_cached.cache_info()._asdict(),
         'abc': get_classificacao_abc_cached.cache_info()._asdict(),
+        'previsao': cache_previsao.estatisticas() if cache_previsao is not None else None,
+        'pedido': cache_pedido.estatisticas(),
     }
 
 
@@ -0,0 +1,225 @@
+"""
+Cache versionado de resultados das telas de pedido (Pedido Fornecedor,
+Compra Planejada e Pedido Planejado).
+
+A chave e o hash dos parametros normalizados da requisicao (mais a tela e a
+data do dia, ja que o calculo parte de hoje). Cada entrada guarda a versao
+dos dados de entrada em que foi calculada:
+
+- demanda: ultima execucao de demanda_calculo_execucao (id, status, itens
+  processados e data; mais atualizado_em quando a migration V58 existe)
+- estoque: data da ultima importacao de estoque_posicao_atual
+- parametros: ultima atualizacao e quantidade de parametros_fornecedor ativos
+- geracao local: alteracoes feitas pela propria aplicacao (ajustes de
+  demanda, parametros, eventos...) via invalidar_cache_pedido()
+
+Com a mesma chave e a mesma versao, o JSON guardado e devolvido sem
+recalcular; se a versao mudou, o pedido e recalculado e a entrada substituida.
+A resposta ganha o campo cache_id, que os endpoints de exportacao aceitam no
+lugar do pedido inteiro.
+
+Configuracao por ambiente:
+    PEDIDO_CACHE_MAX  pedidos guardados (default 32; 0 desliga o cache)
+    PEDIDO_CACHE_TTL  validade maxima de uma entrada em segundos (default 4h)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import Response, request
+
+from app.utils.db_connection import pooled_connection
+from app.utils.demanda_pre_calculada import colunas_progresso_execucao_existem
+from app.utils.universo_produtos import tabela_parametros_existe
+
+CACHE_PEDIDO_MAX = int(os.environ.get('PEDIDO_CACHE_MAX', 32))
+CACHE_PEDIDO_TTL = int(os.environ.get('PEDIDO_CACHE_TTL', 4 * 3600))
+
+# Campos da requisicao que nao mudam o resultado do calculo
+CAMPOS_IGNORADOS = ('assincrono', 'usar_cache', 'cache_id', 'job_id')
+
+# Blueprints cujas alteracoes (POST/PUT/PATCH/DELETE) mudam entradas do pedido
+BLUEPRINTS_INVALIDAM_PEDIDO = frozenset({
+    'parametros', 'previsao', 'demanda_validada', 'demanda_job', 'eventos',
+    'configuracao', 'transferencias', 'padrao_compra',
+})
+
+_entradas: 'OrderedDict[str, Tuple[Tuple, float, bytes]]' = OrderedDict()
+_lock = threading.Lock()
+_geracao = 0
+_stats = {'hits': 0, 'misses': 0, 'desatualizados': 0, 'gravacoes': 0, 'invalidacoes': 0}
+
+
+def chave_pedido(tipo: str, dados: Dict) -> str:
+    """
+    Chave do cache: sha256 de (tela, data de hoje, parametros normalizados).
+
+    Args:
+        tipo: Tela de origem ('pedido_fornecedor', 'compra_planejada', 'pedido_planejado')
+        dados: Corpo JSON da requisicao de calculo
+    """
+    parametros = {k: v for k, v in (dados or {}).items()
+                  if k not in CAMPOS_IGNORADOS and v is not None}
+    material = json.dumps([tipo, date.today().isoformat(), parametros], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _consultar_versao(conn) -> Tuple:
+    cursor = conn.cursor()
+    demanda = ("id || ':' || status || ':' || COALESCE(total_itens_processados, 0)"
+               " || ':' || COALESCE(data_execucao::text, '')")
+    if colunas_progresso_execucao_existem(conn):
+        demanda += " || ':' || COALESCE(atualizado_em::text, '')"
+    if tabela_parametros_existe(conn):
+        parametros = """(SELECT MAX(data_importacao)::text || ':' || COUNT(*) FILTER (WHERE ativo)
+                         FROM parametros_fornecedor)"""
+    else:
+        parametros = "NULL"
+    cursor.execute(f"""
+        SELECT
+            (SELECT {demanda}
+             FROM demanda_calculo_execucao ORDER BY id DESC LIMIT 1),
+            (SELECT MAX(data_importacao)::text FROM estoque_posicao_atual),
+            {parametros}
+    """)
+    versao = tuple(cursor.fetchone())
+    cursor.close()
+    return versao
+
+
+def versao_dados_pedido() -> Optional[Tuple]:
+    """
+    Versao atual das entradas do calculo de pedido.
+
+    Returns:
+        Tupla (demanda, estoque, parametros, geracao local), ou None se a
+        consulta falhar (o pedido e calculado sem usar o cache)
+    """
+    try:
+        with pooled_connection() as conn:
+            versao = _consultar_versao(conn)
+    except Exception as e:
+        print(f"  [CACHE PEDIDO] Versao dos dados indisponivel: {e}")
+        return None
+    return versao + (_geracao,)
+
+
+def _remover_expirados() -> None:
+    """Descarta entradas mais antigas que CACHE_PEDIDO_TTL (chamar com o lock)."""
+    limite = time.monotonic() - CACHE_PEDIDO_TTL
+    for chave in [c for c, (_, criado, _) in _entradas.items() if criado < limite]:
+        del _entradas[chave]
+
+
+def obter_resultado(chave: str, versao: Optional[Tuple] = None) -> Optional[bytes]:
+    """
+    JSON guardado para a chave.
+
+    Args:
+        chave: Chave do pedido (chave_pedido / cache_id)
+        versao: Versao exigida; None aceita qualquer versao (exportacao do
+            pedido que o usuario esta vendo)
+
+    Returns:
+        Corpo JSON em bytes, ou None
+    """
+    with _lock:
+        _remover_expirados()
+        entrada = _entradas.get(chave)
+        if entrada is None:
+            _stats['misses'] += 1
+            return None
+        if versao is not None and entrada[0] != versao:
+            _stats['desatualizados'] += 1
+            return None
+        _entradas.move_to_end(chave)
+        _stats['hits'] += 1
+        return entrada[2]
+
+
+def guardar_resultado(chave: str, versao: Tuple, corpo: bytes) -> None:
+    """Guarda o JSON de um pedido calculado na versao informada."""
+    if CACHE_PEDIDO_MAX <= 0:
+        return
+    with _lock:
+        _entradas[chave] = (versao, time.monotonic(), corpo)
+        _entradas.move_to_end(chave)
+        while len(_entradas) > CACHE_PEDIDO_MAX:
+            _entradas.popitem(last=False)
+        _stats['gravacoes'] += 1
+
+
+def invalidar_cache_pedido() -> None:
+    """Descarta os pedidos guardados (dados alterados pela aplicacao)."""
+    global _geracao
+    with _lock:
+        _geracao += 1
+        _entradas.clear()
+        _stats['invalidacoes'] += 1
+
+
+def estatisticas() -> Dict:
+    with _lock:
+        return {**_stats, 'entradas': len(_entradas), 'bytes': sum(len(e[2]) for e in _entradas.values())}
+
+
+def resultado_exportacao(cache_id: str) -> Optional[Dict]:
+    """Resultado guardado para exportar (sem exigir versao atual)."""
+    corpo = obter_resultado(cache_id)
+    return json.loads(corpo) if corpo is not None else None
+
+
+def cache_resultado_pedido(tipo: str):
+    """
+    Decorator dos endpoints de calculo de pedido.
+
+    Devolve o JSON guardado quando parametros e versao dos dados coincidem;
+    senao executa o endpoint e guarda as respostas com sucesso. Requisicoes
+    assincronas passam direto (o job executa o endpoint e usa o cache).
+    {"usar_cache": false} forca o recalculo.
+
+    Usage:
+        @pedido_fornecedor_bp.route('/api/pedido_fornecedor_integrado', methods=['POST'])
+        @cache_resultado_pedido('pedido_fornecedor')
+        def api_pedido_fornecedor_integrado():
+            ...
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            dados = request.get_json(silent=True)
+            if CACHE_PEDIDO_MAX <= 0 or not isinstance(dados, dict) or dados.get('assincrono'):
+                return func(*args, **kwargs)
+
+            chave = chave_pedido(tipo, dados)
+            versao = versao_dados_pedido()
+            if versao is not None and dados.get('usar_cache', True):
+                corpo = obter_resultado(chave, versao)
+                if corpo is not None:
+                    print(f"  [CACHE PEDIDO] {tipo}: resultado reaproveitado ({chave[:8]})")
+                    return Response(corpo, mimetype='application/json')
+
+            resposta = func(*args, **kwargs)
+            if versao is None:
+                return resposta
+
+            # Endpoints devolvem Response ou (Response, status)
+            resp = resposta[0] if isinstance(resposta, tuple) else resposta
+            status = resposta[1] if isinstance(resposta, tuple) and len(resposta) > 1 else resp.status_code
+            resultado = resp.get_json(silent=True) if isinstance(resp, Response) else None
+            if status != 200 or not isinstance(resultado, dict) or not resultado.get('success'):
+                return resposta
+
+            resultado['cache_id'] = chave
+            corpo = json.dumps(resultado, default=str).encode()
+            guardar_resultado(chave, versao, corpo)
+            return Response(corpo, mimetype='application/json')
+        return wrapped
+    return decorator
@@ -3,8 +3,12 @@ Configuracao e conexao com o banco de dados PostgreSQL
 """
 
 import os
+import threading
+from contextlib import contextmanager
+
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 
 
 # Configuracao do banco de dados
@@ -16,6 +20,12 @@ DB_CONFIG = {
     'port': int(os.environ.get('DB_PORT', 5432))
 }
 
+# Pool de conexoes compartilhado entre threads (consultas concorrentes)
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 8))
+
+_pool = None
+_pool_lock = threading.Lock()
+
 
 def get_db_connection():
     """
@@ -45,3 +55,52 @@ def get_db_cursor(dict_cursor=False):
     else:
         cursor = conn.cursor()
     return conn, cursor
+
+
+def get_db_pool():
+    """
+    Retorna o pool de conexoes do processo (criado na primeira chamada).
+
+    Returns:
+        ThreadedConnectionPool com ate DB_POOL_MAX conexoes
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(1, DB_POOL_MAX, **DB_CONFIG)
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Empresta uma conexao do pool e a devolve ao sair do bloco.
+
+    Com o pool esgotado (muitas requisicoes simultaneas), abre uma conexao
+    avulsa em vez de esperar. Transacoes abertas sao desfeitas na devolucao.
+
+    Usage:
+        with pooled_connection() as conn:
+            df = pd.read_sql(query, conn)
+    """
+    pool = get_db_pool()
+    try:
+        conn = pool.getconn()
+    except PoolError:
+        conn = get_db_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    descartar = False
+    try:
+        conn.set_client_encoding('LATIN1')
+        yield conn
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            descartar = True
+        pool.putconn(conn, close=descartar or conn.closed != 0)
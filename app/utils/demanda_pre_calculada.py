@@ -10,6 +10,14 @@ from typing import Dict, List, Optional, Tuple
 from psycopg2.extras import RealDictCursor
 import numpy as np
 
+# Colunas de progresso de demanda_calculo_execucao criadas pela migration V58
+COLUNAS_PROGRESSO_EXECUCAO = (
+    'total_fornecedores_previstos', 'fornecedores_concluidos', 'retomadas', 'atualizado_em'
+)
+
+# Colunas da V58 existem (so o resultado positivo fica em cache)
+_colunas_progresso_existem = False
+
 
 def calcular_proporcoes_vendas_por_loja(
     conn,
@@ -186,6 +194,81 @@ def precarregar_demanda_em_lote(
     return cache
 
 
+def precarregar_demanda_fornecedores_em_lote(
+    conn,
+    produtos_por_fornecedor: Dict[str, List[str]],
+    cod_empresas: List[int] = None,
+    ano: int = None,
+    mes: int = None
+) -> Dict:
+    """
+    Pre-carrega a demanda mensal de produtos de varios fornecedores em uma unica query.
+
+    Equivale a chamar precarregar_demanda_em_lote uma vez por CNPJ e juntar
+    os resultados: os pares (produto, fornecedor) vao como arrays e o filtro
+    e feito no banco.
+
+    Args:
+        conn: Conexao com o banco de dados
+        produtos_por_fornecedor: CNPJ do fornecedor -> lista de codigos de produtos
+        cod_empresas: Lista de codigos de empresas/lojas (None = consolidado)
+        ano: Ano do periodo (default: ano atual)
+        mes: Mes do periodo (default: mes atual)
+
+    Returns:
+        Dicionario com chave (cod_produto, cod_empresa) -> dados da demanda
+        cod_empresa = None para dados consolidados
+    """
+    pares_produto = []
+    pares_cnpj = []
+    for cnpj_fornecedor, cod_produtos in produtos_por_fornecedor.items():
+        if not cnpj_fornecedor:
+            continue
+        for cod_produto in cod_produtos:
+            pares_produto.append(str(cod_produto))
+            pares_cnpj.append(str(cnpj_fornecedor))
+
+    if not pares_produto:
+        return {}
+
+    if ano is None:
+        ano = datetime.now().year
+    if mes is None:
+        mes = datetime.now().month
+
+    lojas = [e for e in (cod_empresas or []) if e is not None]
+    if lojas:
+        filtro_empresa = "AND (cod_empresa = ANY(%s) OR cod_empresa IS NULL)"
+        params_empresa = [lojas]
+    else:
+        filtro_empresa = "AND cod_empresa IS NULL"
+        params_empresa = []
+
+    query = f"""
+        SELECT *
+        FROM vw_demanda_efetiva
+        WHERE (cod_produto, cnpj_fornecedor) IN (
+                SELECT * FROM unnest(%s::text[], %s::text[])
+              )
+          AND ano = %s
+          AND mes = %s AND tipo_granularidade = 'mensal'
+          {filtro_empresa}
+    """
+    params = [pares_produto, pares_cnpj, ano, mes] + params_empresa
+
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.close()
+
+    cache = {}
+    for row in rows:
+        key = (str(row['cod_produto']), row.get('cod_empresa'))
+        cache[key] = dict(row)
+
+    return cache
+
+
 def precarregar_demanda_semanal_range(
     conn,
     cod_produtos: List[str],
@@ -525,6 +608,22 @@ def obter_demanda_diaria_efetiva(
     return (0, 0, {'fonte': 'sem_dados', 'metodo_usado': 'sem_historico'})
 
 
+def colunas_progresso_execucao_existem(conn) -> bool:
+    """Verifica se demanda_calculo_execucao ja tem as colunas de progresso (V58)."""
+    global _colunas_progresso_existem
+    if not _colunas_progresso_existem:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.columns
+            WHERE table_name = 'demanda_calculo_execucao'
+              AND column_name = ANY(%s)
+        """, (list(COLUNAS_PROGRESSO_EXECUCAO),))
+        _colunas_progresso_existem = cursor.fetchone()[0] == len(COLUNAS_PROGRESSO_EXECUCAO)
+        cursor.close()
+    return _colunas_progresso_existem
+
+
 def verificar_dados_disponiveis(conn, cnpj_fornecedor: str = None) -> Dict:
     """
     Verifica se ha dados pre-calculados disponiveis.
@@ -0,0 +1,253 @@
+"""
+Jobs assincronos de calculo de pedido.
+
+As telas de pedido (Pedido Fornecedor, Compra Planejada e Pedido Planejado)
+podem enviar {"assincrono": true} no corpo da requisicao: o calculo vai para
+um pool limitado de threads e a resposta volta na hora com o job_id. O
+andamento (itens processados / total) e o resultado ficam guardados em
+memoria para consulta e exportacao, sem recalcular o pedido.
+
+O job executa o proprio endpoint (via test_client, como a Compra Planejada
+ja faz com o pedido base), entao o resultado e identico ao modo sincrono.
+Os endpoints de exportacao tambem aceitam o cache_id do cache de resultados
+(app.utils.cache_pedido).
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, jsonify, url_for
+
+from app.utils.cache_pedido import resultado_exportacao
+
+# Calculos simultaneos e limite da fila
+JOBS_WORKERS = int(os.environ.get('PEDIDO_JOBS_WORKERS', 2))
+JOBS_MAX_NA_FILA = int(os.environ.get('PEDIDO_JOBS_MAX_FILA', 20))
+# Tempo que um job finalizado fica disponivel (segundos)
+JOBS_TTL_SEGUNDOS = int(os.environ.get('PEDIDO_JOBS_TTL', 4 * 3600))
+
+STATUS_NA_FILA = 'na_fila'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+STATUS_FINALIZADOS = (STATUS_CONCLUIDO, STATUS_ERRO)
+
+
+@dataclass
+class JobPedido:
+    """Estado de um calculo de pedido em background."""
+    id: str
+    tipo: str
+    rota: str
+    status: str = STATUS_NA_FILA
+    criado_em: datetime = field(default_factory=datetime.now)
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    itens_processados: int = 0
+    itens_total: int = 0
+    etapa: Optional[str] = None
+    # Corpo JSON e codigo HTTP da resposta do endpoint
+    resultado: Optional[Dict] = None
+    status_http: Optional[int] = None
+    erro: Optional[str] = None
+    finalizado_monotonic: Optional[float] = None
+
+    def percentual(self) -> Optional[float]:
+        if self.status in STATUS_FINALIZADOS:
+            return 100.0
+        if not self.itens_total:
+            return None
+        # 100% so quando o job termina (a resposta ainda esta sendo montada)
+        return round(min(self.itens_processados / self.itens_total, 0.99) * 100, 1)
+
+    def como_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'itens_processados': self.itens_processados,
+            'itens_total': self.itens_total,
+            'percentual': self.percentual(),
+            'etapa': self.etapa,
+            'criado_em': self.criado_em.isoformat(),
+            'iniciado_em': self.iniciado_em.isoformat() if self.iniciado_em else None,
+            'concluido_em': self.concluido_em.isoformat() if self.concluido_em else None,
+            'erro': self.erro,
+        }
+
+
+_jobs: Dict[str, JobPedido] = {}
+_jobs_lock = threading.Lock()
+_executor = None
+# Job em execucao na thread atual (para reportar_progresso)
+_contexto = threading.local()
+
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix='pedido_job')
+    return _executor
+
+
+def _remover_expirados() -> None:
+    """Descarta jobs finalizados ha mais de JOBS_TTL_SEGUNDOS (chamar com o lock)."""
+    limite = time.monotonic() - JOBS_TTL_SEGUNDOS
+    for job_id in [j.id for j in _jobs.values()
+                   if j.finalizado_monotonic is not None and j.finalizado_monotonic < limite]:
+        del _jobs[job_id]
+
+
+def reportar_progresso(processados: int, total: int, etapa: str = None) -> None:
+    """
+    Atualiza o andamento do job da thread atual (sem efeito fora de um job).
+
+    Args:
+        processados: Itens ja processados
+        total: Total de itens
+        etapa: Descricao da etapa em andamento
+    """
+    job = getattr(_contexto, 'job', None)
+    if job is None:
+        return
+
+    # Dentro de faixa_progresso: converte para a escala do chamador
+    for inicio, largura, total_faixa, prefixo in reversed(getattr(_contexto, 'faixas', [])):
+        processados = inicio + (largura * min(processados, total) / total if total else 0)
+        total = total_faixa
+        if prefixo and etapa is not None:
+            etapa = f'{prefixo}: {etapa}'
+    processados = int(processados)
+
+    # O andamento nao volta enquanto o total nao muda
+    if total == job.itens_total and processados < job.itens_processados:
+        processados = job.itens_processados
+    job.itens_processados = processados
+    job.itens_total = total
+    if etapa is not None:
+        job.etapa = etapa
+
+
+@contextmanager
+def faixa_progresso(inicio: int, fim: int, total: int, etapa: str = None):
+    """
+    Reserva a faixa [inicio, fim] de total para o trabalho do bloco.
+
+    Os reportar_progresso dentro do bloco (inclusive de um endpoint chamado
+    internamente, como o pedido base da Compra Planejada) sao convertidos
+    para essa faixa, em vez de sobrescrever o andamento do job.
+
+    Args:
+        inicio: Itens ja processados ao entrar no bloco
+        fim: Itens processados ao final do bloco
+        total: Total de itens do job
+        etapa: Prefixo das etapas reportadas no bloco
+    """
+    reportar_progresso(inicio, total, etapa)
+    faixas = getattr(_contexto, 'faixas', None)
+    if faixas is None:
+        faixas = _contexto.faixas = []
+    faixas.append((inicio, fim - inicio, total, etapa))
+    try:
+        yield
+    finally:
+        faixas.pop()
+
+
+def _executar_job(app, job: JobPedido, dados: Dict) -> None:
+    job.status = STATUS_EXECUTANDO
+    job.iniciado_em = datetime.now()
+    _contexto.job = job
+    try:
+        with app.test_client() as client:
+            resp = client.post(job.rota, json=dados)
+        job.resultado = resp.get_json()
+        job.status_http = resp.status_code
+        if resp.status_code < 400 and job.resultado and job.resultado.get('success', True):
+            job.status = STATUS_CONCLUIDO
+        else:
+            job.status = STATUS_ERRO
+            job.erro = (job.resultado or {}).get('erro') or f'HTTP {resp.status_code}'
+    except Exception as e:
+        job.status = STATUS_ERRO
+        job.erro = str(e)
+    finally:
+        _contexto.job = None
+        _contexto.faixas = []
+        job.concluido_em = datetime.now()
+        job.finalizado_monotonic = time.monotonic()
+        duracao = (job.concluido_em - job.iniciado_em).total_seconds()
+        print(f"  [JOB {job.id[:8]}] {job.tipo}: {job.status} em {duracao:.1f}s")
+
+
+def submeter_job_pedido(tipo: str, rota: str, dados: Dict):
+    """
+    Coloca o calculo na fila e responde com o job_id (HTTP 202).
+
+    Args:
+        tipo: Tela de origem ('pedido_fornecedor', 'compra_planejada', 'pedido_planejado')
+        rota: Endpoint a executar em background
+        dados: Corpo da requisicao original (o flag 'assincrono' e removido)
+
+    Returns:
+        Resposta Flask (202 com job_id, ou 429 com a fila cheia)
+    """
+    dados = {k: v for k, v in dados.items() if k != 'assincrono'}
+
+    with _jobs_lock:
+        _remover_expirados()
+        pendentes = sum(1 for j in _jobs.values() if j.status not in STATUS_FINALIZADOS)
+        if pendentes >= JOBS_MAX_NA_FILA:
+            return jsonify({
+                'success': False,
+                'erro': f'Fila de calculos cheia ({pendentes} em andamento). Tente novamente em instantes.'
+            }), 429
+        job = JobPedido(id=uuid.uuid4().hex, tipo=tipo, rota=rota)
+        _jobs[job.id] = job
+
+    _obter_executor().submit(_executar_job, current_app._get_current_object(), job, dados)
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('pedido_jobs.api_pedido_job_status', job_id=job.id),
+        'resultado_url': url_for('pedido_jobs.api_pedido_job_resultado', job_id=job.id),
+    }), 202
+
+
+def obter_job(job_id: str) -> Optional[JobPedido]:
+    with _jobs_lock:
+        _remover_expirados()
+        return _jobs.get(job_id)
+
+
+def dados_exportacao(dados: Optional[Dict]) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Dados para os endpoints de exportacao: com {"job_id": ...} usa o resultado
+    guardado do job e com {"cache_id": ...} o pedido guardado no cache de
+    resultados (sem recalcular); sem eles devolve os dados recebidos.
+
+    Returns:
+        Tupla (dados, mensagem de erro)
+    """
+    if dados and dados.get('cache_id') and not dados.get('job_id'):
+        resultado = resultado_exportacao(dados['cache_id'])
+        if resultado is None:
+            return None, 'Pedido nao encontrado no cache. Calcule o pedido novamente.'
+        return resultado, None
+    if not dados or not dados.get('job_id'):
+        return dados, None
+    job = obter_job(dados['job_id'])
+    if job is None:
+        return None, 'Job nao encontrado ou expirado'
+    if job.status != STATUS_CONCLUIDO:
+        return None, f'Job ainda nao concluido (status: {job.status})'
+    return job.resultado, None
@@ -32,6 +32,17 @@ def set_ultima_previsao_data(data):
     ultima_previsao_data = data
 
 
+def caracteristicas_ml_da_serie(caracteristicas_ml: pd.DataFrame, sku, loja) -> dict:
+    """
+    Caracteristicas de uma serie na matriz do lote, com os mesmos tipos de
+    MLMethodSelector.extrair_caracteristicas (a linha inteira via .loc viraria
+    float64 e tamanho_serie sairia como 24.0).
+    """
+    caracteristicas = {col: caracteristicas_ml.at[(sku, loja), col] for col in caracteristicas_ml.columns}
+    caracteristicas['tamanho_serie'] = int(caracteristicas['tamanho_serie'])
+    return caracteristicas
+
+
 def processar_previsao(arquivo_excel: str,
                       meses_previsao: int = 6,
                       granularidade: str = 'semanal',
@@ -97,28 +108,46 @@ def processar_previsao(arquivo_excel: str,
     df = processar_stockouts_dataframe(df)
     df_rupturas = calcular_metricas_stockout(df)
 
-    # 3.5 TREINAR SELETOR ML DE METODOS
-    print("3.5 Treinando seletor inteligente de metodos...")
+    # 3.5 SELETOR ML DE METODOS
+    # Usa o modelo salvo pelo treino offline (jobs/treinar_ml_selector.py);
+    # sem modelo salvo, treina com o proprio upload como antes
+    print("3.5 Carregando seletor inteligente de metodos...")
     ml_selector = None
+    df_ml = df[['SKU', 'Loja', 'Mes', 'Vendas_Corrigidas']].rename(columns={'Vendas_Corrigidas': 'Vendas'})
     try:
-        from core.ml_selector import MLMethodSelector
-        ml_selector = MLMethodSelector()
+        from core.ml_selector import MLMethodSelector, obter_seletor_treinado
+        ml_selector = obter_seletor_treinado(granularidade)
 
-        # Treinar com historico
-        stats_treino = ml_selector.treinar_com_historico(
-            df[['SKU', 'Loja', 'Mes', 'Vendas_Corrigidas']].rename(columns={'Vendas_Corrigidas': 'Vendas'})
-        )
-
-        if stats_treino['sucesso']:
-            print(f"   [OK] Modelo ML treinado com {stats_treino['series_validas']} series")
-            print(f"   [OK] Acuracia: {stats_treino['acuracia']:.1%}")
+        if ml_selector is not None:
+            print(f"   [OK] Modelo ML salvo carregado ({granularidade}, treinado em {ml_selector.treinado_em})")
         else:
-            print(f"   [AVISO] ML nao treinado - usando seletor baseado em regras")
-            ml_selector = None
+            print(f"   [AVISO] Nenhum modelo ML {granularidade} salvo - treinando com o upload "
+                  "(rode jobs/treinar_ml_selector.py para evitar)")
+            ml_selector = MLMethodSelector()
+
+            # Treinar com historico
+            stats_treino = ml_selector.treinar_com_historico(df_ml)
+
+            if stats_treino['sucesso']:
+                print(f"   [OK] Modelo ML treinado com {stats_treino['series_validas']} series")
+                print(f"   [OK] Acuracia: {stats_treino['acuracia']:.1%}")
+            else:
+                print(f"   [AVISO] ML nao treinado - usando seletor baseado em regras")
+                ml_selector = None
     except Exception as e:
-        print(f"   [AVISO] Erro ao treinar ML: {e}")
+        print(f"   [AVISO] Erro ao preparar ML: {e}")
         ml_selector = None
 
+    # Caracteristicas e metodo ML de todas as series de uma vez (uma predicao)
+    caracteristicas_ml = selecao_ml = None
+    if ml_selector is not None:
+        try:
+            caracteristicas_ml = ml_selector.extrair_caracteristicas_lote(df_ml)
+            selecao_ml = ml_selector.selecionar_metodos_lote(caracteristicas_ml)
+        except Exception as e:
+            print(f"   [AVISO] Erro na selecao ML em lote: {e}")
+            ml_selector = None
+
     # 4. GERAR PREVISOES POR LOJA + SKU
     print("4. Gerando previsoes por loja...")
     previsoes_lojas = []
@@ -168,13 +197,13 @@ def processar_previsao(arquivo_excel: str,
                 'alternativas': []
             }
         elif ml_selector and ml_selector.is_trained and classificacao_serie['permite_ml']:
-            metodo_ml, confianca_ml = ml_selector.selecionar_metodo(serie)
+            metodo_ml, confianca_ml = selecao_ml.loc[(sku, loja)]
 
             recomendacao = {
                 'metodo': metodo_ml,
                 'confianca': confianca_ml,
                 'razao': f'Selecionado por ML (confianca: {confianca_ml:.1%})',
-                'caracteristicas': ml_selector.extrair_caracteristicas(serie),
+                'caracteristicas': caracteristicas_ml_da_serie(caracteristicas_ml, sku, loja),
                 'alternativas': []
             }
         else:
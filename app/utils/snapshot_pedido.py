@@ -0,0 +1,283 @@
+"""
+Pre-carregamento concorrente dos dados da tela de Pedido ao Fornecedor.
+
+Antes do laco de itens o calculo do pedido precisa de varias consultas
+independentes (situacoes de compra, estoque, historico, embalagens,
+produtos, demanda pre-calculada, proporcoes por loja, ultima venda,
+SOLIs, estoque dos CDs, grupos de transferencia). Aqui elas rodam em
+paralelo, cada uma com uma conexao do pool, e o resultado volta num
+unico objeto SnapshotPedido. O tempo total fica limitado pela consulta
+mais lenta, e nao pela soma delas.
+
+Cada carga mantem o tratamento de erro que tinha no endpoint: as que
+antes caiam para um valor vazio continuam caindo (com aviso no log); as
+que antes propagavam a excecao continuam propagando.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.utils.db_connection import pooled_connection, DB_POOL_MAX
+from app.utils.demanda_pre_calculada import (
+    precarregar_demanda_fornecedores_em_lote,
+    calcular_proporcoes_vendas_por_loja
+)
+
+
+@dataclass
+class SnapshotPedido:
+    """Dados pre-carregados para o calculo de um pedido ao fornecedor."""
+    # Caches do PedidoFornecedorIntegrado (mesmo formato dos precarregar_*)
+    regras_sit_compra: Optional[Dict] = None
+    sit_compra_itens: Dict[Tuple[int, int], str] = field(default_factory=dict)
+    estoque: Dict[Tuple[int, int], Dict] = field(default_factory=dict)
+    historico: Dict[Tuple[int, int], List[float]] = field(default_factory=dict)
+    embalagem: Dict[int, Dict] = field(default_factory=dict)
+    produtos: Dict[int, Dict] = field(default_factory=dict)
+    # (cod_produto, cod_empresa) -> linha de vw_demanda_efetiva
+    demanda: Dict[Tuple[str, Optional[int]], Dict] = field(default_factory=dict)
+    # (cod_produto, cod_empresa) -> proporcao de vendas da loja
+    proporcoes: Dict[Tuple[str, int], float] = field(default_factory=dict)
+    # V31: (codigo, cod_empresa) -> data da ultima venda (None se a consulta falhou)
+    ultima_venda: Optional[Dict[Tuple[int, int], date]] = None
+    # V46: SOLIs abertas (codigo, filial_origem, filial_destino, qtde)
+    solis: List[Tuple[int, int, int, float]] = field(default_factory=list)
+    # V29/V30: estoque dos CDs (cod_empresa, codigo, estoque, qtd_pendente, qtd_pend_transf, cue)
+    estoque_cds: List[Tuple[int, int, float, float, float, float]] = field(default_factory=list)
+    # Grupos regionais de transferencia: cod_empresa -> {grupo_id, grupo_nome}
+    # (None se a consulta falhou)
+    grupos_por_loja: Optional[Dict[int, Dict]] = field(default_factory=dict)
+    dias_transferencia_cd: int = 0
+    # Tempo de cada carga (segundos) e tempo total do pre-carregamento
+    tempos: Dict[str, float] = field(default_factory=dict)
+    tempo_total: float = 0.0
+
+    def aplicar_no_processador(self, processador) -> None:
+        """Preenche os caches do PedidoFornecedorIntegrado com os dados do snapshot."""
+        processador._regras_sit_compra = self.regras_sit_compra
+        processador._cache_sit_compra_itens = self.sit_compra_itens
+        processador._cache_estoque = self.estoque
+        processador._cache_historico = self.historico
+        processador._cache_embalagem = self.embalagem
+        processador._cache_produtos = self.produtos
+
+    def itens_sem_venda_desde(self, codigos: List[int], lojas: List[int], data_limite: date) -> Set[Tuple[int, int]]:
+        """V31: combinacoes item x loja sem venda desde data_limite (vazio se a consulta falhou)."""
+        if self.ultima_venda is None:
+            return set()
+        sem_venda = set()
+        for cod in codigos:
+            for loja in lojas:
+                ultima = self.ultima_venda.get((cod, loja))
+                if ultima is None or ultima < data_limite:
+                    sem_venda.add((cod, loja))
+        return sem_venda
+
+
+# ==============================================================================
+# CARGAS (cada uma recebe sua propria conexao)
+# ==============================================================================
+
+# Atributo do PedidoFornecedorIntegrado -> campo do SnapshotPedido
+_CAMPOS_PROCESSADOR = {
+    '_regras_sit_compra': 'regras_sit_compra',
+    '_cache_sit_compra_itens': 'sit_compra_itens',
+    '_cache_estoque': 'estoque',
+    '_cache_historico': 'historico',
+    '_cache_embalagem': 'embalagem',
+    '_cache_produtos': 'produtos',
+}
+
+
+def _carregar_caches_processador(conn, metodo: str, *args) -> Dict:
+    """
+    Roda um precarregar_* do PedidoFornecedorIntegrado numa conexao propria.
+
+    Returns:
+        Campo do SnapshotPedido -> cache preenchido pelo metodo
+    """
+    from core.pedido_fornecedor_integrado import PedidoFornecedorIntegrado
+
+    auxiliar = PedidoFornecedorIntegrado(conn)
+    getattr(auxiliar, metodo)(*args)
+    return {
+        campo: getattr(auxiliar, atributo)
+        for atributo, campo in _CAMPOS_PROCESSADOR.items()
+        if getattr(auxiliar, atributo) is not None
+    }
+
+
+def _carregar_ultima_venda(conn, codigos: List[int], lojas: List[int]) -> Optional[Dict]:
+    """V31: ultima venda por item x loja."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT codigo, cod_empresa, MAX(data) as ultima_venda
+            FROM historico_vendas_diario
+            WHERE codigo = ANY(%s)
+              AND cod_empresa = ANY(%s)
+              AND qtd_venda > 0
+            GROUP BY codigo, cod_empresa
+        """, (codigos, lojas))
+        ultima_venda = {(int(r[0]), int(r[1])): r[2] for r in cursor.fetchall()}
+        cursor.close()
+        return ultima_venda
+    except Exception as e:
+        print(f"  [V31] Erro ao verificar historico de vendas: {e}")
+        return None
+
+
+def _carregar_solis(conn, codigos: List[int]) -> List[Tuple[int, int, int, float]]:
+    """V46: SOLIs abertas dos itens."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT codigo, filial_origem, filial_destino, qtde
+            FROM solis_abertas
+            WHERE dt_confirmacao IS NOT NULL
+              AND codigo = ANY(%s)
+        """, (codigos,))
+        solis = [(int(r[0]), int(r[1]), int(r[2]), float(r[3])) for r in cursor.fetchall()]
+        cursor.close()
+        return solis
+    except Exception as e:
+        print(f"  [V46] Aviso: nao foi possivel carregar SOLIs ({e}). Continuando sem ajuste.")
+        return []
+
+
+def _carregar_estoque_cds(conn, codigos: List[int], cod_destino: Optional[int]) -> List[Tuple]:
+    """
+    V29/V30: estoque dos itens nos CDs (cod_empresa >= 80) e no destino.
+
+    Uma consulta cobre a deteccao de CDs com estoque (V30) e a carga do
+    estoque do CD de cada item (V29).
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT cod_empresa, codigo,
+                   COALESCE(estoque, 0) as estoque,
+                   COALESCE(qtd_pendente, 0) as qtd_pendente,
+                   COALESCE(qtd_pend_transf, 0) as qtd_pend_transf,
+                   COALESCE(cue, 0) as cue
+            FROM estoque_posicao_atual
+            WHERE (cod_empresa >= 80 OR cod_empresa = %s)
+              AND codigo = ANY(%s)
+        """, (cod_destino, codigos))
+        linhas = [
+            (int(r[0]), int(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5]))
+            for r in cursor.fetchall()
+        ]
+        cursor.close()
+        return linhas
+    except Exception as e:
+        print(f"  [CD V29] Erro ao carregar estoque CD: {e}")
+        return []
+
+
+def _carregar_grupos_transferencia(conn) -> Optional[Dict[int, Dict]]:
+    """Grupos regionais de transferencia por loja."""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT lg.cod_empresa, g.id as grupo_id, g.nome as grupo_nome
+            FROM lojas_grupo_transferencia lg
+            JOIN grupos_transferencia g ON lg.grupo_id = g.id
+            WHERE lg.ativo = TRUE AND g.ativo = TRUE
+        """)
+        grupos = {r[0]: {'grupo_id': r[1], 'grupo_nome': r[2]} for r in cursor.fetchall()}
+        cursor.close()
+        return grupos
+    except Exception as e:
+        print(f"  [TRANSFERENCIAS] Erro ao carregar grupos regionais: {e}")
+        return None
+
+
+def _carregar_dias_transferencia(conn) -> int:
+    from core.padrao_compra import get_dias_transferencia
+    return get_dias_transferencia(conn)
+
+
+def _executar_com_conexao(funcao, args: tuple):
+    """Executa uma carga com conexao do pool, medindo o tempo."""
+    inicio = time.perf_counter()
+    with pooled_connection() as conn:
+        resultado = funcao(conn, *args)
+    return resultado, time.perf_counter() - inicio
+
+
+# ==============================================================================
+# PRE-CARREGAMENTO
+# ==============================================================================
+
+def carregar_snapshot_pedido(
+    codigos: List[int],
+    lojas_demanda: List[int],
+    lojas_estoque: List[int],
+    produtos_por_fornecedor: Dict[str, List],
+    is_multiloja: bool,
+    ano: int = None,
+    mes: int = None,
+    cod_destino_cd: Optional[int] = None,
+    workers: int = None
+) -> SnapshotPedido:
+    """
+    Executa em paralelo todas as consultas anteriores ao laco de itens.
+
+    Args:
+        codigos: Codigos dos produtos do pedido
+        lojas_demanda: Lojas cuja demanda entra no pedido
+        lojas_estoque: Lojas (e CD destino) para o cache de estoque
+        produtos_por_fornecedor: CNPJ -> codigos (demanda pre-calculada)
+        is_multiloja: Pedido por loja (demanda por loja, proporcoes e grupos de transferencia)
+        ano, mes: Periodo da demanda pre-calculada
+        cod_destino_cd: CD destino do pedido centralizado (None = direto loja)
+        workers: Consultas simultaneas (default: DB_POOL_MAX)
+
+    Returns:
+        SnapshotPedido com os dados carregados
+    """
+    lojas_demanda = list(lojas_demanda)
+    # Nome da carga -> (funcao, argumentos); as cargas do processador preenchem varios campos
+    tarefas = {
+        'sit_compra': (_carregar_caches_processador, ('precarregar_situacoes_compra', codigos, lojas_demanda)),
+        'estoque': (_carregar_caches_processador, ('precarregar_estoque', codigos, list(lojas_estoque))),
+        'historico': (_carregar_caches_processador, ('precarregar_historico_vendas', codigos, lojas_demanda)),
+        'embalagem': (_carregar_caches_processador, ('precarregar_embalagens', codigos)),
+        'produtos': (_carregar_caches_processador, ('precarregar_produtos', codigos)),
+        'demanda': (precarregar_demanda_fornecedores_em_lote, (
+            produtos_por_fornecedor, lojas_demanda if is_multiloja else None, ano, mes)),
+        'solis': (_carregar_solis, (codigos,)),
+        'estoque_cds': (_carregar_estoque_cds, (codigos, cod_destino_cd)),
+    }
+    if codigos and lojas_demanda:
+        tarefas['ultima_venda'] = (_carregar_ultima_venda, (codigos, lojas_demanda))
+    if is_multiloja:
+        tarefas['proporcoes'] = (calcular_proporcoes_vendas_por_loja, (codigos, lojas_demanda, 365))
+        tarefas['grupos_por_loja'] = (_carregar_grupos_transferencia, ())
+    if cod_destino_cd is not None:
+        tarefas['dias_transferencia_cd'] = (_carregar_dias_transferencia, ())
+
+    inicio = time.perf_counter()
+    snapshot = SnapshotPedido()
+    with ThreadPoolExecutor(max_workers=min(len(tarefas), workers or DB_POOL_MAX)) as executor:
+        futures = {
+            nome: executor.submit(_executar_com_conexao, funcao, args)
+            for nome, (funcao, args) in tarefas.items()
+        }
+        for nome, future in futures.items():
+            resultado, snapshot.tempos[nome] = future.result()
+            if tarefas[nome][0] is _carregar_caches_processador:
+                for campo, valor in resultado.items():
+                    setattr(snapshot, campo, valor)
+            else:
+                setattr(snapshot, nome, resultado)
+    snapshot.tempo_total = time.perf_counter() - inicio
+
+    mais_lenta = max(snapshot.tempos, key=snapshot.tempos.get)
+    print(f"  [PREFETCH] {len(tarefas)} consultas em {snapshot.tempo_total:.2f}s "
+          f"(soma {sum(snapshot.tempos.values()):.2f}s, mais lenta: {mais_lenta})")
+    return snapshot
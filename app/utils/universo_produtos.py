@@ -0,0 +1,152 @@
+"""
+Universo de produtos das telas de pedido (Pedido Fornecedor, Compra Planejada
+e Pedido Planejado).
+
+Resolve numa unica query parametrizada todos os produtos ativos que atendem
+aos filtros de fornecedor, linha1 (categoria) e linha3 (codigo_linha), ja com
+os parametros do fornecedor (parametros_fornecedor) do destino. Substitui a
+query por fornecedor seguida de pd.concat que cada tela fazia.
+"""
+
+from typing import List, Optional, Union
+
+import pandas as pd
+
+# Valores sem parametros_fornecedor cadastrado
+LEAD_TIME_PADRAO = 15
+CICLO_PEDIDO_PADRAO = 7
+
+# Tabela de parametros existe (so o resultado positivo fica em cache)
+_tabela_parametros_existe = False
+
+
+def valores_filtro(filtro, valor_todos: str) -> Optional[List[str]]:
+    """
+    Normaliza um filtro da tela para lista de strings.
+
+    Args:
+        filtro: Valor unico, lista de valores, None ou o valor "todos"
+        valor_todos: Valor que significa sem filtro ('TODOS' / 'TODAS')
+
+    Returns:
+        Lista de valores, ou None quando nao ha filtro
+    """
+    if filtro is None or filtro == valor_todos:
+        return None
+    if isinstance(filtro, (list, tuple)):
+        if not filtro or valor_todos in filtro:
+            return None
+        return [str(v) for v in filtro]
+    return [str(filtro)]
+
+
+def tabela_parametros_existe(conn) -> bool:
+    """Verifica se a tabela parametros_fornecedor existe."""
+    global _tabela_parametros_existe
+    if not _tabela_parametros_existe:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_name = 'parametros_fornecedor'
+            )
+        """)
+        _tabela_parametros_existe = bool(cursor.fetchone()[0])
+        cursor.close()
+    return _tabela_parametros_existe
+
+
+def resolver_universo_produtos(
+    conn,
+    fornecedores=None,
+    linha1=None,
+    linha3=None,
+    cod_destino: Union[int, List[int]] = 80,
+    somente_com_fornecedor: bool = True
+) -> pd.DataFrame:
+    """
+    Busca os produtos que atendem aos filtros numa unica query.
+
+    Com lista de fornecedores, a ordem das linhas segue a ordem da lista
+    (e, dentro de cada fornecedor, o codigo do produto); com 'TODOS', segue
+    o nome do fornecedor. Duplicatas de codigo nao sao removidas aqui.
+
+    Args:
+        conn: Conexao com o banco
+        fornecedores: Nome do fornecedor, lista de nomes ou 'TODOS'/None
+        linha1: Categoria, lista de categorias ou 'TODAS'/None
+        linha3: Codigo de linha, lista de codigos ou 'TODAS'/None
+        cod_destino: Loja/CD cujos parametros_fornecedor sao usados. Com uma
+            lista, cada produto vem uma vez por destino, com a coluna cod_destino
+        somente_com_fornecedor: Com 'TODOS', ignorar produtos sem nome de fornecedor
+
+    Returns:
+        DataFrame com codigo, descricao, linha1, linha3, linha3_descricao,
+        curva_abc, codigo_fornecedor, nome_fornecedor, lead_time_dias,
+        ciclo_pedido_dias, pedido_minimo_valor e fornecedor_cadastrado
+    """
+    nomes_fornecedores = valores_filtro(fornecedores, 'TODOS')
+    valores_linha1 = valores_filtro(linha1, 'TODAS')
+    valores_linha3 = valores_filtro(linha3, 'TODAS')
+    varios_destinos = isinstance(cod_destino, (list, tuple))
+
+    if tabela_parametros_existe(conn):
+        colunas_parametros = f"""
+                COALESCE(pf.lead_time_dias, {LEAD_TIME_PADRAO}) as lead_time_dias,
+                COALESCE(pf.ciclo_pedido_dias, {CICLO_PEDIDO_PADRAO}) as ciclo_pedido_dias,
+                COALESCE(pf.pedido_minimo_valor, 0) as pedido_minimo_valor,
+                CASE WHEN pf.id IS NOT NULL THEN TRUE ELSE FALSE END as fornecedor_cadastrado"""
+        join_parametros = """
+            LEFT JOIN parametros_fornecedor pf ON p.cnpj_fornecedor = pf.cnpj_fornecedor
+                AND pf.cod_empresa = d.cod_destino AND pf.ativo = TRUE"""
+    else:
+        colunas_parametros = f"""
+                {LEAD_TIME_PADRAO} as lead_time_dias,
+                {CICLO_PEDIDO_PADRAO} as ciclo_pedido_dias,
+                0 as pedido_minimo_valor,
+                FALSE as fornecedor_cadastrado"""
+        join_parametros = ""
+
+    query = f"""
+        SELECT DISTINCT
+            {'d.cod_destino,' if varios_destinos else ''}
+            p.cod_produto as codigo,
+            p.descricao,
+            p.categoria as linha1,
+            p.codigo_linha as linha3,
+            p.descricao_linha as linha3_descricao,
+            'B' as curva_abc,
+            p.cnpj_fornecedor as codigo_fornecedor,
+            p.nome_fornecedor,{colunas_parametros},
+            {'array_position(%s::text[], p.nome_fornecedor::text)' if nomes_fornecedores else 'p.nome_fornecedor'} as ordem_fornecedor
+        FROM cadastro_produtos_completo p
+        CROSS JOIN unnest(%s::int[]) AS d(cod_destino){join_parametros}
+        WHERE p.ativo = TRUE
+    """
+    params = []
+    if nomes_fornecedores:
+        params.append(nomes_fornecedores)
+    params.append([int(c) for c in cod_destino] if varios_destinos else [int(cod_destino)])
+
+    if nomes_fornecedores:
+        query += " AND p.nome_fornecedor = ANY(%s)"
+        params.append(nomes_fornecedores)
+    elif somente_com_fornecedor:
+        query += " AND p.nome_fornecedor IS NOT NULL AND TRIM(p.nome_fornecedor) != ''"
+
+    if valores_linha1:
+        query += " AND p.categoria = ANY(%s)"
+        params.append(valores_linha1)
+
+    if valores_linha3:
+        query += " AND p.codigo_linha = ANY(%s)"
+        params.append(valores_linha3)
+
+    query += f" ORDER BY {'d.cod_destino, ' if varios_destinos else ''}ordem_fornecedor, codigo"
+
+    df = _ler_sql(query, conn, params)
+    return df.drop(columns=['ordem_fornecedor']).reset_index(drop=True)
+
+
+def _ler_sql(query: str, conn, params: list) -> pd.DataFrame:
+    return pd.read_sql(query, conn, params=params)
@@ -151,6 +151,57 @@ def calculate_mae(actual: List[float], predicted: List[float]) -> float:
     return float(np.mean(errors))
 
 
+def previsoes_walk_forward(
+    data: List[float],
+    model_name: str,
+    horizon: int = 1,
+    min_train_size: int = 6,
+    **model_params
+) -> Tuple[List[float], List[float]]:
+    """
+    Previsões um passo à frente de todas as dobras do walk-forward
+
+    Ajusta o modelo uma vez em [0:min_train_size] e avança com
+    update(observação), em vez de refazer o fit em [0:t] a cada dobra
+    (O(n) em vez de O(n²) para SMA, WMA, EMA, Holt e Croston; os demais
+    modelos refazem o fit dentro do próprio update). AUTO refaz a
+    recomendação em cada dobra, como o fit em [0:t], e só reajusta o
+    método selecionado quando ele muda.
+
+    Cada dobra t compara data[t] com a previsão feita com [0:t]; dobras
+    com erro são puladas e o modelo é reajustado na dobra seguinte.
+
+    Returns:
+        (actuals, predictions)
+    """
+    valores = list(data)
+    n = len(valores)
+
+    actuals = []
+    predictions = []
+    modelo = None
+
+    for t in range(min_train_size, n - horizon + 1):
+        try:
+            if modelo is None:
+                modelo = get_modelo(model_name, **model_params)
+                modelo.fit(valores[:t])
+            else:
+                modelo.update(valores[t - 1])
+
+            # Armazenar apenas o primeiro valor previsto vs real
+            # (evita sobreposição em validações subsequentes)
+            predictions.append(modelo.predict_next())
+            actuals.append(valores[t])
+
+        except Exception:
+            # Se falhar, pular essa validação e reajustar na próxima
+            modelo = None
+            continue
+
+    return actuals, predictions
+
+
 def walk_forward_validation(
     data: List[float],
     model_name: str,
@@ -164,7 +215,7 @@ def walk_forward_validation(
     Divide a série em múltiplos treino/teste sequenciais:
     - Treino: [0:t]
     - Teste: [t:t+horizon]
-    - Repete avançando janela
+    - Repete avançando janela (um único modelo, atualizado com update())
 
     Args:
         data: Série temporal completa
@@ -191,33 +242,9 @@ def walk_forward_validation(
             f"Necessário: {min_train_size + horizon}, disponível: {n}"
         )
 
-    actuals = []
-    predictions = []
-
-    # Walk-forward: começar com min_train_size, prever horizon, avançar 1
-    for t in range(min_train_size, n - horizon + 1):
-        # Dados de treino: [0:t]
-        train_data = data[:t]
-
-        # Criar e treinar modelo
-        try:
-            model = get_modelo(model_name, **model_params)
-            model.fit(train_data)
-
-            # Prever próximos 'horizon' períodos
-            forecast = model.predict(horizon)
-
-            # Valores reais correspondentes: [t:t+horizon]
-            actual_values = data[t:t + horizon]
-
-            # Armazenar apenas o primeiro valor previsto vs real
-            # (evita sobreposição em validações subsequentes)
-            actuals.append(actual_values[0])
-            predictions.append(forecast[0])
-
-        except Exception as e:
-            # Se falhar, pular essa validação
-            continue
+    actuals, predictions = previsoes_walk_forward(
+        data, model_name, horizon, min_train_size, **model_params
+    )
 
     if len(actuals) == 0:
         raise ValueError("Nenhuma validação bem-sucedida. Verifique os dados e parâmetros.")
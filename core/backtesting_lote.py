@@ -0,0 +1,314 @@
+"""
+Backtesting Universal em Lote
+=============================
+Versao vetorizada (NumPy) de DemandCalculator.backtesting_universal para
+muitas series de uma vez (ex.: todos os itens de um chunk do cronjob).
+
+Para cada serie, os 6 metodos (SMA, WMA, EMA, tendencia, sazonal, TSB) sao
+avaliados no mesmo walk-forward do caminho escalar (ultimos 30% da serie,
+min 2, max 6 periodos), mas sem reajustar cada metodo do zero a cada dobra:
+
+- SMA/WMA: somas acumuladas (janela movel em O(1) por dobra)
+- EMA e tamanho do TSB: recursao ao longo do eixo do tempo, uma vez por serie
+- Probabilidade do TSB: recursao por dobra (inicio depende do prefixo)
+- Tendencia: regressao linear em forma fechada sobre somas acumuladas
+- Sazonal: medias por mes do ano via reshape (n, 12) do prefixo
+
+A escolha do metodo e igual a do caminho escalar: quando os dois melhores
+WMAPE (arredondados) ficam a MARGEM_EMPATE_WMAPE ou menos um do outro, a
+serie e recalculada pelo caminho escalar, que decide o empate. Demanda e
+desvio finais vem sempre do metodo escalar escolhido.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+METODOS_BACKTESTING = ('sma', 'wma', 'ema', 'tendencia', 'sazonal', 'tsb')
+ALPHA_EMA = 0.3      # Mesmo default de calcular_demanda_ema
+ALPHA_TSB = 0.1      # Mesmos defaults de calcular_demanda_tsb
+MAX_DOBRAS = 6       # n_val maximo do walk-forward
+MARGEM_EMPATE_WMAPE = 0.01  # Empate tecnico: decide pelo caminho escalar
+
+
+def _montar_matriz(series, comprimentos: Optional[Sequence[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz (m, T) float64 alinhada a esquerda (zeros apos o comprimento) e comprimentos."""
+    if isinstance(series, np.ndarray) and series.ndim == 2:
+        matriz = np.asarray(series, dtype=np.float64)
+        if comprimentos is None:
+            comprimentos = np.full(matriz.shape[0], matriz.shape[1], dtype=np.int64)
+        comprimentos = np.asarray(comprimentos, dtype=np.int64)
+        # Zerar o que esta fora da mascara (evita lixo nas somas acumuladas)
+        matriz = np.where(np.arange(matriz.shape[1]) < comprimentos[:, None], matriz, 0.0)
+        return matriz, comprimentos
+
+    comprimentos = np.array([len(s) for s in series], dtype=np.int64)
+    matriz = np.zeros((len(series), int(comprimentos.max()) if len(series) else 0), dtype=np.float64)
+    for i, serie in enumerate(series):
+        matriz[i, :comprimentos[i]] = serie
+    return matriz, comprimentos
+
+
+def _janela_movel(tamanho: np.ndarray) -> np.ndarray:
+    """Janela default de SMA/WMA: max(3, n // 2), limitada a n."""
+    return np.minimum(np.maximum(3, tamanho // 2), tamanho)
+
+
+def _previsao_sma(c0: np.ndarray, linhas: np.ndarray, tamanho: np.ndarray) -> np.ndarray:
+    janela = _janela_movel(tamanho)
+    return (c0[linhas, tamanho] - c0[linhas, tamanho - janela]) / janela
+
+
+def _previsao_wma(c0: np.ndarray, c1: np.ndarray, linhas: np.ndarray, tamanho: np.ndarray) -> np.ndarray:
+    # sum_{j=1..w} j * v[ini + j - 1] = sum t*v - (ini - 1) * sum v, com t em [ini, n)
+    janela = _janela_movel(tamanho)
+    inicio = tamanho - janela
+    soma = c0[linhas, tamanho] - c0[linhas, inicio]
+    soma_t = c1[linhas, tamanho] - c1[linhas, inicio]
+    return (soma_t - (inicio - 1) * soma) / (janela * (janela + 1) / 2.0)
+
+
+def _previsao_tendencia(c0: np.ndarray, c1: np.ndarray, linhas: np.ndarray, tamanho: np.ndarray) -> np.ndarray:
+    # y = a + b*x em x = 0..n-1, projetado em x = n
+    n = tamanho.astype(np.float64)
+    x_media = (n - 1) / 2.0
+    y_media = c0[linhas, tamanho] / n
+    sxy = c1[linhas, tamanho] - x_media * c0[linhas, tamanho]
+    sxx = n * (n * n - 1) / 12.0
+    b = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx != 0)
+    return np.maximum(0.0, y_media + b * (n - x_media))
+
+
+def _previsao_sazonal(matriz: np.ndarray, linhas: np.ndarray, tamanho: np.ndarray) -> np.ndarray:
+    """calcular_demanda_sazonal para prefixos com tamanho >= 12."""
+    m, total = len(linhas), matriz.shape[1]
+    colunas = np.arange(total)
+    periodos = -(-total // 12) * 12
+    prefixo = np.zeros((m, periodos))
+    dentro = np.zeros((m, periodos))
+    mascara = colunas < tamanho[:, None]
+    prefixo[:, :total] = np.where(mascara, matriz[linhas], 0.0)
+    dentro[:, :total] = mascara
+
+    # Media por mes do ano (i % 12) e indice sazonal
+    somas = prefixo.reshape(m, -1, 12).sum(axis=1)
+    contagens = dentro.reshape(m, -1, 12).sum(axis=1)
+    medias = somas / np.maximum(contagens, 1)
+    media_geral = medias.mean(axis=1)
+    indices = np.where(
+        media_geral[:, None] > 0,
+        medias / np.where(media_geral > 0, media_geral, 1.0)[:, None],
+        1.0
+    )
+
+    # Tendencia sobre os ultimos `janela` valores dessazonalizados
+    janela = np.minimum(12, np.maximum(6, tamanho // 2))
+    tendencia = np.zeros(m)
+    for tamanho_janela in np.unique(janela):
+        grupo = np.flatnonzero(janela == tamanho_janela)
+        posicoes = tamanho[grupo, None] - tamanho_janela + np.arange(tamanho_janela)
+        valores = matriz[linhas[grupo, None], posicoes]
+        indice = indices[grupo[:, None], posicoes % 12]
+        dessaz = np.where(indice > 0, valores / np.where(indice > 0, indice, 1.0), valores)
+
+        x = np.arange(tamanho_janela, dtype=np.float64)
+        x_media = x.mean()
+        y_media = dessaz.mean(axis=1)
+        denominador = np.sum((x - x_media) ** 2)
+        b = np.sum((x - x_media) * (dessaz - y_media[:, None]), axis=1) / denominador
+        a = y_media - b * x_media
+        tendencia[grupo] = np.maximum(0.0, a + b * tamanho_janela)
+
+    fator = indices[np.arange(m), tamanho % 12]
+    return np.maximum(0.0, tendencia * fator)
+
+
+def _caminho_ema(matriz: np.ndarray, alpha: float) -> np.ndarray:
+    """EMA apos cada periodo (mesma ordem de operacoes de calcular_demanda_ema)."""
+    caminho = np.empty_like(matriz)
+    ema = matriz[:, 0].copy()
+    caminho[:, 0] = ema
+    for t in range(1, matriz.shape[1]):
+        ema = alpha * matriz[:, t] + (1 - alpha) * ema
+        caminho[:, t] = ema
+    return caminho
+
+
+def _caminho_tamanho_tsb(matriz: np.ndarray, alpha: float) -> np.ndarray:
+    """Tamanho suavizado do TSB apos cada periodo (inicia no primeiro valor positivo)."""
+    positivo = matriz > 0
+    primeiro = np.where(positivo.any(axis=1), matriz[np.arange(len(matriz)), positivo.argmax(axis=1)], 0.0)
+    caminho = np.empty_like(matriz)
+    tamanho = primeiro
+    for t in range(matriz.shape[1]):
+        tamanho = np.where(positivo[:, t], alpha * matriz[:, t] + (1 - alpha) * tamanho, tamanho)
+        caminho[:, t] = tamanho
+    return caminho
+
+
+def _previsao_tsb(matriz: np.ndarray, linhas: np.ndarray, tamanho: np.ndarray,
+                  cpos: np.ndarray, caminho_ema: np.ndarray, caminho_tamanho: np.ndarray,
+                  primeiro_positivo: np.ndarray) -> np.ndarray:
+    n_pos = cpos[linhas, tamanho]
+    n = tamanho.astype(np.float64)
+
+    # Probabilidade: inicia na frequencia empirica do prefixo e suaviza periodo a periodo
+    probabilidade = n_pos / n
+    colunas = int(tamanho.max())
+    ocorrencias = (matriz[linhas, :colunas] > 0).astype(np.float64)
+    for t in range(colunas):
+        ativo = t < tamanho
+        probabilidade = np.where(
+            ativo, ALPHA_TSB * ocorrencias[:, t] + (1 - ALPHA_TSB) * probabilidade, probabilidade
+        )
+
+    ultimo = tamanho - 1
+    previsao = probabilidade * caminho_tamanho[linhas, ultimo]
+    previsao = np.where(n_pos == 1, primeiro_positivo[linhas] / n, previsao)
+    previsao = np.where(n_pos == tamanho, caminho_ema[linhas, ultimo], previsao)
+    return np.where(n_pos == 0, 0.0, previsao)
+
+
+def avaliar_metodos_lote(matriz: np.ndarray, comprimentos: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Walk-forward dos 6 metodos para todas as series (comprimento >= 5, treino >= 4).
+
+    Returns:
+        {metodo: {'wmape': (m,), 'mae': (m,)}} - NaN onde o metodo nao tem
+        dobra valida ou a soma dos reais e zero
+    """
+    m = len(comprimentos)
+    linhas = np.arange(m)
+    n_val = np.maximum(2, np.minimum(MAX_DOBRAS, (comprimentos * 0.3).astype(np.int64)))
+
+    tempo = np.arange(matriz.shape[1], dtype=np.float64)
+    c0 = np.zeros((m, matriz.shape[1] + 1))
+    c1 = np.zeros((m, matriz.shape[1] + 1))
+    cpos = np.zeros((m, matriz.shape[1] + 1), dtype=np.int64)
+    np.cumsum(matriz, axis=1, out=c0[:, 1:])
+    np.cumsum(matriz * tempo, axis=1, out=c1[:, 1:])
+    np.cumsum(matriz > 0, axis=1, out=cpos[:, 1:])
+    caminho_ema = _caminho_ema(matriz, ALPHA_EMA)
+    caminho_tamanho = _caminho_tamanho_tsb(matriz, ALPHA_TSB)
+    positivo = matriz > 0
+    primeiro_positivo = np.where(positivo.any(axis=1), matriz[linhas, positivo.argmax(axis=1)], 0.0)
+
+    soma_erros = {metodo: np.zeros(m) for metodo in METODOS_BACKTESTING}
+    soma_reais = {metodo: np.zeros(m) for metodo in METODOS_BACKTESTING}
+    dobras = {metodo: np.zeros(m, dtype=np.int64) for metodo in METODOS_BACKTESTING}
+
+    # Dobras na ordem do caminho escalar (prefixo crescente): k = n - i
+    for k in range(MAX_DOBRAS, 0, -1):
+        ativas = np.flatnonzero(k <= n_val)
+        if len(ativas) == 0:
+            continue
+        tamanho = comprimentos[ativas] - k
+        real = matriz[ativas, tamanho]
+
+        previsoes = {
+            'sma': _previsao_sma(c0, ativas, tamanho),
+            'wma': _previsao_wma(c0, c1, ativas, tamanho),
+            'ema': caminho_ema[ativas, tamanho - 1],
+            'tendencia': _previsao_tendencia(c0, c1, ativas, tamanho),
+            'tsb': _previsao_tsb(matriz, ativas, tamanho, cpos, caminho_ema,
+                                 caminho_tamanho, primeiro_positivo),
+        }
+        validas = {metodo: np.ones(len(ativas), dtype=bool) for metodo in previsoes}
+
+        # Sazonal precisa de pelo menos 1 ciclo completo no treino
+        sazonal = np.full(len(ativas), np.nan)
+        com_ciclo = tamanho >= 12
+        if com_ciclo.any():
+            sazonal[com_ciclo] = _previsao_sazonal(matriz, ativas[com_ciclo], tamanho[com_ciclo])
+        previsoes['sazonal'] = sazonal
+        validas['sazonal'] = com_ciclo
+
+        for metodo, previsao in previsoes.items():
+            ok = validas[metodo] & np.isfinite(previsao)
+            soma_erros[metodo][ativas] += np.where(ok, np.abs(real - previsao), 0.0)
+            soma_reais[metodo][ativas] += np.where(ok, np.abs(real), 0.0)
+            dobras[metodo][ativas] += ok
+
+    resultado = {}
+    for metodo in METODOS_BACKTESTING:
+        valido = (dobras[metodo] > 0) & (soma_reais[metodo] > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wmape = np.where(valido, soma_erros[metodo] / soma_reais[metodo] * 100, np.nan)
+            mae = np.where(valido, soma_erros[metodo] / np.maximum(dobras[metodo], 1), np.nan)
+        resultado[metodo] = {'wmape': wmape, 'mae': mae}
+    return resultado
+
+
+def backtesting_universal_lote(
+    series,
+    comprimentos: Optional[Sequence[int]] = None,
+    min_periodos: int = 8
+) -> List[Tuple[str, float, float, Dict]]:
+    """
+    DemandCalculator.backtesting_universal para muitas series de uma vez.
+
+    Args:
+        series: Lista de series (tamanhos diferentes) ou matriz 2-D (m, T)
+                alinhada a esquerda
+        comprimentos: Comprimento de cada linha da matriz (mascara; default T)
+        min_periodos: Minimo de periodos para backtesting
+
+    Returns:
+        Lista (na ordem das series) de (metodo_escolhido, demanda, desvio, metadata),
+        igual ao retorno de backtesting_universal para cada serie
+    """
+    from core.demand_calculator import DemandCalculator
+
+    matriz, comprimentos = _montar_matriz(series, comprimentos)
+    m = len(comprimentos)
+    resultados: List[Optional[Tuple]] = [None] * m
+
+    def serie(i):
+        return matriz[i, :comprimentos[i]].tolist()
+
+    # Series curtas (fallbacks do caminho escalar) ficam no caminho escalar
+    n_val = np.maximum(2, np.minimum(MAX_DOBRAS, (comprimentos * 0.3).astype(np.int64)))
+    elegiveis = np.flatnonzero((comprimentos >= min_periodos) & (comprimentos - n_val >= 4))
+    for i in np.setdiff1d(np.arange(m), elegiveis):
+        resultados[i] = DemandCalculator.backtesting_universal(serie(i), min_periodos=min_periodos)
+    if len(elegiveis) == 0:
+        return resultados
+
+    avaliacao = avaliar_metodos_lote(matriz[elegiveis], comprimentos[elegiveis])
+    funcoes = {
+        'sma': DemandCalculator.calcular_demanda_sma,
+        'wma': DemandCalculator.calcular_demanda_wma,
+        'ema': DemandCalculator.calcular_demanda_ema,
+        'tendencia': DemandCalculator.calcular_demanda_tendencia,
+        'sazonal': DemandCalculator.calcular_demanda_sazonal,
+        'tsb': DemandCalculator.calcular_demanda_tsb,
+    }
+
+    for posicao, i in enumerate(elegiveis):
+        metricas = {}
+        for metodo in METODOS_BACKTESTING:
+            wmape = avaliacao[metodo]['wmape'][posicao]
+            if not np.isnan(wmape):
+                metricas[metodo] = {
+                    'wmape': round(float(wmape), 2),
+                    'mae': round(float(avaliacao[metodo]['mae'][posicao]), 2)
+                }
+
+        ordenados = sorted(metricas.items(), key=lambda x: x[1]['wmape'])
+        empate = len(ordenados) > 1 and ordenados[1][1]['wmape'] - ordenados[0][1]['wmape'] <= MARGEM_EMPATE_WMAPE
+        if not metricas or empate:
+            resultados[i] = DemandCalculator.backtesting_universal(serie(i), min_periodos=min_periodos)
+            continue
+
+        melhor = ordenados[0][0]
+        demanda, desvio = funcoes[melhor](serie(i))
+        resultados[i] = (melhor, demanda, desvio, {
+            'metodo_selecao': 'backtesting_universal',
+            'wmape_melhor': metricas[melhor]['wmape'],
+            'mae_melhor': metricas[melhor]['mae'],
+            'metodos_testados': len(metricas),
+            'ranking': {k: v['wmape'] for k, v in ordenados}
+        })
+
+    return resultados
@@ -0,0 +1,333 @@
+"""
+Cache de Resultados de Previsao
+===============================
+Cache enderecado por conteudo para os calculos de demanda do
+DemandCalculator. A chave e o hash de (bytes da serie, metodo,
+parametros, versao do codigo): a mesma serie calculada pelo cronjob,
+pela tela de previsao, pela Compra Planejada ou pelo validador vira
+uma consulta em vez de um novo backtesting.
+
+- Memoria: LRU limitado em bytes (valores guardados serializados, cada
+  leitura devolve uma copia independente)
+- Disco (opcional): SQLite local compartilhado entre processos, com
+  validade de um dia
+- Estatisticas de acerto/erro por processo
+
+Configuracao por ambiente:
+    PREVISAO_CACHE_MB     limite da memoria (default 64; 0 desliga o cache)
+    PREVISAO_CACHE_DISCO  caminho do arquivo SQLite (default: sem disco)
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+# Modulos cujo codigo define o resultado em cache: qualquer alteracao
+# neles muda a versao e invalida as entradas antigas (memoria e disco)
+MODULOS_VERSAO = ('demand_calculator.py', 'backtesting_lote.py', 'cache_previsao.py')
+
+LIMITE_MEMORIA_MB_PADRAO = 64
+VALIDADE_DISCO_S = 24 * 3600
+
+
+def _versao_codigo() -> str:
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for nome in MODULOS_VERSAO:
+        try:
+            with open(os.path.join(diretorio, nome), 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            h.update(nome.encode())
+    return h.hexdigest()[:12]
+
+
+VERSAO_CODIGO = _versao_codigo()
+
+
+def chave_previsao(serie, metodo: str, parametros: Optional[Dict] = None,
+                   versao: str = VERSAO_CODIGO) -> str:
+    """
+    Chave do cache: sha256 de (serie como float64, metodo, parametros, versao).
+
+    Args:
+        serie: Lista, array ou pd.Series de vendas
+        metodo: Nome do calculo (ex.: 'demanda_inteligente')
+        parametros: Demais argumentos do calculo (serializaveis em JSON)
+        versao: Versao do codigo (default: VERSAO_CODIGO)
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(np.asarray(serie, dtype=np.float64)).tobytes())
+    h.update(b'\0')
+    h.update(json.dumps([metodo, parametros or {}, versao], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class CachePrevisao:
+    """
+    Cache LRU em memoria (limitado em bytes) com armazenamento opcional em disco.
+
+    Uso:
+        cache = CachePrevisao(max_bytes=64 * 1024 * 1024, caminho_disco='outputs/cache_previsao.db')
+        valor = cache.obter_ou_calcular(chave, lambda: calcular(...))
+        cache.estatisticas()
+    """
+
+    def __init__(self, max_bytes: int = LIMITE_MEMORIA_MB_PADRAO * 1024 * 1024,
+                 caminho_disco: Optional[str] = None,
+                 validade_disco_s: int = VALIDADE_DISCO_S):
+        self.max_bytes = max_bytes
+        self.caminho_disco = caminho_disco
+        self.validade_disco_s = validade_disco_s
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'hits_disco': 0, 'misses': 0, 'gravacoes': 0, 'evictions': 0}
+
+        if caminho_disco:
+            self._criar_tabela()
+
+    # ------------------------------------------------------------------
+    # Disco (SQLite)
+    # ------------------------------------------------------------------
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho_disco, timeout=30)
+
+    def _criar_tabela(self):
+        diretorio = os.path.dirname(self.caminho_disco)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        conn = self._conectar()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_previsao (
+                    chave TEXT PRIMARY KEY,
+                    valor BLOB NOT NULL,
+                    criado_em REAL NOT NULL
+                )
+            ''')
+            # Entradas vencidas nao servem mais para ninguem
+            conn.execute('DELETE FROM cache_previsao WHERE criado_em < ?',
+                         (time.time() - self.validade_disco_s,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _ler_disco(self, chave: str) -> Optional[bytes]:
+        conn = self._conectar()
+        try:
+            linha = conn.execute(
+                'SELECT valor FROM cache_previsao WHERE chave = ? AND criado_em >= ?',
+                (chave, time.time() - self.validade_disco_s)
+            ).fetchone()
+        finally:
+            conn.close()
+        return linha[0] if linha else None
+
+    def _gravar_disco(self, chave: str, dados: bytes):
+        conn = self._conectar()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_previsao (chave, valor, criado_em) VALUES (?, ?, ?)',
+                (chave, sqlite3.Binary(dados), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Memoria (LRU)
+    # ------------------------------------------------------------------
+
+    def _guardar_memoria(self, chave: str, dados: bytes):
+        if len(dados) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entradas[chave] = dados
+            self._bytes += len(dados)
+            while self._bytes > self.max_bytes:
+                _, removido = self._entradas.popitem(last=False)
+                self._bytes -= len(removido)
+                self._stats['evictions'] += 1
+
+    def _buscar(self, chave: str) -> Optional[bytes]:
+        with self._lock:
+            dados = self._entradas.get(chave)
+            if dados is not None:
+                self._entradas.move_to_end(chave)
+                self._stats['hits'] += 1
+                return dados
+
+        if self.caminho_disco:
+            try:
+                dados = self._ler_disco(chave)
+            except sqlite3.Error:
+                dados = None
+            if dados is not None:
+                self._guardar_memoria(chave, dados)
+                with self._lock:
+                    self._stats['hits'] += 1
+                    self._stats['hits_disco'] += 1
+                return dados
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def contem(self, chave: str) -> bool:
+        """True se a chave esta na memoria ou no disco (nao conta nas estatisticas)."""
+        with self._lock:
+            if chave in self._entradas:
+                return True
+        if self.caminho_disco:
+            try:
+                return self._ler_disco(chave) is not None
+            except sqlite3.Error:
+                return False
+        return False
+
+    def obter(self, chave: str) -> Tuple[bool, Any]:
+        """
+        Returns:
+            (encontrado, valor) - valor e uma copia nova a cada leitura
+        """
+        dados = self._buscar(chave)
+        if dados is None:
+            return False, None
+        return True, pickle.loads(dados)
+
+    def gravar(self, chave: str, valor: Any):
+        dados = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        self._guardar_memoria(chave, dados)
+        with self._lock:
+            self._stats['gravacoes'] += 1
+        if self.caminho_disco:
+            try:
+                self._gravar_disco(chave, dados)
+            except sqlite3.Error:
+                pass  # Disco e opcional: segue so com a memoria
+
+    def obter_ou_calcular(self, chave: str, calcular: Callable[[], Any]) -> Any:
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        valor = calcular()
+        self.gravar(chave, valor)
+        return valor
+
+    def limpar(self, disco: bool = False):
+        """Esvazia a memoria (e o disco, se disco=True) e zera as estatisticas."""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            for k in self._stats:
+                self._stats[k] = 0
+        if disco and self.caminho_disco:
+            conn = self._conectar()
+            try:
+                conn.execute('DELETE FROM cache_previsao')
+                conn.commit()
+            finally:
+                conn.close()
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            consultas = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'taxa_acerto': round(self._stats['hits'] / consultas, 4) if consultas else None,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disco': self.caminho_disco,
+                'versao_codigo': VERSAO_CODIGO,
+            }
+
+
+_cache_global = None
+_cache_configurado = False
+
+
+def get_cache_previsao() -> Optional[CachePrevisao]:
+    """
+    Retorna a instancia global do cache (singleton), configurada por
+    PREVISAO_CACHE_MB / PREVISAO_CACHE_DISCO. None se desligado.
+    """
+    global _cache_global, _cache_configurado
+
+    if not _cache_configurado:
+        limite_mb = float(os.environ.get('PREVISAO_CACHE_MB', LIMITE_MEMORIA_MB_PADRAO))
+        if limite_mb > 0:
+            _cache_global = CachePrevisao(
+                max_bytes=int(limite_mb * 1024 * 1024),
+                caminho_disco=os.environ.get('PREVISAO_CACHE_DISCO') or None
+            )
+        _cache_configurado = True
+
+    return _cache_global
+
+
+def configurar_cache_previsao(cache: Optional[CachePrevisao]):
+    """Substitui o cache global (None desliga)."""
+    global _cache_global, _cache_configurado
+    _cache_global = cache
+    _cache_configurado = True
+
+
+def cache_previsao(metodo: str, ignorar: Tuple[str, ...] = ()):
+    """
+    Decorator: guarda o resultado da funcao no cache global.
+
+    O primeiro argumento da funcao e a serie; os demais entram na chave
+    como parametros, exceto os listados em `ignorar` (ex.: um backtesting
+    ja calculado, que nao muda o resultado). A funcao decorada ganha
+    `.chave(*args, **kwargs)` para consultar o cache sem calcular.
+    """
+    def decorator(func):
+        assinatura = inspect.signature(func)
+        nome_serie = next(iter(assinatura.parameters))
+
+        def chave(*args, **kwargs) -> str:
+            argumentos = assinatura.bind(*args, **kwargs)
+            argumentos.apply_defaults()
+            parametros = {
+                k: v for k, v in argumentos.arguments.items()
+                if k != nome_serie and k not in ignorar
+            }
+            return chave_previsao(argumentos.arguments[nome_serie], metodo, parametros)
+
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            cache = get_cache_previsao()
+            if cache is None:
+                return func(*args, **kwargs)
+            try:
+                chave_item = chave(*args, **kwargs)
+            except (TypeError, ValueError):
+                # Serie nao numerica: deixa a funcao tratar/levantar o erro
+                return func(*args, **kwargs)
+            return cache.obter_ou_calcular(chave_item, lambda: func(*args, **kwargs))
+
+        wrapped.chave = chave
+        return wrapped
+
+    return decorator
@@ -9,6 +9,8 @@ import numpy as np
 from typing import Tuple, Dict, List, Optional
 from scipy import stats
 
+from core.cache_previsao import cache_previsao
+
 
 class DemandCalculator:
     """
@@ -293,7 +295,8 @@ class DemandCalculator:
     def calcular_demanda_adaptativa(
         vendas: List[float],
         granularidade: str = 'mensal',
-        media_cluster: Optional[float] = None
+        media_cluster: Optional[float] = None,
+        backtesting: Optional[Tuple] = None
     ) -> Tuple[float, float, Dict]:
         """
         MÉTODO PRINCIPAL ADAPTATIVO
@@ -303,6 +306,7 @@ class DemandCalculator:
             vendas: Lista de vendas
             granularidade: 'diario', 'semanal' ou 'mensal'
             media_cluster: Média de produtos similares (para prior bayesiano)
+            backtesting: Backtesting ja calculado (usado apenas em série longa)
 
         Returns:
             (demanda, desvio, metadata)
@@ -343,7 +347,9 @@ class DemandCalculator:
 
         else:
             # Série longa - usar método inteligente completo
-            demanda, desvio, metadata = DemandCalculator.calcular_demanda_inteligente(vendas)
+            demanda, desvio, metadata = DemandCalculator.calcular_demanda_inteligente(
+                vendas, backtesting=backtesting
+            )
             metadata['categoria_serie'] = 'longa'
             metadata['fator_seguranca_recomendado'] = 1.0
 
@@ -353,11 +359,13 @@ class DemandCalculator:
         return demanda, desvio, metadata
 
     @staticmethod
+    @cache_previsao('demanda_diaria_unificada', ignorar=('backtesting',))
     def calcular_demanda_diaria_unificada(
         vendas_diarias: List[float],
         dias_periodo: int,
         granularidade_exibicao: str = 'mensal',
-        media_cluster_diaria: Optional[float] = None
+        media_cluster_diaria: Optional[float] = None,
+        backtesting: Optional[Tuple] = None
     ) -> Tuple[float, float, Dict]:
         """
         MÉTODO UNIFICADO PARA CONSISTÊNCIA ENTRE GRANULARIDADES
@@ -378,6 +386,7 @@ class DemandCalculator:
             dias_periodo: Número de dias do período de previsão (ex: 181 para Jan-Jun, 217 para Sem 1-31)
             granularidade_exibicao: 'diario', 'semanal' ou 'mensal' (para metadata)
             media_cluster_diaria: Média diária de produtos similares (para prior bayesiano)
+            backtesting: Backtesting ja calculado para a série diária (lote)
 
         Returns:
             (demanda_total_periodo, desvio_total, metadata)
@@ -404,7 +413,8 @@ class DemandCalculator:
         demanda_diaria, desvio_diario, metadata = DemandCalculator.calcular_demanda_adaptativa(
             vendas=vendas_diarias,
             granularidade='diario',
-            media_cluster=media_cluster_diaria
+            media_cluster=media_cluster_diaria,
+            backtesting=backtesting
         )
 
         # 2. Calcular demanda total para o período
@@ -989,6 +999,27 @@ class DemandCalculator:
 
         return melhor, demanda, desvio, metadata
 
+    @staticmethod
+    def backtesting_universal_lote(
+        series,
+        comprimentos: Optional[List[int]] = None,
+        min_periodos: int = 8
+    ) -> List[Tuple[str, float, float, Dict]]:
+        """
+        Backtesting universal de muitas series de uma vez (NumPy).
+        Mesmo resultado de backtesting_universal serie a serie.
+
+        Args:
+            series: Lista de series (tamanhos diferentes) ou matriz 2-D alinhada a esquerda
+            comprimentos: Comprimento de cada linha da matriz (opcional)
+            min_periodos: Minimo de periodos para backtesting
+
+        Returns:
+            Lista de (metodo_escolhido, demanda, desvio, metadata), na ordem das series
+        """
+        from core.backtesting_lote import backtesting_universal_lote
+        return backtesting_universal_lote(series, comprimentos, min_periodos)
+
     @staticmethod
     def classificar_padrao_demanda(vendas: List[float]) -> Dict[str, any]:
         """
@@ -1090,9 +1121,11 @@ class DemandCalculator:
         return resultado
 
     @staticmethod
+    @cache_previsao('demanda_inteligente', ignorar=('backtesting',))
     def calcular_demanda_inteligente(
         vendas: List[float],
-        metodo: str = 'auto'
+        metodo: str = 'auto',
+        backtesting: Optional[Tuple] = None
     ) -> Tuple[float, float, Dict]:
         """
         Método 6: INTELIGENTE - Escolhe automaticamente o melhor método
@@ -1100,6 +1133,8 @@ class DemandCalculator:
         Args:
             vendas: Lista de vendas mensais
             metodo: 'auto', 'simples', 'ema', 'tendencia', 'sazonal', 'tsb'
+            backtesting: Resultado ja calculado de backtesting_universal para
+                         estas vendas (ex.: backtesting_universal_lote)
 
         Returns:
             (demanda_media, desvio_padrao, metadata)
@@ -1129,7 +1164,7 @@ class DemandCalculator:
         # V48: MODO AUTOMÁTICO - Backtesting universal
         # Se serie suficiente (>=8 periodos), testar todos os 6 metodos
         if len(vendas) >= 8:
-            metodo_bt, demanda, desvio, meta_bt = DemandCalculator.backtesting_universal(vendas)
+            metodo_bt, demanda, desvio, meta_bt = backtesting or DemandCalculator.backtesting_universal(vendas)
             metadata = {
                 'metodo_usado': metodo_bt,
                 'modo': 'backtesting_universal',
@@ -1232,14 +1267,25 @@ def processar_demandas_dataframe(
     """
     resultados = []
 
-    # Agrupar por loja e SKU
-    for nome_grupo, grupo in df_historico.groupby(agrupar_por):
-        # Ordenar por mês
-        grupo = grupo.sort_values('Mes')
-        vendas = grupo['Vendas'].tolist()
-
+    # Agrupar por loja e SKU (ordenado por mês)
+    grupos = [
+        (nome_grupo, grupo.sort_values('Mes')['Vendas'].tolist())
+        for nome_grupo, grupo in df_historico.groupby(agrupar_por)
+    ]
+
+    # V48: Backtesting de todas as séries longas de uma vez (modo automático)
+    backtestings = {}
+    if metodo == 'auto':
+        longas = [i for i, (_, vendas) in enumerate(grupos) if len(vendas) >= 8]
+        if longas:
+            lote = DemandCalculator.backtesting_universal_lote([grupos[i][1] for i in longas])
+            backtestings = dict(zip(longas, lote))
+
+    for posicao, (nome_grupo, vendas) in enumerate(grupos):
         # Calcular demanda
-        demanda, desvio, metadata = DemandCalculator.calcular_demanda_inteligente(vendas, metodo)
+        demanda, desvio, metadata = DemandCalculator.calcular_demanda_inteligente(
+            vendas, metodo, backtesting=backtestings.get(posicao)
+        )
 
         # Criar dicionário de resultado
         resultado = {}
@@ -1480,7 +1526,7 @@ def calcular_fator_tendencia_yoy_dessazonalizado(
 
     # Media geral
     medias_validas = [m for m in medias_mensais.values() if m > 0]
-    media_geral = sum(medias_validas) / len(medias_validas) if medias_validas else 0
+    media_geral = soma_sequencial(medias_validas) / len(medias_validas) if medias_validas else 0
 
     if media_geral == 0:
         return 1.0, 'indeterminado', {'motivo': 'Media geral = 0'}
@@ -1512,3 +1558,214 @@ def calcular_fator_tendencia_yoy_dessazonalizado(
     metadata['indices_sazonais'] = {str(k): round(v, 3) for k, v in indices_sazonais.items()}
 
     return fator, classificacao, metadata
+
+
+# =====================================================
+# FATORES MENSAIS EM LOTE (sazonalidade e tendencia YoY)
+# =====================================================
+# Mesmas regras de calcular_fatores_sazonais (job), calcular_fator_tendencia_yoy
+# e calcular_fator_tendencia_yoy_dessazonalizado, para todos os itens de uma vez
+# a partir de um frame longo (item, ano, mes, qtd). As somas seguem a ordem
+# cronologica (a mesma dos dicionarios {(ano, mes): qtd} montados pelo
+# cronjob), entao o resultado e identico ao calculo item a item.
+
+LIMITES_FATOR_SAZONAL = (0.5, 2.0)
+LIMITES_FATOR_TENDENCIA = (0.7, 1.4)
+MIN_MESES_ANO_COMPLETO = 6
+FAIXAS_CLASSIFICACAO_TENDENCIA = (
+    (1.20, 'forte_crescimento'),
+    (1.08, 'crescimento'),
+    (0.92, 'estavel'),
+    (0.80, 'queda'),
+)
+
+
+def soma_sequencial(valores) -> float:
+    """
+    Soma da esquerda para a direita.
+
+    Usada na media geral das medias mensais no calculo item a item. O sum()
+    de floats passou a ser compensado no Python 3.12, e esta soma explicita
+    da o mesmo resultado em qualquer versao e na soma mes a mes do lote.
+    """
+    total = 0.0
+    for valor in valores:
+        total += valor
+    return total
+
+
+def vendas_mensais_longo(vendas_por_item: Dict) -> pd.DataFrame:
+    """
+    Converte {item: {(ano, mes): qtd}} no frame longo usado pelas funcoes em lote.
+
+    Returns:
+        DataFrame com colunas item, ano, mes, qtd
+    """
+    linhas = [
+        (item, ano, mes, qtd)
+        for item, vendas_por_mes in vendas_por_item.items()
+        for (ano, mes), qtd in vendas_por_mes.items()
+    ]
+    return pd.DataFrame(linhas, columns=['item', 'ano', 'mes', 'qtd'])
+
+
+def _agrupar_vendas_mensais(vendas: pd.DataFrame, coluna_item: str):
+    """
+    Indexa itens (ordem de aparicao) e soma linhas repetidas de (item, ano, mes).
+
+    Returns:
+        (itens, idx_item, ano, mes, qtd) - linhas unicas em ordem (item, ano, mes)
+    """
+    idx_item, itens = pd.factorize(vendas[coluna_item], sort=False)
+    ano = vendas['ano'].to_numpy(dtype=np.int64)
+    mes = vendas['mes'].to_numpy(dtype=np.int64)
+    qtd = vendas['qtd'].to_numpy(dtype=np.float64)
+    if len(ano) == 0:
+        vazio = np.zeros(0, dtype=np.int64)
+        return itens, vazio, vazio, vazio, np.zeros(0)
+
+    ano_min = ano.min()
+    n_anos = int(ano.max() - ano_min) + 1
+    chave = (idx_item.astype(np.int64) * n_anos + (ano - ano_min)) * 12 + (mes - 1)
+    chaves, inverso = np.unique(chave, return_inverse=True)
+    qtd = np.bincount(inverso, weights=qtd, minlength=len(chaves))
+    mes = chaves % 12 + 1
+    ano = (chaves // 12) % n_anos + ano_min
+    idx_item = chaves // 12 // n_anos
+    return itens, idx_item, ano, mes, qtd
+
+
+def _indices_sazonais(idx_item, mes, qtd, n_itens: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fator por mes do ano (media do mes / media geral, limitado a 0.5-2.0).
+
+    Returns:
+        (fatores (n_itens, 12), media_geral (n_itens,))
+    """
+    chave = idx_item * 12 + (mes - 1)
+    totais = np.bincount(chave, weights=qtd, minlength=n_itens * 12).reshape(n_itens, 12)
+    contagem = np.bincount(chave, minlength=n_itens * 12).reshape(n_itens, 12)
+    medias = np.divide(totais, contagem, out=np.zeros_like(totais), where=contagem > 0)
+
+    # Soma mes a mes da esquerda para a direita (mesma ordem de soma_sequencial
+    # no calculo item a item; meses sem venda somam 0.0, que e exato)
+    soma = np.zeros(n_itens)
+    validos = np.zeros(n_itens, dtype=np.int64)
+    for m in range(12):
+        soma = soma + np.where(medias[:, m] > 0, medias[:, m], 0.0)
+        validos += medias[:, m] > 0
+    media_geral = np.divide(soma, validos, out=np.zeros(n_itens), where=validos > 0)
+
+    ok = (medias > 0) & (media_geral[:, None] > 0)
+    fatores = np.ones((n_itens, 12))
+    razao = np.divide(medias, media_geral[:, None], out=np.ones_like(medias), where=ok)
+    fatores[ok] = np.clip(razao[ok], *LIMITES_FATOR_SAZONAL)
+    return fatores, media_geral
+
+
+def calcular_fatores_sazonais_lote(vendas: pd.DataFrame, coluna_item: str = 'item') -> pd.DataFrame:
+    """
+    Fatores sazonais por mes (1-12) de todos os itens do frame.
+    Fator = media do mes / media geral (limitado entre 0.5 e 2.0).
+
+    Args:
+        vendas: Frame longo com colunas (coluna_item, ano, mes, qtd)
+
+    Returns:
+        DataFrame indexado pelo item, colunas 1..12
+    """
+    itens, idx_item, _, mes, qtd = _agrupar_vendas_mensais(vendas, coluna_item)
+    fatores, _ = _indices_sazonais(idx_item, mes, qtd, len(itens))
+    return pd.DataFrame(fatores, index=pd.Index(itens, name=coluna_item), columns=range(1, 13))
+
+
+def _fator_tendencia_yoy_arrays(idx_item, ano, mes, qtd, n_itens: int, min_anos: int,
+                                fator_amortecimento: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Nucleo de calcular_fator_tendencia_yoy sobre linhas unicas em ordem (item, ano, mes)."""
+    fator = np.ones(n_itens)
+    classificacao = np.full(n_itens, 'dados_insuficientes', dtype=object)
+    if len(idx_item) == 0:
+        return fator, classificacao
+
+    # Totais e meses por (item, ano)
+    chave_ano, inicio = np.unique(idx_item * 100000 + ano, return_index=True)
+    grupo = np.repeat(np.arange(len(chave_ano)), np.diff(np.append(inicio, len(idx_item))))
+    totais = np.bincount(grupo, weights=qtd, minlength=len(chave_ano))
+    meses = np.bincount(grupo, minlength=len(chave_ano))
+    item_ano = idx_item[inicio]
+
+    # Anos completos (>= 6 meses) e crescimento entre anos completos consecutivos
+    completo = meses >= MIN_MESES_ANO_COMPLETO
+    item_c, total_c = item_ano[completo], totais[completo]
+    n_completos = np.bincount(item_c, minlength=n_itens)
+
+    mesmo_item = item_c[1:] == item_c[:-1]
+    valido = mesmo_item & (total_c[:-1] > 0)
+    item_taxa = item_c[1:][valido]
+    taxa = total_c[1:][valido] / total_c[:-1][valido]
+    n_taxas = np.bincount(item_taxa, minlength=n_itens)
+
+    # Produto sequencial das taxas de cada item (matriz item x taxa, completada com 1.0)
+    posicao = np.arange(len(item_taxa)) - np.repeat(np.cumsum(n_taxas) - n_taxas, n_taxas)
+    matriz = np.ones((n_itens, int(n_taxas.max()) if len(taxa) else 0))
+    matriz[item_taxa, posicao] = taxa
+    produto = np.ones(n_itens)
+    for j in range(matriz.shape[1]):
+        produto = produto * matriz[:, j]
+
+    com_taxa = n_taxas > 0
+    media_geometrica = np.ones(n_itens)
+    # pow do C item a item: np.power vetorizado pode diferir no ultimo bit
+    media_geometrica[com_taxa] = [
+        p ** (1 / k) for p, k in zip(produto[com_taxa].tolist(), n_taxas[com_taxa].tolist())
+    ]
+    calculado = 1.0 + (media_geometrica - 1.0) * fator_amortecimento
+    calculado = np.clip(calculado, *LIMITES_FATOR_TENDENCIA)
+
+    classes = np.full(n_itens, 'forte_queda', dtype=object)
+    for limite, nome in reversed(FAIXAS_CLASSIFICACAO_TENDENCIA):
+        classes[calculado >= limite] = nome
+
+    suficiente = n_completos >= min_anos
+    fator = np.where(suficiente & com_taxa, calculado, 1.0)
+    classificacao = np.where(suficiente, np.where(com_taxa, classes, 'indeterminado'), 'dados_insuficientes')
+    return fator, classificacao.astype(object)
+
+
+def calcular_fator_tendencia_yoy_lote(
+    vendas: pd.DataFrame,
+    min_anos: int = 2,
+    fator_amortecimento: float = 0.7,
+    dessazonalizar: bool = False,
+    coluna_item: str = 'item'
+) -> pd.DataFrame:
+    """
+    Fator de tendencia YoY e classificacao de todos os itens do frame.
+    Mesmas regras de calcular_fator_tendencia_yoy (ou da versao
+    _dessazonalizado, com dessazonalizar=True), sem a metadata de auditoria.
+
+    Args:
+        vendas: Frame longo com colunas (coluna_item, ano, mes, qtd)
+
+    Returns:
+        DataFrame indexado pelo item com colunas fator_tendencia e classificacao
+    """
+    itens, idx_item, ano, mes, qtd = _agrupar_vendas_mensais(vendas, coluna_item)
+    n_itens = len(itens)
+
+    sem_media = np.zeros(n_itens, dtype=bool)
+    if dessazonalizar:
+        indices, media_geral = _indices_sazonais(idx_item, mes, qtd, n_itens)
+        indice = indices[idx_item, mes - 1]
+        qtd = np.where(indice > 0, qtd / indice, qtd)
+        sem_media = media_geral == 0
+
+    fator, classificacao = _fator_tendencia_yoy_arrays(
+        idx_item, ano, mes, qtd, n_itens, min_anos, fator_amortecimento
+    )
+    fator[sem_media] = 1.0
+    classificacao[sem_media] = 'indeterminado'
+    return pd.DataFrame(
+        {'fator_tendencia': fator, 'classificacao': classificacao},
+        index=pd.Index(itens, name=coluna_item)
+    )
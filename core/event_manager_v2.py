@@ -491,6 +491,27 @@ class EventManagerV2:
 
         return eventos
 
+    def buscar_periodos_eventos(self, data_inicio: date, data_fim: date) -> List[Tuple[str, str]]:
+        """
+        Periodos (data_inicio, data_fim) dos eventos nao cancelados que tocam
+        o intervalo, com as mesmas comparacoes de buscar_eventos_para_item.
+
+        Usado para triagem em lote: um item cujo periodo de cobertura nao
+        cruza nenhum destes periodos tem fator de eventos 1.0 sem consulta.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT data_inicio, data_fim
+            FROM eventos
+            WHERE status != 'CANCELADO'
+              AND data_inicio <= ?
+              AND data_fim >= ?
+        ''', (data_fim.isoformat(), data_inicio.isoformat()))
+        periodos = [(row[0], row[1]) for row in cursor.fetchall()]
+        conn.close()
+        return periodos
+
     def calcular_fator_eventos(
         self,
         codigo: int,
@@ -23,6 +23,8 @@ class BaseForecaster:
         self.params = {}
         self.auto_clean_outliers = auto_clean_outliers
         self.outlier_info = None
+        self._dados_brutos = None
+        self._buffer = None
 
     def _preprocess_data(self, data: List[float]) -> List[float]:
         """
@@ -35,6 +37,9 @@ class BaseForecaster:
             self.outlier_info = None
             return data
 
+        # Serie original: update() sem suporte incremental refaz o fit sobre ela
+        self._dados_brutos = list(data)
+
         # Aplicar detecção automática de outliers
         from core.outlier_detector import auto_clean_outliers
 
@@ -68,6 +73,59 @@ class BaseForecaster:
         """Retorna os parâmetros do modelo"""
         return self.params
 
+    def update(self, observation: float) -> 'BaseForecaster':
+        """
+        Incorpora uma nova observação ao modelo ajustado
+
+        Equivale a fit(dados + [observation]). Esta implementação padrão
+        refaz o fit; modelos com estado recursivo (SMA, WMA, SES, Holt,
+        Croston) sobrescrevem com atualização O(1).
+        """
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+
+        if self.auto_clean_outliers and self._dados_brutos is not None:
+            base = self._dados_brutos
+        else:
+            base = list(self.data)
+        return self.fit(base + [observation])
+
+    def predict_next(self) -> float:
+        """Previsão um passo à frente (igual a predict(1)[0])"""
+        return self.predict(1)[0]
+
+    def _anexar_observacao(self, observation: float):
+        """
+        Acrescenta a observação a self.data sem copiar a série inteira
+        (buffer com capacidade dobrada; self.data é uma view dele)
+        """
+        n = len(self.data)
+        if self._buffer is None or self.data.base is not self._buffer or n >= len(self._buffer):
+            buffer = np.empty(max(16, 2 * (n + 1)), dtype=float)
+            buffer[:n] = self.data
+            self._buffer = buffer
+        self._buffer[n] = observation
+        self.data = self._buffer[:n + 1]
+
+    def _otimizar_parametros(self, metodo: str, data, **kwargs):
+        """
+        Escolhe os parâmetros de suavização pelo menor erro um passo à
+        frente na amostra (core/otimizacao_parametros) e os aplica ao modelo
+        """
+        from core.otimizacao_parametros import otimizar_parametros_lote
+
+        for nome, valor in otimizar_parametros_lote([data], metodo, **kwargs)[0].items():
+            setattr(self, nome, valor)
+
+    def _atualizar_incremental(self) -> bool:
+        """
+        Atualização incremental só é equivalente ao refit sem limpeza de
+        outliers nem otimização de parâmetros (ambas dependem da série inteira)
+        """
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+        return not self.auto_clean_outliers and not getattr(self, 'optimize', False)
+
 
 class SimpleMovingAverage(BaseForecaster):
     """
@@ -108,6 +166,7 @@ class SimpleMovingAverage(BaseForecaster):
         else:
             self.adaptive_window = self.window
 
+        self._acumulado = None
         self.fitted = True
 
         # Preservar outlier_detection se já foi adicionado
@@ -149,6 +208,37 @@ class SimpleMovingAverage(BaseForecaster):
 
         return previsoes
 
+    def update(self, observation: float) -> 'SimpleMovingAverage':
+        """
+        Incorpora uma observação em O(1) (janela adaptativa recalculada
+        para o novo tamanho, como no fit)
+        """
+        if not self._atualizar_incremental():
+            return super().update(observation)
+
+        if self._acumulado is None:
+            self._acumulado = [0.0] + np.cumsum(self.data, dtype=float).tolist()
+        self._acumulado.append(self._acumulado[-1] + float(observation))
+        self._anexar_observacao(observation)
+
+        if self.window is None:
+            self.adaptive_window = max(3, len(self.data) // 2)
+            self.params['window'] = self.adaptive_window
+
+        return self
+
+    def predict_next(self) -> float:
+        """Média da última janela via somas acumuladas (O(1))"""
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+
+        if self._acumulado is None:
+            self._acumulado = [0.0] + np.cumsum(self.data, dtype=float).tolist()
+        n = len(self.data)
+        w = min(self.adaptive_window, n)
+        previsao = (self._acumulado[n] - self._acumulado[n - w]) / w
+        return max(0, previsao)
+
 
 class WeightedMovingAverage(BaseForecaster):
     """
@@ -189,6 +279,7 @@ class WeightedMovingAverage(BaseForecaster):
         else:
             self.adaptive_window = self.window
 
+        self._acumulado = None
         self.fitted = True
 
         # Preservar outlier_detection se já foi adicionado
@@ -237,6 +328,55 @@ class WeightedMovingAverage(BaseForecaster):
 
         return previsoes
 
+    def _inicializar_acumulado(self):
+        """Somas acumuladas de x_j e j * x_j (base da soma ponderada da janela)"""
+        indices = np.arange(len(self.data), dtype=float)
+        self._acumulado = (
+            [0.0] + np.cumsum(self.data, dtype=float).tolist(),
+            [0.0] + np.cumsum(self.data * indices, dtype=float).tolist()
+        )
+
+    def update(self, observation: float) -> 'WeightedMovingAverage':
+        """
+        Incorpora uma observação em O(1) (janela adaptativa recalculada
+        para o novo tamanho, como no fit)
+        """
+        if not self._atualizar_incremental():
+            return super().update(observation)
+
+        if self._acumulado is None:
+            self._inicializar_acumulado()
+        soma, soma_indice = self._acumulado
+        n = len(self.data)
+        soma.append(soma[-1] + float(observation))
+        soma_indice.append(soma_indice[-1] + n * float(observation))
+        self._anexar_observacao(observation)
+
+        if self.window is None:
+            self.adaptive_window = max(3, len(self.data) // 2)
+            self.params['window'] = self.adaptive_window
+
+        return self
+
+    def predict_next(self) -> float:
+        """
+        WMA da última janela via somas acumuladas (O(1)):
+        Σ(j - inicio + 1) * x_j = Σ j*x_j - (inicio - 1) * Σ x_j
+        """
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+
+        if self._acumulado is None:
+            self._inicializar_acumulado()
+        soma, soma_indice = self._acumulado
+        n = len(self.data)
+        w = min(self.adaptive_window, n)
+        inicio = n - w
+
+        ponderada = (soma_indice[n] - soma_indice[inicio]) - (inicio - 1) * (soma[n] - soma[inicio])
+        previsao = ponderada / (w * (w + 1) / 2)
+        return max(0, previsao)
+
 
 class SimpleExponentialSmoothing(BaseForecaster):
     """
@@ -246,13 +386,15 @@ class SimpleExponentialSmoothing(BaseForecaster):
     Bom para séries estáveis sem tendência.
     """
 
-    def __init__(self, alpha: float = 0.3):
+    def __init__(self, alpha: float = 0.3, optimize: bool = False):
         """
         Args:
             alpha: Fator de suavização (0 < alpha < 1)
+            optimize: Se True, o fit escolhe alpha pelo menor erro um passo à frente
         """
         super().__init__()
         self.alpha = alpha
+        self.optimize = optimize
         self.level = None
 
     def fit(self, data: List[float]) -> 'SimpleExponentialSmoothing':
@@ -263,6 +405,8 @@ class SimpleExponentialSmoothing(BaseForecaster):
             data: Série temporal de dados históricos
         """
         self.data = np.array(data)
+        if self.optimize:
+            self._otimizar_parametros('ses', self.data)
 
         # Inicializar nível com primeiro valor
         self.level = self.data[0]
@@ -291,6 +435,21 @@ class SimpleExponentialSmoothing(BaseForecaster):
         # SES sempre prevê o último nível
         return [max(0, self.level)] * horizon
 
+    def update(self, observation: float) -> 'SimpleExponentialSmoothing':
+        """Atualiza o nível com uma observação (O(1))"""
+        if not self._atualizar_incremental():
+            return super().update(observation)
+
+        self.level = self.alpha * observation + (1 - self.alpha) * self.level
+        self.params['level'] = self.level
+        self._anexar_observacao(observation)
+        return self
+
+    def predict_next(self) -> float:
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+        return max(0, self.level)
+
 
 class HoltMethod(BaseForecaster):
     """
@@ -300,15 +459,17 @@ class HoltMethod(BaseForecaster):
     Bom para séries com tendência.
     """
 
-    def __init__(self, alpha: float = 0.3, beta: float = 0.1):
+    def __init__(self, alpha: float = 0.3, beta: float = 0.1, optimize: bool = False):
         """
         Args:
             alpha: Fator de suavização do nível
             beta: Fator de suavização da tendência
+            optimize: Se True, o fit escolhe alpha e beta pelo menor erro um passo à frente
         """
         super().__init__()
         self.alpha = alpha
         self.beta = beta
+        self.optimize = optimize
         self.level = None
         self.trend = None
 
@@ -320,6 +481,8 @@ class HoltMethod(BaseForecaster):
 
         if len(self.data) < 2:
             raise ValueError("Necessário pelo menos 2 observações para Holt")
+        if self.optimize:
+            self._otimizar_parametros('holt', self.data)
 
         # Inicialização
         self.level = self.data[0]
@@ -354,6 +517,24 @@ class HoltMethod(BaseForecaster):
 
         return previsoes
 
+    def update(self, observation: float) -> 'HoltMethod':
+        """Atualiza nível e tendência com uma observação (O(1))"""
+        if not self._atualizar_incremental():
+            return super().update(observation)
+
+        level_anterior = self.level
+        self.level = self.alpha * observation + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (self.level - level_anterior) + (1 - self.beta) * self.trend
+        self.params['level'] = self.level
+        self.params['trend'] = self.trend
+        self._anexar_observacao(observation)
+        return self
+
+    def predict_next(self) -> float:
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+        return max(0, self.level + self.trend)
+
 
 class HoltWinters(BaseForecaster):
     """
@@ -365,7 +546,8 @@ class HoltWinters(BaseForecaster):
 
     def __init__(self, season_period: int = None, alpha: float = 0.3,
                  beta: float = 0.1, gamma: float = 0.1,
-                 seasonal: str = 'additive', auto_clean_outliers: bool = False):
+                 seasonal: str = 'additive', auto_clean_outliers: bool = False,
+                 optimize: bool = False):
         """
         Args:
             season_period: Período da sazonalidade (12 para mensal, None para auto-detectar)
@@ -374,9 +556,12 @@ class HoltWinters(BaseForecaster):
             gamma: Fator de suavização da sazonalidade
             seasonal: Tipo de sazonalidade ('additive' ou 'multiplicative')
             auto_clean_outliers: Se True, detecta e trata outliers automaticamente
+            optimize: Se True, o fit escolhe alpha, beta e gamma pelo menor erro um passo à frente
         """
         super().__init__(auto_clean_outliers=auto_clean_outliers)
+        self.optimize = optimize
         self.season_period = season_period
+        self._season_period_informado = season_period
         self.alpha = alpha
         self.beta = beta
         self.gamma = gamma
@@ -396,7 +581,8 @@ class HoltWinters(BaseForecaster):
         n = len(self.data)
 
         # Auto-detectar período sazonal se não especificado
-        if self.season_period is None:
+        # (no construtor: um novo fit/update volta a detectar)
+        if self._season_period_informado is None:
             from core.seasonality_detector import detect_seasonality
             seasonality_info = detect_seasonality(list(self.data))
             self.seasonality_detected = seasonality_info
@@ -412,6 +598,9 @@ class HoltWinters(BaseForecaster):
 
         self.season_period = m  # Atualizar com o valor detectado
 
+        if self.optimize:
+            self._otimizar_parametros('holt_winters', self.data, season_period=m, seasonal=self.seasonal)
+
         if n < 2 * m:
             # Se não tem dados suficientes para sazonalidade, usar Holt simples
             holt = HoltMethod(self.alpha, self.beta)
@@ -520,15 +709,17 @@ class CrostonMethod(BaseForecaster):
     Separa a previsão em tamanho da demanda e intervalo entre demandas.
     """
 
-    def __init__(self, alpha: float = 0.2, variant: str = 'original'):
+    def __init__(self, alpha: float = 0.2, variant: str = 'original', optimize: bool = False):
         """
         Args:
             alpha: Fator de suavização
             variant: Variante do método ('original', 'sba', 'tsb')
+            optimize: Se True, o fit escolhe alpha pelo menor erro um passo à frente
         """
         super().__init__()
         self.alpha = alpha
         self.variant = variant
+        self.optimize = optimize
         self.demand_level = None
         self.interval_level = None
 
@@ -537,6 +728,8 @@ class CrostonMethod(BaseForecaster):
         Ajusta o modelo aos dados
         """
         self.data = np.array(data)
+        if self.optimize:
+            self._otimizar_parametros('croston', self.data, variant=self.variant)
 
         # Separar demandas não-zero e intervalos
         demandas = []
@@ -550,6 +743,9 @@ class CrostonMethod(BaseForecaster):
                 intervalos.append(intervalo_atual)
                 intervalo_atual = 0
 
+        # Períodos desde a última demanda (continua no update)
+        self._intervalo_atual = intervalo_atual
+
         if len(demandas) == 0:
             # Todos zeros
             self.demand_level = 0
@@ -597,6 +793,27 @@ class CrostonMethod(BaseForecaster):
 
         return [max(0, previsao)] * horizon
 
+    def update(self, observation: float) -> 'CrostonMethod':
+        """Atualiza tamanho e intervalo da demanda com uma observação (O(1))"""
+        if not self._atualizar_incremental():
+            return super().update(observation)
+
+        self._intervalo_atual += 1
+        if observation > 0:
+            if self.interval_level == float('inf'):
+                # Primeira demanda não-zero: inicialização
+                self.demand_level = observation
+                self.interval_level = self._intervalo_atual
+            else:
+                self.demand_level = self.alpha * observation + (1 - self.alpha) * self.demand_level
+                self.interval_level = self.alpha * self._intervalo_atual + (1 - self.alpha) * self.interval_level
+            self._intervalo_atual = 0
+            self.params['demand_level'] = self.demand_level
+            self.params['interval_level'] = self.interval_level
+
+        self._anexar_observacao(observation)
+        return self
+
 
 class LinearRegressionForecast(BaseForecaster):
     """
@@ -673,7 +890,12 @@ class AutoMethodSelector(BaseForecaster):
     - TSB: Para demanda intermitente
     """
 
-    def __init__(self, sku: str = None, loja: str = None):
+    # update() reavalia a recomendação a cada INTERVALO_RESELECAO observações.
+    # O padrão 1 equivale a um refit por dobra (métricas do walk-forward
+    # inalteradas); intervalos maiores são opt-in e trocam precisão por tempo
+    INTERVALO_RESELECAO = 1
+
+    def __init__(self, sku: str = None, loja: str = None, intervalo_reselecao: int = None):
         super().__init__()
         self.selected_method = None
         self.method_name = None
@@ -681,6 +903,8 @@ class AutoMethodSelector(BaseForecaster):
         self.sku = sku
         self.loja = loja
         self.validation_result = None
+        self.intervalo_reselecao = max(1, intervalo_reselecao or self.INTERVALO_RESELECAO)
+        self._obs_desde_selecao = 0
 
     def fit(self, data: List[float]) -> 'AutoMethodSelector':
         """
@@ -729,6 +953,7 @@ class AutoMethodSelector(BaseForecaster):
         self.recommendation = selector.recomendar_metodo()
 
         self.method_name = self.recommendation['metodo']
+        self._obs_desde_selecao = 0
 
         # Instanciar o método recomendado
         self.selected_method = get_modelo(self.method_name)
@@ -775,6 +1000,54 @@ class AutoMethodSelector(BaseForecaster):
 
         return self.selected_method.predict(horizon)
 
+    def update(self, observation: float) -> 'AutoMethodSelector':
+        """
+        Incorpora uma observação sem refazer validação nem log
+
+        Por padrão a recomendação é refeita a cada observação, como um
+        refit em [0:t]; o modelo selecionado só é reajustado se o método
+        mudar, senão é atualizado incrementalmente. Reavaliar a recomendação
+        custa O(n): com intervalo_reselecao=k (opt-in) ela só é refeita a
+        cada k observações, e entre reavaliações a seleção pode ficar
+        defasada em relação ao refit.
+        """
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+
+        from core.method_selector import MethodSelector
+
+        self._anexar_observacao(observation)
+        self._obs_desde_selecao += 1
+        if self._obs_desde_selecao < self.intervalo_reselecao:
+            self.selected_method.update(observation)
+            return self
+
+        self._obs_desde_selecao = 0
+        dados = self.data.tolist()
+        self.recommendation = MethodSelector(dados).recomendar_metodo()
+        metodo = self.recommendation['metodo']
+
+        if metodo == self.method_name:
+            self.selected_method.update(observation)
+        else:
+            self.method_name = metodo
+            self.selected_method = get_modelo(metodo)
+            self.selected_method.fit(dados)
+
+        self.params.update({
+            'selected_method': self.method_name,
+            'confidence': self.recommendation['confianca'],
+            'reason': self.recommendation['razao'],
+            'alternatives': self.recommendation.get('alternativas', []),
+            'characteristics': self.recommendation.get('caracteristicas', {})
+        })
+        return self
+
+    def predict_next(self) -> float:
+        if not self.fitted:
+            raise ValueError("Modelo não ajustado. Execute fit() primeiro.")
+        return self.selected_method.predict_next()
+
 
 class SeasonalMovingAverage(BaseForecaster):
     """
@@ -841,6 +1114,7 @@ class DecomposicaoSazonalMensal(BaseForecaster):
     def fit(self, data: List[float]) -> 'DecomposicaoSazonalMensal':
         """Ajusta o modelo"""
         self.data = np.array(data)
+        self.fitted = True
         return self
 
     def predict(self, n_periods: int = 1) -> List[float]:
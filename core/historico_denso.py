@@ -0,0 +1,372 @@
+"""
+Historico Denso - Vendas e Estoque Diarios em Arrays NumPy
+
+Representacao compacta do historico diario de um lote de itens, usada pelo
+cronjob de demanda (jobs/calcular_demanda_diaria.py) no lugar dos dicionarios
+{cod: {data: qtd}} e {cod: {(data, cod_empresa): qtd}}.
+
+Estrutura:
+- datas: indice de datas compartilhado (D dias consecutivos, datetime64[D])
+- vendas: matriz item x dia (float32) com a venda consolidada
+- vendas por loja e estoque por loja: formato CSR por item, com
+  (posicao da loja, dia, valor) ordenados por dia e loja
+
+A serie de um item vai do primeiro ao ultimo dia com registro de venda
+(mesma regra do preload por dicionario), com zero nos dias sem registro.
+Os agregados por semana ISO (calculo semanal V55) sao derivados das mesmas
+linhas diarias, sem nova leitura do banco.
+Quantidades sao armazenadas em float32 (exatas para inteiros ate 2^24)
+e convertidas para float64 na hora do calculo.
+"""
+
+import numpy as np
+from datetime import date
+from typing import List, Dict, Tuple, Optional, Iterable
+
+
+DTYPE_QUANTIDADE = np.float32
+LOJA_CD_MINIMA = 80  # cod_empresa >= 80 sao CDs (nao entram na correcao de ruptura)
+
+
+class _CSRLojaDia:
+    """Valores esparsos item -> (loja, dia, valor) em formato CSR."""
+
+    __slots__ = ('indptr', 'loja_pos', 'dia', 'valor')
+
+    def __init__(self, indptr, loja_pos, dia, valor):
+        self.indptr = indptr
+        self.loja_pos = loja_pos
+        self.dia = dia
+        self.valor = valor
+
+    @classmethod
+    def construir(cls, idx_item, loja_pos, dia, valor, n_itens: int) -> '_CSRLojaDia':
+        """
+        Monta o CSR ordenando por (item, dia, loja).
+        Chaves repetidas mantem a ultima ocorrencia (mesma semantica do dict).
+        """
+        if len(idx_item):
+            ordem = np.lexsort((loja_pos, dia, idx_item))
+            idx_item, loja_pos, dia, valor = idx_item[ordem], loja_pos[ordem], dia[ordem], valor[ordem]
+            # lexsort e estavel: a ultima linha de cada chave e a ultima lida do banco
+            ultima = np.ones(len(idx_item), dtype=bool)
+            ultima[:-1] = (
+                (idx_item[1:] != idx_item[:-1]) | (dia[1:] != dia[:-1]) | (loja_pos[1:] != loja_pos[:-1])
+            )
+            idx_item, loja_pos, dia, valor = idx_item[ultima], loja_pos[ultima], dia[ultima], valor[ultima]
+
+        indptr = np.zeros(n_itens + 1, dtype=np.int64)
+        np.cumsum(np.bincount(idx_item, minlength=n_itens), out=indptr[1:])
+        return cls(indptr, loja_pos.astype(np.int32), dia.astype(np.int32), valor.astype(DTYPE_QUANTIDADE))
+
+    @classmethod
+    def vazio(cls, n_itens: int) -> '_CSRLojaDia':
+        return cls(
+            np.zeros(n_itens + 1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=DTYPE_QUANTIDADE)
+        )
+
+    def segmento(self, i: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ini, fim = self.indptr[i], self.indptr[i + 1]
+        return self.loja_pos[ini:fim], self.dia[ini:fim], self.valor[ini:fim]
+
+    def subconjunto(self, indices: np.ndarray) -> '_CSRLojaDia':
+        partes = [np.arange(self.indptr[i], self.indptr[i + 1]) for i in indices]
+        sel = np.concatenate(partes) if partes else np.zeros(0, dtype=np.int64)
+        tamanhos = np.diff(self.indptr)[indices]
+        indptr = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(tamanhos, out=indptr[1:])
+        return _CSRLojaDia(indptr, self.loja_pos[sel], self.dia[sel], self.valor[sel])
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.loja_pos.nbytes + self.dia.nbytes + self.valor.nbytes
+
+
+class ItemHistorico:
+    """
+    Visao de um item: serie consolidada e matrizes loja x dia na janela do item
+    (do primeiro ao ultimo dia com venda). Valores em float64.
+    """
+
+    __slots__ = ('cod_produto', 'datas', 'serie', 'dias_com_venda', 'meses_com_venda',
+                 'lojas_vendas', 'vendas_loja', 'lojas_estoque', 'estoque_loja')
+
+    def __init__(self, cod_produto, datas, serie, dias_com_venda, meses_com_venda,
+                 lojas_vendas, vendas_loja, lojas_estoque, estoque_loja):
+        self.cod_produto = cod_produto
+        self.datas = datas                  # datetime64[D] (n)
+        self.serie = serie                  # float64 (n)
+        self.dias_com_venda = dias_com_venda
+        self.meses_com_venda = meses_com_venda  # codigos de mes (datetime64[M] como int) com registro
+        self.lojas_vendas = lojas_vendas    # cod_empresa (Lv)
+        self.vendas_loja = vendas_loja      # float64 (Lv x n)
+        self.lojas_estoque = lojas_estoque  # cod_empresa (Le)
+        self.estoque_loja = estoque_loja    # float64 (Le x n), NaN = sem registro
+
+    def __len__(self):
+        return len(self.serie)
+
+    @property
+    def tem_estoque(self) -> bool:
+        return len(self.lojas_estoque) > 0
+
+    def totais_mensais(self, valores: np.ndarray = None, apenas_meses_com_venda: bool = True) -> Dict[Tuple[int, int], float]:
+        """
+        Soma valores diarios por (ano, mes).
+
+        Args:
+            valores: Serie diaria alinhada com datas (default: serie original)
+            apenas_meses_com_venda: Se True, so inclui meses com algum registro de
+                venda (equivale a agrupar vendas_por_data); se False, inclui todos
+                os meses da janela (equivale a agrupar a serie dia a dia)
+        """
+        if len(self.datas) == 0:
+            return {}
+        valores = self.serie if valores is None else np.asarray(valores, dtype=np.float64)
+        meses = self.datas.astype('datetime64[M]').astype(np.int64)
+        mes0 = meses[0]
+        totais = np.bincount(meses - mes0, weights=valores)
+        codigos = self.meses_com_venda if apenas_meses_com_venda else np.unique(meses)
+        return {
+            (int(c // 12) + 1970, int(c % 12) + 1): float(totais[c - mes0])
+            for c in codigos
+        }
+
+
+class HistoricoDenso:
+    """
+    Historico diario de um lote de itens em arrays NumPy.
+
+    Atributos:
+        cod_produtos: codigos dos itens (I)
+        data_ini: primeira data do indice compartilhado
+        n_dias: tamanho do indice de datas (D)
+        lojas: cod_empresa distintos (L), ordenados
+        vendas: float32 (I x D) venda consolidada
+        dia_ini / dia_fim: primeiro/ultimo dia com registro de venda (-1 = sem vendas)
+        vendas_loja / estoque_loja: CSR item -> (loja, dia, valor)
+    """
+
+    def __init__(self, cod_produtos, data_ini, n_dias, lojas, vendas, dia_ini, dia_fim,
+                 vendas_loja: _CSRLojaDia, estoque_loja: _CSRLojaDia):
+        self.cod_produtos = np.asarray(cod_produtos, dtype=np.int64)
+        self.data_ini = np.datetime64(data_ini, 'D')
+        self.n_dias = int(n_dias)
+        self.lojas = np.asarray(lojas, dtype=np.int32)
+        self.vendas = vendas
+        self.dia_ini = dia_ini
+        self.dia_fim = dia_fim
+        self.vendas_loja = vendas_loja
+        self.estoque_loja = estoque_loja
+        self._indice = {int(c): i for i, c in enumerate(self.cod_produtos)}
+        self._semanas = None
+
+    # ------------------------------------------------------------------
+    # Construcao
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def de_linhas_vendas(cls, cod_produtos: List[int], linhas: Iterable[Tuple],
+                         data_ini: date, data_fim: date) -> 'HistoricoDenso':
+        """
+        Constroi o historico a partir de linhas (codigo, data, cod_empresa, qtd_venda).
+
+        O indice de datas cobre [data_ini, data_fim] e e expandido se houver
+        linhas fora desse intervalo.
+        """
+        cod_produtos = [int(c) for c in cod_produtos]
+        indice = {c: i for i, c in enumerate(cod_produtos)}
+
+        linhas = [l for l in linhas if int(l[0]) in indice]
+        n = len(linhas)
+        idx_item = np.fromiter((indice[int(l[0])] for l in linhas), dtype=np.int64, count=n)
+        datas = np.array([l[1] for l in linhas], dtype='datetime64[D]')
+        cod_empresa = np.fromiter((int(l[2]) for l in linhas), dtype=np.int64, count=n)
+        qtd = np.fromiter((float(l[3] or 0) for l in linhas), dtype=np.float64, count=n)
+
+        ini = np.datetime64(data_ini, 'D')
+        fim = np.datetime64(data_fim, 'D')
+        if n:
+            ini = min(ini, datas.min())
+            fim = max(fim, datas.max())
+        n_dias = int((fim - ini).astype(np.int64)) + 1
+        dia = (datas - ini).astype(np.int64)
+
+        lojas, loja_pos = np.unique(cod_empresa, return_inverse=True)
+
+        # Consolidado: acumula em float64 e armazena em float32
+        vendas = np.zeros((len(cod_produtos), n_dias), dtype=np.float64)
+        np.add.at(vendas, (idx_item, dia), qtd)
+
+        dia_ini = np.full(len(cod_produtos), -1, dtype=np.int32)
+        dia_fim = np.full(len(cod_produtos), -1, dtype=np.int32)
+        if n:
+            tem = np.bincount(idx_item, minlength=len(cod_produtos)) > 0
+            minimos = np.full(len(cod_produtos), n_dias, dtype=np.int64)
+            maximos = np.full(len(cod_produtos), -1, dtype=np.int64)
+            np.minimum.at(minimos, idx_item, dia)
+            np.maximum.at(maximos, idx_item, dia)
+            dia_ini[tem] = minimos[tem]
+            dia_fim[tem] = maximos[tem]
+
+        return cls(
+            cod_produtos, ini, n_dias, lojas,
+            vendas.astype(DTYPE_QUANTIDADE), dia_ini, dia_fim,
+            _CSRLojaDia.construir(idx_item, loja_pos, dia, qtd, len(cod_produtos)),
+            _CSRLojaDia.vazio(len(cod_produtos))
+        )
+
+    def anexar_estoque(self, linhas: Iterable[Tuple]):
+        """
+        Anexa estoque diario por loja a partir de linhas (codigo, data, cod_empresa, estoque).
+        Linhas fora do indice de datas sao descartadas (nao afetam o calculo).
+        """
+        linhas = [l for l in linhas if int(l[0]) in self._indice]
+        n = len(linhas)
+        idx_item = np.fromiter((self._indice[int(l[0])] for l in linhas), dtype=np.int64, count=n)
+        dia = (np.array([l[1] for l in linhas], dtype='datetime64[D]') - self.data_ini).astype(np.int64)
+        cod_empresa = np.fromiter((int(l[2]) for l in linhas), dtype=np.int64, count=n)
+        valor = np.fromiter((float(l[3] or 0) for l in linhas), dtype=np.float64, count=n)
+
+        dentro = (dia >= 0) & (dia < self.n_dias)
+        idx_item, dia, cod_empresa, valor = idx_item[dentro], dia[dentro], cod_empresa[dentro], valor[dentro]
+
+        # Lojas que so aparecem no estoque entram no indice de lojas
+        lojas = np.union1d(self.lojas, cod_empresa).astype(np.int32)
+        if len(lojas) != len(self.lojas):
+            remap = np.searchsorted(lojas, self.lojas).astype(np.int32)
+            self.vendas_loja.loja_pos = remap[self.vendas_loja.loja_pos]
+            self.lojas = lojas
+        loja_pos = np.searchsorted(self.lojas, cod_empresa)
+
+        self.estoque_loja = _CSRLojaDia.construir(idx_item, loja_pos, dia, valor, len(self.cod_produtos))
+        return self
+
+    def subconjunto(self, cod_produtos: List[int]) -> 'HistoricoDenso':
+        """Retorna um novo HistoricoDenso apenas com os itens pedidos (para chunks)."""
+        indices = np.array([self._indice[int(c)] for c in cod_produtos], dtype=np.int64)
+        return HistoricoDenso(
+            self.cod_produtos[indices], self.data_ini, self.n_dias, self.lojas,
+            self.vendas[indices], self.dia_ini[indices], self.dia_fim[indices],
+            self.vendas_loja.subconjunto(indices), self.estoque_loja.subconjunto(indices)
+        )
+
+    # ------------------------------------------------------------------
+    # Acesso
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.cod_produtos)
+
+    def __contains__(self, cod_produto) -> bool:
+        return int(cod_produto) in self._indice
+
+    @property
+    def nbytes(self) -> int:
+        return self.vendas.nbytes + self.vendas_loja.nbytes + self.estoque_loja.nbytes
+
+    def tem_estoque(self, cod_produto) -> bool:
+        i = self._indice.get(int(cod_produto))
+        return i is not None and self.estoque_loja.indptr[i + 1] > self.estoque_loja.indptr[i]
+
+    def _semanas_iso(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (indice da semana, ano ISO, semana ISO) de cada dia do indice de datas.
+        O indice da semana e continuo (semanas desde 1970) e serve de chave de agrupamento.
+        """
+        if self._semanas is None:
+            dias = (self.data_ini + np.arange(self.n_dias)).astype(np.int64)  # 1970-01-01 = quinta
+            dia_semana = (dias + 3) % 7                                         # 0 = segunda
+            quinta = dias - dia_semana + 3                                      # quinta define o ano ISO
+            ano_inicio = quinta.astype('datetime64[D]').astype('datetime64[Y]')
+            ano_iso = ano_inicio.astype(np.int64) + 1970
+            semana_iso = (quinta - ano_inicio.astype('datetime64[D]').astype(np.int64)) // 7 + 1
+            self._semanas = ((dias - dia_semana) // 7, ano_iso, semana_iso)
+        return self._semanas
+
+    def _agrupar_semana_loja(self, loja_pos, dia, valor):
+        """Agrupa linhas (loja, dia) por (semana, loja): (ano_iso, semana_iso, cod_empresa, soma, contagem, positivos)."""
+        indice_semana, ano_iso, semana_iso = self._semanas_iso()
+        chave = indice_semana[dia] * len(self.lojas) + loja_pos
+        chaves, inverso = np.unique(chave, return_inverse=True)
+        dia_ref = np.zeros(len(chaves), dtype=np.int64)
+        dia_ref[inverso] = dia
+        return (
+            ano_iso[dia_ref], semana_iso[dia_ref], self.lojas[chaves % len(self.lojas)],
+            np.bincount(inverso, weights=valor.astype(np.float64), minlength=len(chaves)),
+            np.bincount(inverso, minlength=len(chaves)),
+            np.bincount(inverso, weights=(valor > 0), minlength=len(chaves)),
+        )
+
+    def agregado_semanal(self, cod_produto) -> Tuple[Dict, Dict, Dict]:
+        """
+        V55: Vendas e estoque do item agregados por semana ISO, a partir das linhas diarias.
+        Mesmo formato e mesma janela das antigas queries semanais (DIAS_HISTORICO).
+
+        Returns:
+            (
+                {(ano_iso, semana_iso): qtd_venda_total},                      # consolidado
+                {(ano_iso, semana_iso, cod_empresa): qtd_venda_loja},          # V53: por loja
+                {(ano_iso, semana_iso, cod_empresa): (dias_com_estoque, dias_totais)}
+            )
+        """
+        i = self._indice.get(int(cod_produto))
+        if i is None:
+            return {}, {}, {}
+
+        consolidado, por_loja = {}, {}
+        ano, semana, loja, soma, _, _ = self._agrupar_semana_loja(*self.vendas_loja.segmento(i))
+        for a, s, l, q in zip(ano.tolist(), semana.tolist(), loja.tolist(), soma.tolist()):
+            consolidado[(a, s)] = consolidado.get((a, s), 0) + q
+            por_loja[(a, s, l)] = q
+
+        ano, semana, loja, _, dias_totais, dias_ok = self._agrupar_semana_loja(*self.estoque_loja.segmento(i))
+        estoque = {
+            (a, s, l): (int(ok), int(tot))
+            for a, s, l, ok, tot in zip(ano.tolist(), semana.tolist(), loja.tolist(), dias_ok, dias_totais)
+        }
+        return consolidado, por_loja, estoque
+
+    def item(self, cod_produto) -> Optional[ItemHistorico]:
+        """
+        Monta a visao de um item na sua janela de vendas.
+        Retorna None se o item nao pertence ao lote; serie vazia se nao tem vendas.
+        """
+        i = self._indice.get(int(cod_produto))
+        if i is None:
+            return None
+
+        ini, fim = int(self.dia_ini[i]), int(self.dia_fim[i])
+        vazio = np.zeros(0)
+        if ini < 0:
+            return ItemHistorico(
+                int(cod_produto), np.zeros(0, dtype='datetime64[D]'), vazio, 0,
+                np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros((0, 0)),
+                np.zeros(0, dtype=np.int32), np.zeros((0, 0))
+            )
+
+        n = fim - ini + 1
+        datas = self.data_ini + np.arange(ini, fim + 1)
+        serie = self.vendas[i, ini:fim + 1].astype(np.float64)
+
+        # Vendas por loja (todas as linhas de venda estao dentro da janela)
+        loja_pos, dia, valor = self.vendas_loja.segmento(i)
+        pos_vendas = np.unique(loja_pos)
+        vendas_loja = np.zeros((len(pos_vendas), n), dtype=np.float64)
+        vendas_loja[np.searchsorted(pos_vendas, loja_pos), dia - ini] = valor
+        dias_com_venda = len(np.unique(dia))
+        meses_com_venda = np.unique((self.data_ini + dia).astype('datetime64[M]').astype(np.int64))
+
+        # Estoque por loja restrito a janela (NaN = sem registro no dia)
+        loja_pos_e, dia_e, valor_e = self.estoque_loja.segmento(i)
+        na_janela = (dia_e >= ini) & (dia_e <= fim)
+        loja_pos_e, dia_e, valor_e = loja_pos_e[na_janela], dia_e[na_janela], valor_e[na_janela]
+        pos_estoque = np.unique(loja_pos_e)
+        estoque_loja = np.full((len(pos_estoque), n), np.nan, dtype=np.float64)
+        estoque_loja[np.searchsorted(pos_estoque, loja_pos_e), dia_e - ini] = valor_e
+
+        return ItemHistorico(
+            int(cod_produto), datas, serie, dias_com_venda, meses_com_venda,
+            self.lojas[pos_vendas], vendas_loja, self.lojas[pos_estoque], estoque_loja
+        )
@@ -3,11 +3,32 @@ Seletor de Métodos de Previsão usando Machine Learning
 
 Este módulo analisa características das séries temporais e usa ML para selecionar
 o método de previsão mais adequado para cada combinação SKU/Loja.
+
+O modelo treinado (RandomForest, scaler e esquema de features) pode ser
+salvo em disco e carregado sob demanda, sem retreinar a cada upload:
+
+    # Offline (jobs/treinar_ml_selector.py)
+    seletor = MLMethodSelector()
+    seletor.treinar_com_historico(df_historico, workers=4)
+    seletor.salvar('semanal')
+
+    # Na requisição (mesma granularidade das séries do upload)
+    seletor = obter_seletor_treinado('semanal')   # None se não há modelo salvo
+
+Configuração por ambiente:
+    ML_SELECTOR_DIR   pasta dos modelos salvos (default: outputs/modelos)
 """
 
+import glob
+import os
+import pickle
+import threading
+from datetime import datetime
+
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+import sklearn
+from typing import Dict, List, Optional, Tuple
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -15,6 +36,18 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
+# Versão do formato salvo em disco: mudar quando extrair_caracteristicas ou
+# a rotulagem de treino mudarem (modelos de outra versão são ignorados)
+VERSAO_MODELO = 2
+DIRETORIO_MODELOS_PADRAO = os.path.join('outputs', 'modelos')
+PREFIXO_ARQUIVO = 'ml_selector'
+# Granularidade das séries de treino (um modelo por granularidade)
+GRANULARIDADES = ('semanal', 'mensal')
+
+# Séries por tarefa enviada aos processos no treino paralelo
+SERIES_POR_TAREFA = 200
+
+
 class MLMethodSelector:
     """
     Seletor inteligente de métodos de previsão usando Random Forest
@@ -103,6 +136,137 @@ class MLMethodSelector:
             'tamanho_serie': len(valores)
         }
 
+    def extrair_caracteristicas_lote(self, df_historico: pd.DataFrame) -> pd.DataFrame:
+        """
+        Extrai as características de todas as séries SKU/Loja de uma vez
+
+        Mesmas características de extrair_caracteristicas (iguais a menos de
+        arredondamento de ponto flutuante), calculadas sobre uma matriz com
+        uma linha por série (completada com zeros e máscara de posições
+        válidas), sem laço por série.
+
+        Args:
+            df_historico: DataFrame com colunas ['SKU', 'Loja', 'Mes', 'Vendas']
+
+        Returns:
+            DataFrame indexado por (SKU, Loja), uma coluna por característica
+        """
+        colunas = list(self._caracteristicas_padrao().keys())
+        dados = df_historico[['SKU', 'Loja', 'Mes', 'Vendas']].sort_values(
+            ['SKU', 'Loja', 'Mes'], kind='stable'
+        )
+        grupos = dados.groupby(['SKU', 'Loja'], sort=True)
+        indice = grupos.size().index
+        if len(indice) == 0:
+            return pd.DataFrame(columns=colunas, index=indice, dtype=float).astype({'tamanho_serie': np.int64})
+
+        # Matriz series x posicoes (zeros apos o fim de cada serie)
+        codigo = grupos.ngroup().to_numpy()
+        posicao = grupos.cumcount().to_numpy()
+        n = np.bincount(codigo, minlength=len(indice))
+        largura = int(n.max())
+        V = np.zeros((len(indice), largura))
+        V[codigo, posicao] = dados['Vendas'].to_numpy(dtype=np.float64)
+        j = np.arange(largura)
+        valido = j < n[:, None]
+        nf = n.astype(np.float64)
+
+        def media_mascara(matriz, mascara):
+            return np.where(mascara, matriz, 0).sum(axis=1) / mascara.sum(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 1. Estatísticas básicas
+            media = V.sum(axis=1) / nf
+            desvios = np.where(valido, V - media[:, None], 0)
+            std = np.sqrt((desvios ** 2).sum(axis=1) / nf)
+            cv = np.where(media > 0, std / media, 0)
+
+            # 2. Tendência (inclinação de mínimos quadrados)
+            dx = np.where(valido, j - (nf[:, None] - 1) / 2, 0)
+            inclinacao = (dx * desvios).sum(axis=1) / (dx ** 2).sum(axis=1)
+            tendencia = np.where(media > 0, inclinacao / media, 0)
+
+            # 3. Sazonalidade (correlação lag 12)
+            sazonalidade = np.zeros(len(indice))
+            if largura > 12:
+                mascara = j[:-12] < (n - 12)[:, None]
+                a, b = V[:, :-12], V[:, 12:]
+                da = np.where(mascara, a - media_mascara(a, mascara)[:, None], 0)
+                db = np.where(mascara, b - media_mascara(b, mascara)[:, None], 0)
+                correlacao = (da * db).sum(axis=1) / np.sqrt((da ** 2).sum(axis=1) * (db ** 2).sum(axis=1))
+                sazonalidade = np.where(n >= 13, np.clip(correlacao, -1, 1), 0)
+
+            # 4. Estabilidade (desvio da diferença de primeira ordem)
+            estabilidade = np.zeros(len(indice))
+            if largura > 1:
+                mascara = j[:-1] < (n - 1)[:, None]
+                diffs = V[:, 1:] - V[:, :-1]
+                desvios_diff = np.where(mascara, diffs - media_mascara(diffs, mascara)[:, None], 0)
+                std_diff = np.sqrt((desvios_diff ** 2).sum(axis=1) / mascara.sum(axis=1))
+                estabilidade = np.where(std > 0, std_diff / std, 0)
+
+            # 5. Zeros e outliers (quartis com interpolação linear, como np.percentile)
+            pct_zeros = ((V == 0) & valido).sum(axis=1) / nf
+            ordenado = np.sort(np.where(valido, V, np.inf), axis=1)
+            q1, q3 = (_quantil_linear(ordenado, n, q) for q in (0.25, 0.75))
+            limite = q3 + 1.5 * (q3 - q1)
+            pct_outliers = ((V > limite[:, None]) & valido).sum(axis=1) / nf
+
+            # 6. Padrão de crescimento
+            metade = n // 2
+            primeira = media_mascara(V, j < metade[:, None])
+            segunda = media_mascara(V, (j >= metade[:, None]) & valido)
+            crescimento = np.where((n >= 6) & (primeira > 0), (segunda - primeira) / primeira, 0)
+
+            # 7. Regularidade (entropia)
+            proporcao = V / V.sum(axis=1)[:, None]
+            termos = np.where(valido, proporcao * np.log2(proporcao + 1e-10), 0)
+            entropia = np.where(media > 0, -termos.sum(axis=1), 0)
+
+        caracteristicas = pd.DataFrame({
+            'media': media,
+            'cv': cv,
+            'tendencia': tendencia,
+            'sazonalidade': sazonalidade,
+            'estabilidade': estabilidade,
+            'pct_zeros': pct_zeros,
+            'pct_outliers': pct_outliers,
+            'crescimento': crescimento,
+            'entropia': entropia,
+            'tamanho_serie': n,
+        }, index=indice)[colunas]
+
+        # Séries muito curtas: características padrão
+        curtas = n < 3
+        if curtas.any():
+            caracteristicas.loc[curtas] = list(self._caracteristicas_padrao().values())
+        # Mesmos tipos de extrair_caracteristicas (tamanho_serie inteiro)
+        return caracteristicas.astype({'tamanho_serie': np.int64})
+
+    def selecionar_metodos_lote(self, caracteristicas: pd.DataFrame) -> pd.DataFrame:
+        """
+        Seleciona o método de cada linha da matriz de características
+        (extrair_caracteristicas_lote) com uma única predição do modelo
+
+        Returns:
+            DataFrame com o mesmo índice e colunas ['Metodo_Sugerido', 'Confianca']
+        """
+        if not self.is_trained or len(caracteristicas) == 0:
+            # Fallback: usar média móvel se não treinado
+            return pd.DataFrame({'Metodo_Sugerido': 'MEDIA_MOVEL', 'Confianca': 0.5},
+                                index=caracteristicas.index)
+
+        colunas = list(self._caracteristicas_padrao().keys())
+        features_scaled = self.scaler.transform(caracteristicas[colunas].to_numpy(dtype=np.float64))
+
+        # Método = classe de maior probabilidade (mesmo critério de model.predict)
+        probabilidades = self.model.predict_proba(features_scaled)
+        melhor = probabilidades.argmax(axis=1)
+        return pd.DataFrame({
+            'Metodo_Sugerido': self.model.classes_[melhor],
+            'Confianca': probabilidades[np.arange(len(melhor)), melhor],
+        }, index=caracteristicas.index)
+
     def _caracteristicas_padrao(self) -> Dict:
         """Retorna características padrão para séries muito curtas"""
         return {
@@ -183,52 +347,59 @@ class MLMethodSelector:
 
         return np.maximum(previsao, 0)  # Garantir não-negatividade
 
-    def treinar_com_historico(self, df_historico: pd.DataFrame) -> Dict:
+    def exemplo_treino(self, serie: pd.Series) -> Tuple[List[float], str]:
         """
-        Treina o modelo usando histórico de vendas
+        Features e rótulo (método de menor MAPE) de uma série de treino
 
         Args:
-            df_historico: DataFrame com colunas ['SKU', 'Loja', 'Mes', 'Vendas']
+            serie: Série temporal (já ordenada por mês)
 
         Returns:
-            Dicionário com estatísticas do treinamento
+            Tupla (features, melhor_metodo)
         """
-        print("\n[ML] Iniciando treinamento do seletor de métodos...")
+        # Extrair características
+        caracteristicas = self.extrair_caracteristicas(serie)
 
-        # Preparar dados de treinamento
-        X_train = []
-        y_train = []
+        # Avaliar cada método
+        mape_mm = self.avaliar_metodo(serie, 'media_movel')
+        mape_exp = self.avaliar_metodo(serie, 'exponencial')
+        mape_hw = self.avaliar_metodo(serie, 'holt_winters')
 
-        # Para cada combinação SKU/Loja
-        grupos = df_historico.groupby(['SKU', 'Loja'])
-        total_series = len(grupos)
-        series_validas = 0
+        # Melhor método = menor MAPE
+        mapes = [mape_mm, mape_exp, mape_hw]
+        metodos = ['MEDIA_MOVEL', 'EXPONENCIAL', 'HOLT_WINTERS']
+        melhor_metodo = metodos[np.argmin(mapes)]
 
-        for (sku, loja), grupo in grupos:
-            serie = grupo.sort_values('Mes')['Vendas']
+        return list(caracteristicas.values()), melhor_metodo
 
-            # Só usar séries com dados suficientes
-            if len(serie) < 12:
-                continue
+    def treinar_com_historico(self, df_historico: pd.DataFrame, workers: int = 0) -> Dict:
+        """
+        Treina o modelo usando histórico de vendas
 
-            # Extrair características
-            caracteristicas = self.extrair_caracteristicas(serie)
+        Args:
+            df_historico: DataFrame com colunas ['SKU', 'Loja', 'Mes', 'Vendas']
+            workers: Processos para avaliar as séries (0 = sequencial).
+                     O resultado é o mesmo em qualquer modo.
 
-            # Avaliar cada método
-            mape_mm = self.avaliar_metodo(serie, 'media_movel')
-            mape_exp = self.avaliar_metodo(serie, 'exponencial')
-            mape_hw = self.avaliar_metodo(serie, 'holt_winters')
+        Returns:
+            Dicionário com estatísticas do treinamento
+        """
+        print("\n[ML] Iniciando treinamento do seletor de métodos...")
 
-            # Melhor método = menor MAPE
-            mapes = [mape_mm, mape_exp, mape_hw]
-            metodos = ['MEDIA_MOVEL', 'EXPONENCIAL', 'HOLT_WINTERS']
-            melhor_metodo = metodos[np.argmin(mapes)]
+        # Para cada combinação SKU/Loja, só séries com dados suficientes
+        grupos = df_historico.groupby(['SKU', 'Loja'])
+        total_series = len(grupos)
+        series = [
+            grupo.sort_values('Mes')['Vendas'].to_numpy()
+            for _, grupo in grupos
+        ]
+        series = [serie for serie in series if len(serie) >= 12]
 
-            # Adicionar ao dataset de treino
-            features = list(caracteristicas.values())
-            X_train.append(features)
-            y_train.append(melhor_metodo)
-            series_validas += 1
+        # Preparar dados de treinamento
+        exemplos = montar_exemplos_treino(series, workers)
+        X_train = [features for features, _ in exemplos]
+        y_train = [melhor_metodo for _, melhor_metodo in exemplos]
+        series_validas = len(exemplos)
 
         if series_validas < 3:
             print(f"[ML] AVISO: Apenas {series_validas} séries válidas. Mínimo recomendado: 3")
@@ -257,13 +428,98 @@ class MLMethodSelector:
         print(f"    - Séries analisadas: {series_validas}")
         print(f"    - Acurácia (treino): {self.model.score(X_train_scaled, y_train):.2%}")
 
-        return {
+        self.estatisticas_treino = {
             'sucesso': True,
             'total_series': total_series,
             'series_validas': series_validas,
             'acuracia': self.model.score(X_train_scaled, y_train),
             'importancia_features': importancias
         }
+        return self.estatisticas_treino
+
+    def salvar(self, granularidade: str, diretorio: Optional[str] = None) -> str:
+        """
+        Salva modelo, scaler e esquema de features em um novo arquivo versionado
+
+        O arquivo é escrito em um temporário e renomeado, então um processo
+        carregando o modelo nunca lê um arquivo pela metade.
+
+        Args:
+            granularidade: Granularidade das séries de treino ('semanal' ou 'mensal')
+            diretorio: Pasta dos modelos (default: ML_SELECTOR_DIR ou outputs/modelos)
+
+        Returns:
+            Caminho do arquivo salvo
+        """
+        if not self.is_trained:
+            raise ValueError("Modelo não treinado: nada para salvar")
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"Granularidade inválida: {granularidade} (use {GRANULARIDADES})")
+
+        diretorio = diretorio or diretorio_modelos()
+        os.makedirs(diretorio, exist_ok=True)
+        treinado_em = datetime.now()
+        caminho = os.path.join(
+            diretorio,
+            f"{PREFIXO_ARQUIVO}_v{VERSAO_MODELO}_{granularidade}_{treinado_em:%Y%m%d_%H%M%S_%f}.pkl"
+        )
+        artefato = {
+            'versao_modelo': VERSAO_MODELO,
+            'granularidade': granularidade,
+            'versao_sklearn': sklearn.__version__,
+            'feature_names': self.feature_names,
+            'treinado_em': treinado_em.isoformat(),
+            'estatisticas_treino': getattr(self, 'estatisticas_treino', None),
+            'model': self.model,
+            'scaler': self.scaler,
+        }
+        temporario = caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            pickle.dump(artefato, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+        print(f"[ML] Modelo salvo em {caminho}")
+        return caminho
+
+    @classmethod
+    def carregar(cls, caminho: str, granularidade: Optional[str] = None) -> 'MLMethodSelector':
+        """
+        Carrega um modelo salvo por salvar()
+
+        Args:
+            caminho: Arquivo salvo
+            granularidade: Se informada, exige um modelo treinado nela
+
+        Raises:
+            ValueError: Arquivo de outra versão do modelo, do scikit-learn,
+                        de outra granularidade ou com esquema de features
+                        diferente do atual
+        """
+        with open(caminho, 'rb') as f:
+            artefato = pickle.load(f)
+
+        seletor = cls()
+        esperado = list(seletor._caracteristicas_padrao().keys())
+        if artefato.get('versao_modelo') != VERSAO_MODELO:
+            raise ValueError(f"Versão do modelo {artefato.get('versao_modelo')} != {VERSAO_MODELO}")
+        if granularidade is not None and artefato.get('granularidade') != granularidade:
+            raise ValueError(f"Modelo treinado com séries {artefato.get('granularidade')} (esperado: {granularidade})")
+        if artefato.get('versao_sklearn') != sklearn.__version__:
+            raise ValueError(
+                f"Modelo salvo com scikit-learn {artefato.get('versao_sklearn')} "
+                f"(instalado: {sklearn.__version__})"
+            )
+        if artefato.get('feature_names') != esperado:
+            raise ValueError("Esquema de features do modelo salvo difere do atual")
+
+        seletor.model = artefato['model']
+        seletor.scaler = artefato['scaler']
+        seletor.feature_names = artefato['feature_names']
+        seletor.estatisticas_treino = artefato.get('estatisticas_treino')
+        seletor.treinado_em = artefato.get('treinado_em')
+        seletor.granularidade = artefato.get('granularidade')
+        seletor.caminho_modelo = caminho
+        seletor.is_trained = True
+        return seletor
 
     def selecionar_metodo(self, serie: pd.Series) -> Tuple[str, float]:
         """
@@ -299,25 +555,128 @@ class MLMethodSelector:
         """
         Seleciona métodos para todas as combinações SKU/Loja
 
+        Características extraídas em lote e uma única predição do modelo
+        para todas as séries.
+
         Args:
             df_historico: DataFrame com histórico de vendas
 
         Returns:
             DataFrame com colunas ['SKU', 'Loja', 'Metodo_Sugerido', 'Confianca']
         """
-        resultados = []
+        selecao = self.selecionar_metodos_lote(self.extrair_caracteristicas_lote(df_historico))
+        return selecao.reset_index()[['SKU', 'Loja', 'Metodo_Sugerido', 'Confianca']]
 
-        grupos = df_historico.groupby(['SKU', 'Loja'])
 
-        for (sku, loja), grupo in grupos:
-            serie = grupo.sort_values('Mes')['Vendas']
-            metodo, confianca = self.selecionar_metodo(serie)
+def _quantil_linear(ordenado: np.ndarray, n: np.ndarray, q: float) -> np.ndarray:
+    """
+    Quantil q de cada linha (valores válidos ordenados no início da linha),
+    com a mesma interpolação linear de np.percentile.
+    """
+    h = (n - 1) * q
+    abaixo = np.floor(h).astype(np.int64)
+    acima = np.minimum(abaixo + 1, n - 1)
+    linhas = np.arange(len(n))
+    a, b = ordenado[linhas, abaixo], ordenado[linhas, acima]
+    t = h - abaixo
+    diferenca = b - a
+    return np.where(t >= 0.5, b - diferenca * (1 - t), a + diferenca * t)
+
 
-            resultados.append({
-                'SKU': sku,
-                'Loja': loja,
-                'Metodo_Sugerido': metodo,
-                'Confianca': confianca
-            })
+def _exemplos_treino_tarefa(series: List[np.ndarray]) -> List[Tuple[List[float], str]]:
+    """Tarefa do treino paralelo: exemplos de um bloco de séries."""
+    seletor = MLMethodSelector()
+    return [seletor.exemplo_treino(pd.Series(serie)) for serie in series]
 
-        return pd.DataFrame(resultados)
+
+def montar_exemplos_treino(series: List[np.ndarray], workers: int = 0) -> List[Tuple[List[float], str]]:
+    """
+    Features e rótulos de treino de cada série, na ordem recebida
+
+    Args:
+        series: Séries de vendas (arrays ordenados por mês)
+        workers: Processos (0 = sequencial no processo atual)
+
+    Returns:
+        Lista de (features, melhor_metodo)
+    """
+    if workers <= 0 or len(series) <= SERIES_POR_TAREFA:
+        return _exemplos_treino_tarefa(series)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    blocos = [series[i:i + SERIES_POR_TAREFA] for i in range(0, len(series), SERIES_POR_TAREFA)]
+    exemplos = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for bloco in executor.map(_exemplos_treino_tarefa, blocos):
+            exemplos.extend(bloco)
+    return exemplos
+
+
+# =============================================================================
+# MODELO PERSISTIDO (carregado sob demanda nas requisições)
+# =============================================================================
+
+# Por granularidade: arquivos candidatos (caminho, mtime) vistos e seletor carregado
+_modelos_carregados: Dict[str, Dict] = {}
+_lock_modelo = threading.Lock()
+
+
+def diretorio_modelos() -> str:
+    """Pasta dos modelos salvos (ML_SELECTOR_DIR ou outputs/modelos)."""
+    return os.environ.get('ML_SELECTOR_DIR') or DIRETORIO_MODELOS_PADRAO
+
+
+def caminhos_modelos(granularidade: str, diretorio: Optional[str] = None) -> List[str]:
+    """Arquivos da versão atual do modelo na granularidade, do mais recente ao mais antigo."""
+    padrao = os.path.join(
+        diretorio or diretorio_modelos(), f"{PREFIXO_ARQUIVO}_v{VERSAO_MODELO}_{granularidade}_*.pkl"
+    )
+    return sorted(glob.glob(padrao), reverse=True)
+
+
+def caminho_modelo_atual(granularidade: str, diretorio: Optional[str] = None) -> Optional[str]:
+    """Arquivo mais recente da versão atual do modelo na granularidade (None se não houver)."""
+    caminhos = caminhos_modelos(granularidade, diretorio)
+    return caminhos[0] if caminhos else None
+
+
+def obter_seletor_treinado(granularidade: str, diretorio: Optional[str] = None) -> Optional[MLMethodSelector]:
+    """
+    Seletor treinado mais recente salvo em disco para a granularidade
+
+    Tenta os arquivos do mais recente ao mais antigo e usa o primeiro
+    compatível (versão, scikit-learn, features e granularidade). Carrega na
+    primeira chamada e reutiliza enquanto os arquivos não mudarem; um
+    retreino offline passa a valer na próxima requisição sem reiniciar a
+    aplicação.
+
+    Args:
+        granularidade: Granularidade das séries a prever ('semanal' ou 'mensal')
+        diretorio: Pasta dos modelos (default: ML_SELECTOR_DIR ou outputs/modelos)
+
+    Returns:
+        MLMethodSelector treinado, ou None se não há modelo salvo compatível
+    """
+    candidatos = []
+    for caminho in caminhos_modelos(granularidade, diretorio):
+        try:
+            candidatos.append((caminho, os.path.getmtime(caminho)))
+        except OSError:
+            continue  # Removido entre o glob e o stat
+    candidatos = tuple(candidatos)
+
+    with _lock_modelo:
+        cache = _modelos_carregados.get(granularidade)
+        if cache is not None and cache['candidatos'] == candidatos:
+            return cache['seletor']
+
+        seletor = None
+        for caminho, _ in candidatos:
+            try:
+                seletor = MLMethodSelector.carregar(caminho, granularidade)
+                break
+            except Exception as e:
+                print(f"[ML] AVISO: Modelo salvo ignorado ({caminho}): {e}")
+        _modelos_carregados[granularidade] = {'candidatos': candidatos, 'seletor': seletor}
+        return seletor
@@ -0,0 +1,228 @@
+"""
+Otimizacao de Parametros em Lote
+================================
+Escolha de alpha/beta/gamma dos modelos de suavizacao exponencial
+(SimpleExponentialSmoothing, HoltMethod, HoltWinters, CrostonMethod)
+por item, pelo erro quadratico um passo a frente dentro da amostra.
+
+A grade inteira e avaliada de uma vez: estado dos modelos em matrizes
+(serie x combinacao de parametros) e uma unica passada ao longo do eixo
+do tempo, sem laco Python por serie ou por combinacao. Assim a
+otimizacao de todos os itens de um chunk custa algumas passadas NumPy.
+
+O erro de cada instante t e o de um modelo ajustado em serie[:t]
+prevendo serie[t] (mesma recursao e mesmo corte em zero de fit/predict
+dos modelos), a partir do primeiro t em que o fit e possivel:
+    ses: t >= 1 | holt: t >= 2 | holt_winters: t >= 2*m | croston: t >= 1
+
+Uso:
+    params = otimizar_parametros_lote(series, 'holt')
+    modelos = [HoltMethod(**p).fit(s) for p, s in zip(params, series)]
+"""
+
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.backtesting_lote import _montar_matriz
+
+
+GRADE_ALPHA = tuple(round(a, 2) for a in np.arange(0.05, 1.0, 0.05))
+GRADES = {
+    'ses': {'alpha': GRADE_ALPHA},
+    'holt': {'alpha': GRADE_ALPHA, 'beta': (0.01, 0.05, 0.1, 0.15, 0.2, 0.3)},
+    'holt_winters': {
+        'alpha': (0.1, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9),
+        'beta': (0.01, 0.05, 0.1, 0.2),
+        'gamma': (0.05, 0.1, 0.2, 0.3, 0.5),
+    },
+    'croston': {'alpha': GRADE_ALPHA},
+}
+METODOS_OTIMIZACAO = tuple(GRADES)
+# Defaults dos construtores (core/forecasting_models.py)
+PARAMETROS_PADRAO = {
+    'ses': {'alpha': 0.3},
+    'holt': {'alpha': 0.3, 'beta': 0.1},
+    'holt_winters': {'alpha': 0.3, 'beta': 0.1, 'gamma': 0.1},
+    'croston': {'alpha': 0.2},
+}
+MIN_ERROS = 3            # Menos erros que isso: mantem os parametros default
+LIMITE_CELULAS = 2_000_000  # series x combinacoes por bloco (limita memoria)
+
+
+def _combinacoes(grade: Dict[str, Sequence[float]]) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """Nomes e matriz (P, k) com todas as combinacoes da grade."""
+    nomes = tuple(grade)
+    return nomes, np.array(list(product(*(grade[n] for n in nomes))), dtype=np.float64).reshape(-1, len(nomes))
+
+
+def _erros_ses(matriz, comprimentos, alpha):
+    nivel = np.repeat(matriz[:, :1], len(alpha), axis=1)
+    sse = np.zeros_like(nivel)
+    for t in range(1, matriz.shape[1]):
+        obs = matriz[:, t:t + 1]
+        ativo = (t < comprimentos)[:, None]
+        sse += np.where(ativo, (obs - np.maximum(0.0, nivel)) ** 2, 0.0)
+        nivel = np.where(ativo, alpha * obs + (1 - alpha) * nivel, nivel)
+    return sse, np.maximum(comprimentos - 1, 0)
+
+
+def _erros_holt(matriz, comprimentos, alpha, beta):
+    # fit inicializa com nivel=x0, tendencia=x1-x0 e suaviza a partir de x1
+    P = len(alpha)
+    nivel = np.repeat(matriz[:, :1], P, axis=1)
+    tendencia = np.repeat(matriz[:, 1:2] - matriz[:, :1], P, axis=1)
+    sse = np.zeros_like(nivel)
+    for t in range(1, matriz.shape[1]):
+        obs = matriz[:, t:t + 1]
+        ativo = (t < comprimentos)[:, None]
+        if t >= 2:
+            sse += np.where(ativo, (obs - np.maximum(0.0, nivel + tendencia)) ** 2, 0.0)
+        nivel_anterior = nivel
+        novo_nivel = alpha * obs + (1 - alpha) * (nivel + tendencia)
+        nivel = np.where(ativo, novo_nivel, nivel)
+        tendencia = np.where(ativo, beta * (nivel - nivel_anterior) + (1 - beta) * tendencia, tendencia)
+    return sse, np.maximum(comprimentos - 2, 0)
+
+
+def _erros_holt_winters(matriz, comprimentos, alpha, beta, gamma, m: int, seasonal: str):
+    P = len(alpha)
+    S = matriz.shape[0]
+    aditivo = seasonal == 'additive'
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nivel0 = matriz[:, :m].mean(axis=1, keepdims=True)
+        tendencia0 = (matriz[:, m:2 * m].mean(axis=1, keepdims=True) - nivel0) / m
+        sazonal0 = matriz[:, :m] - nivel0 if aditivo else matriz[:, :m] / nivel0
+
+        nivel = np.repeat(nivel0, P, axis=1)
+        tendencia = np.repeat(tendencia0, P, axis=1)
+        sazonais = np.repeat(sazonal0[:, :, None], P, axis=2)  # (S, m, P)
+        sse = np.zeros((S, P))
+        for t in range(m, matriz.shape[1]):
+            obs = matriz[:, t:t + 1]
+            ativo = (t < comprimentos)[:, None]
+            s = sazonais[:, t % m, :]
+            if t >= 2 * m:
+                previsao = nivel + tendencia + s if aditivo else (nivel + tendencia) * s
+                sse += np.where(ativo, (obs - np.maximum(0.0, previsao)) ** 2, 0.0)
+            nivel_anterior = nivel
+            if aditivo:
+                novo_nivel = alpha * (obs - s) + (1 - alpha) * (nivel + tendencia)
+            else:
+                novo_nivel = alpha * (obs / s) + (1 - alpha) * (nivel + tendencia)
+            nivel = np.where(ativo, novo_nivel, nivel)
+            tendencia = np.where(ativo, beta * (nivel - nivel_anterior) + (1 - beta) * tendencia, tendencia)
+            novo_s = gamma * (obs - nivel) + (1 - gamma) * s if aditivo else gamma * (obs / nivel) + (1 - gamma) * s
+            sazonais[:, t % m, :] = np.where(ativo, novo_s, s)
+    # Multiplicativo com nivel/sazonal zero: combinacao invalida
+    sse = np.where(np.isfinite(sse), sse, np.inf)
+    return sse, np.maximum(comprimentos - 2 * m, 0)
+
+
+def _erros_croston(matriz, comprimentos, alpha, variant: str):
+    S, P = matriz.shape[0], len(alpha)
+    fator = (1 - alpha / 2) if variant == 'sba' else np.ones_like(alpha)
+    demanda = np.zeros((S, P))
+    intervalo = np.ones((S, P))
+    iniciado = np.zeros((S, 1), dtype=bool)
+    periodos = np.zeros((S, 1))
+    sse = np.zeros((S, P))
+    for t in range(matriz.shape[1]):
+        obs = matriz[:, t:t + 1]
+        ativo = (t < comprimentos)[:, None]
+        if t >= 1:
+            previsao = np.where(iniciado, np.maximum(0.0, demanda / intervalo * fator), 0.0)
+            sse += np.where(ativo, (obs - previsao) ** 2, 0.0)
+        periodos = np.where(ativo, periodos + 1, periodos)
+        positivo = ativo & (obs > 0)
+        primeira = positivo & ~iniciado
+        suavizar = positivo & iniciado
+        demanda = np.where(primeira, obs, np.where(suavizar, alpha * obs + (1 - alpha) * demanda, demanda))
+        intervalo = np.where(primeira, periodos,
+                             np.where(suavizar, alpha * periodos + (1 - alpha) * intervalo, intervalo))
+        iniciado = iniciado | positivo
+        periodos = np.where(positivo, 0.0, periodos)
+    return sse, np.maximum(comprimentos - 1, 0)
+
+
+def avaliar_grade(series, metodo: str, comprimentos: Optional[Sequence[int]] = None,
+                  grade: Optional[Dict[str, Sequence[float]]] = None,
+                  season_period: int = 12, seasonal: str = 'additive',
+                  variant: str = 'original') -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Soma dos erros quadraticos um passo a frente de cada combinacao da grade.
+
+    Args:
+        series: Lista de series ou matriz 2-D (com `comprimentos`)
+        metodo: 'ses', 'holt', 'holt_winters' ou 'croston'
+        grade: {parametro: valores} (default: GRADES[metodo])
+        season_period / seasonal: Periodo e tipo do Holt-Winters
+        variant: Variante do Croston ('original', 'sba', 'tsb')
+
+    Returns:
+        (nomes, combinacoes (P, k), sse (S, P), n_erros (S,))
+    """
+    if metodo not in GRADES:
+        raise ValueError(f"Metodo '{metodo}' sem otimizacao. Disponiveis: {list(METODOS_OTIMIZACAO)}")
+    nomes, combinacoes = _combinacoes(grade or GRADES[metodo])
+    matriz, comprimentos = _montar_matriz(series, comprimentos)
+    S, P = len(comprimentos), len(combinacoes)
+    if S == 0:
+        return nomes, combinacoes, np.zeros((0, P)), np.zeros(0, dtype=np.int64)
+    if metodo in ('holt', 'holt_winters') and matriz.shape[1] < 2:
+        matriz = np.pad(matriz, ((0, 0), (0, 2 - matriz.shape[1])))
+    p = {nome: combinacoes[:, i] for i, nome in enumerate(nomes)}
+
+    sse = np.empty((S, P))
+    n_erros = np.zeros(S, dtype=np.int64)
+    bloco = max(1, LIMITE_CELULAS // max(P * (season_period if metodo == 'holt_winters' else 1), 1))
+    for ini in range(0, S, bloco):
+        fatia = slice(ini, ini + bloco)
+        m_bloco, c_bloco = matriz[fatia], comprimentos[fatia]
+        if metodo == 'ses':
+            sse[fatia], n_erros[fatia] = _erros_ses(m_bloco, c_bloco, p['alpha'])
+        elif metodo == 'holt':
+            sse[fatia], n_erros[fatia] = _erros_holt(m_bloco, c_bloco, p['alpha'], p['beta'])
+        elif metodo == 'croston':
+            sse[fatia], n_erros[fatia] = _erros_croston(m_bloco, c_bloco, p['alpha'], variant)
+        else:
+            # Serie curta para o periodo: o fit do HoltWinters usa Holt(alpha, beta)
+            sazonal = c_bloco >= 2 * season_period
+            if sazonal.any() and matriz.shape[1] >= 2 * season_period:
+                sse_hw, n_hw = _erros_holt_winters(
+                    m_bloco[sazonal], c_bloco[sazonal], p['alpha'], p['beta'], p['gamma'],
+                    season_period, seasonal
+                )
+                sse[fatia][sazonal], n_erros[fatia][sazonal] = sse_hw, n_hw
+            if (~sazonal).any():
+                sse_h, n_h = _erros_holt(m_bloco[~sazonal], c_bloco[~sazonal], p['alpha'], p['beta'])
+                sse[fatia][~sazonal], n_erros[fatia][~sazonal] = sse_h, n_h
+    return nomes, combinacoes, sse, n_erros
+
+
+def otimizar_parametros_lote(series, metodo: str, comprimentos: Optional[Sequence[int]] = None,
+                             grade: Optional[Dict[str, Sequence[float]]] = None,
+                             padrao: Optional[Dict[str, float]] = None, **kwargs) -> List[Dict[str, float]]:
+    """
+    Parametros de menor erro um passo a frente para cada serie.
+
+    Args:
+        padrao: Parametros das series com menos de MIN_ERROS erros
+            (default: PARAMETROS_PADRAO[metodo])
+        **kwargs: season_period / seasonal / variant (ver avaliar_grade)
+
+    Returns:
+        Lista de dicts {parametro: valor}, pronta para o construtor do modelo
+    """
+    nomes, combinacoes, sse, n_erros = avaliar_grade(series, metodo, comprimentos, grade, **kwargs)
+    padrao = padrao or PARAMETROS_PADRAO[metodo]
+    resultado = []
+    # argmin devolve a primeira combinacao em empates (ordem da grade)
+    melhores = sse.argmin(axis=1) if sse.size else np.zeros(len(n_erros), dtype=np.int64)
+    for i, melhor in enumerate(melhores):
+        if n_erros[i] < MIN_ERROS or not np.isfinite(sse[i, melhor]):
+            resultado.append({nome: padrao[nome] for nome in nomes})
+        else:
+            resultado.append({nome: float(combinacoes[melhor, j]) for j, nome in enumerate(nomes)})
+    return resultado
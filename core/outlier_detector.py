@@ -126,6 +126,206 @@ class AutoOutlierDetector:
             'stats': outlier_stats
         }
 
+    def analyze_many(self, matrix, lengths: Optional[List[int]] = None) -> List[Dict]:
+        """
+        analyze_and_clean para muitas séries de uma vez (NumPy)
+
+        As séries são agrupadas por tamanho; cada grupo vira uma matriz
+        densa e características (CV, % zeros, assimetria, curtose), limites
+        IQR/Z-Score e tratamentos são calculados por linha em operações
+        vetorizadas. Só as decisões (textos de razão, escolha de tratamento)
+        ficam em Python, por série.
+
+        Args:
+            matrix: Lista de séries (tamanhos diferentes) ou matriz 2-D
+                    alinhada à esquerda
+            lengths: Comprimento de cada linha da matriz (opcional)
+
+        Returns:
+            Lista com o mesmo dicionário de analyze_and_clean para cada série
+        """
+        if lengths is not None:
+            matrix = np.asarray(matrix)
+            series = [matrix[i, :int(n)] for i, n in enumerate(lengths)]
+        else:
+            series = [np.array(s) for s in matrix]
+
+        results = [None] * len(series)
+        groups = {}
+        for i, s in enumerate(series):
+            groups.setdefault((len(s), s.dtype.str), []).append(i)
+
+        for (n, _), rows in groups.items():
+            if n == 0:
+                for i in rows:
+                    results[i] = AutoOutlierDetector().analyze_and_clean(series[i])
+                continue
+            block = np.vstack([series[i] for i in rows])
+            for i, result in zip(rows, self._analyze_block(block)):
+                results[i] = result
+
+        return results
+
+    def _analyze_block(self, block: np.ndarray) -> List[Dict]:
+        """analyze_and_clean de cada linha de uma matriz (séries de mesmo tamanho)"""
+        k, n = block.shape
+
+        # 1. CARACTERÍSTICAS (mesmas fórmulas de _analyze_characteristics, por linha)
+        mean = np.mean(block, axis=1)
+        std = np.std(block, axis=1)
+        median = np.median(block, axis=1)
+        positive = mean > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cv = np.where(positive, std / np.where(positive, mean, 1), 0)
+            relative_range = np.where(
+                positive, (np.max(block, axis=1) - np.min(block, axis=1)) / np.where(positive, mean, 1), 0
+            )
+        skewness = stats.skew(block, axis=1)
+        kurtosis = stats.kurtosis(block, axis=1)
+        zeros_pct = 100 * np.sum(block == 0, axis=1) / n
+        high_values = np.sum(block > (mean + 2 * std)[:, None], axis=1)
+        high_values_pct = 100 * high_values / n
+
+        characteristics = [{
+            'n': n,
+            'mean': float(mean[r]),
+            'std': float(std[r]),
+            'median': float(median[r]),
+            'cv': float(cv[r]),
+            'skewness': float(skewness[r]),
+            'kurtosis': float(kurtosis[r]),
+            'zeros_pct': float(zeros_pct[r]),
+            'relative_range': float(relative_range[r]),
+            'high_values_count': int(high_values[r]),
+            'high_values_pct': float(high_values_pct[r])
+        } for r in range(k)]
+
+        # 2-3. DECISÃO E MÉTODO (por série)
+        results = [None] * k
+        methods = {}
+        for r, chars in enumerate(characteristics):
+            should_detect, reason = self._should_detect_outliers(chars)
+            if not should_detect:
+                results[r] = {
+                    'cleaned_data': list(block[r]),
+                    'outliers_detected': [],
+                    'outliers_count': 0,
+                    'method_used': 'NONE',
+                    'treatment': 'NONE',
+                    'reason': reason,
+                    'confidence': 1.0,
+                    'original_values': [],
+                    'replaced_values': [],
+                    'characteristics': chars
+                }
+            else:
+                methods[r] = self._choose_detection_method(chars)
+
+        if not methods:
+            return results
+
+        # 4. DETECÇÃO VETORIZADA (mesmos limites de core.validation.detect_outliers)
+        mask = np.zeros(block.shape, dtype=bool)
+        outlier_stats = {}
+
+        iqr_rows = np.array([r for r, (m, _) in methods.items() if m == 'IQR'], dtype=int)
+        if len(iqr_rows):
+            sub = block[iqr_rows]
+            q1 = np.percentile(sub, 25, axis=1)
+            q3 = np.percentile(sub, 75, axis=1)
+            iqr = q3 - q1
+            lower_bound = q1 - 1.5 * iqr
+            upper_bound = q3 + 1.5 * iqr
+            mask[iqr_rows] = (sub < lower_bound[:, None]) | (sub > upper_bound[:, None])
+            for j, r in enumerate(iqr_rows):
+                outlier_stats[r] = {
+                    'method': 'IQR',
+                    'threshold': 1.5,
+                    'q1': q1[j],
+                    'q3': q3[j],
+                    'iqr': iqr[j],
+                    'lower_bound': lower_bound[j],
+                    'upper_bound': upper_bound[j],
+                    'outlier_count': int(mask[r].sum())
+                }
+
+        z_rows = np.array([r for r, (m, _) in methods.items() if m == 'ZSCORE'], dtype=int)
+        if len(z_rows):
+            sub = block[z_rows]
+            z_mean = np.mean(sub, axis=1)
+            z_std = np.std(sub, axis=1)
+            valid = z_std > 0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = np.abs((sub - z_mean[:, None]) / z_std[:, None])
+            mask[z_rows] = (z_scores > 3.0) & valid[:, None]
+            for j, r in enumerate(z_rows):
+                outlier_stats[r] = {
+                    'method': 'Z-Score',
+                    'threshold': 3.0,
+                    'mean': z_mean[j],
+                    'std': z_std[j],
+                    'outlier_count': int(mask[r].sum())
+                } if valid[j] else {}
+
+        # Mediana sem os outliers, para REPLACE_MEDIAN
+        with_outliers = np.array([r for r in methods if mask[r].any()], dtype=int)
+        medians = {}
+        if len(with_outliers):
+            sub = block[with_outliers].astype(float)
+            sub[mask[with_outliers]] = np.nan
+            with np.errstate(all='ignore'):
+                for r, value in zip(with_outliers, np.nanmedian(sub, axis=1)):
+                    medians[r] = value
+
+        # 5-8. TRATAMENTO, CONFIANÇA E RESULTADO (por série)
+        for r, (method, method_reason) in methods.items():
+            chars = characteristics[r]
+            outlier_indices = np.flatnonzero(mask[r]).tolist()
+
+            if len(outlier_indices) == 0:
+                results[r] = {
+                    'cleaned_data': list(block[r]),
+                    'outliers_detected': [],
+                    'outliers_count': 0,
+                    'method_used': method,
+                    'treatment': 'NONE',
+                    'reason': f"Método {method} não detectou outliers significativos",
+                    'confidence': 0.9,
+                    'original_values': [],
+                    'replaced_values': [],
+                    'characteristics': chars,
+                    'stats': outlier_stats[r]
+                }
+                continue
+
+            treatment, treatment_reason = self._choose_treatment(outlier_indices, chars)
+
+            data = block[r]
+            original_values = [float(v) for v in data[outlier_indices]]
+            replaced_values = []
+            if treatment == 'REMOVE':
+                cleaned = data[~mask[r]]
+            else:  # REPLACE_MEDIAN (único outro tratamento escolhido)
+                cleaned = data.copy()
+                cleaned[outlier_indices] = medians[r]
+                replaced_values = [float(medians[r])] * len(outlier_indices)
+
+            results[r] = {
+                'cleaned_data': list(cleaned),
+                'outliers_detected': outlier_indices,
+                'outliers_count': len(outlier_indices),
+                'method_used': method,
+                'treatment': treatment,
+                'reason': f"{method_reason}. {treatment_reason}",
+                'confidence': self._calculate_confidence(outlier_indices, chars, outlier_stats[r]),
+                'original_values': original_values,
+                'replaced_values': replaced_values,
+                'characteristics': chars,
+                'stats': outlier_stats[r]
+            }
+
+        return results
+
     def _analyze_characteristics(self) -> Dict:
         """Analisa características estatísticas da série"""
         data = self.data
@@ -255,14 +455,14 @@ class AutoOutlierDetector:
         if method == 'IQR':
             # IQR com threshold 1.5 (padrão estatístico)
             outlier_indices, stats_dict = detect_outliers(
-                list(self.data),
+                self.data,
                 method='iqr',
                 threshold=1.5
             )
         else:  # ZSCORE
             # Z-Score com threshold 3.0 (99.7% intervalo de confiança)
             outlier_indices, stats_dict = detect_outliers(
-                list(self.data),
+                self.data,
                 method='zscore',
                 threshold=3.0
             )
@@ -1450,9 +1450,6 @@ class PedidoFornecedorIntegrado:
             aplicar_limitador_cobertura=aplicar_limitador_cobertura
         )
 
-        # 10. Calcular valor do pedido (antes de calcular coberturas para usar CUE)
-        valor_pedido = pedido_info['quantidade_pedido'] * preco_custo
-
         # Calcular demanda média diária a partir da previsão do período
         # (usa a demanda do período dividida pelo número de dias)
         demanda_prevista_diaria = demanda_periodo / cobertura_dias if cobertura_dias > 0 else previsao_diaria
@@ -1485,6 +1482,66 @@ class PedidoFornecedorIntegrado:
             cobertura_pos_pedido = 999
 
         # 12. Montar resultado
+        return self._montar_resultado_item(
+            codigo=codigo,
+            cod_empresa=cod_empresa,
+            produto=produto,
+            estoque=estoque,
+            parametros=parametros,
+            preco_custo=preco_custo,
+            lead_time=lead_time,
+            lead_time_base=lead_time_base,
+            curva_abc=curva_abc,
+            cobertura_dias=cobertura_dias,
+            cobertura_info=cobertura_info,
+            es_info=es_info,
+            desvio_diario=desvio_diario,
+            pedido_info=pedido_info,
+            demanda_periodo_base=demanda_periodo_base,
+            demanda_periodo=demanda_periodo,
+            demanda_prevista_diaria=demanda_prevista_diaria,
+            cobertura_atual=cobertura_atual,
+            cobertura_pos_pedido=cobertura_pos_pedido,
+            fator_eventos=fator_eventos,
+            eventos_aplicados=eventos_aplicados,
+            previsao_semanal_info=previsao_semanal_info
+        )
+
+    def _montar_resultado_item(
+        self,
+        *,
+        codigo: int,
+        cod_empresa: int,
+        produto: Dict,
+        estoque: Dict,
+        parametros: Dict,
+        preco_custo: float,
+        lead_time: int,
+        lead_time_base: int,
+        curva_abc: str,
+        cobertura_dias: float,
+        cobertura_info: Dict,
+        es_info: Dict,
+        desvio_diario: float,
+        pedido_info: Dict,
+        demanda_periodo_base: float,
+        demanda_periodo: float,
+        demanda_prevista_diaria: float,
+        cobertura_atual: float,
+        cobertura_pos_pedido: float,
+        fator_eventos: float,
+        eventos_aplicados: List[Dict],
+        previsao_semanal_info: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Monta o dicionario de resultado de um item nao bloqueado.
+
+        Usado por processar_item e processar_itens_lote: um campo novo no
+        resultado entra aqui e vale para os dois caminhos.
+        """
+        # Valor do pedido usando CUE
+        valor_pedido = pedido_info['quantidade_pedido'] * preco_custo
+
         resultado = {
             # Identificação
             'codigo': codigo,
@@ -1590,6 +1647,210 @@ class PedidoFornecedorIntegrado:
 
         return resultado
 
+    def _fatores_eventos_lote(self, linhas: List[Dict]) -> List[Tuple[float, List[Dict]]]:
+        """
+        Fator de eventos de cada linha (mesmo calculo do passo 8.1 de processar_item).
+
+        Os periodos de eventos sao lidos uma vez; so as linhas cuja janela
+        de cobertura cruza algum evento consultam o EventManager dia a dia.
+        As demais tem fator 1.0 sem consulta (o mesmo valor que o calculo
+        por item obteria).
+        """
+        sem_evento = (1.0, [])
+        fatores = [sem_evento] * len(linhas)
+        event_manager = self.obter_event_manager()
+        if event_manager is None or not linhas:
+            return fatores
+
+        data_base = datetime.now().date()
+        janelas = []
+        for linha in linhas:
+            data_entrega = data_base + timedelta(days=linha['lead_time'])
+            janelas.append((data_entrega, data_entrega + timedelta(days=linha['cobertura_dias'])))
+
+        try:
+            periodos = event_manager.buscar_periodos_eventos(
+                min(inicio for inicio, _ in janelas), max(fim for _, fim in janelas)
+            )
+        except Exception:
+            return fatores
+
+        for i, (linha, (inicio, fim)) in enumerate(zip(linhas, janelas)):
+            inicio_iso, fim_iso = inicio.isoformat(), fim.isoformat()
+            if not any(p_inicio <= fim_iso and p_fim >= inicio_iso for p_inicio, p_fim in periodos):
+                continue
+            try:
+                produto = linha['produto']
+                resultado_eventos = event_manager.calcular_fator_eventos(
+                    codigo=linha['codigo'],
+                    cod_empresa=linha['cod_empresa'],
+                    cod_fornecedor=produto.get('codigo_fornecedor'),
+                    linha1=produto.get('linha1'),
+                    linha3=produto.get('linha3'),
+                    data_inicio=inicio,
+                    data_fim=fim
+                )
+                fatores[i] = (resultado_eventos['fator_total'], resultado_eventos['eventos_aplicados'])
+            except Exception:
+                pass
+        return fatores
+
+    def processar_itens_lote(self, itens: List[Dict]) -> List[Dict]:
+        """
+        Processa varios itens (item x loja) de uma vez.
+
+        Cada elemento de `itens` tem os mesmos argumentos de processar_item
+        (codigo, cod_empresa, previsao_diaria, desvio_padrao e opcionais) e o
+        resultado, na mesma ordem, e igual ao de processar_item. Itens
+        bloqueados ou sem cadastro seguem pelo caminho por item; os demais
+        tem as consultas feitas nos caches pre-carregados e o calculo
+        numerico feito em arrays (core.pedido_lote).
+
+        Args:
+            itens: Lista de dicionarios com os argumentos de processar_item
+
+        Returns:
+            Lista de resultados (mesmo formato de processar_item)
+        """
+        from core.pedido_lote import calcular_pedidos_lote, normalizar_curva_abc, DECISOES_ARREDONDAMENTO
+
+        resultados = [None] * len(itens)
+        linhas = []
+        for i, item in enumerate(itens):
+            codigo, cod_empresa = item['codigo'], item['cod_empresa']
+            produto = None
+            if not self.verificar_situacao_compra(codigo, cod_empresa):
+                produto = self.buscar_dados_produto(codigo)
+            if not produto:
+                # Bloqueado ou sem cadastro: resultado especifico do caminho por item
+                resultados[i] = self.processar_item(**item)
+                continue
+
+            previsao_diaria = item['previsao_diaria']
+            lead_time_dias = item.get('lead_time_dias')
+            lead_time = lead_time_dias if lead_time_dias is not None else (produto.get('lead_time_dias') or 15)
+            ciclo_pedido = item.get('ciclo_pedido_dias')
+            curva_abc = produto.get('curva_abc') or 'B'
+            cobertura_dias = item.get('cobertura_dias')
+            if cobertura_dias is None:
+                cobertura_dias = lead_time + (ciclo_pedido if ciclo_pedido is not None else CICLO_PEDIDO_DIAS) \
+                    + SEGURANCA_BASE_ABC[normalizar_curva_abc(curva_abc)]
+                cobertura_automatica = True
+            else:
+                cobertura_automatica = False
+
+            parametros = self.buscar_parametros_gondola(codigo, cod_empresa)
+            embalagem = self.buscar_embalagem(codigo)
+            if embalagem['qtd_embalagem'] > 1:
+                parametros['multiplo_caixa'] = embalagem['qtd_embalagem']
+                parametros['unidade_compra'] = embalagem['unidade_compra']
+                parametros['unidade_menor'] = embalagem['unidade_menor']
+
+            dias_ate_entrega = item.get('dias_ate_entrega')
+            linhas.append({
+                'indice': i,
+                'codigo': codigo,
+                'cod_empresa': cod_empresa,
+                'produto': produto,
+                'estoque': self.buscar_estoque_atual(codigo, cod_empresa),
+                'parametros': parametros,
+                'preco_custo': self.buscar_preco_custo(codigo, cod_empresa),
+                'previsao_diaria': np.nan if previsao_diaria is None else previsao_diaria,
+                'desvio_padrao': np.nan if item['desvio_padrao'] is None else item['desvio_padrao'],
+                'lead_time': lead_time,
+                'ciclo_pedido': ciclo_pedido if ciclo_pedido is not None else CICLO_PEDIDO_DIAS,
+                'curva_abc': curva_abc,
+                'cobertura_dias': cobertura_dias,
+                'cobertura_automatica': cobertura_automatica,
+                'dias_consumo': dias_ate_entrega if dias_ate_entrega is not None else lead_time,
+                'aplicar_limitador_cobertura': item.get('aplicar_limitador_cobertura', False),
+            })
+
+        if not linhas:
+            return resultados
+
+        eventos = self._fatores_eventos_lote(linhas)
+        colunas = calcular_pedidos_lote(
+            previsao_diaria=[l['previsao_diaria'] for l in linhas],
+            desvio_padrao=[l['desvio_padrao'] for l in linhas],
+            estoque_disponivel=[l['estoque']['estoque_disponivel'] for l in linhas],
+            estoque_transito=[l['estoque']['estoque_transito'] for l in linhas],
+            estoque_efetivo=[l['estoque']['estoque_efetivo'] for l in linhas],
+            lead_time=[l['lead_time'] for l in linhas],
+            ciclo_pedido=[l['ciclo_pedido'] for l in linhas],
+            curva_abc=[normalizar_curva_abc(l['curva_abc']) for l in linhas],
+            multiplo_caixa=[l['parametros']['multiplo_caixa'] for l in linhas],
+            cobertura_dias=[np.nan if l['cobertura_automatica'] else l['cobertura_dias'] for l in linhas],
+            dias_consumo=[l['dias_consumo'] for l in linhas],
+            fator_eventos=[fator for fator, _ in eventos],
+            aplicar_limitador_cobertura=[l['aplicar_limitador_cobertura'] for l in linhas],
+        )
+        # Valores Python (round de float, como no caminho por item)
+        valores = {nome: coluna.tolist() for nome, coluna in colunas.items()}
+        fracoes = colunas['fracao_caixa']
+
+        for j, linha in enumerate(linhas):
+            produto, estoque, parametros = linha['produto'], linha['estoque'], linha['parametros']
+            lead_time, curva_abc = linha['lead_time'], linha['curva_abc']
+            fator_eventos, eventos_aplicados = eventos[j]
+
+            if linha['cobertura_automatica']:
+                cobertura_info = {
+                    'cobertura_total_dias': linha['cobertura_dias'],
+                    'lead_time_dias': lead_time,
+                    'ciclo_pedido_dias': linha['ciclo_pedido'],
+                    'seguranca_abc_dias': valores['seguranca_abc_dias'][j],
+                    'curva_abc': normalizar_curva_abc(curva_abc)
+                }
+            else:
+                cobertura_info = {
+                    'cobertura_total_dias': linha['cobertura_dias'],
+                    'lead_time_dias': lead_time,
+                    'ciclo_pedido_dias': linha['ciclo_pedido'],
+                    'seguranca_abc_dias': SEGURANCA_BASE_ABC.get(curva_abc.upper(), 4),
+                    'curva_abc': curva_abc
+                }
+
+            pedido_info = {
+                'quantidade_pedido': valores['quantidade_pedido'][j],
+                'numero_caixas': valores['numero_caixas'][j],
+                'deve_pedir': valores['deve_pedir'][j],
+                'ajustado_multiplo': valores['ajustado_multiplo'][j],
+                'arredondamento_decisao': DECISOES_ARREDONDAMENTO[valores['arredondamento_decisao'][j]],
+                'fracao_caixa': fracoes[j],
+                'arredondou_para_cima': valores['arredondou_para_cima'][j],
+                'cobertura_limitada': valores['cobertura_limitada'][j],
+                'quantidade_original_antes_limite': valores['quantidade_original_antes_limite'][j],
+            }
+            resultados[linha['indice']] = self._montar_resultado_item(
+                codigo=linha['codigo'],
+                cod_empresa=linha['cod_empresa'],
+                produto=produto,
+                estoque=estoque,
+                parametros=parametros,
+                preco_custo=linha['preco_custo'],
+                lead_time=lead_time,
+                lead_time_base=lead_time,
+                curva_abc=curva_abc,
+                cobertura_dias=linha['cobertura_dias'],
+                cobertura_info=cobertura_info,
+                es_info={
+                    'nivel_servico': valores['nivel_servico'][j],
+                    'estoque_seguranca': valores['estoque_seguranca'][j],
+                },
+                desvio_diario=valores['desvio_diario'][j],
+                pedido_info=pedido_info,
+                demanda_periodo_base=valores['demanda_periodo_base'][j],
+                demanda_periodo=valores['demanda_periodo'][j],
+                demanda_prevista_diaria=valores['demanda_prevista_diaria'][j],
+                cobertura_atual=valores['cobertura_atual'][j],
+                cobertura_pos_pedido=valores['cobertura_pos_pedido'][j],
+                fator_eventos=fator_eventos,
+                eventos_aplicados=eventos_aplicados
+            )
+
+        return resultados
+
 
 def agregar_por_fornecedor(resultados: List[Dict]) -> Dict:
     """
@@ -0,0 +1,234 @@
+"""
+Calculo de Pedido em Lote
+=========================
+Versao colunar (NumPy) da parte numerica de
+PedidoFornecedorIntegrado.processar_item: recebe arrays item x loja e
+calcula todas as quantidades de pedido de uma vez.
+
+Mesma sequencia do caminho escalar, elemento a elemento:
+
+1. Cobertura ABC (Lead Time + Ciclo + Seguranca_ABC) ou cobertura informada
+2. Estoque de seguranca: ES = Z x sigma_diario x sqrt(LT), Z pela curva ABC
+3. Demanda do periodo (x fator de eventos) e consumo ate a entrega (V37)
+4. Quantidade: necessidade bruta, arredondamento inteligente para multiplo
+   de caixa e limitador de cobertura pos-pedido (V26/V36)
+5. Demanda prevista diaria, cobertura atual e cobertura pos-pedido
+
+Os arredondamentos de exibicao (round) ficam com quem monta o resultado,
+exceto fracao_caixa (ver _arredondar_fracao).
+"""
+
+from typing import Dict
+
+import numpy as np
+from scipy import stats
+
+from core.pedido_fornecedor_integrado import (
+    SEGURANCA_BASE_ABC,
+    NIVEL_SERVICO_ABC,
+    PERCENTUAL_MINIMO_ARREDONDAMENTO,
+    MARGEM_SEGURANCA_PROXIMO_CICLO,
+    COBERTURA_MAXIMA_POS_PEDIDO,
+)
+
+
+# Decisoes de arredondamento (codigo no array -> texto do resultado)
+DECISOES_ARREDONDAMENTO = (
+    'nao_precisa_pedir',
+    'sem_multiplo',
+    'multiplo_exato',
+    'fracao_acima_minimo',
+    'risco_ruptura_proximo_ciclo',
+    'sem_risco_proximo_ciclo',
+    'fallback_conservador',
+    'minimo_1_caixa',
+)
+_DECISAO = {nome: i for i, nome in enumerate(DECISOES_ARREDONDAMENTO)}
+
+# Z-score por curva: uma chamada a norm.ppf por curva, nao por item
+_Z_SCORE_ABC = {curva: stats.norm.ppf(nivel) for curva, nivel in NIVEL_SERVICO_ABC.items()}
+
+
+def normalizar_curva_abc(curva_abc) -> str:
+    """Mesma normalizacao de calcular_cobertura_abc/calcular_estoque_seguranca."""
+    curva = curva_abc.upper() if curva_abc else 'B'
+    return curva if curva in SEGURANCA_BASE_ABC else 'B'
+
+
+def _arredondar_fracao(fracao: np.ndarray, com_multiplo: np.ndarray, es_positivo: np.ndarray) -> np.ndarray:
+    """
+    round(fracao, 3) como no caminho escalar: la a necessidade e np.float64
+    (np.round) quando o ES e positivo e float do Python (round correto)
+    quando o ES vira o inteiro 0 de max(0, es).
+    """
+    arredondada = np.where(com_multiplo, np.round(fracao, 3), 0.0)
+    for i in np.flatnonzero(com_multiplo & ~es_positivo):
+        arredondada[i] = round(float(fracao[i]), 3)
+    return arredondada
+
+
+def calcular_pedidos_lote(
+    previsao_diaria: np.ndarray,
+    desvio_padrao: np.ndarray,
+    estoque_disponivel: np.ndarray,
+    estoque_transito: np.ndarray,
+    estoque_efetivo: np.ndarray,
+    lead_time: np.ndarray,
+    ciclo_pedido: np.ndarray,
+    curva_abc: np.ndarray,
+    multiplo_caixa: np.ndarray,
+    cobertura_dias: np.ndarray,
+    dias_consumo: np.ndarray,
+    fator_eventos: np.ndarray = None,
+    aplicar_limitador_cobertura: np.ndarray = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula o pedido de cada linha (item x loja).
+
+    Args:
+        previsao_diaria: Demanda diaria prevista (NaN/inf -> 0.01)
+        desvio_padrao: Desvio padrao DIARIO (NaN para ausente)
+        estoque_disponivel, estoque_transito, estoque_efetivo: Posicao de estoque
+        lead_time: Lead time do fornecedor (dias, ja com transit time do CD)
+        ciclo_pedido: Ciclo de pedido (dias)
+        curva_abc: Curva ABC ja normalizada ('A', 'B' ou 'C')
+        multiplo_caixa: Unidades por caixa (inteiro >= 1)
+        cobertura_dias: Cobertura informada (NaN = automatica pela curva ABC)
+        dias_consumo: Dias de consumo ate a entrega (V37/V43)
+        fator_eventos: Fator multiplicativo de eventos (default 1.0)
+        aplicar_limitador_cobertura: V26 - limitar cobertura a 90 dias (itens TSB)
+
+    Returns:
+        Dicionario coluna -> array, uma posicao por linha
+    """
+    previsao = np.asarray(previsao_diaria, dtype=np.float64)
+    n = len(previsao)
+    previsao = np.where(np.isfinite(previsao), previsao, 0.01)
+    desvio = np.asarray(desvio_padrao, dtype=np.float64)
+    disponivel = np.asarray(estoque_disponivel, dtype=np.float64)
+    transito = np.asarray(estoque_transito, dtype=np.float64)
+    lead_time = np.asarray(lead_time, dtype=np.int64)
+    ciclo = np.asarray(ciclo_pedido, dtype=np.int64)
+    curva = np.asarray(curva_abc, dtype=object)
+    multiplo = np.asarray(multiplo_caixa, dtype=np.int64)
+    fator_eventos = np.ones(n) if fator_eventos is None else np.asarray(fator_eventos, dtype=np.float64)
+    limitador = (np.zeros(n, dtype=bool) if aplicar_limitador_cobertura is None
+                 else np.asarray(aplicar_limitador_cobertura, dtype=bool))
+
+    seguranca_abc = np.array([SEGURANCA_BASE_ABC[c] for c in curva], dtype=np.int64)
+    z_score = np.array([_Z_SCORE_ABC[c] for c in curva], dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 1. Cobertura
+        cobertura_informada = np.asarray(cobertura_dias, dtype=np.float64)
+        cobertura = np.where(np.isnan(cobertura_informada), lead_time + ciclo + seguranca_abc,
+                             cobertura_informada)
+
+        # 2. Estoque de seguranca (desvio ausente/invalido -> 30% da demanda)
+        desvio = np.where(np.isfinite(desvio), desvio, np.where(previsao > 0, previsao * 0.3, 0.1))
+        desvio_diario = np.where(desvio > 0, desvio, previsao * 0.3)
+        desvio_diario = np.where(np.isfinite(desvio_diario), desvio_diario, 0.1)
+        es_bruto = z_score * desvio_diario * np.sqrt(lead_time)
+        estoque_seguranca = np.round(np.where(es_bruto > 0, es_bruto, 0.0), 0)
+
+        # 3. Demanda do periodo e estoque projetado na entrega (V37)
+        demanda_periodo_base = previsao * cobertura
+        demanda_periodo = demanda_periodo_base * fator_eventos
+        projetado = disponivel - previsao * np.asarray(dias_consumo, dtype=np.float64)
+        disponivel_projetado = np.where(projetado > 0, projetado, 0.0)
+
+        # 4. Quantidade a pedir
+        efetivo_projetado = disponivel_projetado + transito
+        necessidade = demanda_periodo + estoque_seguranca - efetivo_projetado
+        precisa = necessidade > 0
+        com_multiplo = precisa & (multiplo > 1)
+        sem_multiplo = precisa & ~com_multiplo
+        necessidade_teto = np.ceil(necessidade)
+
+        multiplo_f = np.maximum(multiplo, 1).astype(np.float64)
+        caixas_cheias = np.floor_divide(necessidade, multiplo_f)
+        fracao = np.mod(necessidade, multiplo_f) / multiplo_f
+
+        # Arredondamento inteligente (apenas com multiplo > 1)
+        tem_info_risco = (previsao > 0) & ((lead_time > 0) | (ciclo > 0))
+        estoque_apos = efetivo_projetado + caixas_cheias * multiplo
+        demanda_proximo_ciclo = previsao * (lead_time + ciclo) * MARGEM_SEGURANCA_PROXIMO_CICLO
+        risco = estoque_apos < demanda_proximo_ciclo + estoque_seguranca
+        decisao = np.select(
+            [fracao == 0, fracao >= PERCENTUAL_MINIMO_ARREDONDAMENTO, ~tem_info_risco, risco],
+            [_DECISAO['multiplo_exato'], _DECISAO['fracao_acima_minimo'],
+             _DECISAO['fallback_conservador'], _DECISAO['risco_ruptura_proximo_ciclo']],
+            _DECISAO['sem_risco_proximo_ciclo'],
+        )
+        arredondar = (decisao != _DECISAO['multiplo_exato']) & (decisao != _DECISAO['sem_risco_proximo_ciclo'])
+        numero_caixas = caixas_cheias + arredondar
+        minimo_uma = com_multiplo & (numero_caixas == 0)
+        numero_caixas = np.where(minimo_uma, 1, numero_caixas)
+        decisao = np.where(minimo_uma, _DECISAO['minimo_1_caixa'], decisao)
+
+        quantidade = np.select([com_multiplo, sem_multiplo], [numero_caixas * multiplo, necessidade_teto], 0)
+        quantidade = quantidade.astype(np.int64)
+        numero_caixas = np.where(com_multiplo, numero_caixas, quantidade).astype(np.int64)
+        decisao = np.select([com_multiplo, sem_multiplo], [decisao, _DECISAO['sem_multiplo']],
+                            _DECISAO['nao_precisa_pedir'])
+        ajustado = com_multiplo & (quantidade != necessidade_teto)
+        quantidade_original = quantidade.copy()
+
+        # V26: Limitador de cobertura pos-pedido (itens TSB)
+        limitar = (limitador & precisa & (previsao > 0) & (quantidade > 0)
+                   & ((efetivo_projetado + quantidade) / previsao > COBERTURA_MAXIMA_POS_PEDIDO))
+        qtd_maxima = COBERTURA_MAXIMA_POS_PEDIDO * previsao - efetivo_projetado
+        qtd_maxima = np.where(qtd_maxima > 0, qtd_maxima, 0.0)
+        cobertura_atual_dias = efetivo_projetado / previsao
+        # V36: ruptura (estoque fisico = 0) sempre permite 1 unidade/caixa
+        em_ruptura = disponivel_projetado == 0
+        maxima_unidades = np.floor(qtd_maxima)
+        sem_minimo = (cobertura_atual_dias >= COBERTURA_MAXIMA_POS_PEDIDO) & ~em_ruptura
+        limitada_sem_multiplo = np.where((maxima_unidades == 0) & sem_minimo, 0,
+                                         np.maximum(1, maxima_unidades))
+        pode_minimo = (cobertura_atual_dias < COBERTURA_MAXIMA_POS_PEDIDO) | em_ruptura
+        limitada_multiplo = np.floor_divide(qtd_maxima, multiplo_f) * multiplo
+        limitada_multiplo = np.where((limitada_multiplo == 0) & pode_minimo, multiplo, limitada_multiplo)
+        quantidade = np.where(limitar, np.where(com_multiplo, limitada_multiplo, limitada_sem_multiplo),
+                              quantidade).astype(np.int64)
+        numero_caixas = np.where(limitar & com_multiplo, quantidade // np.maximum(multiplo, 1),
+                                 np.where(limitar, quantidade, numero_caixas))
+        ajustado = ajustado | (limitar & com_multiplo)
+
+        # 5. Demanda diaria prevista e coberturas
+        demanda_prevista_diaria = np.where(cobertura > 0, demanda_periodo / cobertura, previsao)
+        demanda_prevista_diaria = np.where(np.isfinite(demanda_prevista_diaria), demanda_prevista_diaria,
+                                           np.where(previsao > 0, previsao, 0.01))
+        cobertura_atual = np.where(demanda_prevista_diaria > 0,
+                                   np.asarray(estoque_efetivo, dtype=np.float64) / demanda_prevista_diaria, 999)
+        cobertura_atual = np.where(np.isfinite(cobertura_atual), cobertura_atual, 999)
+        cobertura_pos_pedido = np.where(
+            demanda_prevista_diaria > 0,
+            (disponivel_projetado + transito + quantidade) / demanda_prevista_diaria, 999
+        )
+        cobertura_pos_pedido = np.where(np.isfinite(cobertura_pos_pedido), cobertura_pos_pedido, 999)
+
+    return {
+        'cobertura_dias': cobertura,
+        'seguranca_abc_dias': seguranca_abc,
+        'nivel_servico': np.array([NIVEL_SERVICO_ABC[c] for c in curva], dtype=np.float64),
+        'z_score': z_score,
+        'desvio_diario': desvio_diario,
+        'estoque_seguranca': estoque_seguranca,
+        'demanda_periodo_base': demanda_periodo_base,
+        'demanda_periodo': demanda_periodo,
+        'estoque_disponivel_projetado': disponivel_projetado,
+        'necessidade_bruta': necessidade,
+        'quantidade_pedido': quantidade,
+        'numero_caixas': numero_caixas,
+        'quantidade_original_antes_limite': np.where(precisa, quantidade_original, 0),
+        'deve_pedir': quantidade > 0,
+        'ajustado_multiplo': ajustado,
+        'arredondamento_decisao': decisao,
+        'fracao_caixa': _arredondar_fracao(fracao, com_multiplo, es_bruto > 0),
+        'arredondou_para_cima': com_multiplo & arredondar,
+        'cobertura_limitada': limitar,
+        'demanda_prevista_diaria': demanda_prevista_diaria,
+        'cobertura_atual': cobertura_atual,
+        'cobertura_pos_pedido': cobertura_pos_pedido,
+    }
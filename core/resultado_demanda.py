@@ -0,0 +1,244 @@
+"""
+Resultados Compactos de Demanda
+===============================
+Objetos com __slots__ para o que o pipeline de previsao guarda por item
+ate a gravacao em lote (cronjob de demanda), no lugar dos dicionarios
+de metadata:
+
+- ResultadoDemanda: demanda/desvio e os campos usados no calculo; o
+  diagnostico completo (ranking de metodos, validacoes...) fica
+  serializado e so vira dicionario quando alguem pede
+- ResumoHistorico: metadata do historico de um item (meta_hist), com
+  vendas_por_data guardado em arrays e materializado sob demanda
+- RegistroDemanda: linha de demanda_pre_calculada (mensal ou semanal)
+
+Os tres aceitam leitura como dicionario (obj['campo'], obj.get('campo'),
+'campo' in obj) e como_dict() devolve o mesmo dicionario de antes
+(serializacao para a API). Comparacao com dict compara como_dict().
+"""
+
+import pickle
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+class _Compacto:
+    """
+    Base dos objetos compactos: campos em slots e bitmask dos campos
+    presentes (campo ausente continua ausente em como_dict()).
+    """
+
+    __slots__ = ('_presentes',)
+    _CAMPOS: Tuple[str, ...] = ()
+    _EXTRAS: Tuple[str, ...] = ()  # Slots sempre preenchidos fora de _CAMPOS
+    _INDICE: Dict[str, int] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._INDICE = {campo: i for i, campo in enumerate(cls._CAMPOS)}
+
+    def _preencher(self, valores: Dict) -> Dict:
+        """Copia os campos conhecidos de `valores`; devolve os demais."""
+        presentes = 0
+        extras = {}
+        for chave, valor in valores.items():
+            i = self._INDICE.get(chave)
+            if i is None:
+                extras[chave] = valor
+                continue
+            setattr(self, chave, valor)
+            presentes |= 1 << i
+        self._presentes = presentes
+        return extras
+
+    def _campos_presentes(self) -> Iterator[str]:
+        return (campo for i, campo in enumerate(self._CAMPOS) if self._presentes >> i & 1)
+
+    # Estado como tuplas (sem os nomes dos campos): pickle menor no retorno
+    # dos chunks calculados em processos
+    def __getstate__(self):
+        return (self._presentes,
+                tuple(getattr(self, campo) for campo in self._campos_presentes()),
+                tuple(getattr(self, extra) for extra in self._EXTRAS))
+
+    def __setstate__(self, estado):
+        self._presentes, valores, extras = estado
+        for campo, valor in zip(self._campos_presentes(), valores):
+            setattr(self, campo, valor)
+        for extra, valor in zip(self._EXTRAS, extras):
+            setattr(self, extra, valor)
+
+    def _tem(self, chave: str) -> bool:
+        i = self._INDICE.get(chave)
+        return i is not None and bool(self._presentes >> i & 1)
+
+    def keys(self) -> Iterator[str]:
+        return self._campos_presentes()
+
+    def __getitem__(self, chave: str) -> Any:
+        if not self._tem(chave):
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __contains__(self, chave: str) -> bool:
+        try:
+            self[chave]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, chave: str, padrao: Any = None) -> Any:
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def como_dict(self) -> Dict:
+        return {chave: getattr(self, chave) for chave in self.keys()}
+
+    def __eq__(self, outro):
+        if isinstance(outro, (dict, _Compacto)):
+            return self.como_dict() == (outro if isinstance(outro, dict) else outro.como_dict())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.como_dict()!r})'
+
+
+class RegistroDemanda(_Compacto):
+    """
+    Registro de demanda_pre_calculada (mensal ou semanal V55).
+    Campos de granularidade semanal (semana, tipo_granularidade,
+    data_inicio_semana) so existem nos registros semanais.
+    """
+
+    _CAMPOS = (
+        'cod_produto', 'cnpj_fornecedor', 'cod_empresa', 'ano', 'mes',
+        'semana', 'tipo_granularidade', 'data_inicio_semana',
+        'demanda_prevista', 'demanda_diaria_base', 'desvio_padrao',
+        'fator_sazonal', 'fator_tendencia_yoy', 'classificacao_tendencia',
+        'valor_ano_anterior', 'variacao_vs_aa', 'limitador_aplicado',
+        'metodo_usado', 'categoria_serie', 'dias_historico', 'total_vendido_historico',
+        'taxa_disponibilidade', 'dias_ruptura', 'demanda_censurada_corrigida',
+    )
+    __slots__ = _CAMPOS
+
+    def __init__(self, valores: Dict):
+        extras = self._preencher(valores)
+        if extras:
+            raise ValueError(f"Campos desconhecidos em RegistroDemanda: {sorted(extras)}")
+
+
+class ResultadoDemanda(_Compacto):
+    """
+    Resultado de DemandCalculator (demanda_total, desvio_total, metadata).
+
+    Os campos de metadata usados pelo calculo ficam em slots; o restante
+    da metadata (diagnostico) e guardado serializado e comprimido, ou
+    descartado com diagnostico=False.
+
+    Uso:
+        resultado = ResultadoDemanda.de_calculo(
+            *DemandCalculator.calcular_demanda_diaria_unificada(serie)
+        )
+        resultado.demanda_diaria_base
+        resultado.diagnostico      # dict completo (materializado na hora)
+        resultado.como_dict()      # metadata original (API)
+    """
+
+    _CAMPOS = ('metodo_usado', 'categoria_serie', 'confianca',
+               'demanda_diaria_base', 'desvio_diario_base')
+    _EXTRAS = ('demanda_total', 'desvio_total', '_diagnostico')
+    __slots__ = _CAMPOS + _EXTRAS
+
+    def __init__(self, demanda_total: float, desvio_total: float,
+                 metadata: Optional[Dict] = None, diagnostico: bool = True):
+        self.demanda_total = demanda_total
+        self.desvio_total = desvio_total
+        metadata = metadata or {}
+        self._preencher(metadata)
+        # Guarda a metadata inteira (ordem das chaves preservada)
+        self._diagnostico = (
+            zlib.compress(pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL))
+            if diagnostico and metadata else None
+        )
+
+    @classmethod
+    def de_calculo(cls, demanda_total: float, desvio_total: float, metadata: Dict,
+                   diagnostico: bool = True) -> 'ResultadoDemanda':
+        """Empacota o retorno (demanda, desvio, metadata) do DemandCalculator."""
+        return cls(demanda_total, desvio_total, metadata, diagnostico=diagnostico)
+
+    @property
+    def tem_diagnostico(self) -> bool:
+        return self._diagnostico is not None
+
+    @property
+    def diagnostico(self) -> Optional[Dict]:
+        """Metadata completa (nova copia a cada acesso) ou None se descartada."""
+        if self._diagnostico is None:
+            return None
+        return pickle.loads(zlib.decompress(self._diagnostico))
+
+    def __getitem__(self, chave: str) -> Any:
+        if self._tem(chave):
+            return getattr(self, chave)
+        if self._diagnostico is not None:
+            return self.diagnostico[chave]
+        raise KeyError(chave)
+
+    def como_dict(self) -> Dict:
+        """Metadata completa se o diagnostico foi guardado, senao so os campos principais."""
+        if self._diagnostico is not None:
+            return self.diagnostico
+        return super().como_dict()
+
+    def como_tupla(self) -> Tuple[float, float, Dict]:
+        """Mesmo formato de retorno do DemandCalculator."""
+        return self.demanda_total, self.desvio_total, self.como_dict()
+
+
+class ResumoHistorico(_Compacto):
+    """
+    Metadata do historico de um item (meta_hist de buscar_historico_item
+    e do preload por dicionario). vendas_por_data ({data: qtd}) e guardado
+    como arrays de datas e quantidades e so volta a ser dicionario quando
+    lido (correcao de censura V51).
+    """
+
+    _CAMPOS = ('dias_historico', 'dias_com_venda', 'total_vendido',
+               'vendas_por_mes', 'vendas_por_loja')
+    _EXTRAS = ('_datas', '_vendas')
+    __slots__ = _CAMPOS + _EXTRAS
+
+    def __init__(self, valores: Dict):
+        extras = self._preencher(valores)
+        vendas_por_data = extras.pop('vendas_por_data', None)
+        if extras:
+            raise ValueError(f"Campos desconhecidos em ResumoHistorico: {sorted(extras)}")
+        if vendas_por_data is None:
+            self._datas = self._vendas = None
+        else:
+            self._datas = np.array(list(vendas_por_data.keys()), dtype='datetime64[D]')
+            self._vendas = np.fromiter(vendas_por_data.values(), dtype=np.float64, count=len(vendas_por_data))
+
+    @property
+    def vendas_por_data(self) -> Optional[Dict]:
+        """{data: qtd} materializado a partir dos arrays (None se nao carregado)."""
+        if self._datas is None:
+            return None
+        return dict(zip(self._datas.tolist(), self._vendas.tolist()))
+
+    def keys(self) -> Iterator[str]:
+        yield from super().keys()
+        if self._datas is not None:
+            yield 'vendas_por_data'
+
+    def __getitem__(self, chave: str) -> Any:
+        if chave == 'vendas_por_data' and self._datas is not None:
+            return self.vendas_por_data
+        return super().__getitem__(chave)
@@ -7,6 +7,13 @@ Analisa séries temporais para detectar:
 3. QUÃO forte é o padrão sazonal
 
 Usa decomposição sazonal + testes estatísticos.
+
+Triagem: antes da decomposição, todos os períodos candidatos recebem um
+score rápido em NumPy (fração da variância da série, sem tendência linear,
+explicada pelo perfil médio do período - a energia do periodograma nos
+harmônicos de 1/período). Só os melhores candidatos da triagem passam
+pela decomposição + ANOVA. detect_seasonality_batch faz a triagem de
+muitas séries em uma única operação vetorizada.
 """
 
 import numpy as np
@@ -17,6 +24,121 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
+# Períodos sazonais candidatos e tamanho mínimo da série para cada um
+# (pelo menos 2 ciclos completos)
+CANDIDATE_MIN_LENGTH = {2: 4, 4: 8, 6: 12, 7: 14, 12: 24, 14: 28}
+
+# Triagem: quantos candidatos (melhor score) vão para a decomposição completa
+SCREENING_TOP_CANDIDATES = 2
+
+# Divisores de um candidato selecionado com score >= esta fração do dele
+# também são avaliados (detect() prefere o período fundamental)
+SCREENING_DIVISOR_RATIO = 0.8
+
+
+def _screening_scores(matrix: np.ndarray, lengths: np.ndarray) -> Dict[int, np.ndarray]:
+    """
+    Score de triagem de cada período candidato para cada linha da matriz
+
+    Para cada série (valores alinhados à esquerda, lengths[i] válidos):
+    remove a tendência linear (mínimos quadrados), calcula o perfil médio
+    por posição no período e retorna Var(perfil) / (Var(perfil) + Var(resto)).
+
+    Returns:
+        {periodo: array (n_series,)} - NaN onde o período não é candidato
+    """
+    n_series, width = matrix.shape
+    t = np.arange(width, dtype=float)
+    mask = t[None, :] < lengths[:, None]
+    n = lengths.astype(float)
+
+    # Tendência linear por linha (fórmulas fechadas de mínimos quadrados)
+    x = np.where(mask, matrix, 0.0)
+    tm = np.where(mask, t[None, :], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = tm.sum(axis=1) / n
+        x_mean = x.sum(axis=1) / n
+        s_tt = (np.where(mask, (t[None, :] - t_mean[:, None]) ** 2, 0.0)).sum(axis=1)
+        s_tx = (np.where(mask, (t[None, :] - t_mean[:, None]) * (x - x_mean[:, None]), 0.0)).sum(axis=1)
+        slope = np.where(s_tt > 0, s_tx / np.where(s_tt > 0, s_tt, 1.0), 0.0)
+    intercept = x_mean - slope * t_mean
+    y = np.where(mask, x - intercept[:, None] - slope[:, None] * t[None, :], 0.0)
+    y_sq_mean = (y ** 2).sum(axis=1) / np.maximum(n, 1)
+
+    scores = {}
+    for period, min_length in CANDIDATE_MIN_LENGTH.items():
+        cols = -(-width // period) * period
+        y_pad = np.zeros((n_series, cols))
+        y_pad[:, :width] = y
+        m_pad = np.zeros((n_series, cols))
+        m_pad[:, :width] = mask
+
+        sums = y_pad.reshape(n_series, -1, period).sum(axis=1)
+        counts = m_pad.reshape(n_series, -1, period).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            profile = means - means.mean(axis=1, keepdims=True)
+
+            # Momentos de seas[t] = profile[t % period] e de y - seas
+            seas_mean = (counts * profile).sum(axis=1) / n
+            seas_sq_mean = (counts * profile ** 2).sum(axis=1) / n
+            cross_mean = (profile * sums).sum(axis=1) / n
+            var_seasonal = seas_sq_mean - seas_mean ** 2
+            resid_mean = -seas_mean  # média de y é zero (resíduo da regressão)
+            var_resid = y_sq_mean - 2 * cross_mean + seas_sq_mean - resid_mean ** 2
+            total = var_seasonal + var_resid
+            score = np.where(total > 0, var_seasonal / np.where(total > 0, total, 1.0), 0.0)
+
+        scores[period] = np.where(lengths >= min_length, np.clip(score, 0.0, 1.0), np.nan)
+
+    return scores
+
+
+def _select_screened(scores: Dict[int, float], candidates: List[int]) -> List[int]:
+    """
+    Escolhe os candidatos que vão para a decomposição completa: os
+    SCREENING_TOP_CANDIDATES melhores e seus divisores com score próximo
+    """
+    ranked = sorted(candidates, key=lambda p: (-scores[p], p))
+    selected = set(ranked[:SCREENING_TOP_CANDIDATES])
+    for period in list(selected):
+        for divisor in candidates:
+            if divisor < period and period % divisor == 0 and \
+                    scores[divisor] >= SCREENING_DIVISOR_RATIO * scores[period]:
+                selected.add(divisor)
+    return sorted(selected)
+
+
+def screen_seasonality_batch(series) -> List[List[int]]:
+    """
+    Triagem vetorizada de muitas séries de uma vez
+
+    Args:
+        series: Lista de séries (tamanhos diferentes)
+
+    Returns:
+        Para cada série, os períodos que passariam pela decomposição
+        completa em SeasonalityDetector.detect() (lista vazia se nenhum)
+    """
+    series = [np.asarray(s, dtype=float) for s in series]
+    if not series:
+        return []
+
+    lengths = np.array([len(s) for s in series])
+    matrix = np.zeros((len(series), max(1, lengths.max())))
+    for i, s in enumerate(series):
+        matrix[i, :len(s)] = s
+
+    scores = _screening_scores(matrix, lengths)
+
+    screened = []
+    for i, n in enumerate(lengths):
+        candidates = [p for p, min_length in CANDIDATE_MIN_LENGTH.items() if n >= min_length]
+        row = {p: float(scores[p][i]) for p in candidates}
+        screened.append(_select_screened(row, candidates) if candidates else [])
+    return screened
+
+
 class SeasonalityDetector:
     """
     Detector automático de sazonalidade
@@ -32,10 +154,15 @@ class SeasonalityDetector:
         self.data = np.array(data)
         self.n = len(self.data)
 
-    def detect(self) -> Dict:
+    def detect(self, candidate_periods: Optional[List[int]] = None) -> Dict:
         """
         Detecta sazonalidade automaticamente
 
+        Args:
+            candidate_periods: Períodos a decompor. Default: resultado da
+                triagem (screen_candidates). Passar _get_candidate_periods()
+                força a busca completa.
+
         Returns:
             Dicionário com:
             - has_seasonality: bool
@@ -59,9 +186,9 @@ class SeasonalityDetector:
             }
 
         # Testar múltiplos períodos sazonais
-        candidate_periods = self._get_candidate_periods()
+        all_candidates = self._get_candidate_periods()
 
-        if len(candidate_periods) == 0:
+        if len(all_candidates) == 0:
             return {
                 'has_seasonality': False,
                 'seasonal_period': None,
@@ -72,6 +199,10 @@ class SeasonalityDetector:
                 'seasonal_indices': None
             }
 
+        # Triagem rápida: só os melhores candidatos vão para a decomposição
+        if candidate_periods is None:
+            candidate_periods = self.screen_candidates()
+
         # Avaliar cada período candidato
         results = []
         for period in candidate_periods:
@@ -180,6 +311,19 @@ class SeasonalityDetector:
             'seasonal_indices': best['seasonal_indices'] if has_seasonality else None
         }
 
+    def screen_candidates(self) -> List[int]:
+        """
+        Triagem NumPy dos períodos candidatos (ver _screening_scores)
+
+        Returns:
+            Períodos que merecem a decomposição completa
+        """
+        candidates = self._get_candidate_periods()
+        if not candidates:
+            return []
+        scores = _screening_scores(self.data.astype(float)[None, :], np.array([self.n]))
+        return _select_screened({p: float(scores[p][0]) for p in candidates}, candidates)
+
     def _get_candidate_periods(self) -> List[int]:
         """
         Retorna períodos sazonais candidatos baseado no tamanho da série
@@ -187,31 +331,12 @@ class SeasonalityDetector:
         Returns:
             Lista de períodos para testar
         """
-        candidates = []
-
-        # Semanal (7)
-        if self.n >= 14:  # Pelo menos 2 semanas
-            candidates.append(7)
-
-        # Trimestral (4)
-        if self.n >= 8:  # Pelo menos 2 trimestres
-            candidates.append(4)
-
-        # Mensal (12)
-        if self.n >= 24:  # Pelo menos 2 anos
-            candidates.append(12)
-
-        # Quinzenal (14)
-        if self.n >= 28:
-            candidates.append(14)
-
-        # Semestral (6)
-        if self.n >= 12:
-            candidates.append(6)
-
-        # Bimestral (2)
-        if self.n >= 4:
-            candidates.append(2)
+        # Semanal (7), trimestral (4), mensal (12), quinzenal (14), semestral (6)
+        # e bimestral (2), cada um com pelo menos 2 ciclos completos
+        candidates = [
+            period for period, min_length in CANDIDATE_MIN_LENGTH.items()
+            if self.n >= min_length
+        ]
 
         # Ordenar do menor para o maior (preferir períodos curtos)
         candidates.sort()
@@ -426,3 +551,24 @@ def detect_seasonality(data: List[float]) -> Dict:
     """
     detector = SeasonalityDetector(data)
     return detector.detect()
+
+
+def detect_seasonality_batch(series) -> List[Dict]:
+    """
+    Detecção de sazonalidade para muitas séries
+
+    A triagem de todas as séries é feita em uma chamada vetorizada;
+    a decomposição roda só para os candidatos selecionados de cada série.
+
+    Args:
+        series: Lista de séries temporais
+
+    Returns:
+        Lista com o resultado de detect() de cada série
+    """
+    series = list(series)
+    screened = screen_seasonality_batch(series)
+    return [
+        SeasonalityDetector(s).detect(candidate_periods=candidates)
+        for s, candidates in zip(series, screened)
+    ]
@@ -583,9 +583,14 @@ class ValidadorConformidade:
         4. Serie com queda -> fator < 1.0
         5. Fator limitado entre 0.7 e 1.4
         6. Classificacao correta (forte_crescimento, crescimento, estavel, queda, forte_queda)
+        7. Calculo em lote (usado pelo cronjob) igual ao calculo item a item
+
+        As series de teste sao calculadas juntas por calcular_fator_tendencia_yoy_lote.
         """
         try:
-            from core.demand_calculator import calcular_fator_tendencia_yoy
+            from core.demand_calculator import (
+                calcular_fator_tendencia_yoy, calcular_fator_tendencia_yoy_lote, vendas_mensais_longo
+            )
 
             resultados_testes = []
             todos_corretos = True
@@ -605,7 +610,41 @@ class ValidadorConformidade:
                 (2025, 1): 169, (2025, 2): 186, (2025, 3): 178,
             }
 
-            fator1, class1, meta1 = calcular_fator_tendencia_yoy(vendas_crescimento)
+            # Demais series de teste (calculadas junto com esta, em lote)
+            vendas_estavel = {
+                (2023, 1): 100, (2023, 2): 102, (2023, 3): 98,
+                (2023, 4): 101, (2023, 5): 99, (2023, 6): 100,
+                (2023, 7): 102, (2023, 8): 98, (2023, 9): 101,
+                (2023, 10): 99, (2023, 11): 100, (2023, 12): 102,
+                (2024, 1): 101, (2024, 2): 103, (2024, 3): 99,
+                (2024, 4): 102, (2024, 5): 100, (2024, 6): 101,
+                (2024, 7): 103, (2024, 8): 99, (2024, 9): 102,
+                (2024, 10): 100, (2024, 11): 101, (2024, 12): 103,
+                (2025, 1): 102, (2025, 2): 104, (2025, 3): 100,
+            }
+            vendas_queda = {
+                (2023, 1): 200, (2023, 2): 195, (2023, 3): 190,
+                (2023, 4): 185, (2023, 5): 180, (2023, 6): 175,
+                (2023, 7): 170, (2023, 8): 165, (2023, 9): 160,
+                (2023, 10): 155, (2023, 11): 150, (2023, 12): 145,
+                (2024, 1): 150, (2024, 2): 146, (2024, 3): 143,
+                (2024, 4): 139, (2024, 5): 135, (2024, 6): 131,
+                (2024, 7): 128, (2024, 8): 124, (2024, 9): 120,
+                (2024, 10): 116, (2024, 11): 113, (2024, 12): 109,
+                (2025, 1): 113, (2025, 2): 110, (2025, 3): 107,
+            }
+            vendas_curta = {
+                (2025, 1): 100, (2025, 2): 110, (2025, 3): 105,
+            }
+            series_teste = {
+                'crescimento': vendas_crescimento,
+                'estavel': vendas_estavel,
+                'queda': vendas_queda,
+                'curta': vendas_curta,
+            }
+            lote = calcular_fator_tendencia_yoy_lote(vendas_mensais_longo(series_teste))
+
+            fator1, class1 = lote.loc['crescimento', 'fator_tendencia'], lote.loc['crescimento', 'classificacao']
 
             teste1_ok = fator1 > 1.0 and class1 in ['crescimento', 'forte_crescimento']
             resultados_testes.append({
@@ -622,19 +661,7 @@ class ValidadorConformidade:
             # =================================================================
             # Teste 2: Serie estavel (variacao < 5%)
             # =================================================================
-            vendas_estavel = {
-                (2023, 1): 100, (2023, 2): 102, (2023, 3): 98,
-                (2023, 4): 101, (2023, 5): 99, (2023, 6): 100,
-                (2023, 7): 102, (2023, 8): 98, (2023, 9): 101,
-                (2023, 10): 99, (2023, 11): 100, (2023, 12): 102,
-                (2024, 1): 101, (2024, 2): 103, (2024, 3): 99,
-                (2024, 4): 102, (2024, 5): 100, (2024, 6): 101,
-                (2024, 7): 103, (2024, 8): 99, (2024, 9): 102,
-                (2024, 10): 100, (2024, 11): 101, (2024, 12): 103,
-                (2025, 1): 102, (2025, 2): 104, (2025, 3): 100,
-            }
-
-            fator2, class2, meta2 = calcular_fator_tendencia_yoy(vendas_estavel)
+            fator2, class2 = lote.loc['estavel', 'fator_tendencia'], lote.loc['estavel', 'classificacao']
 
             # Para serie estavel, fator deve estar entre 0.95 e 1.05
             teste2_ok = 0.95 <= fator2 <= 1.05 and class2 == 'estavel'
@@ -652,19 +679,7 @@ class ValidadorConformidade:
             # =================================================================
             # Teste 3: Serie com queda (-25% ao ano)
             # =================================================================
-            vendas_queda = {
-                (2023, 1): 200, (2023, 2): 195, (2023, 3): 190,
-                (2023, 4): 185, (2023, 5): 180, (2023, 6): 175,
-                (2023, 7): 170, (2023, 8): 165, (2023, 9): 160,
-                (2023, 10): 155, (2023, 11): 150, (2023, 12): 145,
-                (2024, 1): 150, (2024, 2): 146, (2024, 3): 143,
-                (2024, 4): 139, (2024, 5): 135, (2024, 6): 131,
-                (2024, 7): 128, (2024, 8): 124, (2024, 9): 120,
-                (2024, 10): 116, (2024, 11): 113, (2024, 12): 109,
-                (2025, 1): 113, (2025, 2): 110, (2025, 3): 107,
-            }
-
-            fator3, class3, meta3 = calcular_fator_tendencia_yoy(vendas_queda)
+            fator3, class3 = lote.loc['queda', 'fator_tendencia'], lote.loc['queda', 'classificacao']
 
             teste3_ok = fator3 < 1.0 and class3 in ['queda', 'forte_queda']
             resultados_testes.append({
@@ -696,11 +711,7 @@ class ValidadorConformidade:
             # =================================================================
             # Teste 5: Dados insuficientes (menos de 2 anos)
             # =================================================================
-            vendas_curta = {
-                (2025, 1): 100, (2025, 2): 110, (2025, 3): 105,
-            }
-
-            fator5, class5, meta5 = calcular_fator_tendencia_yoy(vendas_curta)
+            fator5, class5 = lote.loc['curta', 'fator_tendencia'], lote.loc['curta', 'classificacao']
 
             teste5_ok = fator5 == 1.0 and class5 == 'dados_insuficientes'
             resultados_testes.append({
@@ -714,6 +725,25 @@ class ValidadorConformidade:
             if not teste5_ok:
                 todos_corretos = False
 
+            # =================================================================
+            # Teste 6: Lote igual ao calculo item a item
+            # =================================================================
+            divergentes = []
+            for nome_serie, vendas in series_teste.items():
+                fator_item, class_item, _ = calcular_fator_tendencia_yoy(vendas)
+                if abs(fator_item - lote.loc[nome_serie, 'fator_tendencia']) > 1e-9 or \
+                        class_item != lote.loc[nome_serie, 'classificacao']:
+                    divergentes.append(nome_serie)
+
+            teste6_ok = not divergentes
+            resultados_testes.append({
+                'teste': 'Lote igual ao item a item',
+                'divergentes': divergentes,
+                'correto': teste6_ok
+            })
+            if not teste6_ok:
+                todos_corretos = False
+
             # =================================================================
             # Resultado final
             # =================================================================
@@ -0,0 +1,36 @@
+-- =====================================================
+-- Migration V57: Fingerprint de entrada por item (calculo incremental)
+-- =====================================================
+-- Objetivo: Registrar, por item, a "impressao digital" dos dados usados
+-- no ultimo calculo de demanda. No modo incremental o cronjob recalcula
+-- apenas itens cujo fingerprint mudou ou cujo horizonte de previsao virou.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS demanda_calculo_fingerprint (
+    cod_produto VARCHAR(20) NOT NULL,
+    cnpj_fornecedor VARCHAR(20) NOT NULL,
+
+    -- Entradas usadas no calculo
+    ultima_venda DATE,                              -- Ultima data com venda na janela
+    checksum_historico VARCHAR(32),                 -- md5 das vendas diarias por loja
+    checksum_estoque VARCHAR(32),                   -- md5 do estoque diario por loja (janela de vendas)
+    bloqueio TEXT,                                  -- Lojas com EN/FL (lista ordenada)
+
+    -- Horizonte de previsao no momento do calculo (mes e semana ISO de partida)
+    horizonte VARCHAR(20),                          -- Ex: '2026-10/2026-W42'
+
+    execucao_id INTEGER,                            -- demanda_calculo_execucao.id
+    atualizado_em TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (cod_produto, cnpj_fornecedor)
+);
+
+CREATE INDEX IF NOT EXISTS idx_demanda_fingerprint_fornecedor
+ON demanda_calculo_fingerprint(cnpj_fornecedor);
+
+COMMENT ON TABLE demanda_calculo_fingerprint IS
+    'Fingerprint das entradas do ultimo calculo por item. Usado pelo modo incremental do cronjob.';
+
+-- =====================================================
+-- FIM DA MIGRATION V57
+-- =====================================================
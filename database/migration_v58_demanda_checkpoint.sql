@@ -0,0 +1,32 @@
+-- =====================================================
+-- Migration V58: Checkpoint por fornecedor no calculo de demanda
+-- =====================================================
+-- Objetivo: Persistir o progresso do cronjob durante a execucao.
+-- Cada fornecedor gravado com sucesso gera um checkpoint; o modo
+-- --resume <execucao_id> pula os fornecedores ja concluidos e a API
+-- de status expoe o percentual concluido.
+-- =====================================================
+
+-- 1. Progresso na tabela de controle de execucoes
+ALTER TABLE demanda_calculo_execucao
+    ADD COLUMN IF NOT EXISTS total_fornecedores_previstos INTEGER,
+    ADD COLUMN IF NOT EXISTS fornecedores_concluidos INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS retomadas INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP;
+
+-- 2. Checkpoint por fornecedor
+CREATE TABLE IF NOT EXISTS demanda_calculo_checkpoint (
+    execucao_id INTEGER NOT NULL REFERENCES demanda_calculo_execucao(id) ON DELETE CASCADE,
+    cnpj_fornecedor VARCHAR(20) NOT NULL,
+    resultado JSONB,                                -- Resumo do fornecedor (itens, registros, erros)
+    concluido_em TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (execucao_id, cnpj_fornecedor)
+);
+
+COMMENT ON TABLE demanda_calculo_checkpoint IS
+    'Fornecedores ja gravados por execucao do cronjob. Usado pelo modo --resume.';
+
+-- =====================================================
+-- FIM DA MIGRATION V58
+-- =====================================================
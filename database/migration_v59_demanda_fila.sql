@@ -0,0 +1,39 @@
+-- =====================================================
+-- Migration V59: Fila de trabalho do calculo de demanda (multi-no)
+-- =====================================================
+-- Objetivo: Permitir que varias maquinas processem a mesma execucao
+-- do cronjob. O coordenador (executar_calculo --modo fila) enfileira
+-- os fornecedores; cada worker reserva o proximo com
+-- SELECT ... FOR UPDATE SKIP LOCKED, renova heartbeat_em enquanto
+-- calcula e marca a tarefa como concluida. Tarefas com heartbeat
+-- vencido voltam para 'pendente' (worker morto ou sem rede).
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS demanda_calculo_fila (
+    execucao_id INTEGER NOT NULL REFERENCES demanda_calculo_execucao(id) ON DELETE CASCADE,
+    cnpj_fornecedor VARCHAR(20) NOT NULL,
+    nome_fornecedor VARCHAR(200),
+
+    -- pendente | em_execucao | concluido | erro
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    worker VARCHAR(100),                            -- host:pid do worker que reservou
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    heartbeat_em TIMESTAMP,
+    iniciado_em TIMESTAMP,
+    concluido_em TIMESTAMP,
+
+    resultado JSONB,                                -- Resumo do fornecedor (mesmo formato do checkpoint)
+    erro TEXT,
+
+    PRIMARY KEY (execucao_id, cnpj_fornecedor)
+);
+
+CREATE INDEX IF NOT EXISTS idx_demanda_fila_status
+ON demanda_calculo_fila(execucao_id, status);
+
+COMMENT ON TABLE demanda_calculo_fila IS
+    'Fila de fornecedores por execucao do cronjob no modo fila (varios workers/maquinas).';
+
+-- =====================================================
+-- FIM DA MIGRATION V59
+-- =====================================================
@@ -0,0 +1,14 @@
+-- =====================================================
+-- Migration V60: Custo estimado por tarefa da fila de demanda
+-- =====================================================
+-- Objetivo: Os workers do modo fila reservam primeiro os fornecedores
+-- de maior custo (tempo medido na execucao anterior ou volume de
+-- historico), para que um fornecedor grande nao fique para o fim.
+-- =====================================================
+
+ALTER TABLE demanda_calculo_fila
+    ADD COLUMN IF NOT EXISTS custo_estimado_ms DOUBLE PRECISION;
+
+-- =====================================================
+-- FIM DA MIGRATION V60
+-- =====================================================
@@ -22,6 +22,25 @@ Modos de Operacao:
 4. VERIFICAR STATUS:
    python jobs/calcular_demanda_diaria.py --status
 
+5. MOTOR MULTIPROCESSO (chunks de itens em varios processos):
+   python jobs/calcular_demanda_diaria.py --manual --modo processos --workers 16 --chunk 200
+
+6. INCREMENTAL x COMPLETO:
+   O cronjob diario recalcula apenas itens cujo fingerprint de entrada mudou
+   (ultima venda, checksum de vendas/estoque, bloqueio EN/FL) ou cujo horizonte
+   de previsao virou (novo mes ou nova semana ISO). Execucoes manuais sao completas.
+   python jobs/calcular_demanda_diaria.py --manual --incremental
+   python jobs/calcular_demanda_diaria.py --manual --full
+
+7. RETOMAR EXECUCAO INTERROMPIDA (checkpoint por fornecedor):
+   python jobs/calcular_demanda_diaria.py --resume 1234
+
+8. FILA MULTI-NO (varias maquinas no mesmo PostgreSQL, migration V59):
+   Coordenador (enfileira, sobe workers locais e consolida as metricas):
+   python jobs/calcular_demanda_diaria.py --manual --full --modo fila --workers 4
+   Worker em outra maquina (reserva fornecedores da execucao 1234):
+   python jobs/calcular_demanda_diaria.py --worker 1234
+
 Autor: Valter Lino / Claude (Anthropic)
 Data: Fevereiro 2026
 """
@@ -30,12 +49,18 @@ import sys
 import os
 import argparse
 import logging
+import io
 import json
+import math
 import time
+import socket
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import numpy as np
+
 # Adicionar pasta raiz ao path
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, ROOT_DIR)
@@ -55,15 +80,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from jobs.configuracao_jobs import CONFIGURACAO_BANCO
-from core.demand_calculator import DemandCalculator, calcular_fator_tendencia_yoy
+from core.demand_calculator import (
+    DemandCalculator, calcular_fator_tendencia_yoy, soma_sequencial,
+    vendas_mensais_longo, calcular_fatores_sazonais_lote, calcular_fator_tendencia_yoy_lote
+)
+from core.cache_previsao import get_cache_previsao
+from core.historico_denso import HistoricoDenso, ItemHistorico, LOJA_CD_MINIMA
+from core.resultado_demanda import RegistroDemanda, ResultadoDemanda, ResumoHistorico
+from jobs.perfil_execucao import PerfilEtapas
 
 
 # Configuracoes
 MESES_PREVISAO = 12  # Calcular 12 meses a frente
 SEMANAS_PREVISAO = 54  # Calcular ~13 meses de previsao semanal
 MAX_WORKERS = 4      # Threads para paralelizacao
+MODO_EXECUCAO_PADRAO = 'threads'  # 'threads' (por fornecedor), 'processos' (por chunk de itens) ou 'fila'
+MODOS_EXECUCAO = ('threads', 'processos', 'fila')
+MAX_WORKERS_PROCESSOS = os.cpu_count() or MAX_WORKERS  # Processos no modo 'processos'
+TAMANHO_CHUNK_ITENS = 200  # Itens por chunk enviado a cada processo
+CHUNKS_EM_VOO_POR_WORKER = 2  # Limite de chunks pendentes por processo (memoria)
+MAX_PARTES_FORNECEDOR = None  # Partes max. de um fornecedor grande no modo 'threads' (default: workers)
+INTERVALO_HEARTBEAT_FILA = 30  # Segundos entre heartbeats do worker no modo 'fila'
+TIMEOUT_HEARTBEAT_FILA = 300   # Sem heartbeat por este tempo, a tarefa volta para a fila
+MAX_TENTATIVAS_FILA = 3        # Tarefa que estourou o timeout este numero de vezes vira 'erro'
+INTERVALO_POLL_FILA = 5        # Segundos entre consultas quando nao ha tarefa pendente
+TIPOS_INCREMENTAIS = ('cronjob_diario',)  # Tipos de execucao incrementais por padrao
 DIAS_HISTORICO = 730 # 2 anos de historico
 LIMITER_CORRECAO = 3.0  # V53: correcao maxima de 3x a media dos dias com estoque
+DIAS_SERIE_LONGA = 90  # Acima disso a serie diaria passa pelo backtesting universal (V48)
 FREQUENCIA_MINIMA_CORRECAO = 0.25  # V53b: so corrige loja se vendeu em >=25% dos dias com estoque
 
 
@@ -112,6 +156,92 @@ def atualizar_execucao(conn, execucao_id: int, status: str, metricas: Dict):
     conn.commit()
 
 
+def buscar_execucao(conn, execucao_id: int) -> Optional[Dict]:
+    """Busca o registro de uma execucao (usado pelo modo --resume)."""
+    from psycopg2.extras import RealDictCursor
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("""
+        SELECT id, tipo, status, cnpj_fornecedor_filtro
+        FROM demanda_calculo_execucao
+        WHERE id = %s
+    """, (execucao_id,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def buscar_checkpoints(conn, execucao_id: int) -> Dict[str, Dict]:
+    """
+    Retorna os fornecedores ja concluidos de uma execucao.
+
+    Returns:
+        Dict {cnpj_fornecedor: resultado do fornecedor}
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT cnpj_fornecedor, resultado
+        FROM demanda_calculo_checkpoint
+        WHERE execucao_id = %s
+    """, (execucao_id,))
+    return {cnpj: (resultado or {}) for cnpj, resultado in cursor.fetchall()}
+
+
+def registrar_progresso_execucao(conn, execucao_id: int, total_fornecedores: int, retomada: bool = False):
+    """
+    Registra o total de fornecedores previstos (base do percentual concluido).
+    Na retomada, volta o status para 'iniciado' e conta a tentativa.
+    Sem a migration V58 o calculo segue sem checkpoint.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE demanda_calculo_execucao
+            SET total_fornecedores_previstos = %s,
+                fornecedores_concluidos = (
+                    SELECT COUNT(*) FROM demanda_calculo_checkpoint WHERE execucao_id = %s
+                ),
+                status = CASE WHEN %s THEN 'iniciado' ELSE status END,
+                retomadas = COALESCE(retomadas, 0) + CASE WHEN %s THEN 1 ELSE 0 END,
+                atualizado_em = NOW()
+            WHERE id = %s
+        """, (total_fornecedores, execucao_id, retomada, retomada, execucao_id))
+        conn.commit()
+    except Exception as e:
+        logger.warning(f"Checkpoint indisponivel (migration V58?): {e}")
+        conn.rollback()
+
+
+def registrar_checkpoint_fornecedor(conn, execucao_id: int, resultado: Dict):
+    """
+    Grava o checkpoint de um fornecedor concluido e atualiza o progresso da execucao.
+    Chamado apos o commit da demanda do fornecedor: se o job morrer depois daqui,
+    --resume nao refaz este fornecedor. Fornecedores com erro nao geram checkpoint.
+    """
+    if not execucao_id or not resultado.get('sucesso'):
+        return
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO demanda_calculo_checkpoint (execucao_id, cnpj_fornecedor, resultado)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (execucao_id, cnpj_fornecedor) DO UPDATE SET
+                resultado = EXCLUDED.resultado,
+                concluido_em = NOW()
+        """, (execucao_id, resultado['cnpj'], json.dumps(resultado, default=str)))
+        cursor.execute("""
+            UPDATE demanda_calculo_execucao
+            SET fornecedores_concluidos = (
+                    SELECT COUNT(*) FROM demanda_calculo_checkpoint WHERE execucao_id = %s
+                ),
+                atualizado_em = NOW()
+            WHERE id = %s
+        """, (execucao_id, execucao_id))
+        conn.commit()
+    except Exception as e:
+        logger.warning(f"  Erro gravando checkpoint de {resultado['cnpj']}: {e}")
+        conn.rollback()
+
+
 def buscar_fornecedores(conn, cnpj_filtro: str = None) -> List[Dict]:
     """
     Busca lista de fornecedores para processar.
@@ -144,6 +274,121 @@ def buscar_fornecedores(conn, cnpj_filtro: str = None) -> List[Dict]:
     return cursor.fetchall()
 
 
+def buscar_tempos_execucao_anterior(conn, tipo: str) -> Dict[str, float]:
+    """
+    Tempo medido por fornecedor (perfil, ms) na ultima execucao concluida,
+    preferindo uma execucao do mesmo tipo (incremental x completa).
+
+    Returns:
+        Dict {cnpj_fornecedor: tempo_total_ms}
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT detalhes->'perfil'->'fornecedores'
+        FROM demanda_calculo_execucao
+        WHERE status IN ('sucesso', 'parcial')
+          AND detalhes->'perfil' IS NOT NULL
+        ORDER BY (tipo = %s) DESC, id DESC
+        LIMIT 1
+    """, (tipo,))
+    row = cursor.fetchone()
+    fornecedores = (row[0] if row else None) or []
+    return {
+        f['cnpj']: float(f['tempo_total_ms'])
+        for f in fornecedores
+        if f.get('cnpj') and f.get('tempo_total_ms') is not None
+    }
+
+
+def buscar_volume_historico_fornecedores(conn, cnpjs: List[str]) -> Dict[str, int]:
+    """
+    Linhas de historico diario por fornecedor na janela de DIAS_HISTORICO
+    (itens x lojas x dias com venda): estimativa de custo sem execucao anterior.
+    """
+    if not cnpjs:
+        return {}
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.cnpj_fornecedor, COUNT(*)
+        FROM historico_vendas_diario h
+        JOIN cadastro_produtos_completo p ON h.codigo::text = p.cod_produto
+        WHERE p.cnpj_fornecedor = ANY(%s)
+          AND h.data >= CURRENT_DATE - INTERVAL '%s days'
+        GROUP BY p.cnpj_fornecedor
+    """, (list(cnpjs), DIAS_HISTORICO))
+    return {cnpj: int(linhas) for cnpj, linhas in cursor.fetchall()}
+
+
+def calcular_custos_fornecedores(fornecedores: List[Dict], tempos_anteriores: Dict[str, float],
+                                 volumes: Dict[str, int]) -> Dict[str, float]:
+    """
+    Custo estimado (ms) por fornecedor.
+
+    1. Tempo medido na execucao anterior, quando existe
+    2. Senao, linhas de historico x ms por linha calibrado nos fornecedores
+       que tem as duas medidas (sem calibracao, as linhas valem como custo relativo)
+
+    Returns:
+        Dict {cnpj_fornecedor: custo}
+    """
+    calibrados = [c for c in tempos_anteriores if volumes.get(c)]
+    ms_por_linha = 1.0
+    if calibrados:
+        ms_por_linha = sum(tempos_anteriores[c] for c in calibrados) / sum(volumes[c] for c in calibrados)
+
+    custos = {}
+    for f in fornecedores:
+        cnpj = f['cnpj_fornecedor']
+        if cnpj in tempos_anteriores:
+            custos[cnpj] = tempos_anteriores[cnpj]
+        else:
+            custos[cnpj] = volumes.get(cnpj, 0) * ms_por_linha
+    return custos
+
+
+def estimar_custos_fornecedores(conn, fornecedores: List[Dict], tipo: str) -> Dict[str, float]:
+    """
+    Estima o custo de cada fornecedor para o escalonamento (maiores primeiro).
+    O volume de historico so e consultado se algum fornecedor nao tem tempo anterior.
+    """
+    tempos = buscar_tempos_execucao_anterior(conn, tipo)
+    volumes = {}
+    if any(f['cnpj_fornecedor'] not in tempos for f in fornecedores):
+        volumes = buscar_volume_historico_fornecedores(conn, [f['cnpj_fornecedor'] for f in fornecedores])
+    return calcular_custos_fornecedores(fornecedores, tempos, volumes)
+
+
+def planejar_fornecedores(fornecedores: List[Dict], custos: Dict[str, float], workers: int,
+                          max_partes: int = None) -> List[Tuple[Dict, Optional[Tuple[int, int]]]]:
+    """
+    Ordena as tarefas do maior custo para o menor (LPT) e divide fornecedores
+    maiores que a cota de um worker (custo total / workers) em partes de itens
+    que rodam em paralelo. Evita que um fornecedor grande no fim da fila deixe
+    os demais workers ociosos.
+
+    Returns:
+        Lista de (fornecedor, parte) com parte = (indice, total_partes) ou None
+    """
+    if not custos:
+        return [(f, None) for f in fornecedores]
+
+    workers = max(1, workers)
+    max_partes = max_partes or workers
+    cota = sum(custos.get(f['cnpj_fornecedor'], 0) for f in fornecedores) / workers
+
+    tarefas = []
+    for f in fornecedores:
+        custo = custos.get(f['cnpj_fornecedor'], 0)
+        partes = min(max_partes, math.ceil(custo / cota)) if cota > 0 else 1
+        if partes <= 1:
+            tarefas.append((custo, f, None))
+        else:
+            tarefas.extend((custo / partes, f, (indice, partes)) for indice in range(partes))
+
+    tarefas.sort(key=lambda t: t[0], reverse=True)
+    return [(f, parte) for _, f, parte in tarefas]
+
+
 def buscar_itens_bloqueados(conn, cnpj_fornecedor: str) -> Dict[int, set]:
     """
     Busca itens com situacao EN (Em Negociacao) ou FL (Fora de Linha) por loja.
@@ -200,10 +445,11 @@ def buscar_itens_fornecedor(conn, cnpj_fornecedor: str) -> List[Dict]:
     return cursor.fetchall()
 
 
-def precarregar_historico_lote(conn, cod_produtos: List[int], cnpj_fornecedor: str) -> Dict[int, Tuple[List[float], Dict]]:
+def precarregar_historico_lote(conn, cod_produtos: List[int], cnpj_fornecedor: str) -> HistoricoDenso:
     """
     Pre-carrega historico de vendas de TODOS os itens de uma vez.
-    OTIMIZACAO: 1 query em vez de N queries.
+    OTIMIZACAO: 1 query em vez de N queries, resultado em arrays NumPy
+    (matriz item x dia + vendas por loja em CSR) em vez de dicts por data.
 
     Args:
         conn: Conexao com o banco
@@ -211,13 +457,17 @@ def precarregar_historico_lote(conn, cod_produtos: List[int], cnpj_fornecedor: s
         cnpj_fornecedor: CNPJ do fornecedor
 
     Returns:
-        Dict {cod_produto: (serie, metadata)}
+        HistoricoDenso com vendas consolidadas e por loja (V53)
     """
+    hoje = datetime.now().date()
+    data_ini = hoje - timedelta(days=DIAS_HISTORICO)
+    data_fim = hoje - timedelta(days=1)
+
     if not cod_produtos:
-        return {}
+        return HistoricoDenso.de_linhas_vendas([], [], data_ini, data_fim)
 
-    from psycopg2.extras import RealDictCursor
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    # Cursor de tuplas: evita um dict por linha em lotes de milhoes de linhas
+    cursor = conn.cursor()
 
     # V53: Query com cod_empresa para vendas por loja
     placeholders = ','.join(['%s'] * len(cod_produtos))
@@ -235,84 +485,25 @@ def precarregar_historico_lote(conn, cod_produtos: List[int], cnpj_fornecedor: s
         ORDER BY h.codigo, h.data
     """, cod_produtos)
 
-    # Agrupar por produto — consolidado + por loja
-    vendas_por_produto = {}       # {cod: {data: qtd_total}}
-    vendas_por_loja_produto = {}  # V53: {cod: {(data, cod_empresa): qtd}}
-    for row in cursor.fetchall():
-        cod = int(row['codigo'])
-        qtd = float(row['qtd_venda'])
-        data = row['data']
-        cod_emp = int(row['cod_empresa'])
-
-        # Consolidado (como antes)
-        if cod not in vendas_por_produto:
-            vendas_por_produto[cod] = {}
-        vendas_por_produto[cod][data] = vendas_por_produto[cod].get(data, 0) + qtd
-
-        # V53: Por loja
-        if cod not in vendas_por_loja_produto:
-            vendas_por_loja_produto[cod] = {}
-        vendas_por_loja_produto[cod][(data, cod_emp)] = qtd
-
-    # Processar cada produto
-    resultado = {}
-    for cod_produto in cod_produtos:
-        vendas_por_data = vendas_por_produto.get(cod_produto, {})
-
-        if vendas_por_data:
-            data_min = min(vendas_por_data.keys())
-            data_max = max(vendas_por_data.keys())
-            dias_total = (data_max - data_min).days + 1
-
-            serie = []
-            data_atual = data_min
-            while data_atual <= data_max:
-                serie.append(vendas_por_data.get(data_atual, 0))
-                data_atual += timedelta(days=1)
-
-            # Calcular vendas por mes
-            vendas_por_mes = {}
-            for data, qtd in vendas_por_data.items():
-                chave = (data.year, data.month)
-                vendas_por_mes[chave] = vendas_por_mes.get(chave, 0) + qtd
-
-            metadata = {
-                'dias_historico': dias_total,
-                'dias_com_venda': len(vendas_por_data),
-                'total_vendido': sum(vendas_por_data.values()),
-                'vendas_por_mes': vendas_por_mes,
-                'vendas_por_data': vendas_por_data,  # V51: consolidado
-                'vendas_por_loja': vendas_por_loja_produto.get(cod_produto, {})  # V53: por loja
-            }
-        else:
-            serie = []
-            metadata = {
-                'dias_historico': 0,
-                'dias_com_venda': 0,
-                'total_vendido': 0,
-                'vendas_por_mes': {},
-                'vendas_por_data': {},
-                'vendas_por_loja': {}  # V53
-            }
-
-        resultado[cod_produto] = (serie, metadata)
-
-    return resultado
+    historico = HistoricoDenso.de_linhas_vendas(cod_produtos, cursor.fetchall(), data_ini, data_fim)
+    cursor.close()
+    return historico
 
 
-def precarregar_estoque_diario_lote(conn, cod_produtos: List[int]) -> Dict[int, Dict]:
+def precarregar_estoque_diario_lote(conn, historico: HistoricoDenso) -> HistoricoDenso:
     """
-    V53: Pre-carrega estoque diario POR LOJA para cada item.
+    V53: Pre-carrega estoque diario POR LOJA para os itens do historico.
     Usado para detectar e corrigir demanda censurada por loja individual.
+    O estoque e anexado ao HistoricoDenso (mesmo indice de datas e de lojas).
 
     Returns:
-        Dict {cod_produto: {(data, cod_empresa): estoque_diario}}
+        O proprio historico, com estoque_loja preenchido
     """
+    cod_produtos = [int(c) for c in historico.cod_produtos]
     if not cod_produtos:
-        return {}
+        return historico
 
-    from psycopg2.extras import RealDictCursor
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
 
     placeholders = ','.join(['%s'] * len(cod_produtos))
     cursor.execute(f"""
@@ -328,16 +519,9 @@ def precarregar_estoque_diario_lote(conn, cod_produtos: List[int]) -> Dict[int,
         ORDER BY e.codigo, e.data
     """, cod_produtos)
 
-    resultado = {}
-    for row in cursor.fetchall():
-        cod = int(row['codigo'])
-        if cod not in resultado:
-            resultado[cod] = {}
-        chave = (row['data'], int(row['cod_empresa']))
-        resultado[cod][chave] = float(row['estoque_diario'])
-
+    historico.anexar_estoque(cursor.fetchall())
     cursor.close()
-    return resultado
+    return historico
 
 
 def _corrigir_loja(
@@ -688,10 +872,166 @@ def _corrigir_consolidado_fallback(
     return serie_corrigida, meta
 
 
-def buscar_historico_item(conn, cod_produto: int, cnpj_fornecedor: str) -> Tuple[List[float], Dict]:
+def _deslocar(matriz: np.ndarray, delta: int, preencher) -> np.ndarray:
+    """Retorna matriz[:, i + delta] alinhada em i (fora da janela = preencher)."""
+    resultado = np.full_like(matriz, preencher)
+    n = matriz.shape[1]
+    if delta > 0:
+        resultado[:, :max(n - delta, 0)] = matriz[:, delta:]
+    elif delta < 0:
+        resultado[:, -delta:] = matriz[:, :max(n + delta, 0)]
+    else:
+        resultado[:] = matriz
+    return resultado
+
+
+def _corrigir_lojas_matriz(vendas: np.ndarray, estoque: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    V53: Correcao de ruptura de TODAS as lojas de um item de uma vez, sobre
+    matrizes loja x dia alinhadas pela janela do item. Mesma logica de
+    _corrigir_loja (3 estrategias + limiter 3x + filtro de frequencia),
+    vetorizada por dia: cada estrategia e um deslocamento da matriz.
+
+    Args:
+        vendas: vendas diarias por loja (float64, L x n)
+        estoque: estoque diario por loja (float64, L x n; NaN = sem registro)
+
+    Returns:
+        (matriz_corrigida, meta_lojas) com contadores por loja (arrays de tamanho L)
+    """
+    verificado = ~np.isnan(estoque)
+    estoque_0 = np.where(verificado, estoque, 0.0)
+    com_estoque = verificado & (estoque_0 > 0)
+    ruptura = verificado & (vendas == 0) & (estoque_0 <= 0)
+    # Dia de referencia valido: tinha estoque e vendeu
+    referencia = com_estoque & (vendas > 0)
+
+    dias_verificados = verificado.sum(axis=1)
+    dias_com_estoque = com_estoque.sum(axis=1)
+    dias_referencia = referencia.sum(axis=1)
+    dias_ruptura = ruptura.sum(axis=1)
+
+    # V53b: Filtro de frequencia - nao corrigir itens intermitentes na loja
+    frequencia_venda = np.divide(
+        dias_referencia, dias_com_estoque,
+        out=np.zeros(len(vendas)), where=dias_com_estoque > 0
+    )
+    ativa = (dias_verificados > 0) & (frequencia_venda >= FREQUENCIA_MINIMA_CORRECAO)
+
+    meta_lojas = {
+        'dias_ruptura': np.where(ativa, dias_ruptura, 0),
+        'dias_corrigidos': np.zeros(len(vendas), dtype=np.int64),
+        'dias_verificados': dias_verificados,
+        'dias_com_estoque': dias_com_estoque,
+    }
+
+    corrigida = vendas.copy()
+    alvo = ruptura & ativa[:, None]
+    if not alvo.any():
+        return corrigida, meta_lojas
+
+    # Media (limiter 3x) e mediana por loja sobre os dias de referencia.
+    # Calculadas no vetor compacto de cada loja, como no calculo escalar.
+    limite_correcao = np.zeros(len(vendas))
+    mediana = np.zeros(len(vendas))
+    for k in np.flatnonzero(ativa & (dias_ruptura > 0)):
+        vendas_com_estoque = vendas[k][referencia[k]]
+        if len(vendas_com_estoque):
+            media = np.mean(vendas_com_estoque)
+            limite_correcao[k] = media * LIMITER_CORRECAO if media > 0 else 0
+            mediana[k] = float(np.median(vendas_com_estoque))
+
+    valor_ref = np.where(referencia, vendas, 0.0)
+
+    # 1. Mesmo dia da semana (+-1/2 semanas): primeiro deslocamento valido
+    valor_estimado = np.zeros_like(vendas)
+    for delta in (-14, 14, -7, 7):
+        ok = _deslocar(referencia, delta, False)
+        valor_estimado = np.where(ok, _deslocar(valor_ref, delta, 0.0), valor_estimado)
+
+    # 2. Media de dias adjacentes com estoque (ate 2 valores, na ordem -1, 1, -2, 2, -3, 3)
+    soma_adj = np.zeros_like(vendas)
+    qtd_adj = np.zeros(vendas.shape, dtype=np.int64)
+    for delta in (-1, 1, -2, 2, -3, 3):
+        pega = _deslocar(referencia, delta, False) & (qtd_adj < 2)
+        soma_adj = np.where(pega, soma_adj + _deslocar(valor_ref, delta, 0.0), soma_adj)
+        qtd_adj += pega
+    media_adj = np.divide(soma_adj, qtd_adj, out=np.zeros_like(vendas), where=qtd_adj > 0)
+    valor_estimado = np.where(valor_estimado == 0, media_adj, valor_estimado)
+
+    # 3. Mediana global dos dias com estoque e vendas positivas
+    valor_estimado = np.where(valor_estimado == 0, mediana[:, None], valor_estimado)
+
+    # Aplicar limiter de seguranca (max 3x media)
+    limite = limite_correcao[:, None]
+    valor_estimado = np.where((limite > 0) & (valor_estimado > limite), limite, valor_estimado)
+
+    aplicar = alvo & (valor_estimado > 0)
+    corrigida[aplicar] = valor_estimado[aplicar]
+    meta_lojas['dias_corrigidos'] = aplicar.sum(axis=1)
+
+    return corrigida, meta_lojas
+
+
+def corrigir_demanda_censurada_denso(item: ItemHistorico) -> Tuple[np.ndarray, Dict]:
+    """
+    V53: Corrige a serie de vendas POR LOJA a partir das matrizes loja x dia
+    do HistoricoDenso e reconsolida. Equivalente a corrigir_demanda_censurada(),
+    com todas as lojas corrigidas numa unica passada vetorizada.
+
+    Returns:
+        (serie_corrigida, metadata_censura)
+    """
+    meta = {
+        'dias_ruptura': 0,
+        'dias_corrigidos': 0,
+        'taxa_disponibilidade': 1.0,
+        'houve_correcao': False
+    }
+
+    # Lojas fisicas com estoque (excluir CDs >= 80)
+    fisicas = item.lojas_estoque < LOJA_CD_MINIMA
+    if len(item) == 0 or not fisicas.any():
+        return item.serie.copy(), meta
+
+    lojas = item.lojas_estoque[fisicas]
+    pos_vendas = np.searchsorted(item.lojas_vendas, lojas)
+    tem_venda = (pos_vendas < len(item.lojas_vendas))
+    tem_venda[tem_venda] = item.lojas_vendas[pos_vendas[tem_venda]] == lojas[tem_venda]
+
+    vendas = np.zeros((len(lojas), len(item)))
+    vendas[tem_venda] = item.vendas_loja[pos_vendas[tem_venda]]
+    corrigida, meta_lojas = _corrigir_lojas_matriz(vendas, item.estoque_loja[fisicas])
+
+    # Reconsolidar na ordem das lojas (mesma ordem de soma do calculo por dict)
+    serie_corrigida = np.zeros(len(item))
+    for linha in corrigida:
+        serie_corrigida += linha
+
+    # Somar vendas de lojas SEM dados de estoque (nao afetadas pela correcao)
+    for k in np.flatnonzero(~np.isin(item.lojas_vendas, lojas)):
+        serie_corrigida += item.vendas_loja[k]
+
+    total_dias_verificados = int(meta_lojas['dias_verificados'].sum())
+    total_dias_com_estoque = int(meta_lojas['dias_com_estoque'].sum())
+    total_dias_corrigidos = int(meta_lojas['dias_corrigidos'].sum())
+    taxa_disponibilidade = total_dias_com_estoque / total_dias_verificados if total_dias_verificados > 0 else 1.0
+
+    meta = {
+        'dias_ruptura': int(meta_lojas['dias_ruptura'].sum()),
+        'dias_corrigidos': total_dias_corrigidos,
+        'taxa_disponibilidade': round(taxa_disponibilidade, 4),
+        'houve_correcao': total_dias_corrigidos > 0,
+        'lojas_corrigidas': int((meta_lojas['dias_corrigidos'] > 0).sum())  # V53
+    }
+
+    return serie_corrigida, meta
+
+
+def buscar_historico_item(conn, cod_produto: int, cnpj_fornecedor: str) -> Tuple[List[float], ResumoHistorico]:
     """
     Busca historico de vendas diarias de um item.
-    Retorna serie temporal e metadata.
+    Retorna serie temporal e metadata (ResumoHistorico, lido como dict).
 
     NOTA: Funcao mantida para compatibilidade, mas preferir precarregar_historico_lote()
     """
@@ -748,7 +1088,7 @@ def buscar_historico_item(conn, cod_produto: int, cnpj_fornecedor: str) -> Tuple
             'vendas_por_mes': {}
         }
 
-    return serie, metadata
+    return serie, ResumoHistorico(metadata)
 
 
 def calcular_fatores_sazonais(vendas_por_mes: Dict) -> Dict[int, float]:
@@ -777,7 +1117,7 @@ def calcular_fatores_sazonais(vendas_por_mes: Dict) -> Dict[int, float]:
 
     # Media geral
     medias_validas = [m for m in medias.values() if m > 0]
-    media_geral = sum(medias_validas) / len(medias_validas) if medias_validas else 0
+    media_geral = soma_sequencial(medias_validas) / len(medias_validas) if medias_validas else 0
 
     # Calcular fatores (limitados entre 0.5 e 2.0)
     fatores = {}
@@ -791,6 +1131,31 @@ def calcular_fatores_sazonais(vendas_por_mes: Dict) -> Dict[int, float]:
     return fatores
 
 
+def calcular_fatores_mensais_lote(vendas_por_item: Dict[int, Dict]) -> Dict[int, Tuple[Dict[int, float], float, str]]:
+    """
+    Fatores sazonais, fator de tendencia YoY e classificacao de varios itens
+    em uma chamada (frame longo + operacoes por grupo em core/demand_calculator).
+
+    Args:
+        vendas_por_item: {cod_produto: {(ano, mes): qtd}}
+
+    Returns:
+        {cod_produto: (fatores_sazonais {mes: fator}, fator_tendencia_yoy, classificacao_tendencia)}
+        Itens sem vendas mensais: fatores 1.0 e 'nao_calculado'
+    """
+    vendas = vendas_mensais_longo(vendas_por_item)
+    sazonais = calcular_fatores_sazonais_lote(vendas)
+    tendencia = calcular_fator_tendencia_yoy_lote(vendas, min_anos=2, fator_amortecimento=0.7)
+
+    fatores = dict(zip(sazonais.index, sazonais.to_dict('records')))
+    yoy = dict(zip(tendencia.index, zip(tendencia['fator_tendencia'].tolist(), tendencia['classificacao'])))
+    neutro = {mes: 1.0 for mes in range(1, 13)}
+    return {
+        cod: (fatores[cod], *yoy[cod]) if cod in fatores else (dict(neutro), 1.0, 'nao_calculado')
+        for cod in vendas_por_item
+    }
+
+
 def calcular_demanda_item(
     conn,
     cod_produto: int,
@@ -937,236 +1302,138 @@ def calcular_demanda_item(
     return registros
 
 
-def salvar_demanda_batch(conn, registros: List[Dict]):
-    """
-    Salva batch de registros de demanda no banco.
-    OTIMIZADO: Usa execute_values para INSERT em lote (muito mais rapido).
+# Colunas gravadas pelo cronjob em demanda_pre_calculada (mensal e semanal)
+COLUNAS_DEMANDA_PRE_CALCULADA = (
+    'cod_produto', 'cnpj_fornecedor', 'cod_empresa',
+    'ano', 'mes',
+    'semana', 'tipo_granularidade', 'data_inicio_semana',
+    'demanda_prevista', 'demanda_diaria_base', 'desvio_padrao',
+    'fator_sazonal', 'fator_tendencia_yoy', 'classificacao_tendencia',
+    'valor_ano_anterior', 'variacao_vs_aa',
+    'limitador_aplicado', 'metodo_usado', 'categoria_serie',
+    'dias_historico', 'total_vendido_historico',
+    'taxa_disponibilidade', 'dias_ruptura', 'demanda_censurada_corrigida',
+)
 
-    ATUALIZADO v5.7 (Fev/2026):
-    - Adicionado fator_tendencia_yoy (captura crescimento/queda YoY)
-    - Adicionado classificacao_tendencia (forte_crescimento, crescimento, estavel, queda, forte_queda)
-    """
-    if not registros:
-        return 0
+# Mesmas expressoes do indice UNIQUE uk_demanda_pre_calc (migration V50)
+CHAVE_DEMANDA_PRE_CALCULADA = (
+    'cod_produto', 'cnpj_fornecedor', 'COALESCE(cod_empresa, 0)',
+    'ano', 'COALESCE(semana, 0)', 'COALESCE(mes, 0)'
+)
 
-    from psycopg2.extras import execute_values
 
-    cursor = conn.cursor()
+def _valores_demanda(reg: Dict) -> Tuple:
+    """Tupla de valores de um registro na ordem de COLUNAS_DEMANDA_PRE_CALCULADA."""
+    semanal = reg.get('tipo_granularidade') == 'semanal'
+    return (
+        reg['cod_produto'], reg['cnpj_fornecedor'], reg['cod_empresa'],
+        reg['ano'], None if semanal else reg['mes'],
+        reg['semana'] if semanal else None,
+        'semanal' if semanal else 'mensal',
+        reg.get('data_inicio_semana') if semanal else None,
+        reg['demanda_prevista'], reg['demanda_diaria_base'], reg['desvio_padrao'],
+        reg['fator_sazonal'], reg['fator_tendencia_yoy'], reg['classificacao_tendencia'],
+        reg['valor_ano_anterior'], reg['variacao_vs_aa'],
+        reg['limitador_aplicado'], reg['metodo_usado'], reg['categoria_serie'],
+        reg['dias_historico'], reg['total_vendido_historico'],
+        # V51: Metadata de demanda censurada
+        reg.get('taxa_disponibilidade'),
+        reg.get('dias_ruptura', 0),
+        reg.get('demanda_censurada_corrigida', False)
+    )
 
-    # FIX v6.25: DELETE + INSERT com protecao contra duplicatas
-    # 1. Deleta registros SEM ajuste_manual (serao recalculados)
-    # 2. Identifica registros COM ajuste_manual (preservados)
-    # 3. Deduplicar batch antes do INSERT
-    # 4. Usa COALESCE(cod_empresa,0) para casar com o UNIQUE index
-    chaves_para_deletar = set()
-    for reg in registros:
-        chaves_para_deletar.add((
-            reg['cod_produto'], reg['cnpj_fornecedor'],
-            reg['ano'], reg['mes']
-        ))
-
-    # Deletar registros antigos SEM ajuste manual que serao recalculados.
-    # Registros com ajuste_manual (salvos pela Tela de Demanda) sao preservados.
-    chaves_com_ajuste = set()
-    if chaves_para_deletar:
-        chaves_list = list(chaves_para_deletar)
-        execute_values(cursor, """
-            DELETE FROM demanda_pre_calculada
-            WHERE ajuste_manual IS NULL
-              AND tipo_granularidade = 'mensal'
-              AND (cod_produto, cnpj_fornecedor, ano, mes) IN (VALUES %s)
-              AND (cod_empresa IS NULL OR cod_empresa = 0)
-        """, chaves_list, template="(%s, %s, %s, %s)")
-
-        # Identificar quais chaves ainda existem (tem ajuste_manual) para nao inserir duplicata
-        # NOTA: Nao usar execute_values para SELECT (page_size trunca resultados)
-        # Extrair cnpj unico do batch para query direta
-        cnpjs = set(c[1] for c in chaves_list)
-        for cnpj in cnpjs:
-            cursor.execute("""
-                SELECT cod_produto, cnpj_fornecedor, ano, mes
-                FROM demanda_pre_calculada
-                WHERE cnpj_fornecedor = %s
-                  AND (cod_empresa IS NULL OR cod_empresa = 0)
-                  AND ajuste_manual IS NOT NULL
-                  AND tipo_granularidade = 'mensal'
-            """, (cnpj,))
-            for row in cursor.fetchall():
-                chaves_com_ajuste.add((str(row[0]), str(row[1]), int(row[2]), int(row[3])))
-
-    # Preparar dados para insert em lote, excluindo os que ja tem ajuste_manual
-    registros_para_inserir = [
-        reg for reg in registros
-        if (str(reg['cod_produto']), str(reg['cnpj_fornecedor']), int(reg['ano']), int(reg['mes'])) not in chaves_com_ajuste
-    ]
 
-    # Deduplicar batch: mesmo (cod_produto, cnpj, cod_empresa, ano, mes) pode aparecer 2x
-    # UNIQUE index usa COALESCE(cod_empresa,0), entao NULL e 0 sao iguais
-    vistos = set()
-    registros_unicos = []
-    for reg in registros_para_inserir:
-        chave = (str(reg['cod_produto']), str(reg['cnpj_fornecedor']),
-                 0 if reg['cod_empresa'] is None else int(reg['cod_empresa']),
-                 int(reg['ano']), int(reg['mes']))
-        if chave not in vistos:
-            vistos.add(chave)
-            registros_unicos.append(reg)
+def _formatar_valor_copy(valor) -> str:
+    """Formata um valor para COPY ... FROM STDIN (formato text do PostgreSQL)."""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, (bool, np.bool_)):
+        return 't' if valor else 'f'
+    texto = str(valor)
+    return (texto.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
 
-    valores = [
-        (
-            reg['cod_produto'], reg['cnpj_fornecedor'], reg['cod_empresa'],
-            reg['ano'], reg['mes'],
-            reg['demanda_prevista'], reg['demanda_diaria_base'], reg['desvio_padrao'],
-            reg['fator_sazonal'], reg['fator_tendencia_yoy'], reg['classificacao_tendencia'],
-            reg['valor_ano_anterior'], reg['variacao_vs_aa'],
-            reg['limitador_aplicado'], reg['metodo_usado'], reg['categoria_serie'],
-            reg['dias_historico'], reg['total_vendido_historico'],
-            # V51: Metadata de demanda censurada
-            reg.get('taxa_disponibilidade'),
-            reg.get('dias_ruptura', 0),
-            reg.get('demanda_censurada_corrigida', False)
-        )
-        for reg in registros_unicos
-    ]
 
-    if not valores:
-        conn.commit()
-        return len(registros)
+def gerar_buffer_copy(linhas: List[Tuple]) -> io.StringIO:
+    """Serializa linhas no formato text do COPY (tab-separado, \\N = NULL)."""
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write('\t'.join(_formatar_valor_copy(v) for v in linha))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
 
-    # INSERT em lote. Registros com ajuste_manual ja foram excluidos,
-    # e batch deduplicado para evitar colisao no UNIQUE index.
-    execute_values(cursor, """
-        INSERT INTO demanda_pre_calculada (
-            cod_produto, cnpj_fornecedor, cod_empresa, ano, mes,
-            demanda_prevista, demanda_diaria_base, desvio_padrao,
-            fator_sazonal, fator_tendencia_yoy, classificacao_tendencia,
-            valor_ano_anterior, variacao_vs_aa,
-            limitador_aplicado, metodo_usado, categoria_serie,
-            dias_historico, total_vendido_historico,
-            taxa_disponibilidade, dias_ruptura, demanda_censurada_corrigida,
-            data_calculo
-        ) VALUES %s
-    """, valores, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())")
 
-    conn.commit()
-    return len(registros)
+def upsert_demanda_staging(conn, registros: List[Dict]) -> int:
+    """
+    Grava registros em demanda_pre_calculada via COPY + staging + um unico upsert.
 
+    1. COPY do batch para uma tabela temporaria (sem lock na tabela principal)
+    2. INSERT ... SELECT DISTINCT ON (chave do UNIQUE) -> deduplica (mantem a 1a ocorrencia)
+    3. ON CONFLICT DO UPDATE ... WHERE ajuste_manual IS NULL -> substitui o calculo
+       anterior e preserva registros com ajuste manual (Tela de Demanda)
 
-def precarregar_historico_semanal_lote(conn, cod_produtos: List[int]) -> Dict[int, Tuple[Dict, Dict]]:
-    """
-    Pre-carrega historico de vendas agregado por semana ISO para TODOS os itens de uma vez.
-    V53: Retorna tambem vendas por loja para correcao de ruptura por loja.
+    A unica instrucao que toca demanda_pre_calculada e o upsert final, que trava
+    apenas as linhas do batch (as telas de pedido continuam lendo normalmente).
 
     Returns:
-        Dict {cod_produto: (
-            {(ano_iso, semana_iso): qtd_venda_total},                    # consolidado
-            {(ano_iso, semana_iso, cod_empresa): qtd_venda_loja}         # V53: por loja
-        )}
+        Quantidade de registros recebidos
     """
-    if not cod_produtos:
-        return {}
+    if not registros:
+        return 0
 
-    from psycopg2.extras import RealDictCursor
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor = conn.cursor()
+    colunas = ', '.join(COLUNAS_DEMANDA_PRE_CALCULADA)
+    colunas_stg = ', '.join(f's.{c}' for c in COLUNAS_DEMANDA_PRE_CALCULADA)
+    chave_stg = ', '.join(c.replace('(', '(s.') if '(' in c else f's.{c}' for c in CHAVE_DEMANDA_PRE_CALCULADA)
+    chave_conflito = ', '.join(f'({c})' if '(' in c else c for c in CHAVE_DEMANDA_PRE_CALCULADA)
+    atualizar = ',\n                '.join(
+        f'{c} = EXCLUDED.{c}' for c in COLUNAS_DEMANDA_PRE_CALCULADA if c not in ('cod_produto', 'cnpj_fornecedor')
+    )
 
-    # V53: Incluir cod_empresa no GROUP BY
-    placeholders = ','.join(['%s'] * len(cod_produtos))
+    # 1. Staging temporaria (descartada no commit)
     cursor.execute(f"""
-        SELECT
-            h.codigo,
-            h.cod_empresa,
-            EXTRACT(ISOYEAR FROM h.data)::INTEGER as ano_iso,
-            EXTRACT(WEEK FROM h.data)::INTEGER as semana_iso,
-            SUM(COALESCE(h.qtd_venda, 0)) as qtd_venda
-        FROM historico_vendas_diario h
-        WHERE h.codigo IN ({placeholders})
-          AND h.data >= CURRENT_DATE - INTERVAL '{DIAS_HISTORICO} days'
-          AND h.data < CURRENT_DATE
-        GROUP BY h.codigo, h.cod_empresa, ano_iso, semana_iso
-        ORDER BY h.codigo, ano_iso, semana_iso
-    """, cod_produtos)
-
-    consolidado = {}    # {cod: {(ano_iso, sem_iso): qtd_total}}
-    por_loja = {}       # {cod: {(ano_iso, sem_iso, cod_emp): qtd}}
-    for row in cursor.fetchall():
-        cod = int(row['codigo'])
-        qtd = float(row['qtd_venda'])
-        ano_iso = int(row['ano_iso'])
-        sem_iso = int(row['semana_iso'])
-        cod_emp = int(row['cod_empresa'])
-
-        # Consolidado
-        if cod not in consolidado:
-            consolidado[cod] = {}
-        chave_cons = (ano_iso, sem_iso)
-        consolidado[cod][chave_cons] = consolidado[cod].get(chave_cons, 0) + qtd
-
-        # V53: Por loja
-        if cod not in por_loja:
-            por_loja[cod] = {}
-        por_loja[cod][(ano_iso, sem_iso, cod_emp)] = qtd
-
-    cursor.close()
+        CREATE TEMP TABLE IF NOT EXISTS stg_demanda_pre_calculada ON COMMIT DROP AS
+        SELECT 0::BIGINT AS ordem, {colunas}
+        FROM demanda_pre_calculada
+        WITH NO DATA
+    """)
+    cursor.copy_expert(
+        f"COPY stg_demanda_pre_calculada (ordem, {colunas}) FROM STDIN",
+        gerar_buffer_copy((i,) + _valores_demanda(reg) for i, reg in enumerate(registros))
+    )
 
-    # Montar resultado como tuple (consolidado, por_loja)
-    resultado = {}
-    for cod in set(list(consolidado.keys()) + list(por_loja.keys())):
-        resultado[cod] = (consolidado.get(cod, {}), por_loja.get(cod, {}))
+    # 2 + 3. Deduplicar e substituir em uma unica instrucao
+    # Registro recalculado equivale a um registro novo: limpa metadados de ajuste antigo
+    cursor.execute(f"""
+        INSERT INTO demanda_pre_calculada ({colunas}, data_calculo)
+        SELECT DISTINCT ON ({chave_stg}) {colunas_stg}, NOW()
+        FROM stg_demanda_pre_calculada s
+        ORDER BY {chave_stg}, s.ordem
+        ON CONFLICT ({chave_conflito}) DO UPDATE SET
+                {atualizar},
+                data_calculo = EXCLUDED.data_calculo,
+                ajuste_manual_data = NULL,
+                ajuste_manual_usuario = NULL,
+                ajuste_manual_motivo = NULL,
+                editado_manualmente = FALSE
+        WHERE demanda_pre_calculada.ajuste_manual IS NULL
+    """)
 
-    return resultado
+    conn.commit()
+    return len(registros)
 
 
-def precarregar_estoque_semanal_lote(conn, cod_produtos: List[int]) -> Dict[int, Dict]:
+def salvar_demanda_batch(conn, registros: List[Dict]):
     """
-    V53: Pre-carrega dias com estoque por semana ISO POR LOJA.
-    Usado para corrigir demanda censurada na serie semanal.
+    Salva batch de registros de demanda no banco.
+    OTIMIZADO: COPY para staging + upsert unico (upsert_demanda_staging).
 
-    Returns:
-        {cod_produto: {(ano_iso, semana_iso, cod_empresa): (dias_com_estoque, dias_totais)}}
+    ATUALIZADO v5.7 (Fev/2026):
+    - Adicionado fator_tendencia_yoy (captura crescimento/queda YoY)
+    - Adicionado classificacao_tendencia (forte_crescimento, crescimento, estavel, queda, forte_queda)
     """
-    if not cod_produtos:
-        return {}
-
-    from psycopg2.extras import RealDictCursor
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-    placeholders = ','.join(['%s'] * len(cod_produtos))
-    cursor.execute(f"""
-        SELECT
-            sub.codigo,
-            sub.cod_empresa,
-            sub.ano_iso,
-            sub.semana_iso,
-            COUNT(*) FILTER (WHERE sub.estoque_diario > 0) as dias_com_estoque,
-            COUNT(*) as dias_totais
-        FROM (
-            SELECT
-                e.codigo,
-                e.cod_empresa,
-                e.data,
-                EXTRACT(ISOYEAR FROM e.data)::INTEGER as ano_iso,
-                EXTRACT(WEEK FROM e.data)::INTEGER as semana_iso,
-                COALESCE(e.estoque_diario, 0) as estoque_diario
-            FROM historico_estoque_diario e
-            WHERE e.codigo IN ({placeholders})
-              AND e.data >= CURRENT_DATE - INTERVAL '{DIAS_HISTORICO} days'
-              AND e.data < CURRENT_DATE
-        ) sub
-        GROUP BY sub.codigo, sub.cod_empresa, sub.ano_iso, sub.semana_iso
-    """, cod_produtos)
-
-    resultado = {}
-    for row in cursor.fetchall():
-        cod = int(row['codigo'])
-        if cod not in resultado:
-            resultado[cod] = {}
-        resultado[cod][(int(row['ano_iso']), int(row['semana_iso']), int(row['cod_empresa']))] = (
-            int(row['dias_com_estoque']),
-            int(row['dias_totais'])
-        )
-
-    cursor.close()
-    return resultado
+    return upsert_demanda_staging(conn, registros)
 
 
 def semanas_iso_do_mes(ano: int, mes: int) -> List[int]:
@@ -1226,7 +1493,7 @@ def calcular_demanda_item_semanal(
     registros_mensais: List[Dict] = None,
     estoque_semanal: Dict = None,
     vendas_semanal_por_loja: Dict = None
-) -> List[Dict]:
+) -> List[RegistroDemanda]:
     """
     V55: Calcula demanda semanal DERIVADA da demanda mensal.
     Em vez de calcular independentemente, decompoe cada mes em semanas usando
@@ -1382,7 +1649,7 @@ def calcular_demanda_item_semanal(
         valor_aa_key = (ano_iso - 1, semana_iso)
         valor_aa = historico_semanal.get(valor_aa_key, 0) if historico_semanal else 0
 
-        registros.append({
+        registros.append(RegistroDemanda({
             'cod_produto': str(cod_produto),
             'cnpj_fornecedor': cnpj_fornecedor,
             'cod_empresa': None,
@@ -1407,7 +1674,7 @@ def calcular_demanda_item_semanal(
             'taxa_disponibilidade': reg_mensal.get('taxa_disponibilidade'),
             'dias_ruptura': reg_mensal.get('dias_ruptura', 0),
             'demanda_censurada_corrigida': reg_mensal.get('demanda_censurada_corrigida', False),
-        })
+        }))
 
     return registros
 
@@ -1415,138 +1682,24 @@ def calcular_demanda_item_semanal(
 def salvar_demanda_batch_semanal(conn, registros: List[Dict]):
     """
     Salva batch de registros de demanda SEMANAL no banco.
-    Espelha salvar_demanda_batch() mas com chave (cod_produto, cnpj_forn, ano, semana).
+    Espelha salvar_demanda_batch() com chave (cod_produto, cnpj_forn, ano, semana).
     """
-    if not registros:
-        return 0
-
-    from psycopg2.extras import execute_values
+    return upsert_demanda_staging(conn, registros)
 
-    cursor = conn.cursor()
 
-    # Coletar chaves para deletar (apenas registros semanais sem ajuste manual)
-    chaves_para_deletar = set()
-    for reg in registros:
-        chaves_para_deletar.add((
-            reg['cod_produto'], reg['cnpj_fornecedor'],
-            reg['ano'], reg['semana']
-        ))
-
-    chaves_com_ajuste = set()
-    if chaves_para_deletar:
-        chaves_list = list(chaves_para_deletar)
-        execute_values(cursor, """
-            DELETE FROM demanda_pre_calculada
-            WHERE ajuste_manual IS NULL
-              AND tipo_granularidade = 'semanal'
-              AND (cod_produto, cnpj_fornecedor, ano, semana) IN (VALUES %s)
-              AND (cod_empresa IS NULL OR cod_empresa = 0)
-        """, chaves_list, template="(%s, %s, %s, %s)")
-
-        # Identificar chaves com ajuste manual (preservar)
-        cnpjs = set(c[1] for c in chaves_list)
-        for cnpj in cnpjs:
-            cursor.execute("""
-                SELECT cod_produto, cnpj_fornecedor, ano, semana
-                FROM demanda_pre_calculada
-                WHERE cnpj_fornecedor = %s
-                  AND (cod_empresa IS NULL OR cod_empresa = 0)
-                  AND ajuste_manual IS NOT NULL
-                  AND tipo_granularidade = 'semanal'
-            """, (cnpj,))
-            for row in cursor.fetchall():
-                chaves_com_ajuste.add((str(row[0]), str(row[1]), int(row[2]), int(row[3])))
-
-    # Filtrar e deduplicar
-    vistos = set()
-    registros_unicos = []
-    for reg in registros:
-        chave = (str(reg['cod_produto']), str(reg['cnpj_fornecedor']),
-                 int(reg['ano']), int(reg['semana']))
-        if chave in chaves_com_ajuste:
-            continue
-        if chave not in vistos:
-            vistos.add(chave)
-            registros_unicos.append(reg)
+def _remover_outliers(serie_censurada: List[float], perfil: PerfilEtapas = None) -> List[float]:
+    """
+    V48: Deteccao e tratamento de outliers na serie diaria (ja corrigida por censura).
 
-    if not registros_unicos:
-        conn.commit()
-        return len(registros)
-
-    valores = [
-        (
-            reg['cod_produto'], reg['cnpj_fornecedor'], reg['cod_empresa'],
-            reg['ano'], None,  # mes = NULL para semanal
-            reg['semana'], reg['tipo_granularidade'], reg['data_inicio_semana'],
-            reg['demanda_prevista'], reg['demanda_diaria_base'], reg['desvio_padrao'],
-            reg['fator_sazonal'], reg['fator_tendencia_yoy'], reg['classificacao_tendencia'],
-            reg['valor_ano_anterior'], reg['variacao_vs_aa'],
-            reg['limitador_aplicado'], reg['metodo_usado'], reg['categoria_serie'],
-            reg['dias_historico'], reg['total_vendido_historico'],
-            # V51: Metadata de demanda censurada
-            reg.get('taxa_disponibilidade'),
-            reg.get('dias_ruptura', 0),
-            reg.get('demanda_censurada_corrigida', False)
-        )
-        for reg in registros_unicos
-    ]
-
-    execute_values(cursor, """
-        INSERT INTO demanda_pre_calculada (
-            cod_produto, cnpj_fornecedor, cod_empresa,
-            ano, mes,
-            semana, tipo_granularidade, data_inicio_semana,
-            demanda_prevista, demanda_diaria_base, desvio_padrao,
-            fator_sazonal, fator_tendencia_yoy, classificacao_tendencia,
-            valor_ano_anterior, variacao_vs_aa,
-            limitador_aplicado, metodo_usado, categoria_serie,
-            dias_historico, total_vendido_historico,
-            taxa_disponibilidade, dias_ruptura, demanda_censurada_corrigida,
-            data_calculo
-        ) VALUES %s
-    """, valores, template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())")
-
-    conn.commit()
-    return len(registros)
-
-
-def calcular_demanda_item_com_cache(
-    cod_produto: int,
-    cnpj_fornecedor: str,
-    serie: List[float],
-    meta_hist: Dict,
-    ano_base: int,
-    estoque_por_data: Dict = None
-) -> List[Dict]:
-    """
-    Calcula demanda para um item usando historico pre-carregado.
-    OTIMIZADO: Nao faz query no banco, usa dados do cache.
-    V48: Deteccao de outliers antes do calculo.
-    V51: Correcao de demanda censurada antes do calculo.
-    """
-    if not serie or len(serie) < 7:
-        return []
-
-    # V51: Correcao de demanda censurada ANTES de outliers
-    meta_censura = {
-        'dias_ruptura': 0,
-        'dias_corrigidos': 0,
-        'taxa_disponibilidade': None,
-        'houve_correcao': False
-    }
-    serie_censurada = serie
-    if estoque_por_data:
-        vendas_por_data = meta_hist.get('vendas_por_data', {})
-        vendas_por_loja = meta_hist.get('vendas_por_loja', None)  # V53
-        if vendas_por_data:
-            serie_censurada, meta_censura = corrigir_demanda_censurada(
-                serie, vendas_por_data, estoque_por_data,
-                vendas_por_loja=vendas_por_loja  # V53
-            )
+    Returns:
+        Serie limpa (a propria serie quando nao ha outliers)
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
 
     # V48: Deteccao e tratamento de outliers ANTES do calculo
     outlier_info = None
     serie_limpa = serie_censurada
+    inicio = time.perf_counter()
     if len(serie_censurada) >= 30:  # Minimo para deteccao confiavel (1 mes de dados diarios)
         try:
             from core.outlier_detector import AutoOutlierDetector
@@ -1562,48 +1715,97 @@ def calcular_demanda_item_com_cache(
                 }
         except Exception:
             pass  # Falha no detector nao deve bloquear o calculo
+    perfil.registrar('deteccao_outliers', (time.perf_counter() - inicio) * 1000, itens=1)
+    return serie_limpa
 
-    # Calcular demanda usando DemandCalculator (com serie limpa)
-    demanda_total, desvio_total, meta_calc = DemandCalculator.calcular_demanda_diaria_unificada(
-        vendas_diarias=serie_limpa,
-        dias_periodo=30,
-        granularidade_exibicao='mensal'
-    )
 
-    demanda_diaria_base = meta_calc.get('demanda_diaria_base', 0)
-    if demanda_diaria_base <= 0:
-        return []
+def _remover_outliers_lote(series: Dict[int, np.ndarray], perfil: PerfilEtapas = None) -> Dict[int, List[float]]:
+    """
+    V48: _remover_outliers de todas as series do chunk em uma chamada
+    (AutoOutlierDetector.analyze_many). Mesmo resultado item a item.
 
-    # V53: Se houve correcao de censura, recalcular vendas_por_mes a partir da serie corrigida
-    vendas_por_mes = meta_hist.get('vendas_por_mes', {})
-    if meta_censura.get('houve_correcao') and serie_censurada != serie:
-        vendas_por_data = meta_hist.get('vendas_por_data', {})
-        datas_ordenadas = sorted(vendas_por_data.keys())
-        if datas_ordenadas:
-            from datetime import timedelta
-            data_min = min(datas_ordenadas)
-            data_max = max(datas_ordenadas)
-            datas_serie = []
-            d = data_min
-            while d <= data_max:
-                datas_serie.append(d)
-                d += timedelta(days=1)
-            if len(datas_serie) == len(serie_censurada):
-                vendas_por_mes_corrigido = {}
-                for i, data in enumerate(datas_serie):
-                    chave = (data.year, data.month)
-                    vendas_por_mes_corrigido[chave] = vendas_por_mes_corrigido.get(chave, 0) + serie_censurada[i]
-                vendas_por_mes = vendas_por_mes_corrigido
+    Returns:
+        Dict {cod_produto: serie limpa (lista)}
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+    limpas = {cod: serie.tolist() for cod, serie in series.items()}
+    candidatas = [cod for cod, serie in series.items() if len(serie) >= 30]
+    if not candidatas:
+        return limpas
 
-    # Calcular fatores sazonais
-    fatores_sazonais = calcular_fatores_sazonais(vendas_por_mes)
-    fator_tendencia_yoy = 1.0
-    classificacao_tendencia = 'nao_calculado'
+    with perfil.medir('deteccao_outliers', itens=len(candidatas)):
+        try:
+            from core.outlier_detector import AutoOutlierDetector
+            resultados = AutoOutlierDetector().analyze_many([series[cod] for cod in candidatas])
+        except Exception as e:
+            # Sem lote, cada item faz a deteccao escalar
+            logger.debug(f"Deteccao de outliers em lote indisponivel: {e}")
+            resultados = [None] * len(candidatas)
 
-    if vendas_por_mes:
-        fator_tendencia_yoy, classificacao_tendencia, _ = calcular_fator_tendencia_yoy(
-            vendas_por_mes, min_anos=2, fator_amortecimento=0.7
+    for cod, resultado in zip(candidatas, resultados):
+        if resultado is None:
+            limpas[cod] = _remover_outliers(limpas[cod], perfil)
+        elif resultado['outliers_count'] > 0:
+            limpas[cod] = resultado['cleaned_data']
+    return limpas
+
+
+def _calcular_base_diaria(serie_censurada: List[float], perfil: PerfilEtapas = None,
+                          serie_limpa: List[float] = None, backtesting: Tuple = None) -> ResultadoDemanda:
+    """
+    V48 + DemandCalculator: trata outliers e calcula a demanda diaria base.
+
+    Args:
+        serie_limpa: Serie ja tratada por _remover_outliers (evita repetir a deteccao)
+        backtesting: Resultado de backtesting_universal ja calculado em lote
+
+    Returns:
+        ResultadoDemanda de DemandCalculator.calcular_demanda_diaria_unificada,
+        sem o diagnostico (ranking etc. nao e gravado)
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+    if serie_limpa is None:
+        serie_limpa = _remover_outliers(serie_censurada, perfil)
+
+    # Calcular demanda usando DemandCalculator (com serie limpa)
+    with perfil.medir('backtesting_metodo', itens=1):
+        demanda_total, desvio_total, meta_calc = DemandCalculator.calcular_demanda_diaria_unificada(
+            vendas_diarias=serie_limpa,
+            dias_periodo=30,
+            granularidade_exibicao='mensal',
+            backtesting=backtesting
         )
+    return ResultadoDemanda.de_calculo(demanda_total, desvio_total, meta_calc, diagnostico=False)
+
+
+def _gerar_registros_mensais(
+    cod_produto: int,
+    cnpj_fornecedor: str,
+    meta_calc: ResultadoDemanda,
+    vendas_por_mes: Dict,
+    vendas_por_mes_original: Dict,
+    meta_censura: Dict,
+    dias_historico: int,
+    total_vendido: float,
+    fatores_mensais: Tuple = None
+) -> List[RegistroDemanda]:
+    """
+    Aplica sazonalidade, tendencia YoY e limitador V11 sobre a demanda diaria base
+    e gera os registros dos proximos MESES_PREVISAO meses (RegistroDemanda:
+    ficam em memoria ate a gravacao em lote do fornecedor).
+
+    Args:
+        vendas_por_mes: {(ano, mes): qtd} usado para fatores (corrigido por censura, se houve)
+        vendas_por_mes_original: {(ano, mes): qtd} real (base do limitador V11)
+        fatores_mensais: (fatores_sazonais, fator_yoy, classificacao) ja calculados
+            em lote por calcular_fatores_mensais_lote (default: calcula para o item)
+    """
+    demanda_diaria_base = meta_calc.get('demanda_diaria_base', 0)
+
+    # Fatores sazonais e tendencia YoY (mesmo calculo do lote do chunk)
+    if fatores_mensais is None:
+        fatores_mensais = calcular_fatores_mensais_lote({cod_produto: vendas_por_mes})[cod_produto]
+    fatores_sazonais, fator_tendencia_yoy, classificacao_tendencia = fatores_mensais
 
     # Gerar registros para os proximos 12 meses
     registros = []
@@ -1627,7 +1829,6 @@ def calcular_demanda_item_com_cache(
 
         # Valor ano anterior (vendas reais, nao corrigidas - limitador V11 opera sobre dados reais)
         ano_anterior = ano - 1
-        vendas_por_mes_original = meta_hist.get('vendas_por_mes', {})
         valor_aa = vendas_por_mes_original.get((ano_anterior, mes), 0)
 
         # Aplicar limitador V11
@@ -1655,7 +1856,7 @@ def calcular_demanda_item_com_cache(
 
         variacao_vs_aa = (demanda_prevista / valor_aa) if valor_aa > 0 else None
 
-        registros.append({
+        registros.append(RegistroDemanda({
             'cod_produto': str(cod_produto),
             'cnpj_fornecedor': cnpj_fornecedor,
             'cod_empresa': None,
@@ -1672,243 +1873,1436 @@ def calcular_demanda_item_com_cache(
             'limitador_aplicado': limitador_aplicado,
             'metodo_usado': meta_calc.get('metodo_usado', 'auto'),
             'categoria_serie': meta_calc.get('categoria_serie', 'media'),
-            'dias_historico': meta_hist.get('dias_historico', 0),
-            'total_vendido_historico': round(meta_hist.get('total_vendido', 0), 2),
+            'dias_historico': dias_historico,
+            'total_vendido_historico': round(total_vendido, 2),
             # V51: Metadata de demanda censurada
             'taxa_disponibilidade': meta_censura.get('taxa_disponibilidade'),
             'dias_ruptura': meta_censura.get('dias_ruptura', 0),
             'demanda_censurada_corrigida': meta_censura.get('houve_correcao', False),
-        })
+        }))
 
     return registros
 
 
-def processar_fornecedor(cnpj_fornecedor: str, nome_fornecedor: str) -> Dict:
+def calcular_demanda_item_com_cache(
+    cod_produto: int,
+    cnpj_fornecedor: str,
+    serie: List[float],
+    meta_hist: Dict,
+    ano_base: int,
+    estoque_por_data: Dict = None
+) -> List[RegistroDemanda]:
+    """
+    Calcula demanda para um item usando historico pre-carregado.
+    OTIMIZADO: Nao faz query no banco, usa dados do cache.
+    V48: Deteccao de outliers antes do calculo.
+    V51: Correcao de demanda censurada antes do calculo.
+    """
+    if not serie or len(serie) < 7:
+        return []
+
+    # V51: Correcao de demanda censurada ANTES de outliers
+    meta_censura = {
+        'dias_ruptura': 0,
+        'dias_corrigidos': 0,
+        'taxa_disponibilidade': None,
+        'houve_correcao': False
+    }
+    serie_censurada = serie
+    if estoque_por_data:
+        vendas_por_data = meta_hist.get('vendas_por_data', {})
+        vendas_por_loja = meta_hist.get('vendas_por_loja', None)  # V53
+        if vendas_por_data:
+            serie_censurada, meta_censura = corrigir_demanda_censurada(
+                serie, vendas_por_data, estoque_por_data,
+                vendas_por_loja=vendas_por_loja  # V53
+            )
+
+    meta_calc = _calcular_base_diaria(serie_censurada)
+    if meta_calc.get('demanda_diaria_base', 0) <= 0:
+        return []
+
+    # V53: Se houve correcao de censura, recalcular vendas_por_mes a partir da serie corrigida
+    vendas_por_mes = meta_hist.get('vendas_por_mes', {})
+    if meta_censura.get('houve_correcao') and serie_censurada != serie:
+        vendas_por_data = meta_hist.get('vendas_por_data', {})
+        datas_ordenadas = sorted(vendas_por_data.keys())
+        if datas_ordenadas:
+            from datetime import timedelta
+            data_min = min(datas_ordenadas)
+            data_max = max(datas_ordenadas)
+            datas_serie = []
+            d = data_min
+            while d <= data_max:
+                datas_serie.append(d)
+                d += timedelta(days=1)
+            if len(datas_serie) == len(serie_censurada):
+                vendas_por_mes_corrigido = {}
+                for i, data in enumerate(datas_serie):
+                    chave = (data.year, data.month)
+                    vendas_por_mes_corrigido[chave] = vendas_por_mes_corrigido.get(chave, 0) + serie_censurada[i]
+                vendas_por_mes = vendas_por_mes_corrigido
+
+    return _gerar_registros_mensais(
+        cod_produto, cnpj_fornecedor, meta_calc,
+        vendas_por_mes, meta_hist.get('vendas_por_mes', {}), meta_censura,
+        meta_hist.get('dias_historico', 0), meta_hist.get('total_vendido', 0)
+    )
+
+
+def preparar_serie_item_denso(
+    item: ItemHistorico,
+    tem_estoque: bool = False,
+    perfil: PerfilEtapas = None,
+    remover_outliers: bool = True
+) -> Optional[Dict]:
+    """
+    Primeira fase de calcular_demanda_item_denso: V51/V53 censura -> V48 outliers.
+    Separada para o backtesting de todos os itens do chunk rodar em lote.
+
+    Args:
+        remover_outliers: False deixa serie_limpa = None (o chunk trata os
+            outliers de todos os itens em lote com _remover_outliers_lote)
+
+    Returns:
+        {serie_censurada, meta_censura, serie_limpa} ou None (serie curta demais)
+    """
+    if item is None or len(item) < 7:
+        return None
+    perfil = perfil if perfil is not None else PerfilEtapas()
+
+    # V51: Correcao de demanda censurada ANTES de outliers
+    meta_censura = {
+        'dias_ruptura': 0,
+        'dias_corrigidos': 0,
+        'taxa_disponibilidade': None,
+        'houve_correcao': False
+    }
+    serie_censurada = item.serie
+    if tem_estoque:
+        with perfil.medir('correcao_censura', itens=1):
+            serie_censurada, meta_censura = corrigir_demanda_censurada_denso(item)
+
+    return {
+        'serie_censurada': serie_censurada,
+        'meta_censura': meta_censura,
+        'serie_limpa': _remover_outliers(serie_censurada.tolist(), perfil) if remover_outliers else None,
+    }
+
+
+def finalizar_demanda_item_denso(
+    cnpj_fornecedor: str,
+    item: ItemHistorico,
+    preparo: Dict,
+    perfil: PerfilEtapas = None,
+    backtesting: Tuple = None,
+    fatores_mensais: Tuple = None
+) -> List[RegistroDemanda]:
+    """
+    Segunda fase de calcular_demanda_item_denso: DemandCalculator -> sazonalidade/YoY/V11.
+
+    Args:
+        preparo: Retorno de preparar_serie_item_denso
+        backtesting: Backtesting da serie limpa ja calculado em lote (opcional)
+        fatores_mensais: Fatores sazonais/YoY ja calculados em lote (opcional)
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+    serie_censurada = preparo['serie_censurada']
+    meta_censura = preparo['meta_censura']
+
+    meta_calc = _calcular_base_diaria(
+        serie_censurada.tolist(), perfil, serie_limpa=preparo['serie_limpa'], backtesting=backtesting
+    )
+    if meta_calc.get('demanda_diaria_base', 0) <= 0:
+        return []
+
+    # Com fatores do lote, a etapa fator_yoy ja contou o item
+    with perfil.medir('fator_yoy', itens=0 if fatores_mensais is not None else 1):
+        vendas_por_mes, vendas_por_mes_original = vendas_mensais_item_denso(item, preparo)
+
+        return _gerar_registros_mensais(
+            item.cod_produto, cnpj_fornecedor, meta_calc,
+            vendas_por_mes, vendas_por_mes_original, meta_censura,
+            len(item), float(item.serie.sum()),
+            fatores_mensais=fatores_mensais
+        )
+
+
+def vendas_mensais_item_denso(item: ItemHistorico, preparo: Dict) -> Tuple[Dict, Dict]:
+    """
+    Totais mensais direto dos arrays.
+
+    Returns:
+        (vendas_por_mes, vendas_por_mes_original) - a primeira vem da serie
+        corrigida quando houve censura (V53), a segunda e a venda real (V11)
+    """
+    serie_censurada = preparo['serie_censurada']
+    vendas_por_mes_original = item.totais_mensais()
+    vendas_por_mes = vendas_por_mes_original
+    if preparo['meta_censura'].get('houve_correcao') and not np.array_equal(serie_censurada, item.serie):
+        vendas_por_mes = item.totais_mensais(serie_censurada, apenas_meses_com_venda=False)
+    return vendas_por_mes, vendas_por_mes_original
+
+
+def calcular_demanda_item_denso(
+    cnpj_fornecedor: str,
+    item: ItemHistorico,
+    tem_estoque: bool = False,
+    perfil: PerfilEtapas = None
+) -> List[RegistroDemanda]:
+    """
+    Calcula demanda para um item a partir do HistoricoDenso (arrays NumPy).
+    Mesmo fluxo de calcular_demanda_item_com_cache: V51/V53 censura -> V48 outliers
+    -> DemandCalculator -> sazonalidade/YoY/V11, sem dicts por data.
+
+    Args:
+        cnpj_fornecedor: CNPJ do fornecedor
+        item: Visao do item (HistoricoDenso.item)
+        tem_estoque: Se o item tem algum registro de estoque diario
+        perfil: Acumulador de tempo por etapa (opcional)
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+    preparo = preparar_serie_item_denso(item, tem_estoque=tem_estoque, perfil=perfil)
+    if preparo is None:
+        return []
+    return finalizar_demanda_item_denso(cnpj_fornecedor, item, preparo, perfil)
+
+
+def backtesting_lote_chunk(preparos: Dict[int, Dict], perfil: PerfilEtapas = None) -> Dict[int, Tuple]:
+    """
+    V48: Backtesting universal de todas as series longas do chunk em uma
+    chamada (DemandCalculator.backtesting_universal_lote). Series ate
+    DIAS_SERIE_LONGA nao usam backtesting em calcular_demanda_adaptativa.
+
+    Series cujo resultado ja esta no cache de previsao (core/cache_previsao)
+    ficam fora do lote: o calculo delas vira consulta ao cache.
+
+    Returns:
+        Dict {cod_produto: (metodo, demanda, desvio, metadata)}
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+    longas = [cod for cod, preparo in preparos.items() if len(preparo['serie_limpa']) > DIAS_SERIE_LONGA]
+    cache = get_cache_previsao()
+    if cache is not None and longas:
+        unificada = DemandCalculator.calcular_demanda_diaria_unificada
+        longas = [
+            cod for cod in longas
+            if not cache.contem(unificada.chave(preparos[cod]['serie_limpa'], 30, 'mensal'))
+        ]
+    if not longas:
+        return {}
+    try:
+        with perfil.medir('backtesting_metodo'):
+            lote = DemandCalculator.backtesting_universal_lote([preparos[cod]['serie_limpa'] for cod in longas])
+        return dict(zip(longas, lote))
+    except Exception as e:
+        # Sem lote, cada item faz o backtesting escalar
+        logger.debug(f"Backtesting em lote indisponivel: {e}")
+        return {}
+
+
+def horizonte_previsao_atual() -> str:
+    """
+    Identifica o horizonte de previsao corrente: mes de partida do calculo mensal
+    e semana ISO de partida do calculo semanal. Quando qualquer um vira, todos
+    os itens precisam ser recalculados (a janela de previsao deslocou).
+    """
+    hoje = datetime.now().date()
+    ano_iso, semana_iso, _ = hoje.isocalendar()
+    return f"{hoje.year}-{hoje.month:02d}/{ano_iso}-W{semana_iso:02d}"
+
+
+def buscar_fingerprints_entrada(conn, cod_produtos: List[int]) -> Dict[int, Dict]:
+    """
+    Calcula no banco o fingerprint das entradas de cada item, sem trazer o historico.
+
+    O fingerprint cobre exatamente os dados usados pelo calculo:
+    - ultima_venda: ultima data com venda na janela de DIAS_HISTORICO
+    - checksum_historico: md5 das vendas diarias por loja na janela
+    - checksum_estoque: md5 do estoque diario por loja entre a primeira e a
+      ultima venda (fora desse intervalo o estoque nao afeta a correcao V53)
+
+    Returns:
+        Dict {cod_produto: {ultima_venda, checksum_historico, checksum_estoque}}
+    """
+    if not cod_produtos:
+        return {}
+
+    from psycopg2.extras import RealDictCursor
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    placeholders = ','.join(['%s'] * len(cod_produtos))
+    cursor.execute(f"""
+        WITH vendas AS (
+            SELECT h.codigo, h.data, h.cod_empresa, SUM(h.qtd_venda) as qtd_venda
+            FROM historico_vendas_diario h
+            WHERE h.codigo IN ({placeholders})
+              AND h.data >= CURRENT_DATE - INTERVAL '{DIAS_HISTORICO} days'
+              AND h.data < CURRENT_DATE
+            GROUP BY h.codigo, h.data, h.cod_empresa
+        ),
+        janela AS (
+            SELECT
+                codigo,
+                MIN(data) as data_min,
+                MAX(data) as data_max,
+                md5(string_agg(data::text || ':' || cod_empresa::text || ':' || qtd_venda::text, ','
+                               ORDER BY data, cod_empresa)) as checksum_historico
+            FROM vendas
+            GROUP BY codigo
+        ),
+        estoque AS (
+            SELECT
+                e.codigo,
+                md5(string_agg(e.data::text || ':' || e.cod_empresa::text || ':' ||
+                               COALESCE(e.estoque_diario, 0)::text, ','
+                               ORDER BY e.data, e.cod_empresa)) as checksum_estoque
+            FROM historico_estoque_diario e
+            JOIN janela j ON j.codigo = e.codigo
+             AND e.data BETWEEN j.data_min AND j.data_max
+            GROUP BY e.codigo
+        )
+        SELECT j.codigo, j.data_max as ultima_venda, j.checksum_historico,
+               COALESCE(es.checksum_estoque, '') as checksum_estoque
+        FROM janela j
+        LEFT JOIN estoque es ON es.codigo = j.codigo
+    """, cod_produtos)
+
+    resultado = {}
+    for row in cursor.fetchall():
+        resultado[int(row['codigo'])] = {
+            'ultima_venda': row['ultima_venda'],
+            'checksum_historico': row['checksum_historico'],
+            'checksum_estoque': row['checksum_estoque'],
+        }
+
+    cursor.close()
+    return resultado
+
+
+def buscar_fingerprints_salvos(conn, cnpj_fornecedor: str) -> Dict[int, Dict]:
+    """
+    Busca os fingerprints gravados no ultimo calculo de cada item do fornecedor.
+
+    Returns:
+        Dict {cod_produto: {ultima_venda, checksum_historico, checksum_estoque, bloqueio, horizonte}}
+    """
+    from psycopg2.extras import RealDictCursor
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("""
+        SELECT cod_produto, ultima_venda, checksum_historico, checksum_estoque, bloqueio, horizonte
+        FROM demanda_calculo_fingerprint
+        WHERE cnpj_fornecedor = %s
+    """, (cnpj_fornecedor,))
+
+    resultado = {}
+    for row in cursor.fetchall():
+        cod = int(row.pop('cod_produto'))
+        resultado[cod] = dict(row)
+
+    cursor.close()
+    return resultado
+
+
+def fingerprint_alterado(atual: Dict, anterior: Optional[Dict]) -> bool:
+    """Retorna True se o item precisa ser recalculado (fingerprint novo ou diferente)."""
+    if not anterior:
+        return True
+    campos = ('ultima_venda', 'checksum_historico', 'checksum_estoque', 'bloqueio', 'horizonte')
+    return any(atual.get(c) != anterior.get(c) for c in campos)
+
+
+def salvar_fingerprints(conn, cnpj_fornecedor: str, fingerprints: Dict[int, Dict], execucao_id: int = None):
+    """
+    Grava (upsert) os fingerprints dos itens efetivamente recalculados.
+    Chamado apos a gravacao da demanda, para que uma falha no meio do fornecedor
+    faca os itens serem recalculados na proxima execucao.
+    """
+    if not fingerprints:
+        return 0
+
+    from psycopg2.extras import execute_values
+    cursor = conn.cursor()
+
+    valores = [
+        (
+            str(cod), cnpj_fornecedor,
+            fp.get('ultima_venda'), fp.get('checksum_historico'), fp.get('checksum_estoque'),
+            fp.get('bloqueio'), fp.get('horizonte'), execucao_id
+        )
+        for cod, fp in fingerprints.items()
+    ]
+    execute_values(cursor, """
+        INSERT INTO demanda_calculo_fingerprint (
+            cod_produto, cnpj_fornecedor,
+            ultima_venda, checksum_historico, checksum_estoque,
+            bloqueio, horizonte, execucao_id, atualizado_em
+        ) VALUES %s
+        ON CONFLICT (cod_produto, cnpj_fornecedor) DO UPDATE SET
+            ultima_venda = EXCLUDED.ultima_venda,
+            checksum_historico = EXCLUDED.checksum_historico,
+            checksum_estoque = EXCLUDED.checksum_estoque,
+            bloqueio = EXCLUDED.bloqueio,
+            horizonte = EXCLUDED.horizonte,
+            execucao_id = EXCLUDED.execucao_id,
+            atualizado_em = NOW()
+    """, valores, template="(%s, %s, %s, %s, %s, %s, %s, %s, NOW())")
+
+    conn.commit()
+    return len(valores)
+
+
+def carregar_itens_fornecedor(conn, cnpj_fornecedor: str, incremental: bool = False,
+                              perfil: PerfilEtapas = None, parte: Tuple[int, int] = None) -> Dict:
     """
-    Processa todos os itens de um fornecedor.
-    OTIMIZADO: Pre-carrega historico em lote e salva em batch.
+    Lista itens do fornecedor, aplica filtro EN/FL e pre-carrega historico e estoque.
+    Etapa de I/O comum aos modos 'threads' e 'processos'.
 
     FILTRO v6.2: Itens com situacao EN (Em Negociacao) ou FL (Fora de Linha)
     nao tem demanda calculada. O filtro e por loja especifica.
-    """
-    conn = None
-    try:
-        conn = obter_conexao()
-        ano_base = datetime.now().year
 
-        # Buscar itens do fornecedor
-        itens = buscar_itens_fornecedor(conn, cnpj_fornecedor)
-        if not itens:
-            return {
-                'cnpj': cnpj_fornecedor,
-                'nome': nome_fornecedor,
-                'itens': 0,
-                'itens_filtrados_en_fl': 0,
-                'registros': 0,
-                'erros': 0,
-                'sucesso': True
-            }
+    INCREMENTAL: Com incremental=True, so pre-carrega e recalcula itens cujo
+    fingerprint (ultima venda, checksum de historico/estoque, bloqueio EN/FL,
+    horizonte) difere do gravado no ultimo calculo.
 
-        cod_produtos = [item['cod_produto'] for item in itens]
+    PARTE: Com parte=(indice, total), carrega apenas um de `total` subconjuntos
+    intercalados dos itens (fornecedor grande dividido entre workers).
 
+    Returns:
+        Dict com itens, itens_ativos, itens_filtrados, itens_inalterados,
+        fingerprints, historico (HistoricoDenso com vendas e estoque) e perfil
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+
+    # Buscar itens do fornecedor
+    inicio = time.perf_counter()
+    itens = buscar_itens_fornecedor(conn, cnpj_fornecedor)
+    if parte:
+        indice, total_partes = parte
+        itens = itens[indice::total_partes]
+    perfil.registrar('listagem_itens', (time.perf_counter() - inicio) * 1000, len(itens))
+    dados = {
+        'itens': itens,
+        'itens_ativos': [],
+        'itens_filtrados': 0,
+        'itens_inalterados': 0,
+        'fingerprints': {},
+        'historico': None,
+        'perfil': perfil
+    }
+    if not itens:
+        return dados
+
+    with perfil.medir('filtro_bloqueio', itens=len(itens)):
         # FILTRO EN/FL v6.2: Buscar itens bloqueados por loja
         itens_bloqueados = buscar_itens_bloqueados(conn, cnpj_fornecedor)
         total_lojas = buscar_total_lojas(conn)
 
         # Identificar itens bloqueados em TODAS as lojas (nao calcular demanda)
-        itens_filtrados = 0
-        itens_ativos = []
         for item in itens:
             cod_produto = item['cod_produto']
             lojas_bloqueadas = itens_bloqueados.get(cod_produto, set())
 
             # Se bloqueado em todas as lojas, nao calcular demanda
             if len(lojas_bloqueadas) >= total_lojas:
-                itens_filtrados += 1
+                dados['itens_filtrados'] += 1
                 logger.debug(f"  Item {cod_produto} filtrado (EN/FL em todas as lojas)")
             else:
-                itens_ativos.append(item)
+                dados['itens_ativos'].append(item)
+
+    if dados['itens_filtrados'] > 0:
+        logger.info(f"  {dados['itens_filtrados']} itens filtrados (EN/FL em todas as lojas)")
+
+    # Fingerprint das entradas (sempre calculado, para servir de base ao proximo incremental)
+    cod_produtos_ativos = [item['cod_produto'] for item in dados['itens_ativos']]
+    inicio = time.perf_counter()
+    try:
+        horizonte = horizonte_previsao_atual()
+        fingerprints = buscar_fingerprints_entrada(conn, cod_produtos_ativos)
+        for cod_produto in cod_produtos_ativos:
+            fp = fingerprints.setdefault(cod_produto, {
+                'ultima_venda': None, 'checksum_historico': None, 'checksum_estoque': None
+            })
+            fp['bloqueio'] = ','.join(str(l) for l in sorted(itens_bloqueados.get(cod_produto, set())))
+            fp['horizonte'] = horizonte
+        dados['fingerprints'] = fingerprints
+
+        if incremental:
+            anteriores = buscar_fingerprints_salvos(conn, cnpj_fornecedor)
+            alterados = [
+                item for item in dados['itens_ativos']
+                if fingerprint_alterado(fingerprints[item['cod_produto']], anteriores.get(item['cod_produto']))
+            ]
+            dados['itens_inalterados'] = len(dados['itens_ativos']) - len(alterados)
+            dados['itens_ativos'] = alterados
+            cod_produtos_ativos = [item['cod_produto'] for item in alterados]
+            if dados['itens_inalterados'] > 0:
+                logger.info(f"  {dados['itens_inalterados']} itens inalterados (incremental)")
+    except Exception as e:
+        # Sem tabela de fingerprint (migration V57 pendente): recalculo completo
+        logger.warning(f"  Fingerprint indisponivel, recalculando todos os itens: {e}")
+        conn.rollback()
+        dados['fingerprints'] = {}
+    perfil.registrar('fingerprint', (time.perf_counter() - inicio) * 1000, len(dados['fingerprints']))
+
+    # PRE-CARREGAR HISTORICO EM LOTE (apenas itens ativos)
+    logger.debug(f"  Pre-carregando historico de {len(cod_produtos_ativos)} itens ativos...")
+    with perfil.medir('preload_historico', itens=len(cod_produtos_ativos)):
+        dados['historico'] = precarregar_historico_lote(conn, cod_produtos_ativos, cnpj_fornecedor)
+
+    # V51: Pre-carregar estoque diario para correcao de demanda censurada
+    try:
+        with perfil.medir('preload_estoque', itens=len(cod_produtos_ativos)):
+            precarregar_estoque_diario_lote(conn, dados['historico'])
+        logger.debug(f"  Historico denso: {dados['historico'].nbytes / 1024 / 1024:.1f} MB")
+    except Exception as e:
+        logger.debug(f"  Sem dados de estoque diario: {e}")
+
+    perfil.atualizar_memoria()
+    return dados
+
+
+def montar_chunks_itens(dados: Dict, tamanho_chunk: int) -> List[HistoricoDenso]:
+    """
+    Divide os itens ativos em chunks auto-contidos (historico + estoque de cada item).
+    Cada chunk e um HistoricoDenso com o subconjunto de itens: pode ser enviado
+    a um processo separado sem acesso ao banco (serializa apenas arrays).
+
+    Returns:
+        Lista de HistoricoDenso, cada um com ate tamanho_chunk itens
+    """
+    historico = dados['historico']
+    tamanho_chunk = max(1, int(tamanho_chunk))
+    cod_produtos = [item['cod_produto'] for item in dados['itens_ativos']]
+    if historico is None:
+        return []
+
+    return [
+        historico.subconjunto(cod_produtos[i:i + tamanho_chunk])
+        for i in range(0, len(cod_produtos), tamanho_chunk)
+    ]
 
-        if itens_filtrados > 0:
-            logger.info(f"  {itens_filtrados} itens filtrados (EN/FL em todas as lojas)")
 
-        # PRE-CARREGAR HISTORICO EM LOTE (apenas itens ativos)
-        cod_produtos_ativos = [item['cod_produto'] for item in itens_ativos]
-        logger.debug(f"  Pre-carregando historico de {len(cod_produtos_ativos)} itens ativos...")
-        cache_historico = precarregar_historico_lote(conn, cod_produtos_ativos, cnpj_fornecedor)
+def calcular_chunk_itens(cnpj_fornecedor: str, chunk: HistoricoDenso,
+                         ano_base: int) -> Tuple[List[RegistroDemanda], List[int], PerfilEtapas]:
+    """
+    Calcula a demanda mensal e a semanal derivada (V55) de um chunk de itens
+    com historico pre-carregado. A semanal e agregada dos mesmos arrays diarios
+    da mensal (mesmo snapshot, sem segunda leitura do banco).
+    Nao acessa o banco: roda tanto em thread quanto em processo do pool.
+
+    Args:
+        cnpj_fornecedor: CNPJ do fornecedor
+        chunk: HistoricoDenso com os itens do chunk
+        ano_base: Ano base do calculo
+
+    Returns:
+        (registros, itens_com_erro, perfil) - registros mensais e semanais
+        (tipo_granularidade='semanal'); perfil com tempo por etapa e pico de
+        memoria do processo que calculou o chunk
+    """
+    registros = []
+    itens_com_erro = []
+    perfil = PerfilEtapas()
 
-        # V51: Pre-carregar estoque diario para correcao de demanda censurada
-        cache_estoque = {}
+    # Fase 1: censura por item, outliers de todos os itens em lote
+    preparos = {}
+    for cod_produto in chunk.cod_produtos:
+        cod_produto = int(cod_produto)
         try:
-            cache_estoque = precarregar_estoque_diario_lote(conn, cod_produtos_ativos)
-            if cache_estoque:
-                logger.debug(f"  Estoque diario carregado para {len(cache_estoque)} itens")
+            # V51: Estoque diario (no proprio HistoricoDenso) para correcao de censura
+            preparos[cod_produto] = preparar_serie_item_denso(
+                chunk.item(cod_produto),
+                tem_estoque=chunk.tem_estoque(cod_produto),
+                perfil=perfil,
+                remover_outliers=False
+            )
         except Exception as e:
-            logger.debug(f"  Sem dados de estoque diario: {e}")
+            itens_com_erro.append(cod_produto)
+            logger.debug(f"Erro item {cod_produto}: {e}")
 
-        # Processar itens usando cache
-        todos_registros = []
-        total_erros = 0
+    limpas = _remover_outliers_lote(
+        {cod: preparo['serie_censurada'] for cod, preparo in preparos.items() if preparo is not None}, perfil
+    )
+    for cod_produto, serie_limpa in limpas.items():
+        preparos[cod_produto]['serie_limpa'] = serie_limpa
 
-        for item in itens_ativos:
-            try:
-                cod_produto = item['cod_produto']
-                serie, meta_hist = cache_historico.get(cod_produto, ([], {}))
-
-                # V51: Passar estoque diario para correcao de censura
-                estoque_item = cache_estoque.get(cod_produto, None)
-
-                registros = calcular_demanda_item_com_cache(
-                    cod_produto,
-                    cnpj_fornecedor,
-                    serie,
-                    meta_hist,
-                    ano_base,
-                    estoque_por_data=estoque_item
-                )
-                todos_registros.extend(registros)
-            except Exception as e:
-                total_erros += 1
-                logger.debug(f"Erro item {item['cod_produto']}: {e}")
+    # Fase 2: backtesting de todos os itens do chunk em lote
+    validos = {cod: preparo for cod, preparo in preparos.items() if preparo is not None}
+    backtestings = backtesting_lote_chunk(validos, perfil)
 
-        # SALVAR TODOS OS REGISTROS MENSAIS EM UM UNICO BATCH
-        total_registros = 0
-        if todos_registros:
-            total_registros = salvar_demanda_batch(conn, todos_registros)
+    # Fatores sazonais e YoY de todos os itens do chunk em uma chamada
+    with perfil.medir('fator_yoy', itens=len(validos)):
+        fatores = calcular_fatores_mensais_lote({
+            cod: vendas_mensais_item_denso(chunk.item(cod), preparo)[0] for cod, preparo in validos.items()
+        })
 
-        # V55: CALCULAR E SALVAR DEMANDA SEMANAL (derivada da mensal)
-        total_registros_semanais = 0
+    # Fase 3: metodo escolhido -> sazonalidade/YoY/V11 e semanal derivada
+    # Series e backtesting de cada item sao liberados assim que o item fica pronto:
+    # ate a gravacao so restam os RegistroDemanda
+    for cod_produto in list(preparos):
+        preparo = preparos.pop(cod_produto)
+        backtesting = backtestings.pop(cod_produto, None)
         try:
-            # Construir mapa de registros mensais por item para o calculo semanal
-            registros_mensais_por_item = {}
-            for reg in todos_registros:
-                cod = reg['cod_produto']
-                if cod not in registros_mensais_por_item:
-                    registros_mensais_por_item[cod] = []
-                registros_mensais_por_item[cod].append(reg)
-
-            cache_hist_semanal = precarregar_historico_semanal_lote(conn, cod_produtos_ativos)
-
-            # V51: Pre-carregar estoque semanal para correcao censurada (pesos sazonais)
-            cache_estoque_semanal = {}
-            try:
-                cache_estoque_semanal = precarregar_estoque_semanal_lote(conn, cod_produtos_ativos)
-            except Exception:
-                pass
+            registros_mensais = []
+            if preparo is not None:
+                registros_mensais = finalizar_demanda_item_denso(
+                    cnpj_fornecedor, chunk.item(cod_produto), preparo, perfil,
+                    backtesting=backtesting, fatores_mensais=fatores.pop(cod_produto, None)
+                )
+            registros.extend(registros_mensais)
+        except Exception as e:
+            itens_com_erro.append(cod_produto)
+            logger.debug(f"Erro item {cod_produto}: {e}")
+            continue
 
-            todos_registros_semanais = []
-            for item in itens_ativos:
-                try:
-                    cod_produto = item['cod_produto']
-                    # V53: cache retorna (consolidado, por_loja) tuple
-                    hist_sem_data = cache_hist_semanal.get(cod_produto, ({}, {}))
-                    if isinstance(hist_sem_data, tuple):
-                        hist_sem, hist_sem_loja = hist_sem_data
-                    else:
-                        hist_sem = hist_sem_data
-                        hist_sem_loja = {}
-                    est_sem = cache_estoque_semanal.get(cod_produto, None)
-                    # V55: Passar registros mensais para decomposicao
-                    regs_mensais = registros_mensais_por_item.get(str(cod_produto), [])
-                    registros_sem = calcular_demanda_item_semanal(
-                        cod_produto, cnpj_fornecedor, hist_sem,
-                        registros_mensais=regs_mensais,
-                        estoque_semanal=est_sem,
-                        vendas_semanal_por_loja=hist_sem_loja
-                    )
-                    todos_registros_semanais.extend(registros_sem)
-                except Exception:
-                    pass
-
-            if todos_registros_semanais:
-                total_registros_semanais = salvar_demanda_batch_semanal(conn, todos_registros_semanais)
+        # V55: Demanda semanal derivada da mensal (falha nao invalida o item)
+        try:
+            with perfil.medir('agregacao_semanal', itens=1):
+                hist_sem, hist_sem_loja, est_sem = chunk.agregado_semanal(cod_produto)
+            with perfil.medir('calculo_semanal', itens=1):
+                registros.extend(calcular_demanda_item_semanal(
+                    cod_produto, cnpj_fornecedor, hist_sem,
+                    registros_mensais=registros_mensais,
+                    estoque_semanal=est_sem or None,
+                    vendas_semanal_por_loja=hist_sem_loja
+                ))
         except Exception as e:
-            logger.warning(f"  Erro no calculo semanal: {e}")
-
-        return {
-            'cnpj': cnpj_fornecedor,
-            'nome': nome_fornecedor,
-            'itens': len(itens),
-            'itens_ativos': len(itens_ativos),
-            'itens_filtrados_en_fl': itens_filtrados,
-            'registros': total_registros,
-            'registros_semanais': total_registros_semanais,
-            'erros': total_erros,
-            'sucesso': True
-        }
+            logger.debug(f"Erro semanal item {cod_produto}: {e}")
+
+    perfil.atualizar_memoria()
+    return registros, itens_com_erro, perfil
+
+
+def gravar_resultados_fornecedor(
+    conn,
+    cnpj_fornecedor: str,
+    todos_registros: List[RegistroDemanda],
+    perfil: PerfilEtapas = None
+) -> Tuple[int, int]:
+    """
+    Grava os registros mensais e os semanais derivados (V55) do fornecedor.
+    Etapa de escrita (writer unico por conexao).
+
+    Returns:
+        (total_registros_mensais, total_registros_semanais)
+    """
+    perfil = perfil if perfil is not None else PerfilEtapas()
+
+    registros_mensais = [r for r in todos_registros if r.get('tipo_granularidade') != 'semanal']
+    registros_semanais = [r for r in todos_registros if r.get('tipo_granularidade') == 'semanal']
+
+    # SALVAR TODOS OS REGISTROS MENSAIS EM UM UNICO BATCH
+    total_registros = 0
+    if registros_mensais:
+        with perfil.medir('gravacao_mensal', itens=len(registros_mensais)):
+            total_registros = salvar_demanda_batch(conn, registros_mensais)
+
+    # V55: SALVAR DEMANDA SEMANAL (calculada junto com a mensal, nos chunks)
+    total_registros_semanais = 0
+    if registros_semanais:
+        try:
+            with perfil.medir('gravacao_semanal', itens=len(registros_semanais)):
+                total_registros_semanais = salvar_demanda_batch_semanal(conn, registros_semanais)
+        except Exception as e:
+            logger.warning(f"  Erro ao gravar demanda semanal: {e}")
+            conn.rollback()
+
+    return total_registros, total_registros_semanais
+
+
+def gravar_fingerprints_fornecedor(conn, cnpj_fornecedor: str, dados: Dict,
+                                   itens_com_erro: List[int], execucao_id: int = None):
+    """
+    Grava o fingerprint dos itens recalculados com sucesso.
+    Itens com erro ficam sem fingerprint atualizado e voltam no proximo incremental.
+    """
+    fingerprints = dados.get('fingerprints') or {}
+    if not fingerprints:
+        return
+    com_erro = set(itens_com_erro)
+    recalculados = {
+        item['cod_produto']: fingerprints[item['cod_produto']]
+        for item in dados['itens_ativos']
+        if item['cod_produto'] in fingerprints and item['cod_produto'] not in com_erro
+    }
+    try:
+        salvar_fingerprints(conn, cnpj_fornecedor, recalculados, execucao_id)
+    except Exception as e:
+        logger.warning(f"  Erro gravando fingerprints: {e}")
+        conn.rollback()
+
+
+def _resumo_fornecedor(cnpj_fornecedor: str, nome_fornecedor: str, dados: Dict,
+                       total_registros: int, total_registros_semanais: int, total_erros: int) -> Dict:
+    """Monta o dicionario de resultado de um fornecedor processado com sucesso."""
+    perfil = dados.get('perfil')
+    if perfil is not None:
+        perfil.atualizar_memoria()
+    return {
+        'cnpj': cnpj_fornecedor,
+        'nome': nome_fornecedor,
+        'itens': len(dados['itens']),
+        'itens_ativos': len(dados['itens_ativos']),
+        'itens_filtrados_en_fl': dados['itens_filtrados'],
+        'itens_inalterados': dados.get('itens_inalterados', 0),
+        'registros': total_registros,
+        'registros_semanais': total_registros_semanais,
+        'erros': total_erros,
+        'sucesso': True,
+        'perfil': perfil.como_dict() if perfil is not None else None
+    }
+
+
+def _resumo_fornecedor_erro(cnpj_fornecedor: str, nome_fornecedor: str, erro: Exception) -> Dict:
+    """Monta o dicionario de resultado de um fornecedor que falhou."""
+    return {
+        'cnpj': cnpj_fornecedor,
+        'nome': nome_fornecedor,
+        'itens': 0,
+        'itens_ativos': 0,
+        'itens_filtrados_en_fl': 0,
+        'registros': 0,
+        'erros': 1,
+        'sucesso': False,
+        'erro': str(erro)
+    }
+
+
+def processar_fornecedor(
+    cnpj_fornecedor: str,
+    nome_fornecedor: str,
+    incremental: bool = False,
+    execucao_id: int = None,
+    parte: Tuple[int, int] = None
+) -> Dict:
+    """
+    Processa todos os itens de um fornecedor (modo 'threads').
+    OTIMIZADO: Pre-carrega historico em lote e salva em batch.
+    INCREMENTAL: Recalcula apenas itens com fingerprint alterado.
+    PARTE: Processa apenas a parte (indice, total) dos itens; o checkpoint
+    do fornecedor fica a cargo de quem combina as partes.
+    """
+    conn = None
+    try:
+        conn = obter_conexao()
+        ano_base = datetime.now().year
+        checkpoint_id = None if parte else execucao_id
+
+        dados = carregar_itens_fornecedor(conn, cnpj_fornecedor, incremental=incremental, parte=parte)
+        if not dados['itens']:
+            resultado = _resumo_fornecedor(cnpj_fornecedor, nome_fornecedor, dados, 0, 0, 0)
+            registrar_checkpoint_fornecedor(conn, checkpoint_id, resultado)
+            return resultado
+
+        # Processar itens usando cache (um unico chunk com todos os itens ativos)
+        todos_registros, itens_com_erro = [], []
+        for chunk in montar_chunks_itens(dados, max(1, len(dados['itens_ativos']))):
+            registros, erros_chunk, perfil_chunk = calcular_chunk_itens(cnpj_fornecedor, chunk, ano_base)
+            dados['perfil'].somar(perfil_chunk)
+            todos_registros.extend(registros)
+            itens_com_erro.extend(erros_chunk)
+
+        total_registros, total_registros_semanais = gravar_resultados_fornecedor(
+            conn, cnpj_fornecedor, todos_registros, dados['perfil']
+        )
+        gravar_fingerprints_fornecedor(conn, cnpj_fornecedor, dados, itens_com_erro, execucao_id)
+
+        resultado = _resumo_fornecedor(
+            cnpj_fornecedor, nome_fornecedor, dados,
+            total_registros, total_registros_semanais, len(itens_com_erro)
+        )
+        registrar_checkpoint_fornecedor(conn, checkpoint_id, resultado)
+        return resultado
 
     except Exception as e:
         logger.error(f"Erro processando fornecedor {cnpj_fornecedor}: {e}")
         import traceback
         traceback.print_exc()
-        return {
-            'cnpj': cnpj_fornecedor,
-            'nome': nome_fornecedor,
-            'itens': 0,
-            'itens_ativos': 0,
-            'itens_filtrados_en_fl': 0,
-            'registros': 0,
-            'erros': 1,
-            'sucesso': False,
-            'erro': str(e)
-        }
+        return _resumo_fornecedor_erro(cnpj_fornecedor, nome_fornecedor, e)
     finally:
         if conn:
             conn.close()
 
 
-def executar_calculo(tipo: str = 'cronjob_diario', cnpj_filtro: str = None):
+def combinar_resultados_partes(partes: List[Dict]) -> Dict:
+    """Junta os resultados das partes de um fornecedor dividido em um resultado unico."""
+    combinado = {'cnpj': partes[0]['cnpj'], 'nome': partes[0]['nome']}
+    for campo in ('itens', 'itens_ativos', 'itens_filtrados_en_fl', 'itens_inalterados',
+                  'registros', 'registros_semanais', 'erros'):
+        combinado[campo] = sum(p.get(campo, 0) for p in partes)
+    combinado['sucesso'] = all(p['sucesso'] for p in partes)
+    if not combinado['sucesso']:
+        combinado['erro'] = '; '.join(p['erro'] for p in partes if p.get('erro'))
+
+    perfis = [p['perfil'] for p in partes if p.get('perfil')]
+    combinado['perfil'] = None
+    if perfis:
+        perfil = PerfilEtapas()
+        for perfil_parte in perfis:
+            perfil.somar(perfil_parte)
+        combinado['perfil'] = perfil.como_dict()
+    combinado['partes'] = len(partes)
+    return combinado
+
+
+def executar_fornecedores_threads(
+    tarefas: List[Tuple[Dict, Optional[Tuple[int, int]]]],
+    workers: int = None,
+    incremental: bool = False,
+    execucao_id: int = None
+) -> List[Dict]:
+    """
+    Modo 'threads': uma tarefa (fornecedor ou parte de fornecedor) por thread.
+    As partes de um fornecedor dividido sao combinadas quando a ultima termina,
+    e so entao o checkpoint do fornecedor e gravado.
+
+    Args:
+        tarefas: Lista de (fornecedor, parte) na ordem de submissao (planejar_fornecedores)
+
+    Returns:
+        Lista de resultados por fornecedor
+    """
+    resultados = []
+    partes_concluidas = {}  # cnpj -> resultados das partes
+
+    with ThreadPoolExecutor(max_workers=workers or MAX_WORKERS) as executor:
+        futures = {}
+        for f, parte in tarefas:
+            future = executor.submit(
+                processar_fornecedor, f['cnpj_fornecedor'], f['nome_fornecedor'],
+                incremental, execucao_id, parte=parte
+            )
+            futures[future] = parte
+
+        for future in as_completed(futures):
+            resultado = future.result()
+            parte = futures[future]
+            if parte:
+                partes = partes_concluidas.setdefault(resultado['cnpj'], [])
+                partes.append(resultado)
+                if len(partes) < parte[1]:
+                    continue
+                resultado = combinar_resultados_partes(partes_concluidas.pop(resultado['cnpj']))
+                if execucao_id and resultado['sucesso']:
+                    conn = obter_conexao()
+                    try:
+                        registrar_checkpoint_fornecedor(conn, execucao_id, resultado)
+                    finally:
+                        conn.close()
+            resultados.append(resultado)
+            _log_resultado_fornecedor(resultado)
+
+    return resultados
+
+
+def executar_fornecedores_processos(
+    fornecedores: List[Dict],
+    workers: int = None,
+    tamanho_chunk: int = None,
+    incremental: bool = False,
+    execucao_id: int = None
+) -> List[Dict]:
+    """
+    Modo 'processos': distribui o calculo por item entre processos (contorna o GIL).
+
+    Fluxo:
+    1. Processo principal pre-carrega historico/estoque de cada fornecedor (I/O)
+    2. Itens sao enviados em chunks ao ProcessPoolExecutor (CPU: censura,
+       outliers, backtesting, YoY)
+    3. Registros retornam ao processo principal, que e o writer unico:
+       quando todos os chunks de um fornecedor terminam, grava mensal + semanal
+
+    O pre-carregamento do proximo fornecedor ocorre enquanto os processos
+    calculam os chunks anteriores. O numero de chunks em voo e limitado
+    para conter o uso de memoria.
+
+    Args:
+        fornecedores: Lista de {cnpj_fornecedor, nome_fornecedor}
+        workers: Numero de processos (default MAX_WORKERS_PROCESSOS)
+        tamanho_chunk: Itens por chunk (default TAMANHO_CHUNK_ITENS)
+        incremental: Recalcula apenas itens com fingerprint alterado
+        execucao_id: ID da execucao (gravado junto aos fingerprints)
+
+    Returns:
+        Lista de resultados por fornecedor (mesmo formato de processar_fornecedor)
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    workers = workers or MAX_WORKERS_PROCESSOS
+    tamanho_chunk = tamanho_chunk or TAMANHO_CHUNK_ITENS
+    max_chunks_em_voo = workers * CHUNKS_EM_VOO_POR_WORKER
+    ano_base = datetime.now().year
+
+    resultados = []
+    pendentes = {}  # future -> (cnpj, cod_produtos do chunk)
+    estado = {}     # cnpj -> {nome, dados, registros, itens_com_erro, chunks_restantes}
+
+    def finalizar(conn, cnpj):
+        st = estado.pop(cnpj)
+        try:
+            total_registros, total_semanais = gravar_resultados_fornecedor(
+                conn, cnpj, st['registros'], st['dados']['perfil']
+            )
+            gravar_fingerprints_fornecedor(conn, cnpj, st['dados'], st['itens_com_erro'], execucao_id)
+            resultado = _resumo_fornecedor(
+                cnpj, st['nome'], st['dados'], total_registros, total_semanais,
+                len(st['itens_com_erro'])
+            )
+            registrar_checkpoint_fornecedor(conn, execucao_id, resultado)
+        except Exception as e:
+            logger.error(f"Erro gravando fornecedor {cnpj}: {e}")
+            conn.rollback()
+            resultado = _resumo_fornecedor_erro(cnpj, st['nome'], e)
+        resultados.append(resultado)
+        _log_resultado_fornecedor(resultado)
+
+    def drenar(conn, bloquear: bool):
+        if not pendentes:
+            return
+        concluidos, _ = wait(list(pendentes), timeout=None if bloquear else 0,
+                             return_when=FIRST_COMPLETED)
+        for future in concluidos:
+            cnpj, cods_chunk = pendentes.pop(future)
+            st = estado[cnpj]
+            try:
+                registros, itens_com_erro, perfil_chunk = future.result()
+                # Tempos dos processos sao somados (tempo de CPU por etapa)
+                st['dados']['perfil'].somar(perfil_chunk)
+            except Exception as e:
+                # Falha do processo (ex.: OOM) invalida o chunk inteiro
+                logger.error(f"Erro no chunk do fornecedor {cnpj}: {e}")
+                registros, itens_com_erro = [], cods_chunk
+            st['registros'].extend(registros)
+            st['itens_com_erro'].extend(itens_com_erro)
+            st['chunks_restantes'] -= 1
+            if st['chunks_restantes'] == 0:
+                finalizar(conn, cnpj)
+
+    conn = obter_conexao()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for f in fornecedores:
+                cnpj, nome = f['cnpj_fornecedor'], f['nome_fornecedor']
+                try:
+                    dados = carregar_itens_fornecedor(conn, cnpj, incremental=incremental)
+                except Exception as e:
+                    logger.error(f"Erro processando fornecedor {cnpj}: {e}")
+                    conn.rollback()
+                    resultado = _resumo_fornecedor_erro(cnpj, nome, e)
+                    resultados.append(resultado)
+                    _log_resultado_fornecedor(resultado)
+                    continue
+
+                chunks = montar_chunks_itens(dados, tamanho_chunk)
+                # Historico ja foi copiado para os chunks; liberar no processo principal
+                dados['historico'] = None
+
+                estado[cnpj] = {
+                    'nome': nome,
+                    'dados': dados,
+                    'registros': [],
+                    'itens_com_erro': [],
+                    'chunks_restantes': len(chunks)
+                }
+                if not chunks:
+                    finalizar(conn, cnpj)
+                    continue
+
+                for chunk in chunks:
+                    while len(pendentes) >= max_chunks_em_voo:
+                        drenar(conn, bloquear=True)
+                    future = executor.submit(calcular_chunk_itens, cnpj, chunk, ano_base)
+                    pendentes[future] = (cnpj, [int(c) for c in chunk.cod_produtos])
+
+                # Gravar fornecedores ja concluidos sem esperar
+                drenar(conn, bloquear=False)
+
+            while pendentes:
+                drenar(conn, bloquear=True)
+    finally:
+        conn.close()
+
+    return resultados
+
+
+def _log_resultado_fornecedor(resultado: Dict):
+    """Loga uma linha de resultado por fornecedor."""
+    status = "OK" if resultado['sucesso'] else "ERRO"
+    logger.info(f"  [{status}] {resultado['nome'][:30]:<30} - {resultado['registros']:>6} registros")
+
+
+# =============================================================================
+# MODO FILA (multi-no): fornecedores em demanda_calculo_fila (migration V59)
+# =============================================================================
+
+def identificar_worker() -> str:
+    """Identificador do worker gravado na fila (host:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enfileirar_fornecedores(conn, execucao_id: int, fornecedores: List[Dict],
+                            custos: Dict[str, float] = None) -> int:
+    """
+    Enfileira os fornecedores da execucao com o custo estimado (os workers
+    reservam os maiores primeiro). Na retomada, tarefas que nao terminaram
+    (pendente, em_execucao, erro) voltam para 'pendente'.
+
+    Returns:
+        Numero de tarefas pendentes
+    """
+    if not fornecedores:
+        return 0
+    from psycopg2.extras import execute_values
+    custos = custos or {}
+    cursor = conn.cursor()
+    execute_values(cursor, """
+        INSERT INTO demanda_calculo_fila (execucao_id, cnpj_fornecedor, nome_fornecedor, custo_estimado_ms)
+        VALUES %s
+        ON CONFLICT (execucao_id, cnpj_fornecedor) DO UPDATE SET
+            custo_estimado_ms = EXCLUDED.custo_estimado_ms,
+            status = 'pendente',
+            worker = NULL,
+            tentativas = 0,
+            heartbeat_em = NULL,
+            erro = NULL
+        WHERE demanda_calculo_fila.status <> 'concluido'
+    """, [
+        (execucao_id, f['cnpj_fornecedor'], f['nome_fornecedor'], custos.get(f['cnpj_fornecedor']))
+        for f in fornecedores
+    ])
+    conn.commit()
+    return len(fornecedores)
+
+
+def reenfileirar_expirados(conn, execucao_id: int, timeout_s: int = None) -> int:
+    """
+    Devolve para 'pendente' as tarefas cujo worker parou de mandar heartbeat.
+    Depois de MAX_TENTATIVAS_FILA a tarefa vira 'erro' (ex.: fornecedor que
+    derruba o worker por memoria), para a execucao poder terminar.
+
+    Returns:
+        Numero de tarefas devolvidas a fila
+    """
+    timeout_s = timeout_s or TIMEOUT_HEARTBEAT_FILA
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE demanda_calculo_fila
+        SET status = CASE WHEN tentativas >= %s THEN 'erro' ELSE 'pendente' END,
+            erro = 'Heartbeat expirado (worker ' || COALESCE(worker, '?') || ')',
+            worker = NULL,
+            heartbeat_em = NULL
+        WHERE execucao_id = %s
+          AND status = 'em_execucao'
+          AND heartbeat_em < NOW() - make_interval(secs => %s)
+        RETURNING status
+    """, (MAX_TENTATIVAS_FILA, execucao_id, timeout_s))
+    devolvidas = sum(1 for (status,) in cursor.fetchall() if status == 'pendente')
+    conn.commit()
+    return devolvidas
+
+
+def reservar_fornecedor(conn, execucao_id: int, worker_id: str) -> Optional[Dict]:
+    """
+    Reserva a proxima tarefa pendente (maior custo estimado primeiro).
+    SKIP LOCKED garante que dois workers nunca recebam o mesmo fornecedor,
+    sem esperar pelo lock um do outro.
+
+    Returns:
+        {cnpj_fornecedor, nome_fornecedor, tentativas} ou None se nao ha pendentes
+    """
+    from psycopg2.extras import RealDictCursor
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("""
+        WITH proxima AS (
+            SELECT cnpj_fornecedor
+            FROM demanda_calculo_fila
+            WHERE execucao_id = %s
+              AND status = 'pendente'
+            ORDER BY custo_estimado_ms DESC NULLS LAST, cnpj_fornecedor
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE demanda_calculo_fila f
+        SET status = 'em_execucao',
+            worker = %s,
+            tentativas = f.tentativas + 1,
+            heartbeat_em = NOW(),
+            iniciado_em = NOW()
+        FROM proxima
+        WHERE f.execucao_id = %s
+          AND f.cnpj_fornecedor = proxima.cnpj_fornecedor
+        RETURNING f.cnpj_fornecedor, f.nome_fornecedor, f.tentativas
+    """, (execucao_id, worker_id, execucao_id))
+    row = cursor.fetchone()
+    conn.commit()
+    return dict(row) if row else None
+
+
+def concluir_tarefa_fila(conn, execucao_id: int, worker_id: str, resultado: Dict) -> bool:
+    """
+    Marca a tarefa como concluida (ou erro) com o resumo do fornecedor.
+    So vale se a tarefa ainda pertence ao worker: se ela expirou e foi
+    reservada por outro, o resultado deste worker e descartado.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE demanda_calculo_fila
+        SET status = %s,
+            resultado = %s,
+            erro = %s,
+            concluido_em = NOW()
+        WHERE execucao_id = %s
+          AND cnpj_fornecedor = %s
+          AND worker = %s
+          AND status = 'em_execucao'
+    """, (
+        'concluido' if resultado.get('sucesso') else 'erro',
+        json.dumps(resultado, default=str),
+        resultado.get('erro'),
+        execucao_id, resultado['cnpj'], worker_id
+    ))
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def resumo_fila(conn, execucao_id: int) -> Dict[str, int]:
+    """Contagem de tarefas por status: {pendente, em_execucao, concluido, erro}."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT status, COUNT(*)
+        FROM demanda_calculo_fila
+        WHERE execucao_id = %s
+        GROUP BY status
+    """, (execucao_id,))
+    resumo = {'pendente': 0, 'em_execucao': 0, 'concluido': 0, 'erro': 0}
+    resumo.update({status: int(total) for status, total in cursor.fetchall()})
+    return resumo
+
+
+def buscar_resultados_fila(conn, execucao_id: int, cnpjs: List[str]) -> List[Dict]:
+    """Resumos gravados pelos workers (tarefas que expiraram sem resultado viram erro)."""
+    if not cnpjs:
+        return []
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT cnpj_fornecedor, nome_fornecedor, resultado, erro
+        FROM demanda_calculo_fila
+        WHERE execucao_id = %s
+          AND cnpj_fornecedor = ANY(%s)
+    """, (execucao_id, list(cnpjs)))
+    resultados = []
+    for cnpj, nome, resultado, erro in cursor.fetchall():
+        resultados.append(resultado or _resumo_fornecedor_erro(cnpj, nome or cnpj, Exception(erro or 'sem resultado')))
+    return resultados
+
+
+class HeartbeatFila:
+    """
+    Renova heartbeat_em da tarefa em uma thread (conexao propria) enquanto
+    o worker calcula o fornecedor.
+
+    Uso:
+        with HeartbeatFila(execucao_id, cnpj, worker_id):
+            processar_fornecedor(...)
+    """
+
+    def __init__(self, execucao_id: int, cnpj_fornecedor: str, worker_id: str,
+                 intervalo_s: float = None):
+        self.execucao_id = execucao_id
+        self.cnpj_fornecedor = cnpj_fornecedor
+        self.worker_id = worker_id
+        self.intervalo_s = intervalo_s or INTERVALO_HEARTBEAT_FILA
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        return False
+
+    def _executar(self):
+        conn = None
+        try:
+            conn = obter_conexao()
+            cursor = conn.cursor()
+            while not self._parar.wait(self.intervalo_s):
+                cursor.execute("""
+                    UPDATE demanda_calculo_fila
+                    SET heartbeat_em = NOW()
+                    WHERE execucao_id = %s
+                      AND cnpj_fornecedor = %s
+                      AND worker = %s
+                      AND status = 'em_execucao'
+                """, (self.execucao_id, self.cnpj_fornecedor, self.worker_id))
+                conn.commit()
+                if cursor.rowcount == 0:
+                    logger.warning(f"  Tarefa {self.cnpj_fornecedor} nao pertence mais a {self.worker_id}")
+                    return
+        except Exception as e:
+            logger.warning(f"  Heartbeat interrompido ({self.cnpj_fornecedor}): {e}")
+        finally:
+            if conn:
+                conn.close()
+
+
+def executar_worker_fila(
+    execucao_id: int,
+    incremental: bool = None,
+    worker_id: str = None,
+    intervalo_poll_s: float = None
+) -> List[Dict]:
+    """
+    Worker do modo 'fila': reserva fornecedores da execucao ate a fila esvaziar.
+    Pode rodar em qualquer maquina com acesso ao banco (--worker EXECUCAO_ID).
+
+    Enquanto houver tarefas em execucao em outros workers, continua
+    consultando a fila: se um deles morrer, a tarefa expira e e
+    reprocessada aqui.
+
+    Returns:
+        Resultados dos fornecedores processados por este worker
+    """
+    worker_id = worker_id or identificar_worker()
+    intervalo_poll_s = intervalo_poll_s if intervalo_poll_s is not None else INTERVALO_POLL_FILA
+    resultados = []
+
+    conn = obter_conexao()
+    try:
+        if incremental is None:
+            execucao = buscar_execucao(conn, execucao_id)
+            if not execucao:
+                raise ValueError(f"Execucao nao encontrada: {execucao_id}")
+            incremental = execucao['tipo'] in TIPOS_INCREMENTAIS
+
+        logger.info(f"Worker {worker_id}: execucao #{execucao_id}{' (incremental)' if incremental else ''}")
+        while True:
+            reenfileirar_expirados(conn, execucao_id)
+            tarefa = reservar_fornecedor(conn, execucao_id, worker_id)
+            if tarefa is None:
+                situacao = resumo_fila(conn, execucao_id)
+                if situacao['pendente'] == 0 and situacao['em_execucao'] == 0:
+                    break
+                time.sleep(intervalo_poll_s)
+                continue
+
+            cnpj, nome = tarefa['cnpj_fornecedor'], tarefa['nome_fornecedor']
+            with HeartbeatFila(execucao_id, cnpj, worker_id):
+                resultado = processar_fornecedor(cnpj, nome, incremental, execucao_id)
+            if not concluir_tarefa_fila(conn, execucao_id, worker_id, resultado):
+                logger.warning(f"  Tarefa {cnpj} expirou antes de concluir; resultado descartado")
+                continue
+            resultados.append(resultado)
+            _log_resultado_fornecedor(resultado)
+    finally:
+        conn.close()
+
+    logger.info(f"Worker {worker_id}: {len(resultados)} fornecedores processados")
+    return resultados
+
+
+def coordenar_fila(
+    execucao_id: int,
+    fornecedores: List[Dict],
+    workers: int = None,
+    incremental: bool = False,
+    intervalo_poll_s: float = None,
+    custos: Dict[str, float] = None
+) -> List[Dict]:
+    """
+    Modo 'fila': enfileira os fornecedores, sobe `workers` workers locais
+    (processos) e aguarda a fila esvaziar. Workers de outras maquinas
+    entram com --worker EXECUCAO_ID. Com workers=0 o coordenador apenas
+    aguarda os workers remotos.
+
+    Returns:
+        Resultados por fornecedor lidos da fila (mesmo formato de processar_fornecedor)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = MAX_WORKERS if workers is None else workers
+    intervalo_poll_s = intervalo_poll_s if intervalo_poll_s is not None else INTERVALO_POLL_FILA
+
+    conn = obter_conexao()
+    try:
+        enfileirar_fornecedores(conn, execucao_id, fornecedores, custos)
+        logger.info(f"Fila #{execucao_id}: {len(fornecedores)} fornecedores, {workers} workers locais")
+        logger.info(f"  Workers remotos: python jobs/calcular_demanda_diaria.py --worker {execucao_id}")
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        try:
+            futures = [
+                executor.submit(executar_worker_fila, execucao_id, incremental)
+                for _ in range(workers)
+            ]
+            # O coordenador tambem devolve tarefas expiradas (ex.: todos os workers remotos cairam)
+            while True:
+                reenfileirar_expirados(conn, execucao_id)
+                situacao = resumo_fila(conn, execucao_id)
+                if situacao['pendente'] == 0 and situacao['em_execucao'] == 0:
+                    break
+                if futures and all(f.done() and f.exception() for f in futures):
+                    raise RuntimeError(f"Todos os workers locais falharam: {futures[0].exception()}")
+                time.sleep(intervalo_poll_s)
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Worker local falhou: {e}")
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+
+        return buscar_resultados_fila(conn, execucao_id, [f['cnpj_fornecedor'] for f in fornecedores])
+    finally:
+        conn.close()
+
+
+def executar_calculo(
+    tipo: str = 'cronjob_diario',
+    cnpj_filtro: str = None,
+    modo: str = None,
+    workers: int = None,
+    tamanho_chunk: int = None,
+    incremental: bool = None,
+    retomar_execucao_id: int = None
+):
     """
     Executa o calculo de demanda para todos os fornecedores (ou filtrado).
+    Cada fornecedor gravado gera um checkpoint; retomar_execucao_id continua
+    uma execucao interrompida pulando os fornecedores ja concluidos.
+
+    Args:
+        tipo: Tipo da execucao registrado em demanda_calculo_execucao
+        cnpj_filtro: CNPJ ou nome do fornecedor (opcional)
+        modo: 'threads' (um fornecedor por thread), 'processos'
+              (chunks de itens em ProcessPoolExecutor) ou 'fila' (fornecedores
+              em demanda_calculo_fila, workers locais e remotos; este processo
+              e o coordenador). Default MODO_EXECUCAO_PADRAO
+        workers: Numero de threads/processos (no modo 'fila': workers locais, 0 = so remotos)
+        tamanho_chunk: Itens por chunk no modo 'processos'
+        incremental: Recalcula apenas itens com fingerprint alterado.
+                     Default: incremental para tipos em TIPOS_INCREMENTAIS,
+                     recalculo completo para os demais (--full / --incremental)
+        retomar_execucao_id: ID de uma execucao interrompida (--resume). Tipo e
+                     filtro vem da execucao original
     """
+    modo = modo or MODO_EXECUCAO_PADRAO
+    if modo not in MODOS_EXECUCAO:
+        raise ValueError(f"Modo de execucao invalido: {modo}")
+
+    inicio = time.time()
+    conn = obter_conexao()
+
+    # Retomada: reaproveita a execucao e os checkpoints ja gravados
+    concluidos = {}
+    if retomar_execucao_id:
+        execucao = buscar_execucao(conn, retomar_execucao_id)
+        if not execucao:
+            conn.close()
+            raise ValueError(f"Execucao nao encontrada: {retomar_execucao_id}")
+        tipo = execucao['tipo']
+        cnpj_filtro = execucao['cnpj_fornecedor_filtro']
+        concluidos = buscar_checkpoints(conn, retomar_execucao_id)
+
+    if incremental is None:
+        incremental = tipo in TIPOS_INCREMENTAIS
+
     logger.info("=" * 60)
     logger.info("  CALCULO DIARIO DE DEMANDA PRE-CALCULADA")
     logger.info(f"  Data: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"  Tipo: {tipo}")
+    logger.info(f"  Modo: {modo}{' (incremental)' if incremental else ''}")
     if cnpj_filtro:
         logger.info(f"  Filtro: {cnpj_filtro}")
+    if retomar_execucao_id:
+        logger.info(f"  Retomando execucao #{retomar_execucao_id} ({len(concluidos)} fornecedores ja concluidos)")
     logger.info("=" * 60)
 
-    inicio = time.time()
-    conn = obter_conexao()
-
     # Registrar inicio
-    execucao_id = registrar_inicio_execucao(conn, tipo, cnpj_filtro)
+    execucao_id = retomar_execucao_id or registrar_inicio_execucao(conn, tipo, cnpj_filtro)
 
-    # Buscar fornecedores
-    fornecedores = buscar_fornecedores(conn, cnpj_filtro)
+    # Buscar fornecedores (pulando os que ja tem checkpoint)
+    todos_fornecedores = buscar_fornecedores(conn, cnpj_filtro)
+    fornecedores = [f for f in todos_fornecedores if f['cnpj_fornecedor'] not in concluidos]
+    registrar_progresso_execucao(conn, execucao_id, len(todos_fornecedores), retomada=bool(retomar_execucao_id))
     logger.info(f"Fornecedores a processar: {len(fornecedores)}")
 
-    conn.close()
+    # Escalonamento por custo: maiores fornecedores primeiro (tempo da execucao
+    # anterior ou volume de historico); sem estimativa mantem a ordem original
+    custos = {}
+    try:
+        custos = estimar_custos_fornecedores(conn, fornecedores, tipo)
+        fornecedores = sorted(fornecedores, key=lambda f: custos.get(f['cnpj_fornecedor'], 0), reverse=True)
+        for f in fornecedores[:3]:
+            logger.info(f"  Maior custo: {f['nome_fornecedor'][:30]:<30} ~{custos.get(f['cnpj_fornecedor'], 0)/1000:.1f}s")
+    except Exception as e:
+        logger.warning(f"Estimativa de custo indisponivel, ordem original: {e}")
+        conn.rollback()
 
-    # Processar em paralelo
-    resultados = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(processar_fornecedor, f['cnpj_fornecedor'], f['nome_fornecedor']): f
-            for f in fornecedores
-        }
+    conn.close()
 
-        for future in as_completed(futures):
-            resultado = future.result()
-            resultados.append(resultado)
-            status = "OK" if resultado['sucesso'] else "ERRO"
-            logger.info(f"  [{status}] {resultado['nome'][:30]:<30} - {resultado['registros']:>6} registros")
+    # Processar em paralelo (resultados de checkpoints anteriores entram nas metricas)
+    resultados = [r for r in concluidos.values() if r]
+    if modo == 'fila':
+        resultados += coordenar_fila(
+            execucao_id, fornecedores, workers=workers, incremental=incremental, custos=custos
+        )
+    elif modo == 'processos':
+        resultados += executar_fornecedores_processos(
+            fornecedores, workers=workers, tamanho_chunk=tamanho_chunk,
+            incremental=incremental, execucao_id=execucao_id
+        )
+    else:
+        tarefas = planejar_fornecedores(
+            fornecedores, custos, workers or MAX_WORKERS, max_partes=MAX_PARTES_FORNECEDOR
+        )
+        resultados += executar_fornecedores_threads(
+            tarefas, workers=workers, incremental=incremental, execucao_id=execucao_id
+        )
 
     # Consolidar metricas
     total_itens = sum(r['itens'] for r in resultados)
     total_registros = sum(r['registros'] for r in resultados)
     total_erros = sum(r['erros'] for r in resultados)
+    total_inalterados = sum(r.get('itens_inalterados', 0) for r in resultados)
     tempo_ms = int((time.time() - inicio) * 1000)
 
+    # Perfil por etapa: agregado da execucao + detalhe por fornecedor
+    perfil_execucao = PerfilEtapas()
+    perfil_fornecedores = []
+    for r in resultados:
+        if r.get('perfil'):
+            perfil_execucao.somar(r['perfil'])
+            perfil_fornecedores.append({
+                'cnpj': r['cnpj'], 'nome': r['nome'], 'itens_ativos': r.get('itens_ativos', 0),
+                **r['perfil']
+            })
+    perfil_execucao.atualizar_memoria()
+    perfil_fornecedores.sort(key=lambda p: p['tempo_total_ms'], reverse=True)
+
     metricas = {
         'total_itens': total_itens,
         'total_registros': total_registros,
         'total_erros': total_erros,
-        'total_fornecedores': len(fornecedores),
+        'total_fornecedores': len(todos_fornecedores),
         'tempo_ms': tempo_ms,
         'detalhes': {
-            'fornecedores': [r for r in resultados if not r['sucesso']]
+            'incremental': incremental,
+            'itens_inalterados': total_inalterados,
+            'fornecedores_retomados': len(concluidos),
+            'fornecedores': [r for r in resultados if not r['sucesso']],
+            'perfil': {
+                **perfil_execucao.como_dict(),
+                'modo': modo,
+                'tempo_execucao_ms': tempo_ms,
+                'fornecedores': perfil_fornecedores
+            }
         }
     }
 
@@ -1920,11 +3314,19 @@ def executar_calculo(tipo: str = 'cronjob_diario', cnpj_filtro: str = None):
 
     logger.info("=" * 60)
     logger.info(f"  RESULTADO: {status_final.upper()}")
-    logger.info(f"  Fornecedores: {len(fornecedores)}")
+    logger.info(f"  Fornecedores: {len(todos_fornecedores)}")
+    if concluidos:
+        logger.info(f"  Fornecedores pulados (checkpoint): {len(concluidos)}")
     logger.info(f"  Itens processados: {total_itens:,}")
+    if incremental:
+        logger.info(f"  Itens inalterados (nao recalculados): {total_inalterados:,}")
     logger.info(f"  Registros salvos: {total_registros:,}")
     logger.info(f"  Erros: {total_erros}")
     logger.info(f"  Tempo: {tempo_ms/1000:.1f}s")
+    for etapa, valores in perfil_execucao.como_dict()['etapas'].items():
+        logger.info(f"    {etapa:<20} {valores['tempo_ms']/1000:>9.1f}s  {valores['itens']:>9,} itens")
+    if perfil_execucao.memoria_pico_mb is not None:
+        logger.info(f"  Memoria pico: {perfil_execucao.memoria_pico_mb:,.0f} MB")
     logger.info("=" * 60)
 
     return metricas
@@ -1950,7 +3352,10 @@ def verificar_status():
 
     print("\nUltimas 5 execucoes:")
     for row in cursor.fetchall():
-        print(f"  {row['data_execucao']} | {row['tipo']:<20} | {row['status']:<10} | {row['total_itens_processados']:>6} itens")
+        progresso = ''
+        if row.get('total_fornecedores_previstos'):
+            progresso = f" | {row.get('fornecedores_concluidos') or 0}/{row['total_fornecedores_previstos']} fornecedores"
+        print(f"  #{row['id']} {row['data_execucao']} | {row['tipo']:<20} | {row['status']:<10} | {row['total_itens_processados']:>6} itens{progresso}")
 
     # Total de registros
     cursor.execute("SELECT COUNT(*) as total FROM demanda_pre_calculada")
@@ -2004,15 +3409,39 @@ def main():
                         help='CNPJ do fornecedor para recalculo especifico')
     parser.add_argument('--status', action='store_true',
                         help='Mostra status das ultimas execucoes')
+    parser.add_argument('--modo', choices=MODOS_EXECUCAO, default=None,
+                        help=f'Motor de execucao (default: {MODO_EXECUCAO_PADRAO})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Numero de threads/processos (modo fila: workers locais, 0 = so remotos)')
+    parser.add_argument('--chunk', type=int, default=None,
+                        help=f'Itens por chunk no modo processos (default: {TAMANHO_CHUNK_ITENS})')
+
+    parser.add_argument('--full', action='store_true',
+                        help='Forca recalculo completo (ignora fingerprints)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Recalcula apenas itens com vendas/estoque/bloqueio alterados')
+    parser.add_argument('--resume', type=int, default=None, metavar='EXECUCAO_ID',
+                        help='Retoma uma execucao interrompida, pulando fornecedores ja concluidos')
+    parser.add_argument('--worker', type=int, default=None, metavar='EXECUCAO_ID',
+                        help='Worker do modo fila: processa fornecedores enfileirados da execucao')
 
     args = parser.parse_args()
+    incremental = False if args.full else (True if args.incremental else None)
+    opcoes_execucao = {
+        'modo': args.modo, 'workers': args.workers, 'tamanho_chunk': args.chunk,
+        'incremental': incremental
+    }
 
     if args.status:
         verificar_status()
+    elif args.worker:
+        executar_worker_fila(args.worker, incremental=incremental)
+    elif args.resume:
+        executar_calculo(retomar_execucao_id=args.resume, **opcoes_execucao)
     elif args.fornecedor:
-        executar_calculo(tipo='recalculo_fornecedor', cnpj_filtro=args.fornecedor)
+        executar_calculo(tipo='recalculo_fornecedor', cnpj_filtro=args.fornecedor, **opcoes_execucao)
     elif args.manual:
-        executar_calculo(tipo='manual')
+        executar_calculo(tipo='manual', **opcoes_execucao)
     else:
         iniciar_scheduler()
 
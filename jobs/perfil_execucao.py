@@ -0,0 +1,124 @@
+"""
+Perfil de Execucao do Calculo de Demanda
+========================================
+Tempo e volume por etapa do cronjob (jobs/calcular_demanda_diaria.py),
+medidos por fornecedor e agregados por execucao. O resultado e gravado
+como JSON em demanda_calculo_execucao.detalhes['perfil'] e servido por
+/api/demanda_job/perfil.
+
+Serve para identificar qual etapa regrediu quando uma nova regra Vxx
+e adicionada ao calculo.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+# Etapas medidas, na ordem do fluxo do cronjob
+ETAPAS_CALCULO = (
+    'listagem_itens',       # buscar_itens_fornecedor
+    'filtro_bloqueio',      # EN/FL por loja (v6.2)
+    'fingerprint',          # fingerprint de entrada / modo incremental
+    'preload_historico',    # precarregar_historico_lote
+    'preload_estoque',      # precarregar_estoque_diario_lote
+    'correcao_censura',     # V51/V53
+    'deteccao_outliers',    # V48
+    'backtesting_metodo',   # DemandCalculator (selecao de metodo)
+    'fator_yoy',            # sazonalidade + tendencia YoY + limitador V11
+    'agregacao_semanal',    # semanas ISO a partir dos arrays diarios (V55)
+    'calculo_semanal',      # V55
+    'gravacao_mensal',      # salvar_demanda_batch
+    'gravacao_semanal',     # salvar_demanda_batch_semanal
+)
+
+
+def memoria_pico_mb() -> Optional[float]:
+    """
+    Pico de memoria residente do processo atual (MB).
+    None onde o modulo resource nao existe (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(pico / divisor, 1)
+
+
+class PerfilEtapas:
+    """
+    Acumula tempo (ms), itens e chamadas por etapa.
+
+    Uso:
+        perfil = PerfilEtapas()
+        with perfil.medir('preload_historico', itens=len(cods)):
+            ...
+        perfil.como_dict()
+    """
+
+    __slots__ = ('etapas', 'memoria_pico_mb')
+
+    def __init__(self, etapas: Dict = None, memoria_pico_mb: float = None):
+        self.etapas = {}
+        self.memoria_pico_mb = memoria_pico_mb
+        if etapas:
+            self.somar(etapas)
+
+    @contextmanager
+    def medir(self, etapa: str, itens: int = 0):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, (time.perf_counter() - inicio) * 1000, itens)
+
+    def registrar(self, etapa: str, tempo_ms: float, itens: int = 0, chamadas: int = 1):
+        atual = self.etapas.get(etapa)
+        if atual is None:
+            atual = self.etapas[etapa] = {'tempo_ms': 0.0, 'itens': 0, 'chamadas': 0}
+        atual['tempo_ms'] += tempo_ms
+        atual['itens'] += itens
+        atual['chamadas'] += chamadas
+
+    def somar(self, outro):
+        """Soma outro perfil (PerfilEtapas ou dict de como_dict) neste."""
+        if isinstance(outro, PerfilEtapas):
+            etapas, memoria = outro.etapas, outro.memoria_pico_mb
+        else:
+            etapas, memoria = outro.get('etapas', outro), outro.get('memoria_pico_mb')
+        for etapa, valores in etapas.items():
+            if isinstance(valores, dict):
+                self.registrar(etapa, valores.get('tempo_ms', 0), valores.get('itens', 0), valores.get('chamadas', 0))
+        self.atualizar_memoria(memoria)
+        return self
+
+    def atualizar_memoria(self, memoria_mb: Optional[float] = None):
+        """Mantem o maior pico de memoria visto (default: processo atual)."""
+        if memoria_mb is None:
+            memoria_mb = memoria_pico_mb()
+        if memoria_mb is not None:
+            self.memoria_pico_mb = max(self.memoria_pico_mb or 0, memoria_mb)
+
+    @property
+    def tempo_total_ms(self) -> float:
+        return sum(v['tempo_ms'] for v in self.etapas.values())
+
+    def como_dict(self) -> Dict:
+        """Estrutura JSON: etapas na ordem de ETAPAS_CALCULO, tempos arredondados."""
+        ordem = list(ETAPAS_CALCULO) + sorted(e for e in self.etapas if e not in ETAPAS_CALCULO)
+        return {
+            'etapas': {
+                etapa: {
+                    'tempo_ms': round(self.etapas[etapa]['tempo_ms'], 1),
+                    'itens': self.etapas[etapa]['itens'],
+                    'chamadas': self.etapas[etapa]['chamadas'],
+                }
+                for etapa in ordem if etapa in self.etapas
+            },
+            'tempo_total_ms': round(self.tempo_total_ms, 1),
+            'memoria_pico_mb': self.memoria_pico_mb,
+        }
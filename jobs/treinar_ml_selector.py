@@ -0,0 +1,137 @@
+"""
+Job: Treinar Seletor ML de Metodos
+==================================
+Treina o MLMethodSelector offline e salva o modelo em disco (versionado).
+A tela de previsao (processar_previsao) carrega o modelo salvo mais recente
+em vez de treinar um novo a cada upload.
+
+Este job:
+1. Le um ou mais arquivos de vendas diarias (mesmo formato do upload)
+2. Agrega e trata stockouts como a previsao (Vendas_Corrigidas)
+3. Avalia as series SKU/Loja em paralelo (processos) e treina o RandomForest
+4. Salva modelo + scaler + esquema de features em ML_SELECTOR_DIR
+
+Modos de Operacao:
+==================
+1. RETREINAR:
+   python jobs/treinar_ml_selector.py --arquivo vendas_2025.xlsx vendas_2026.xlsx --workers 4
+
+2. VERIFICAR MODELO ATUAL:
+   python jobs/treinar_ml_selector.py --status --granularidade mensal
+
+Cada granularidade (semanal/mensal) tem o seu modelo: a tela de previsao so
+usa um modelo treinado na mesma granularidade do upload.
+"""
+
+import sys
+import os
+import argparse
+import logging
+from typing import List
+
+import pandas as pd
+
+# Adicionar pasta raiz ao path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+)
+logger = logging.getLogger(__name__)
+
+from core.ml_selector import MLMethodSelector, caminho_modelo_atual, diretorio_modelos
+
+
+def carregar_historico_treino(arquivos: List[str], granularidade: str = 'semanal') -> pd.DataFrame:
+    """
+    Historico SKU/Loja/Mes/Vendas dos arquivos, preparado como em processar_previsao
+    (agregacao na granularidade + vendas corrigidas de stockout).
+    """
+    from core.data_adapter import DataAdapter
+    from core.stockout_handler import processar_stockouts_dataframe
+
+    partes = []
+    for arquivo in arquivos:
+        adapter = DataAdapter(arquivo)
+        valido, mensagens = adapter.carregar_e_validar()
+        if not valido:
+            raise ValueError(f"Dados invalidos em {arquivo}: {'; '.join(mensagens)}")
+
+        df = adapter.converter_para_formato_legado(granularidade=granularidade)
+        if 'Mes_Projetado' not in df.columns:
+            df['Mes_Projetado'] = False
+            df['Taxa_Progresso'] = 1.0
+            df['Vendas_Original'] = df['Vendas']
+        df = processar_stockouts_dataframe(df)
+        partes.append(
+            df[['SKU', 'Loja', 'Mes', 'Vendas_Corrigidas']].rename(columns={'Vendas_Corrigidas': 'Vendas'})
+        )
+        logger.info(f"{arquivo}: {len(df):,} registros ({granularidade})")
+
+    historico = pd.concat(partes, ignore_index=True)
+    # Arquivos com periodos sobrepostos: manter o ultimo valor de cada periodo
+    return historico.drop_duplicates(subset=['SKU', 'Loja', 'Mes'], keep='last')
+
+
+def treinar(arquivos: List[str], granularidade: str = 'semanal', workers: int = None,
+            diretorio: str = None) -> dict:
+    """Treina o seletor com os arquivos e salva o modelo. Retorna as estatisticas."""
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+
+    historico = carregar_historico_treino(arquivos, granularidade)
+    seletor = MLMethodSelector()
+    stats = seletor.treinar_com_historico(historico, workers=workers)
+    if not stats['sucesso']:
+        logger.warning(f"Modelo nao treinado: {stats['series_validas']} series validas")
+        return stats
+
+    stats['caminho'] = seletor.salvar(granularidade, diretorio)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Treinar seletor ML de metodos (offline)')
+    parser.add_argument('--arquivo', nargs='+', help='Arquivos de vendas diarias (formato do upload)')
+    parser.add_argument('--granularidade', choices=['semanal', 'mensal'], default='semanal',
+                        help='Agregacao das series (default: semanal, como a tela de previsao)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processos para avaliar as series (default: CPUs - 1; 0 = sequencial)')
+    parser.add_argument('--diretorio', type=str, default=None,
+                        help='Pasta dos modelos (default: ML_SELECTOR_DIR ou outputs/modelos)')
+    parser.add_argument('--status', action='store_true', help='Mostrar modelo atual')
+
+    args = parser.parse_args()
+
+    if args.status:
+        caminho = caminho_modelo_atual(args.granularidade, args.diretorio)
+        print("\n" + "=" * 60)
+        print("SELETOR ML DE METODOS")
+        print("=" * 60)
+        print(f"Pasta: {args.diretorio or diretorio_modelos()}")
+        print(f"Granularidade: {args.granularidade}")
+        if caminho is None:
+            print("Nenhum modelo salvo (previsao treina no upload)")
+        else:
+            seletor = MLMethodSelector.carregar(caminho)
+            stats = seletor.estatisticas_treino or {}
+            print(f"Modelo: {os.path.basename(caminho)}")
+            print(f"Treinado em: {seletor.treinado_em}")
+            print(f"Series: {stats.get('series_validas', 'N/A')}")
+        print("=" * 60 + "\n")
+        return
+
+    if not args.arquivo:
+        parser.error('informe --arquivo ou --status')
+
+    stats = treinar(args.arquivo, args.granularidade, args.workers, args.diretorio)
+    if not stats['sucesso']:
+        sys.exit(1)
+    print(f"Sucesso: {stats['series_validas']} series, acuracia {stats['acuracia']:.1%}")
+    print(f"Modelo salvo em {stats['caminho']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -171,6 +171,20 @@ def mock_db_connection(mocker):
     return mock_conn, mock_cursor
 
 
+@pytest.fixture(autouse=True)
+def cache_previsao_isolado():
+    """
+    Cada teste usa um cache de previsao vazio e so em memoria
+    (sem reaproveitar resultados de outro teste nem do disco).
+    """
+    from core.cache_previsao import CachePrevisao, configurar_cache_previsao
+
+    cache = CachePrevisao()
+    configurar_cache_previsao(cache)
+    yield cache
+    configurar_cache_previsao(None)
+
+
 # ============================================
 # HELPERS
 # ============================================
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para core/backtesting_lote.py (backtesting universal em lote)
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from core.demand_calculator import DemandCalculator, processar_demandas_dataframe
+from core.backtesting_lote import avaliar_metodos_lote, METODOS_BACKTESTING
+
+
+def gerar_series(seed=0, quantidade=60):
+    """Series de tamanhos e padroes variados (estavel, intermitente, tendencia+sazonal, quase zero)."""
+    rng = np.random.default_rng(seed)
+    series = []
+    for i in range(quantidade):
+        n = int(rng.integers(3, 60)) if i % 3 else int(rng.integers(90, 400))
+        padrao = i % 4
+        if padrao == 0:
+            serie = rng.poisson(5, n).astype(float)
+        elif padrao == 1:
+            serie = (rng.random(n) < 0.2) * rng.poisson(4, n).astype(float)
+        elif padrao == 2:
+            t = np.arange(n)
+            serie = np.maximum(0, 10 + 0.1 * t + rng.normal(0, 2, n) + 5 * np.sin(t * 2 * np.pi / 12))
+        else:
+            serie = np.zeros(n)
+            serie[n // 2] = 3.0
+        series.append([float(v) for v in serie])
+    return series
+
+
+class TestBacktestingLote:
+    """Lote deve reproduzir backtesting_universal serie a serie"""
+
+    @pytest.mark.unit
+    def test_lote_igual_ao_escalar(self):
+        """Metodo, demanda, desvio e metadata iguais ao caminho escalar"""
+        series = gerar_series()
+
+        lote = DemandCalculator.backtesting_universal_lote(series)
+        escalar = [DemandCalculator.backtesting_universal(s) for s in series]
+
+        assert lote == escalar
+
+    @pytest.mark.unit
+    def test_matriz_com_mascara_de_comprimento(self):
+        """Matriz 2-D com comprimentos equivale a lista de series (valores fora da mascara ignorados)"""
+        series = gerar_series(seed=1, quantidade=12)
+        comprimentos = [len(s) for s in series]
+        matriz = np.full((len(series), max(comprimentos)), 999.0)
+        for i, s in enumerate(series):
+            matriz[i, :len(s)] = s
+
+        assert DemandCalculator.backtesting_universal_lote(matriz, comprimentos) == \
+            DemandCalculator.backtesting_universal_lote(series)
+
+    @pytest.mark.unit
+    def test_wmape_por_metodo_igual_ao_escalar(self):
+        """WMAPE de cada metodo (ranking) bate com o walk-forward escalar"""
+        series = [s for s in gerar_series(seed=2) if len(s) >= 90]
+        comprimentos = np.array([len(s) for s in series])
+        matriz = np.zeros((len(series), comprimentos.max()))
+        for i, s in enumerate(series):
+            matriz[i, :len(s)] = s
+
+        avaliacao = avaliar_metodos_lote(matriz, comprimentos)
+
+        for i, s in enumerate(series):
+            _, _, _, meta = DemandCalculator.backtesting_universal(s)
+            for metodo in METODOS_BACKTESTING:
+                wmape = avaliacao[metodo]['wmape'][i]
+                if metodo in meta.get('ranking', {}):
+                    assert wmape == pytest.approx(meta['ranking'][metodo], abs=0.006)
+                else:
+                    assert np.isnan(wmape)
+
+    @pytest.mark.unit
+    def test_dataframe_auto_usa_lote(self, mocker):
+        """processar_demandas_dataframe calcula o backtesting de todos os itens em uma chamada"""
+        rng = np.random.default_rng(3)
+        linhas = [
+            {'Loja': loja, 'SKU': sku, 'Mes': mes, 'Vendas': float(rng.poisson(10))}
+            for loja in (1, 2) for sku in ('A', 'B', 'C') for mes in range(1, 25)
+        ]
+        linhas += [{'Loja': 3, 'SKU': 'D', 'Mes': mes, 'Vendas': 5.0} for mes in range(1, 5)]
+        df = pd.DataFrame(linhas)
+
+        lote = mocker.spy(DemandCalculator, 'backtesting_universal_lote')
+        obtido = processar_demandas_dataframe(df.copy(), metodo='auto')
+
+        lote.assert_called_once()
+        assert len(lote.call_args.args[0]) == 6  # serie curta (D) fica no caminho escalar
+
+        # Referencia: backtesting escalar item a item
+        mocker.patch.object(DemandCalculator, 'backtesting_universal_lote', side_effect=lambda series: [
+            DemandCalculator.backtesting_universal(s) for s in series
+        ])
+        esperado = processar_demandas_dataframe(df.copy(), metodo='auto')
+        pd.testing.assert_frame_equal(obtido, esperado)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitarios para app/utils/cache_pedido.py (cache versionado de
+resultados das telas de pedido)
+"""
+
+from collections import OrderedDict
+
+import pytest
+from flask import Flask, jsonify, request
+
+import app.utils.cache_pedido as cache_pedido
+import app.utils.universo_produtos as universo_produtos
+from app.utils.cache_pedido import cache_resultado_pedido, chave_pedido, invalidar_cache_pedido
+from app.utils.jobs_pedido import dados_exportacao
+
+
+class CursorVersao:
+    def __init__(self):
+        self.executados = []
+
+    def execute(self, query, params=None):
+        self.executados.append(query)
+
+    def fetchone(self):
+        return (7, 'sucesso:', '2026-10-17 06:00:00')
+
+    def close(self):
+        pass
+
+
+class ConexaoVersao:
+    def __init__(self):
+        self.cursor_versao = CursorVersao()
+
+    def cursor(self, cursor_factory=None):
+        return self.cursor_versao
+
+
+@pytest.fixture
+def app_cache(monkeypatch):
+    """App com um endpoint de calculo que conta as execucoes."""
+    monkeypatch.setattr(cache_pedido, '_entradas', OrderedDict())
+    versao = {'atual': (1, 'estoque', 'parametros', 0)}
+    monkeypatch.setattr(cache_pedido, 'versao_dados_pedido', lambda: versao['atual'])
+
+    app = Flask(__name__)
+    app.calculos = 0
+    app.versao = versao
+
+    @app.route('/api/calculo_teste', methods=['POST'])
+    @cache_resultado_pedido('teste')
+    def calculo_teste():
+        app.calculos += 1
+        dados = request.get_json()
+        if dados.get('falhar'):
+            return jsonify({'success': False, 'erro': 'Fornecedor invalido'}), 400
+        return jsonify({'success': True, 'itens': dados['itens'], 'calculo': app.calculos})
+
+    return app
+
+
+class TestChavePedido:
+    """Normalizacao dos parametros"""
+
+    @pytest.mark.unit
+    def test_campos_de_controle_nao_mudam_a_chave(self):
+        base = chave_pedido('pedido_fornecedor', {'fornecedor': 'A', 'cobertura_dias': None})
+        assert chave_pedido('pedido_fornecedor', {'assincrono': True, 'fornecedor': 'A', 'usar_cache': False}) == base
+        assert chave_pedido('compra_planejada', {'fornecedor': 'A'}) != base
+        assert chave_pedido('pedido_fornecedor', {'fornecedor': 'B'}) != base
+
+
+class TestCacheResultadoPedido:
+    """Reaproveitamento e invalidacao"""
+
+    @pytest.mark.unit
+    def test_mesma_versao_reaproveita_resultado(self, app_cache):
+        client = app_cache.test_client()
+
+        primeira = client.post('/api/calculo_teste', json={'itens': [1, 2]}).get_json()
+        segunda = client.post('/api/calculo_teste', json={'itens': [1, 2]}).get_json()
+
+        assert app_cache.calculos == 1
+        assert segunda == primeira
+        assert primeira['cache_id'] == chave_pedido('teste', {'itens': [1, 2]})
+
+    @pytest.mark.unit
+    def test_versao_nova_recalcula(self, app_cache):
+        client = app_cache.test_client()
+        client.post('/api/calculo_teste', json={'itens': [1]})
+
+        app_cache.versao['atual'] = (2, 'estoque', 'parametros', 0)
+        resultado = client.post('/api/calculo_teste', json={'itens': [1]}).get_json()
+
+        assert (app_cache.calculos, resultado['calculo']) == (2, 2)
+
+    @pytest.mark.unit
+    def test_invalidacao_e_usar_cache(self, app_cache, monkeypatch):
+        monkeypatch.setattr(cache_pedido, '_geracao', 0)
+        client = app_cache.test_client()
+        client.post('/api/calculo_teste', json={'itens': [1]})
+
+        client.post('/api/calculo_teste', json={'itens': [1], 'usar_cache': False})
+        assert app_cache.calculos == 2
+
+        invalidar_cache_pedido()
+        client.post('/api/calculo_teste', json={'itens': [1]})
+        assert app_cache.calculos == 3
+        assert cache_pedido._geracao == 1
+
+    @pytest.mark.unit
+    def test_erro_nao_fica_em_cache(self, app_cache):
+        client = app_cache.test_client()
+
+        assert client.post('/api/calculo_teste', json={'falhar': True}).status_code == 400
+        assert client.post('/api/calculo_teste', json={'falhar': True}).status_code == 400
+        assert app_cache.calculos == 2
+
+    @pytest.mark.unit
+    def test_sem_versao_nao_usa_cache(self, app_cache, monkeypatch):
+        monkeypatch.setattr(cache_pedido, 'versao_dados_pedido', lambda: None)
+        client = app_cache.test_client()
+
+        client.post('/api/calculo_teste', json={'itens': [1]})
+        resultado = client.post('/api/calculo_teste', json={'itens': [1]}).get_json()
+
+        assert app_cache.calculos == 2
+        assert 'cache_id' not in resultado
+
+    @pytest.mark.unit
+    def test_exportacao_por_cache_id(self, app_cache):
+        client = app_cache.test_client()
+        cache_id = client.post('/api/calculo_teste', json={'itens': [3]}).get_json()['cache_id']
+
+        # Exporta o pedido calculado mesmo que os dados tenham mudado depois
+        app_cache.versao['atual'] = (9, 'estoque', 'parametros', 0)
+        dados, erro = dados_exportacao({'cache_id': cache_id})
+
+        assert erro is None
+        assert dados['itens'] == [3]
+        assert dados_exportacao({'cache_id': 'x'})[0] is None
+
+
+class TestVersaoDados:
+    """Consulta da versao das entradas"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('com_v58', [True, False])
+    def test_consulta_unica_com_as_tres_fontes(self, monkeypatch, com_v58):
+        monkeypatch.setattr(universo_produtos, '_tabela_parametros_existe', True)
+        monkeypatch.setattr(cache_pedido, 'colunas_progresso_execucao_existem', lambda conn: com_v58)
+        conn = ConexaoVersao()
+
+        versao = cache_pedido._consultar_versao(conn)
+
+        query, = conn.cursor_versao.executados
+        assert 'demanda_calculo_execucao' in query
+        assert 'total_itens_processados' in query
+        assert ('atualizado_em' in query) == com_v58
+        assert 'estoque_posicao_atual' in query
+        assert 'parametros_fornecedor' in query
+        assert versao == (7, 'sucesso:', '2026-10-17 06:00:00')
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para core/cache_previsao.py (cache de resultados de previsao)
+"""
+
+import pytest
+import numpy as np
+
+from core.cache_previsao import CachePrevisao, chave_previsao, configurar_cache_previsao
+from core.demand_calculator import DemandCalculator
+
+
+SERIE = [float(v) for v in np.random.default_rng(0).poisson(8, 120)]
+
+
+class TestChavePrevisao:
+    """Chave depende de serie, metodo, parametros e versao"""
+
+    @pytest.mark.unit
+    def test_chave_por_conteudo(self):
+        """Lista, array e inteiros equivalentes geram a mesma chave"""
+        base = chave_previsao(SERIE, 'demanda_inteligente', {'metodo': 'auto'})
+
+        assert chave_previsao(np.array(SERIE), 'demanda_inteligente', {'metodo': 'auto'}) == base
+        assert chave_previsao(SERIE[:-1] + [SERIE[-1] + 1], 'demanda_inteligente', {'metodo': 'auto'}) != base
+        assert chave_previsao(SERIE, 'demanda_inteligente', {'metodo': 'ema'}) != base
+        assert chave_previsao(SERIE, 'demanda_inteligente', {'metodo': 'auto'}, versao='outra') != base
+
+
+class TestCachePrevisao:
+    """LRU limitado em bytes, disco opcional e estatisticas"""
+
+    @pytest.mark.unit
+    def test_lru_respeita_limite_de_bytes(self):
+        """Entrada menos usada sai quando o limite e ultrapassado"""
+        cache = CachePrevisao(max_bytes=3000)
+        for i in range(3):
+            cache.gravar(f'k{i}', b'x' * 900)
+        cache.obter('k0')  # k0 passa a ser o mais recente
+        cache.gravar('k3', b'x' * 900)
+
+        assert cache.contem('k0') and cache.contem('k3')
+        assert not cache.contem('k1')
+        stats = cache.estatisticas()
+        assert stats['evictions'] == 1
+        assert stats['bytes'] <= 3000
+
+    @pytest.mark.unit
+    def test_disco_compartilhado_entre_instancias(self, tmp_path):
+        """Outra instancia (outro processo) encontra o valor no disco"""
+        caminho = str(tmp_path / 'cache_previsao.db')
+        CachePrevisao(caminho_disco=caminho).gravar('k', {'demanda': 1.5})
+
+        outro = CachePrevisao(caminho_disco=caminho)
+        assert outro.obter('k') == (True, {'demanda': 1.5})
+        assert outro.estatisticas()['hits_disco'] == 1
+
+        vencido = CachePrevisao(caminho_disco=caminho, validade_disco_s=-1)
+        assert vencido.obter('k') == (False, None)
+
+    @pytest.mark.unit
+    def test_demand_calculator_consulta_o_cache(self, cache_previsao_isolado, mocker):
+        """Segunda chamada identica nao recalcula e devolve copia independente"""
+        backtesting = mocker.spy(DemandCalculator, 'backtesting_universal')
+
+        primeiro = DemandCalculator.calcular_demanda_diaria_unificada(SERIE, 30, 'mensal')
+        primeiro[2]['alterado'] = True
+        segundo = DemandCalculator.calcular_demanda_diaria_unificada(SERIE, 30, 'mensal')
+
+        assert backtesting.call_count == 1
+        assert 'alterado' not in segundo[2]
+        assert segundo[:2] == primeiro[:2]
+        stats = cache_previsao_isolado.estatisticas()
+        assert stats['hits'] == 1
+        assert stats['misses'] >= 1
+
+        # Parametro diferente e outra entrada
+        DemandCalculator.calcular_demanda_diaria_unificada(SERIE, 60, 'mensal')
+        assert backtesting.call_count == 1  # demanda_inteligente da mesma serie ja esta em cache
+
+        configurar_cache_previsao(None)
+        assert DemandCalculator.calcular_demanda_diaria_unificada(SERIE, 30, 'mensal')[:2] == segundo[:2]
+        assert backtesting.call_count == 2
@@ -0,0 +1,724 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para jobs/calcular_demanda_diaria.py (partes sem banco)
+"""
+
+import pytest
+import numpy as np
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from jobs.calcular_demanda_diaria import (
+    montar_chunks_itens,
+    calcular_chunk_itens,
+    calcular_demanda_item_com_cache,
+    calcular_demanda_item_denso,
+    calcular_demanda_item_semanal,
+    corrigir_demanda_censurada,
+    corrigir_demanda_censurada_denso,
+    _corrigir_loja,
+    _corrigir_lojas_matriz,
+    fingerprint_alterado,
+    horizonte_previsao_atual,
+    gerar_buffer_copy,
+    upsert_demanda_staging,
+    COLUNAS_DEMANDA_PRE_CALCULADA,
+    registrar_checkpoint_fornecedor,
+)
+import jobs.calcular_demanda_diaria as job
+from core.historico_denso import HistoricoDenso
+from core.cache_previsao import configurar_cache_previsao
+
+
+DATA_INI = date(2024, 1, 1)
+
+
+def gerar_item_sintetico(cod_produto, seed, dias=400, lojas=(1, 2, 3)):
+    """
+    Gera linhas de venda e estoque no formato das queries de
+    precarregar_historico_lote / precarregar_estoque_diario_lote
+    (codigo, data, cod_empresa, valor), com rupturas aleatorias por loja.
+    """
+    rng = np.random.default_rng(seed)
+    linhas_vendas = []
+    linhas_estoque = []
+    for d in range(dias):
+        data = DATA_INI + timedelta(days=d)
+        for loja in lojas:
+            em_ruptura = rng.random() < 0.1
+            linhas_estoque.append((cod_produto, data, loja, 0.0 if em_ruptura else float(rng.integers(1, 50))))
+            qtd = 0.0 if em_ruptura else float(rng.poisson(3))
+            if qtd > 0:
+                linhas_vendas.append((cod_produto, data, loja, qtd))
+    return linhas_vendas, linhas_estoque
+
+
+def montar_cache_dict(linhas_vendas, linhas_estoque):
+    """Reproduz (serie, meta_hist, estoque) do preload antigo por dicionario."""
+    vendas_por_data = {}
+    vendas_por_loja = {}
+    for _, data, loja, qtd in linhas_vendas:
+        vendas_por_loja[(data, loja)] = qtd
+        vendas_por_data[data] = vendas_por_data.get(data, 0) + qtd
+
+    datas = sorted(vendas_por_data)
+    serie = []
+    data = datas[0]
+    while data <= datas[-1]:
+        serie.append(vendas_por_data.get(data, 0))
+        data += timedelta(days=1)
+
+    vendas_por_mes = {}
+    for data, qtd in vendas_por_data.items():
+        vendas_por_mes[(data.year, data.month)] = vendas_por_mes.get((data.year, data.month), 0) + qtd
+
+    meta_hist = {
+        'dias_historico': len(serie),
+        'dias_com_venda': len(vendas_por_data),
+        'total_vendido': sum(vendas_por_data.values()),
+        'vendas_por_mes': vendas_por_mes,
+        'vendas_por_data': vendas_por_data,
+        'vendas_por_loja': vendas_por_loja,
+    }
+    estoque = {(data, loja): valor for _, data, loja, valor in linhas_estoque}
+    return serie, meta_hist, estoque
+
+
+@pytest.fixture
+def linhas_fornecedor():
+    """Linhas de venda e estoque de 5 itens sinteticos."""
+    vendas, estoque = [], []
+    for cod in range(1, 6):
+        v, e = gerar_item_sintetico(cod, seed=cod)
+        vendas += v
+        estoque += e
+    return vendas, estoque
+
+
+@pytest.fixture
+def dados_fornecedor(linhas_fornecedor):
+    """Estrutura retornada por carregar_itens_fornecedor para 5 itens."""
+    vendas, estoque = linhas_fornecedor
+    historico = HistoricoDenso.de_linhas_vendas(
+        list(range(1, 6)), vendas, DATA_INI, DATA_INI + timedelta(days=399)
+    ).anexar_estoque(estoque)
+    itens = [{'cod_produto': cod, 'descricao': f'ITEM {cod}'} for cod in range(1, 6)]
+    return {
+        'itens': itens,
+        'itens_ativos': itens,
+        'itens_filtrados': 0,
+        'historico': historico,
+    }
+
+
+class TestMotorProcessos:
+    """Testes do motor de execucao por chunks (modo 'processos')"""
+
+    @pytest.mark.unit
+    def test_montar_chunks_respeita_tamanho(self, dados_fornecedor):
+        """Chunks devem ter no maximo o tamanho pedido e cobrir todos os itens"""
+        chunks = montar_chunks_itens(dados_fornecedor, 2)
+
+        assert [len(c) for c in chunks] == [2, 2, 1]
+        assert [int(c) for chunk in chunks for c in chunk.cod_produtos] == [1, 2, 3, 4, 5]
+
+    @pytest.mark.unit
+    def test_processos_equivalente_ao_sequencial(self, dados_fornecedor):
+        """Calculo em processos deve gerar os mesmos registros do calculo sequencial"""
+        chunk_unico = montar_chunks_itens(dados_fornecedor, 100)[0]
+        esperado, erros_esperados, perfil = calcular_chunk_itens('123', chunk_unico, 2026)
+
+        registros = []
+        erros = []
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(calcular_chunk_itens, '123', chunk, 2026)
+                for chunk in montar_chunks_itens(dados_fornecedor, 2)
+            ]
+            for future in futures:
+                regs, errs, _ = future.result()
+                registros.extend(regs)
+                erros += errs
+
+        assert erros == erros_esperados == []
+        mensais = [r for r in esperado if r.get('tipo_granularidade') != 'semanal']
+        assert len(mensais) == 5 * 12
+        assert len(esperado) > len(mensais)
+        assert registros == esperado
+        # Perfil do chunk: etapas por item medidas uma vez por item
+        etapas = perfil.como_dict()['etapas']
+        for etapa in ('correcao_censura', 'deteccao_outliers', 'backtesting_metodo', 'fator_yoy'):
+            assert etapas[etapa]['itens'] == 5
+
+    @pytest.mark.unit
+    def test_threads_acumula_todos_os_chunks(self, mocker, dados_fornecedor):
+        """processar_fornecedor grava os registros de todos os chunks, nao so do ultimo"""
+        from jobs.perfil_execucao import PerfilEtapas
+
+        chunk_unico = montar_chunks_itens(dados_fornecedor, 100)[0]
+        esperado, _, _ = calcular_chunk_itens('123', chunk_unico, job.datetime.now().year)
+
+        mocker.patch.object(job, 'obter_conexao')
+        mocker.patch.object(job, 'carregar_itens_fornecedor',
+                            return_value={**dados_fornecedor, 'perfil': PerfilEtapas()})
+        mocker.patch.object(job, 'montar_chunks_itens',
+                            side_effect=lambda dados, tamanho: montar_chunks_itens(dados, 2))
+        gravar = mocker.patch.object(job, 'gravar_resultados_fornecedor', return_value=(60, 0))
+        mocker.patch.object(job, 'gravar_fingerprints_fornecedor')
+        mocker.patch.object(job, 'registrar_checkpoint_fornecedor')
+
+        resultado = job.processar_fornecedor('123', 'FORN 123')
+
+        assert resultado['sucesso']
+        assert gravar.call_args.args[2] == esperado
+
+
+class TestHistoricoDenso:
+    """Testes do historico em arrays (HistoricoDenso) contra o preload por dicionario"""
+
+    @pytest.mark.unit
+    def test_item_reproduz_serie_do_dict(self, dados_fornecedor):
+        """Serie, totais mensais e vendas por loja devem bater com o preload antigo"""
+        v, e = gerar_item_sintetico(3, seed=3)
+        serie, meta_hist, _ = montar_cache_dict(v, e)
+
+        item = dados_fornecedor['historico'].item(3)
+
+        assert item.serie.tolist() == serie
+        assert item.dias_com_venda == meta_hist['dias_com_venda']
+        assert item.totais_mensais() == meta_hist['vendas_por_mes']
+        assert list(item.lojas_vendas) == [1, 2, 3]
+
+    @pytest.mark.unit
+    def test_subconjunto_preserva_itens(self, dados_fornecedor):
+        """Subconjunto deve trazer exatamente o historico dos itens pedidos"""
+        historico = dados_fornecedor['historico']
+        sub = historico.subconjunto([4, 2])
+
+        assert [int(c) for c in sub.cod_produtos] == [4, 2]
+        assert sub.item(2).serie.tolist() == historico.item(2).serie.tolist()
+        assert np.array_equal(sub.item(4).estoque_loja, historico.item(4).estoque_loja, equal_nan=True)
+        assert 3 not in sub
+
+    @pytest.mark.unit
+    def test_calculo_denso_equivalente_ao_dict(self, dados_fornecedor):
+        """Calculo pelos arrays deve gerar os mesmos registros do calculo por dicionario"""
+        historico = dados_fornecedor['historico']
+        for cod in range(1, 6):
+            v, e = gerar_item_sintetico(cod, seed=cod)
+            serie, meta_hist, estoque = montar_cache_dict(v, e)
+
+            esperado = calcular_demanda_item_com_cache(cod, '123', serie, meta_hist, 2026, estoque)
+            obtido = calcular_demanda_item_denso('123', historico.item(cod), tem_estoque=True)
+
+            assert obtido == esperado
+
+    @pytest.mark.unit
+    def test_chunk_com_backtesting_em_lote_igual_ao_item_a_item(self, dados_fornecedor, mocker):
+        """Backtesting em lote no chunk gera os mesmos registros mensais do calculo item a item"""
+        configurar_cache_previsao(None)
+        historico = dados_fornecedor['historico']
+        esperado = []
+        for cod in range(1, 6):
+            esperado += calcular_demanda_item_denso('123', historico.item(cod), tem_estoque=True)
+
+        lote = mocker.spy(job.DemandCalculator, 'backtesting_universal_lote')
+        chunk = montar_chunks_itens(dados_fornecedor, 100)[0]
+        registros, erros, _ = calcular_chunk_itens('123', chunk, 2026)
+
+        lote.assert_called_once()
+        assert len(lote.call_args.args[0]) == 5
+        assert erros == []
+        assert [r for r in registros if r.get('tipo_granularidade') != 'semanal'] == esperado
+
+    @pytest.mark.unit
+    def test_outliers_em_lote_igual_ao_item_a_item(self):
+        """_remover_outliers_lote devolve a mesma serie limpa de _remover_outliers"""
+        rng = np.random.default_rng(7)
+        series = {}
+        for cod in range(1, 41):
+            serie = rng.poisson(6, int(rng.integers(10, 400))).astype(float)
+            if cod % 2:
+                serie[rng.integers(0, len(serie), 3)] *= 15
+            series[cod] = serie
+
+        lote = job._remover_outliers_lote(series)
+
+        for cod, serie in series.items():
+            assert lote[cod] == job._remover_outliers(serie.tolist())
+        assert any(len(lote[cod]) != len(series[cod]) for cod in series)
+
+    @pytest.mark.unit
+    def test_chunk_repetido_usa_cache_de_previsao(self, dados_fornecedor, mocker):
+        """Segundo calculo do mesmo chunk nao refaz o backtesting (resultado vem do cache)"""
+        chunk = montar_chunks_itens(dados_fornecedor, 100)[0]
+        primeiro, _, _ = calcular_chunk_itens('123', chunk, 2026)
+
+        lote = mocker.spy(job.DemandCalculator, 'backtesting_universal_lote')
+        segundo, erros, _ = calcular_chunk_itens('123', chunk, 2026)
+
+        lote.assert_not_called()
+        assert erros == []
+        assert segundo == primeiro
+
+    @pytest.mark.unit
+    def test_agregado_semanal_equivale_ao_preload_semanal(self, dados_fornecedor):
+        """Semanas ISO derivadas dos arrays devem bater com o agrupamento das queries semanais"""
+        v, e = gerar_item_sintetico(2, seed=2)
+        vendas, vendas_loja, estoque = {}, {}, {}
+        for _, data, loja, qtd in v:
+            ano, sem, _ = data.isocalendar()
+            vendas[(ano, sem)] = vendas.get((ano, sem), 0) + qtd
+            vendas_loja[(ano, sem, loja)] = vendas_loja.get((ano, sem, loja), 0) + qtd
+        for _, data, loja, valor in e:
+            ano, sem, _ = data.isocalendar()
+            ok, tot = estoque.get((ano, sem, loja), (0, 0))
+            estoque[(ano, sem, loja)] = (ok + (valor > 0), tot + 1)
+
+        consolidado, por_loja, est = dados_fornecedor['historico'].agregado_semanal(2)
+
+        assert consolidado == pytest.approx(vendas)
+        assert por_loja == pytest.approx(vendas_loja)
+        assert est == estoque
+
+    @pytest.mark.unit
+    def test_chunk_gera_semanal_da_mensal(self, dados_fornecedor):
+        """Registros semanais do chunk devem ser os de calcular_demanda_item_semanal"""
+        historico = dados_fornecedor['historico']
+        chunk = montar_chunks_itens(dados_fornecedor, 100)[0]
+        registros, _, perfil = calcular_chunk_itens('123', chunk, 2026)
+
+        for cod in (1, 4):
+            mensais = [r for r in registros if r['cod_produto'] == cod and r.get('tipo_granularidade') != 'semanal']
+            semanais = [r for r in registros if r['cod_produto'] == cod and r.get('tipo_granularidade') == 'semanal']
+            hist_sem, hist_sem_loja, est_sem = historico.agregado_semanal(cod)
+            esperado = calcular_demanda_item_semanal(
+                cod, '123', hist_sem, registros_mensais=mensais,
+                estoque_semanal=est_sem, vendas_semanal_por_loja=hist_sem_loja
+            )
+            assert semanais == esperado
+        assert perfil.como_dict()['etapas']['calculo_semanal']['itens'] == 5
+
+
+def gerar_lojas_ruptura(seed, dias=120, lojas=(1, 2, 3, 5, 90)):
+    """
+    Linhas de venda/estoque com casos de borda da correcao de ruptura:
+    vendas fracionadas, dias sem registro de estoque, loja intermitente,
+    loja sem estoque (so vendas) e CD (>= 80).
+    """
+    rng = np.random.default_rng(seed)
+    linhas_vendas = []
+    linhas_estoque = []
+    for loja in lojas:
+        taxa_venda = 0.1 if loja == 5 else rng.uniform(0.4, 0.9)
+        sem_estoque = loja == 3 and seed % 2 == 0
+        for d in range(dias):
+            data = DATA_INI + timedelta(days=d)
+            em_ruptura = rng.random() < 0.2
+            if not sem_estoque and rng.random() < 0.85:
+                linhas_estoque.append((7, data, loja, 0.0 if em_ruptura else float(rng.integers(1, 30))))
+            if not em_ruptura and rng.random() < taxa_venda:
+                linhas_vendas.append((7, data, loja, float(rng.integers(1, 40)) / 4))
+    return linhas_vendas, linhas_estoque
+
+
+class TestCorrecaoCensuradaVetorizada:
+    """Teste diferencial: correcao vetorizada x correcao escalar por dict (V53)"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('seed', range(8))
+    def test_matriz_equivalente_a_loja_escalar(self, seed):
+        """Cada linha da matriz corrigida deve bater bit a bit com _corrigir_loja"""
+        rng = np.random.default_rng(100 + seed)
+        n = int(rng.integers(5, 90))
+        datas = [DATA_INI + timedelta(days=d) for d in range(n)]
+        vendas = np.where(rng.random((4, n)) < 0.6, rng.gamma(2.0, 3.0, (4, n)), 0.0)
+        estoque = np.where(rng.random((4, n)) < 0.3, 0.0, rng.integers(1, 20, (4, n)).astype(float))
+        estoque[rng.random((4, n)) < 0.15] = np.nan
+        estoque[3] = np.nan  # loja sem nenhum registro de estoque
+
+        corrigida, meta_lojas = _corrigir_lojas_matriz(vendas, estoque)
+
+        for k in range(4):
+            estoque_dict = {d: estoque[k, i] for i, d in enumerate(datas) if not np.isnan(estoque[k, i])}
+            esperado, meta_esperada = _corrigir_loja(list(vendas[k]), datas, estoque_dict)
+            assert corrigida[k].tolist() == [float(v) for v in esperado]
+            for campo, valor in meta_esperada.items():
+                assert meta_lojas[campo][k] == valor
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('seed', range(6))
+    def test_item_equivalente_a_corrigir_demanda_censurada(self, seed):
+        """Serie reconsolidada e metadados devem bater bit a bit com a versao por dict"""
+        vendas, estoque = gerar_lojas_ruptura(seed)
+        serie, meta_hist, estoque_dict = montar_cache_dict(vendas, estoque)
+        historico = HistoricoDenso.de_linhas_vendas(
+            [7], vendas, DATA_INI, DATA_INI + timedelta(days=119)
+        ).anexar_estoque(estoque)
+
+        esperado, meta_esperada = corrigir_demanda_censurada(
+            serie, meta_hist['vendas_por_data'], estoque_dict, meta_hist['vendas_por_loja']
+        )
+        obtido, meta = corrigir_demanda_censurada_denso(historico.item(7))
+
+        assert meta_esperada['houve_correcao']
+        assert obtido.tolist() == [float(v) for v in esperado]
+        assert meta == meta_esperada
+
+
+class TestCalculoIncremental:
+    """Testes da comparacao de fingerprints do modo incremental"""
+
+    FP = {
+        'ultima_venda': date(2026, 10, 15),
+        'checksum_historico': 'a' * 32,
+        'checksum_estoque': 'b' * 32,
+        'bloqueio': '',
+        'horizonte': '2026-10/2026-W42',
+    }
+
+    @pytest.mark.unit
+    def test_item_sem_fingerprint_anterior_recalcula(self):
+        """Item nunca calculado deve ser recalculado"""
+        assert fingerprint_alterado(self.FP, None)
+
+    @pytest.mark.unit
+    def test_item_inalterado_nao_recalcula(self):
+        """Fingerprint identico nao dispara recalculo"""
+        assert not fingerprint_alterado(self.FP, dict(self.FP))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('campo,valor', [
+        ('ultima_venda', date(2026, 10, 16)),
+        ('checksum_historico', 'c' * 32),
+        ('checksum_estoque', 'd' * 32),
+        ('bloqueio', '3,7'),
+        ('horizonte', '2026-10/2026-W43'),
+    ])
+    def test_qualquer_campo_alterado_recalcula(self, campo, valor):
+        """Mudanca em vendas, estoque, bloqueio ou horizonte dispara recalculo"""
+        atual = dict(self.FP, **{campo: valor})
+        assert fingerprint_alterado(atual, self.FP)
+
+    @pytest.mark.unit
+    def test_horizonte_formato(self):
+        """Horizonte combina mes de partida e semana ISO de partida"""
+        hoje = date.today()
+        ano_iso, semana_iso, _ = hoje.isocalendar()
+        assert horizonte_previsao_atual() == f"{hoje.year}-{hoje.month:02d}/{ano_iso}-W{semana_iso:02d}"
+
+
+class TestGravacaoStaging:
+    """Testes do writer COPY + staging + upsert de demanda_pre_calculada"""
+
+    REGISTRO = {
+        'cod_produto': '101', 'cnpj_fornecedor': '123', 'cod_empresa': None,
+        'ano': 2026, 'mes': 11,
+        'demanda_prevista': 30.5, 'demanda_diaria_base': 1.0167, 'desvio_padrao': 0.4,
+        'fator_sazonal': 1.0, 'fator_tendencia_yoy': 1.0, 'classificacao_tendencia': 'estavel',
+        'valor_ano_anterior': None, 'variacao_vs_aa': None,
+        'limitador_aplicado': False, 'metodo_usado': 'sma', 'categoria_serie': 'longa',
+        'dias_historico': 400, 'total_vendido_historico': 410.0,
+        'taxa_disponibilidade': 0.95, 'dias_ruptura': 3, 'demanda_censurada_corrigida': True,
+    }
+
+    @pytest.mark.unit
+    def test_buffer_copy_nulos_booleanos_e_escape(self):
+        """NULL vira \\N, booleanos t/f e separadores sao escapados"""
+        buffer = gerar_buffer_copy([(None, True, False, 'a\tb\\c', date(2026, 1, 5), 1.5)])
+        assert buffer.read() == '\\N\tt\tf\ta\\tb\\\\c\t2026-01-05\t1.5\n'
+
+    @pytest.mark.unit
+    def test_upsert_copia_batch_e_preserva_ajuste_manual(self, mocker):
+        """Batch vai por COPY e um unico upsert respeita ajuste_manual e o indice UNIQUE"""
+        conn = mocker.MagicMock()
+        cursor = conn.cursor.return_value
+        semanal = dict(self.REGISTRO, mes=None, semana=46, tipo_granularidade='semanal',
+                       data_inicio_semana=date(2026, 11, 9))
+
+        assert upsert_demanda_staging(conn, [self.REGISTRO, semanal, dict(self.REGISTRO)]) == 3
+
+        sql_copy, buffer = cursor.copy_expert.call_args[0]
+        linhas = [l.split('\t') for l in buffer.read().splitlines()]
+        assert 'stg_demanda_pre_calculada' in sql_copy
+        assert len(linhas) == 3
+        assert all(len(l) == len(COLUNAS_DEMANDA_PRE_CALCULADA) + 1 for l in linhas)
+        # Mensal: mes preenchido, semana NULL; semanal: o inverso
+        assert linhas[0][5:8] == ['11', '\\N', 'mensal']
+        assert linhas[1][5:8] == ['\\N', '46', 'semanal']
+
+        sql_upsert = cursor.execute.call_args_list[-1][0][0]
+        assert 'DISTINCT ON' in sql_upsert
+        assert ('ON CONFLICT (cod_produto, cnpj_fornecedor, (COALESCE(cod_empresa, 0)), ano, '
+                '(COALESCE(semana, 0)), (COALESCE(mes, 0)))') in sql_upsert
+        assert 'WHERE demanda_pre_calculada.ajuste_manual IS NULL' in sql_upsert
+        conn.commit.assert_called_once()
+
+    @pytest.mark.unit
+    def test_upsert_batch_vazio_nao_acessa_banco(self, mocker):
+        conn = mocker.MagicMock()
+        assert upsert_demanda_staging(conn, []) == 0
+        conn.cursor.assert_not_called()
+
+
+def resumo(cnpj, itens=10, sucesso=True):
+    return {'cnpj': cnpj, 'nome': f'FORN {cnpj}', 'itens': itens, 'itens_ativos': itens,
+            'itens_filtrados_en_fl': 0, 'itens_inalterados': 0, 'registros': itens * 12,
+            'registros_semanais': 0, 'erros': 0 if sucesso else 1, 'sucesso': sucesso}
+
+
+class TestCheckpointRetomada:
+    """Testes de checkpoint por fornecedor e do modo --resume"""
+
+    @pytest.mark.unit
+    def test_retomada_pula_fornecedores_concluidos(self, mocker):
+        """--resume processa apenas fornecedores sem checkpoint e soma os anteriores nas metricas"""
+        mocker.patch.object(job, 'obter_conexao')
+        mocker.patch.object(job, 'buscar_execucao', return_value={
+            'id': 7, 'tipo': 'manual', 'status': 'iniciado', 'cnpj_fornecedor_filtro': None
+        })
+        mocker.patch.object(job, 'buscar_checkpoints', return_value={'A': resumo('A', itens=5)})
+        mocker.patch.object(job, 'buscar_fornecedores', return_value=[
+            {'cnpj_fornecedor': c, 'nome_fornecedor': f'FORN {c}'} for c in ('A', 'B', 'C')
+        ])
+        progresso = mocker.patch.object(job, 'registrar_progresso_execucao')
+        inicio = mocker.patch.object(job, 'registrar_inicio_execucao')
+        atualizar = mocker.patch.object(job, 'atualizar_execucao')
+        processar = mocker.patch.object(
+            job, 'processar_fornecedor', side_effect=lambda cnpj, nome, inc, eid, parte=None: resumo(cnpj)
+        )
+
+        metricas = job.executar_calculo(retomar_execucao_id=7, modo='threads', workers=1)
+
+        inicio.assert_not_called()
+        progresso.assert_called_once_with(mocker.ANY, 7, 3, retomada=True)
+        assert sorted(c.args[0] for c in processar.call_args_list) == ['B', 'C']
+        assert all(c.args[3] == 7 for c in processar.call_args_list)
+        assert metricas['total_itens'] == 25
+        assert metricas['total_fornecedores'] == 3
+        assert metricas['detalhes']['fornecedores_retomados'] == 1
+        assert atualizar.call_args.args[1:3] == (7, 'sucesso')
+
+    @pytest.mark.unit
+    def test_retomada_execucao_inexistente(self, mocker):
+        mocker.patch.object(job, 'obter_conexao')
+        mocker.patch.object(job, 'buscar_execucao', return_value=None)
+        with pytest.raises(ValueError):
+            job.executar_calculo(retomar_execucao_id=99)
+
+    @pytest.mark.unit
+    def test_checkpoint_apenas_fornecedor_com_sucesso(self, mocker):
+        """Fornecedor com erro nao gera checkpoint (sera refeito na retomada)"""
+        conn = mocker.MagicMock()
+        registrar_checkpoint_fornecedor(conn, 7, resumo('B', sucesso=False))
+        registrar_checkpoint_fornecedor(conn, None, resumo('B'))
+        conn.cursor.assert_not_called()
+
+        registrar_checkpoint_fornecedor(conn, 7, resumo('B'))
+        sql, params = conn.cursor.return_value.execute.call_args_list[0].args
+        assert 'demanda_calculo_checkpoint' in sql
+        assert params[:2] == (7, 'B')
+        conn.commit.assert_called_once()
+
+
+class CursorStatus:
+    """Cursor falso de um banco com ou sem a migration V58"""
+
+    def __init__(self, com_v58):
+        self.com_v58 = com_v58
+        self.query = ''
+
+    def execute(self, query, params=None):
+        self.query = query
+        if not self.com_v58 and 'atualizado_em' in query and 'information_schema' not in query:
+            raise Exception('column "atualizado_em" does not exist')
+
+    def fetchone(self):
+        if 'information_schema' in self.query:
+            return (4 if self.com_v58 else 0,)
+        if 'COUNT(*) as total_registros' in self.query:
+            return {'total_registros': 12, 'total_produtos': 1}
+        return self.fetchall()[0]
+
+    def fetchall(self):
+        execucao = {'id': 7, 'data_execucao': None, 'status': 'processando',
+                    'cnpj_fornecedor_filtro': 'A'}
+        if self.com_v58:
+            execucao.update(total_fornecedores_previstos=4, fornecedores_concluidos=1,
+                            retomadas=0, atualizado_em=None)
+        return [execucao]
+
+    def close(self):
+        pass
+
+
+class TestStatusExecucao:
+    """Endpoints de status com e sem as colunas de progresso (V58)"""
+
+    @pytest.fixture
+    def client_status(self, mocker):
+        import app.blueprints.demanda_job as demanda_job
+        import app.utils.demanda_pre_calculada as demanda_pre_calculada
+        from flask import Flask
+
+        mocker.patch.object(demanda_pre_calculada, '_colunas_progresso_existem', False)
+        mocker.patch.object(demanda_job, 'verificar_dados_disponiveis', return_value={})
+        flask_app = Flask(__name__)
+        flask_app.register_blueprint(demanda_job.demanda_job_bp)
+
+        def client(com_v58):
+            cursor = CursorStatus(com_v58)
+            conn = mocker.MagicMock()
+            conn.cursor.return_value = cursor
+            mocker.patch.object(demanda_job, 'get_db_connection', return_value=conn)
+            return flask_app.test_client()
+        return client
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('com_v58,percentual', [(True, 25.0), (False, None)])
+    def test_status_geral(self, client_status, com_v58, percentual):
+        resp = client_status(com_v58).get('/api/demanda_job/status')
+
+        assert resp.status_code == 200
+        dados = resp.get_json()
+        assert dados['percentual_concluido'] == percentual
+        assert ('retomadas' in dados['ultimas_execucoes'][0]) == com_v58
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('com_v58,percentual', [(True, 25.0), (False, None)])
+    def test_status_fornecedor(self, client_status, com_v58, percentual):
+        resp = client_status(com_v58).get('/api/demanda_job/status/A')
+
+        assert resp.status_code == 200
+        dados = resp.get_json()
+        assert (dados['is_processando'], dados['percentual_concluido']) == (True, percentual)
+        assert dados['execucao']['percentual_concluido'] == percentual
+
+
+class TestFilaMultiNo:
+    """Testes do modo fila (coordenador + workers em varias maquinas)"""
+
+    FILA_VAZIA = {'pendente': 0, 'em_execucao': 0, 'concluido': 2, 'erro': 0}
+
+    @pytest.mark.unit
+    def test_reserva_usa_skip_locked(self, mocker):
+        """Reserva e atomica (FOR UPDATE SKIP LOCKED) e marca o worker na tarefa"""
+        conn = mocker.MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchone.return_value = {'cnpj_fornecedor': 'A', 'nome_fornecedor': 'FORN A', 'tentativas': 1}
+
+        tarefa = job.reservar_fornecedor(conn, 7, 'host:1')
+
+        sql, params = cursor.execute.call_args.args
+        assert 'FOR UPDATE SKIP LOCKED' in sql
+        assert params == (7, 'host:1', 7)
+        assert tarefa['cnpj_fornecedor'] == 'A'
+        conn.commit.assert_called_once()
+
+    @pytest.mark.unit
+    def test_worker_consome_fila_ate_esvaziar(self, mocker):
+        """Worker processa as tarefas reservadas, espera tarefas de outros e descarta tarefa expirada"""
+        mocker.patch.object(job, 'obter_conexao')
+        mocker.patch.object(job, 'HeartbeatFila')
+        mocker.patch.object(job, 'reenfileirar_expirados', return_value=0)
+        sleep = mocker.patch.object(job.time, 'sleep')
+        mocker.patch.object(job, 'reservar_fornecedor', side_effect=[
+            {'cnpj_fornecedor': 'A', 'nome_fornecedor': 'FORN A'},
+            {'cnpj_fornecedor': 'B', 'nome_fornecedor': 'FORN B'},
+            None, None
+        ])
+        mocker.patch.object(job, 'resumo_fila', side_effect=[
+            dict(self.FILA_VAZIA, em_execucao=1), self.FILA_VAZIA
+        ])
+        processar = mocker.patch.object(
+            job, 'processar_fornecedor', side_effect=lambda cnpj, nome, inc, eid, parte=None: resumo(cnpj)
+        )
+        # B expirou e foi reservado por outro worker antes de concluir
+        concluir = mocker.patch.object(job, 'concluir_tarefa_fila', side_effect=[True, False])
+
+        resultados = job.executar_worker_fila(7, incremental=False, worker_id='host:1')
+
+        assert [r['cnpj'] for r in resultados] == ['A']
+        assert [c.args for c in processar.call_args_list] == [('A', 'FORN A', False, 7), ('B', 'FORN B', False, 7)]
+        assert concluir.call_args_list[0].args[:2] == (mocker.ANY, 7)
+        sleep.assert_called_once()
+
+    @pytest.mark.unit
+    def test_coordenador_consolida_resultados_da_fila(self, mocker):
+        """executar_calculo no modo fila enfileira, aguarda e grava as metricas dos workers"""
+        mocker.patch.object(job, 'obter_conexao')
+        mocker.patch.object(job, 'registrar_inicio_execucao', return_value=8)
+        mocker.patch.object(job, 'registrar_progresso_execucao')
+        mocker.patch.object(job, 'buscar_fornecedores', return_value=[
+            {'cnpj_fornecedor': c, 'nome_fornecedor': f'FORN {c}'} for c in ('A', 'B')
+        ])
+        enfileirar = mocker.patch.object(job, 'enfileirar_fornecedores')
+        mocker.patch.object(job, 'reenfileirar_expirados', return_value=0)
+        mocker.patch.object(job, 'resumo_fila', return_value=self.FILA_VAZIA)
+        mocker.patch.object(job, 'buscar_resultados_fila', return_value=[resumo('A'), resumo('B', sucesso=False)])
+        atualizar = mocker.patch.object(job, 'atualizar_execucao')
+
+        metricas = job.executar_calculo(tipo='manual', modo='fila', workers=0)
+
+        assert enfileirar.call_args.args[1] == 8
+        assert [f['cnpj_fornecedor'] for f in enfileirar.call_args.args[2]] == ['A', 'B']
+        assert metricas['total_itens'] == 20
+        assert metricas['detalhes']['perfil']['modo'] == 'fila'
+        assert atualizar.call_args.args[1:3] == (8, 'parcial')
+
+
+class TestEscalonamentoCusto:
+    """Testes do escalonamento por custo (maiores fornecedores primeiro)"""
+
+    FORNECEDORES = [{'cnpj_fornecedor': c, 'nome_fornecedor': f'FORN {c}'} for c in ('A', 'B', 'C', 'D')]
+
+    @pytest.mark.unit
+    def test_custo_usa_tempo_anterior_e_calibra_volume(self):
+        """Tempo medido prevalece; sem tempo, linhas de historico x ms por linha calibrado"""
+        custos = job.calcular_custos_fornecedores(
+            self.FORNECEDORES,
+            tempos_anteriores={'A': 1000.0, 'B': 3000.0},
+            volumes={'A': 100, 'B': 100, 'C': 50}
+        )
+        assert custos == {'A': 1000.0, 'B': 3000.0, 'C': 1000.0, 'D': 0.0}
+
+    @pytest.mark.unit
+    def test_planejamento_maiores_primeiro_e_divide_grandes(self):
+        """Fornecedor acima da cota de um worker vira partes; tarefas em ordem decrescente de custo"""
+        custos = {'A': 10.0, 'B': 60.0, 'C': 20.0, 'D': 10.0}
+
+        tarefas = job.planejar_fornecedores(self.FORNECEDORES, custos, workers=4)
+
+        # Cota = 100 / 4 = 25 -> B (60) em 3 partes de 20
+        assert [(f['cnpj_fornecedor'], parte) for f, parte in tarefas] == [
+            ('B', (0, 3)), ('B', (1, 3)), ('B', (2, 3)), ('C', None), ('A', None), ('D', None)
+        ]
+        assert job.planejar_fornecedores(self.FORNECEDORES, custos, workers=4, max_partes=2)[:2] == [
+            (self.FORNECEDORES[1], (0, 2)), (self.FORNECEDORES[1], (1, 2))
+        ]
+        assert job.planejar_fornecedores(self.FORNECEDORES, {}, workers=4) == [
+            (f, None) for f in self.FORNECEDORES
+        ]
+
+    @pytest.mark.unit
+    def test_partes_combinadas_com_um_checkpoint(self, mocker):
+        """Partes de um fornecedor sao somadas e geram um unico checkpoint"""
+        mocker.patch.object(job, 'obter_conexao')
+        checkpoint = mocker.patch.object(job, 'registrar_checkpoint_fornecedor')
+
+        def processar(cnpj, nome, inc, eid, parte=None):
+            r = resumo(cnpj, itens=5)
+            r['perfil'] = {'etapas': {'fator_yoy': {'tempo_ms': 10.0, 'itens': 5, 'chamadas': 1}}}
+            return r
+        processar_mock = mocker.patch.object(job, 'processar_fornecedor', side_effect=processar)
+
+        tarefas = [(self.FORNECEDORES[0], (0, 2)), (self.FORNECEDORES[0], (1, 2)), (self.FORNECEDORES[1], None)]
+        resultados = job.executar_fornecedores_threads(tarefas, workers=2, execucao_id=7)
+
+        assert sorted(c.kwargs['parte'] for c in processar_mock.call_args_list if c.kwargs['parte']) == [(0, 2), (1, 2)]
+        combinado = next(r for r in resultados if r['cnpj'] == 'A')
+        assert len(resultados) == 2
+        assert combinado['itens'] == 10 and combinado['partes'] == 2
+        assert combinado['perfil']['etapas']['fator_yoy']['itens'] == 10
+        checkpoint.assert_called_once()
+        assert checkpoint.call_args.args[1:] == (7, combinado)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para os fatores mensais em lote (sazonal e tendencia YoY)
+"""
+
+import pytest
+import numpy as np
+
+from core.demand_calculator import (
+    _indices_sazonais,
+    calcular_fator_tendencia_yoy,
+    calcular_fator_tendencia_yoy_dessazonalizado,
+    calcular_fator_tendencia_yoy_lote,
+    calcular_fatores_sazonais_lote,
+    soma_sequencial,
+    vendas_mensais_longo,
+)
+from core.validador_conformidade import ValidadorConformidade
+from jobs.calcular_demanda_diaria import calcular_fatores_mensais_lote, calcular_fatores_sazonais
+
+
+def gerar_vendas_por_item(seed=0, quantidade=150):
+    """{item: {(ano, mes): qtd}} com historicos de 0 a 4 anos, lacunas, zeros e crescimento."""
+    rng = np.random.default_rng(seed)
+    vendas_por_item = {}
+    for i in range(quantidade):
+        vendas = {}
+        ano0, mes0 = int(rng.integers(2021, 2025)), int(rng.integers(1, 13))
+        crescimento = rng.uniform(0.5, 1.6)
+        for k in range(int(rng.integers(0, 50))):
+            ano, mes = ano0 + (mes0 - 1 + k) // 12, (mes0 - 1 + k) % 12 + 1
+            if rng.random() < 0.85:
+                qtd = float(rng.poisson(50) * crescimento ** (ano - ano0)) if i % 7 else 0.0
+                vendas[(ano, mes)] = qtd if i % 5 else float(int(qtd))
+        vendas_por_item[i] = vendas
+    return vendas_por_item
+
+
+class TestFatoresLote:
+    """Lote igual as funcoes item a item"""
+
+    @pytest.mark.unit
+    def test_fatores_sazonais_iguais_ao_item_a_item(self):
+        vendas_por_item = gerar_vendas_por_item()
+
+        fatores = calcular_fatores_sazonais_lote(vendas_mensais_longo(vendas_por_item))
+
+        for item, vendas in vendas_por_item.items():
+            if not vendas:
+                assert item not in fatores.index
+                continue
+            esperado = calcular_fatores_sazonais(vendas)
+            assert list(fatores.loc[item]) == [esperado[mes] for mes in range(1, 13)]
+
+    @pytest.mark.unit
+    def test_media_geral_independe_da_versao_do_python(self):
+        """Soma da esquerda para a direita em item a item e lote (sum() e compensado no 3.12+)"""
+        medias = [1e16, 1.0, 1.0]
+        vendas = {(2024, mes): qtd for mes, qtd in enumerate(medias, start=1)}
+
+        _, media_geral = _indices_sazonais(np.zeros(3, dtype=np.int64), np.arange(1, 4), np.array(medias), 1)
+
+        assert soma_sequencial(medias) == 1e16
+        assert media_geral[0] == soma_sequencial(medias) / 3
+        assert list(calcular_fatores_sazonais_lote(vendas_mensais_longo({0: vendas})).loc[0]) == \
+            [calcular_fatores_sazonais(vendas)[mes] for mes in range(1, 13)]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('dessazonalizar, funcao_item', [
+        (False, calcular_fator_tendencia_yoy),
+        (True, calcular_fator_tendencia_yoy_dessazonalizado),
+    ])
+    def test_tendencia_yoy_igual_ao_item_a_item(self, dessazonalizar, funcao_item):
+        vendas_por_item = gerar_vendas_por_item(seed=1)
+
+        lote = calcular_fator_tendencia_yoy_lote(
+            vendas_mensais_longo(vendas_por_item), dessazonalizar=dessazonalizar
+        )
+
+        for item, vendas in vendas_por_item.items():
+            if not vendas:
+                continue
+            fator, classificacao, _ = funcao_item(vendas)
+            assert lote.loc[item, 'fator_tendencia'] == fator
+            assert lote.loc[item, 'classificacao'] == classificacao
+
+    @pytest.mark.unit
+    def test_fatores_mensais_do_job_e_validador(self):
+        vendas_por_item = gerar_vendas_por_item(seed=2, quantidade=20)
+
+        fatores = calcular_fatores_mensais_lote(vendas_por_item)
+
+        for item, vendas in vendas_por_item.items():
+            if not vendas:
+                assert fatores[item] == ({mes: 1.0 for mes in range(1, 13)}, 1.0, 'nao_calculado')
+                continue
+            fator, classificacao, _ = calcular_fator_tendencia_yoy(vendas)
+            assert fatores[item] == (calcular_fatores_sazonais(vendas), fator, classificacao)
+
+        status, _, detalhes = ValidadorConformidade.__new__(ValidadorConformidade)._verificar_fator_tendencia_yoy()
+        assert status == 'ok'
+        assert detalhes['testes'][-1]['divergentes'] == []
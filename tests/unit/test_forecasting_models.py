@@ -13,7 +13,8 @@ from core.forecasting_models import (
     SimpleExponentialSmoothing,
     LinearRegressionForecast,
     DecomposicaoSazonalMensal,
-    CrostonMethod
+    CrostonMethod,
+    HoltMethod
 )
 
 
@@ -175,3 +176,82 @@ class TestLinearRegression:
         # Previsão deve continuar decrescendo
         assert len(previsao) == 3
         assert previsao[0] < dados[-1]
+
+
+class TestAtualizacaoIncremental:
+    """update()/predict_next() devem equivaler a refazer o fit com a série estendida"""
+
+    SERIES = [
+        [float(v) for v in np.random.default_rng(0).poisson(5, 60)],
+        [float(v) for v in (np.random.default_rng(1).random(80) < 0.2) * np.random.default_rng(2).poisson(4, 80)],
+        [100, 110, 120, 130, 140, 150, 160, 170, 150, 140, 130],
+        [0.0] * 20,
+    ]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('nome', ['SMA', 'WMA', 'EMA', 'TSB', 'Holt', 'Regressão Linear', 'Holt-Winters'])
+    def test_update_igual_ao_refit(self, nome):
+        """Previsão um passo à frente após cada update bate com fit em [0:t]"""
+        for serie in self.SERIES:
+            modelo = get_modelo(nome)
+            modelo.fit(serie[:6])
+            for t in range(6, len(serie)):
+                referencia = get_modelo(nome).fit(serie[:t])
+                assert modelo.predict_next() == pytest.approx(referencia.predict(1)[0], rel=1e-9, abs=1e-9)
+                modelo.update(serie[t])
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('classe', [SimpleExponentialSmoothing, HoltMethod, CrostonMethod])
+    def test_update_com_otimizacao_igual_ao_refit(self, classe):
+        """Com optimize=True o update reotimiza os parâmetros como o refit"""
+        serie = self.SERIES[0]
+        modelo = classe(optimize=True).fit(serie[:6])
+        for t in range(6, len(serie)):
+            referencia = classe(optimize=True).fit(serie[:t])
+            assert modelo.predict_next() == pytest.approx(referencia.predict(1)[0], rel=1e-9, abs=1e-9)
+            modelo.update(serie[t])
+
+    @pytest.mark.unit
+    def test_walk_forward_em_uma_passada(self, mocker):
+        """walk_forward_validation ajusta o modelo uma única vez"""
+        from core.accuracy_metrics import walk_forward_validation
+
+        serie = self.SERIES[0]
+        fit = mocker.spy(SimpleExponentialSmoothing, 'fit')
+        resultado = walk_forward_validation(serie, 'EMA')
+
+        assert fit.call_count == 1
+        assert resultado['n_folds'] == len(serie) - 6
+        esperado = [SimpleExponentialSmoothing().fit(serie[:t]).predict(1)[0] for t in range(6, len(serie))]
+        assert resultado['predictions'] == pytest.approx(esperado)
+
+    @pytest.mark.unit
+    def test_walk_forward_auto_igual_ao_refit_por_dobra(self):
+        """AUTO no walk-forward escolhe o método de cada dobra como um fit em [0:t]"""
+        from core.accuracy_metrics import walk_forward_validation
+
+        for serie in (self.SERIES[0], self.SERIES[2]):
+            resultado = walk_forward_validation(serie, 'AUTO')
+
+            esperado = [get_modelo('AUTO').fit(serie[:t]).predict(1)[0] for t in range(6, len(serie))]
+            assert resultado['predictions'] == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+
+    @pytest.mark.unit
+    def test_auto_reavalia_a_cada_intervalo(self, mocker):
+        """AUTO só refaz a recomendação a cada intervalo_reselecao observações"""
+        from core.forecasting_models import AutoMethodSelector
+        from core.method_selector import MethodSelector
+
+        serie = self.SERIES[0]
+        recomendar = mocker.spy(MethodSelector, 'recomendar_metodo')
+        modelo = AutoMethodSelector(intervalo_reselecao=6).fit(serie[:12])
+        for valor in serie[12:]:
+            modelo.update(valor)
+
+        assert recomendar.call_count == 1 + (len(serie) - 12) // 6
+
+        # Padrão (intervalo 1): a seleção acompanha o refit a cada passo
+        modelo = AutoMethodSelector().fit(serie[:12])
+        for t in range(12, len(serie)):
+            modelo.update(serie[t])
+            assert modelo.method_name == MethodSelector(serie[:t + 1]).recomendar_metodo()['metodo']
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitarios para app/utils/jobs_pedido.py (calculo de pedido em background)
+"""
+
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+
+import app.utils.jobs_pedido as jobs_pedido
+from app.blueprints.pedido_jobs import pedido_jobs_bp
+from app.utils.jobs_pedido import (
+    STATUS_CONCLUIDO, STATUS_ERRO, JobPedido, dados_exportacao, faixa_progresso,
+    reportar_progresso, submeter_job_pedido
+)
+
+
+@pytest.fixture
+def app_jobs(monkeypatch):
+    """App minimo com um endpoint de calculo que reporta progresso."""
+    monkeypatch.setattr(jobs_pedido, '_jobs', {})
+    liberar = threading.Event()
+
+    app = Flask(__name__)
+    app.register_blueprint(pedido_jobs_bp)
+
+    @app.route('/api/calculo_teste', methods=['POST'])
+    def calculo_teste():
+        dados = request.get_json()
+        if dados.get('assincrono'):
+            return submeter_job_pedido('teste', request.path, dados)
+        reportar_progresso(1, 4, 'Calculando itens')
+        liberar.wait(5)
+        if dados.get('falhar'):
+            return jsonify({'success': False, 'erro': 'Fornecedor invalido'}), 400
+        return jsonify({'success': True, 'itens': dados['itens']})
+
+    app.liberar = liberar
+    return app
+
+
+def aguardar_fim(client, job_id):
+    for _ in range(100):
+        resp = client.get(f'/api/pedido_jobs/{job_id}/resultado')
+        if resp.status_code != 202:
+            return resp
+        time.sleep(0.02)
+    raise AssertionError('job nao terminou')
+
+
+class TestJobsPedido:
+    """Submissao, andamento e resultado"""
+
+    @pytest.mark.unit
+    def test_job_devolve_resultado_do_modo_sincrono(self, app_jobs):
+        client = app_jobs.test_client()
+
+        resp = client.post('/api/calculo_teste', json={'assincrono': True, 'itens': [1, 2]})
+        assert resp.status_code == 202
+        job_id = resp.get_json()['job_id']
+        assert resp.get_json()['status_url'] == f'/api/pedido_jobs/{job_id}'
+
+        for _ in range(100):
+            status = client.get(f'/api/pedido_jobs/{job_id}').get_json()
+            if status['itens_total']:
+                break
+            time.sleep(0.02)
+        assert status['status'] == 'executando'
+        assert (status['itens_processados'], status['itens_total'], status['percentual']) == (1, 4, 25.0)
+        assert status['etapa'] == 'Calculando itens'
+
+        app_jobs.liberar.set()
+        resp = aguardar_fim(client, job_id)
+        assert resp.status_code == 200
+        assert resp.get_json() == {'success': True, 'itens': [1, 2]}
+        assert client.get(f'/api/pedido_jobs/{job_id}').get_json()['status'] == STATUS_CONCLUIDO
+
+    @pytest.mark.unit
+    def test_erro_do_endpoint_fica_no_job(self, app_jobs):
+        client = app_jobs.test_client()
+        app_jobs.liberar.set()
+
+        job_id = client.post('/api/calculo_teste', json={'assincrono': True, 'falhar': True}).get_json()['job_id']
+
+        resp = aguardar_fim(client, job_id)
+        assert resp.status_code == 400
+        job = jobs_pedido.obter_job(job_id)
+        assert (job.status, job.erro) == (STATUS_ERRO, 'Fornecedor invalido')
+        assert dados_exportacao({'job_id': job_id}) == (None, 'Job ainda nao concluido (status: erro)')
+
+    @pytest.mark.unit
+    def test_fila_cheia(self, app_jobs, monkeypatch):
+        monkeypatch.setattr(jobs_pedido, 'JOBS_MAX_NA_FILA', 1)
+        client = app_jobs.test_client()
+
+        assert client.post('/api/calculo_teste', json={'assincrono': True, 'itens': []}).status_code == 202
+        assert client.post('/api/calculo_teste', json={'assincrono': True, 'itens': []}).status_code == 429
+        app_jobs.liberar.set()
+
+    @pytest.mark.unit
+    def test_job_expirado(self, app_jobs, monkeypatch):
+        client = app_jobs.test_client()
+        app_jobs.liberar.set()
+        job_id = client.post('/api/calculo_teste', json={'assincrono': True, 'itens': []}).get_json()['job_id']
+        aguardar_fim(client, job_id)
+
+        monkeypatch.setattr(jobs_pedido, 'JOBS_TTL_SEGUNDOS', -1)
+
+        assert client.get(f'/api/pedido_jobs/{job_id}').status_code == 404
+
+
+class TestDadosExportacao:
+    """Exportacao a partir do resultado guardado"""
+
+    @pytest.mark.unit
+    def test_sem_job_id_usa_dados_recebidos(self):
+        assert dados_exportacao({'itens': [1]}) == ({'itens': [1]}, None)
+        assert dados_exportacao(None) == (None, None)
+
+    @pytest.mark.unit
+    def test_job_inexistente(self, app_jobs):
+        assert dados_exportacao({'job_id': 'x'}) == (None, 'Job nao encontrado ou expirado')
+
+    @pytest.mark.unit
+    def test_job_concluido(self, app_jobs):
+        client = app_jobs.test_client()
+        app_jobs.liberar.set()
+        job_id = client.post('/api/calculo_teste', json={'assincrono': True, 'itens': [3]}).get_json()['job_id']
+        aguardar_fim(client, job_id)
+
+        assert dados_exportacao({'job_id': job_id}) == ({'success': True, 'itens': [3]}, None)
+
+    @pytest.mark.unit
+    def test_progresso_fora_de_job_nao_tem_efeito(self):
+        reportar_progresso(1, 2, 'x')
+
+
+@pytest.fixture
+def job_na_thread():
+    job = JobPedido(id='j', tipo='teste', rota='/x', status='executando')
+    jobs_pedido._contexto.job = job
+    yield job
+    jobs_pedido._contexto.job = None
+    jobs_pedido._contexto.faixas = []
+
+
+class TestAndamento:
+    """Andamento reportado pelos endpoints"""
+
+    @pytest.mark.unit
+    def test_chamada_interna_reporta_dentro_da_faixa(self, job_na_thread):
+        # Compra Planejada: 3 fases de 10 itens; a Fase 1 e o pedido base (4 itens + 2 passos)
+        with faixa_progresso(0, 10, 30, 'Fase 1 de 3'):
+            reportar_progresso(3, 6, 'Preparando itens')
+            assert (job_na_thread.itens_processados, job_na_thread.itens_total) == (5, 30)
+            assert job_na_thread.etapa == 'Fase 1 de 3: Preparando itens'
+            reportar_progresso(6, 6, 'Consolidando pedido')
+        assert job_na_thread.itens_processados == 10
+
+        reportar_progresso(10, 30, 'Fase 2 de 3')
+        assert (job_na_thread.itens_processados, job_na_thread.itens_total) == (10, 30)
+
+    @pytest.mark.unit
+    def test_andamento_nao_volta_nem_chega_a_100_antes_do_fim(self, job_na_thread):
+        reportar_progresso(8, 10)
+        reportar_progresso(5, 10)
+        assert job_na_thread.itens_processados == 8
+
+        reportar_progresso(10, 10, 'Consolidando pedido')
+        assert job_na_thread.percentual() < 100
+        job_na_thread.status = STATUS_CONCLUIDO
+        assert job_na_thread.percentual() == 100.0
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a extracao de caracteristicas e selecao em lote do MLMethodSelector
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from core.ml_selector import MLMethodSelector
+
+
+def gerar_historico(seed=0, quantidade=60):
+    """Series de 1 a 40 meses: tendencia, intermitente, constante e sazonal, em ordem embaralhada."""
+    rng = np.random.default_rng(seed)
+    registros = []
+    for i in range(quantidade):
+        for t in range(int(rng.integers(1, 40))):
+            vendas = [
+                100 + 5 * t + rng.normal(0, 10),
+                float(rng.choice([0, 0, 50, 100])),
+                7.0,
+                150 + 50 * np.sin(2 * np.pi * t / 12),
+            ][i % 4]
+            registros.append({'SKU': f'P{i % 20:03d}', 'Loja': f'L{i // 20}',
+                              'Mes': pd.Timestamp('2023-01-01') + pd.DateOffset(months=t),
+                              'Vendas': vendas})
+    return pd.DataFrame(registros).sample(frac=1, random_state=seed)
+
+
+class TestCaracteristicasLote:
+    """Matriz de caracteristicas igual a extracao serie a serie"""
+
+    @pytest.mark.unit
+    def test_caracteristicas_iguais_as_da_serie(self):
+        historico = gerar_historico()
+        seletor = MLMethodSelector()
+
+        lote = seletor.extrair_caracteristicas_lote(historico)
+
+        assert list(lote.columns) == list(seletor._caracteristicas_padrao().keys())
+        for (sku, loja), grupo in historico.groupby(['SKU', 'Loja']):
+            esperado = seletor.extrair_caracteristicas(grupo.sort_values('Mes')['Vendas'])
+            obtido = lote.loc[(sku, loja)]
+            for nome, valor in esperado.items():
+                assert obtido[nome] == pytest.approx(valor, rel=1e-9, abs=1e-12, nan_ok=True), nome
+
+    @pytest.mark.unit
+    def test_tamanho_serie_inteiro_como_na_serie(self):
+        seletor = MLMethodSelector()
+        historico = gerar_historico(seed=3, quantidade=8)
+
+        lote = seletor.extrair_caracteristicas_lote(historico)
+        vazio = seletor.extrair_caracteristicas_lote(historico.iloc[:0])
+
+        assert isinstance(seletor.extrair_caracteristicas(pd.Series([1.0, 2.0, 3.0]))['tamanho_serie'], int)
+        assert lote['tamanho_serie'].dtype == np.int64
+        assert vazio['tamanho_serie'].dtype == np.int64
+
+    @pytest.mark.unit
+    def test_caracteristicas_da_serie_no_helper(self):
+        from app.utils.previsao_helper import caracteristicas_ml_da_serie
+
+        seletor = MLMethodSelector()
+        historico = gerar_historico(seed=3, quantidade=8)
+        lote = seletor.extrair_caracteristicas_lote(historico)
+
+        for (sku, loja), grupo in historico.groupby(['SKU', 'Loja']):
+            esperado = seletor.extrair_caracteristicas(grupo.sort_values('Mes')['Vendas'])
+            obtido = caracteristicas_ml_da_serie(lote, sku, loja)
+            assert list(obtido) == list(esperado)
+            assert type(obtido['tamanho_serie']) is int
+            assert obtido['tamanho_serie'] == esperado['tamanho_serie']
+            assert obtido == pytest.approx(esperado, rel=1e-9, abs=1e-12, nan_ok=True)
+
+
+class TestSelecaoLote:
+    """Selecao em massa com uma predicao igual a selecao serie a serie"""
+
+    @pytest.mark.unit
+    def test_selecao_em_massa_igual_a_selecao_por_serie(self):
+        historico = gerar_historico(seed=1)
+        seletor = MLMethodSelector()
+        seletor.treinar_com_historico(historico)
+
+        resultado = seletor.selecionar_metodos_em_massa(historico)
+
+        assert list(resultado.columns) == ['SKU', 'Loja', 'Metodo_Sugerido', 'Confianca']
+        for linha, ((sku, loja), grupo) in zip(resultado.itertuples(), historico.groupby(['SKU', 'Loja'])):
+            metodo, confianca = seletor.selecionar_metodo(grupo.sort_values('Mes')['Vendas'])
+            assert (linha.SKU, linha.Loja, linha.Metodo_Sugerido) == (sku, loja, metodo)
+            assert linha.Confianca == pytest.approx(confianca)
+
+    @pytest.mark.unit
+    def test_sem_treino_usa_media_movel(self):
+        resultado = MLMethodSelector().selecionar_metodos_em_massa(gerar_historico(quantidade=8))
+
+        assert (resultado['Metodo_Sugerido'] == 'MEDIA_MOVEL').all()
+        assert (resultado['Confianca'] == 0.5).all()
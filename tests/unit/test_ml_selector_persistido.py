@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para o MLMethodSelector persistido (treino offline + carga sob demanda)
+"""
+
+import pickle
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from core import ml_selector as modulo
+from core.ml_selector import MLMethodSelector, montar_exemplos_treino, obter_seletor_treinado
+
+
+def gerar_historico(seed=0, quantidade=12):
+    """Historico SKU/Loja/Mes/Vendas com series estaveis, com tendencia e intermitentes."""
+    rng = np.random.default_rng(seed)
+    registros = []
+    for i in range(quantidade):
+        for t in range(24):
+            if i % 3 == 0:
+                vendas = 100 + 5 * t + rng.normal(0, 10)
+            elif i % 3 == 1:
+                vendas = 200 + rng.normal(0, 15)
+            else:
+                vendas = float(rng.choice([0, 0, 50, 100, 200]))
+            registros.append({'SKU': f'P{i:03d}', 'Loja': 'L001',
+                              'Mes': pd.Timestamp('2024-01-01') + pd.DateOffset(months=t),
+                              'Vendas': vendas})
+    return pd.DataFrame(registros)
+
+
+@pytest.fixture
+def diretorio_modelos(tmp_path, monkeypatch):
+    monkeypatch.setenv('ML_SELECTOR_DIR', str(tmp_path))
+    monkeypatch.setattr(modulo, '_modelos_carregados', {})
+    return tmp_path
+
+
+class TestTreinoParalelo:
+    """Treino paralelo gera os mesmos exemplos do sequencial"""
+
+    @pytest.mark.unit
+    def test_exemplos_paralelos_iguais_aos_sequenciais(self, monkeypatch):
+        historico = gerar_historico()
+        series = [g.sort_values('Mes')['Vendas'].to_numpy() for _, g in historico.groupby(['SKU', 'Loja'])]
+        monkeypatch.setattr(modulo, 'SERIES_POR_TAREFA', 5)
+
+        assert montar_exemplos_treino(series, workers=2) == montar_exemplos_treino(series)
+
+
+class TestModeloPersistido:
+    """Salvar, carregar e reutilizar o modelo entre requisicoes"""
+
+    @pytest.mark.unit
+    def test_modelo_carregado_prediz_igual_ao_treinado(self, diretorio_modelos):
+        historico = gerar_historico()
+        seletor = MLMethodSelector()
+        seletor.treinar_com_historico(historico)
+
+        caminho = seletor.salvar('mensal')
+        carregado = obter_seletor_treinado('mensal')
+
+        assert carregado.caminho_modelo == caminho
+        assert carregado.estatisticas_treino['series_validas'] == 12
+        for _, grupo in historico.groupby('SKU'):
+            serie = grupo.sort_values('Mes')['Vendas']
+            assert carregado.selecionar_metodo(serie) == seletor.selecionar_metodo(serie)
+        # Reutilizado enquanto o arquivo nao muda; outra granularidade nao usa este modelo
+        assert obter_seletor_treinado('mensal') is carregado
+        assert obter_seletor_treinado('semanal') is None
+
+    @pytest.mark.unit
+    def test_sem_modelo_ou_modelo_incompativel_retorna_none(self, diretorio_modelos):
+        assert obter_seletor_treinado('semanal') is None
+
+        seletor = MLMethodSelector()
+        seletor.treinar_com_historico(gerar_historico(seed=1))
+        caminho = seletor.salvar('semanal')
+        with open(caminho, 'rb') as f:
+            artefato = pickle.load(f)
+        artefato['feature_names'] = artefato['feature_names'][:-1]
+        with open(caminho, 'wb') as f:
+            pickle.dump(artefato, f)
+
+        assert obter_seletor_treinado('semanal') is None
+        with pytest.raises(ValueError):
+            MLMethodSelector.carregar(caminho)
+
+    @pytest.mark.unit
+    def test_arquivo_recente_incompativel_usa_o_anterior(self, diretorio_modelos):
+        seletor = MLMethodSelector()
+        seletor.treinar_com_historico(gerar_historico(seed=2))
+        anterior = seletor.salvar('semanal')
+        recente = seletor.salvar('semanal')
+        with open(recente, 'rb') as f:
+            artefato = pickle.load(f)
+        artefato['versao_sklearn'] = '0.0'
+        with open(recente, 'wb') as f:
+            pickle.dump(artefato, f)
+
+        carregado = obter_seletor_treinado('semanal')
+
+        assert carregado.caminho_modelo == anterior
+        assert carregado.granularidade == 'semanal'
+        with pytest.raises(ValueError):
+            MLMethodSelector.carregar(anterior, 'mensal')
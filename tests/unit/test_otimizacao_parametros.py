@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para core/otimizacao_parametros.py (grade de parametros em lote)
+"""
+
+import pytest
+import numpy as np
+
+from core.forecasting_models import SimpleExponentialSmoothing, HoltMethod, HoltWinters, CrostonMethod
+from core.otimizacao_parametros import avaliar_grade, otimizar_parametros_lote, PARAMETROS_PADRAO
+
+
+def gerar_series(seed=0, quantidade=12):
+    """Series curtas e medias com tendencia + sazonalidade (periodo 4) e intermitentes."""
+    rng = np.random.default_rng(seed)
+    series = []
+    for i in range(quantidade):
+        n = int(rng.integers(5, 50))
+        t = np.arange(n)
+        serie = np.maximum(0, 10 + 0.2 * t + 3 * np.sin(2 * np.pi * t / 4) + rng.normal(0, 2, n))
+        if i % 3 == 0:
+            serie = (rng.random(n) < 0.3) * rng.poisson(4, n)
+        series.append([float(v) for v in serie])
+    return series
+
+
+def sse_escalar(criar_modelo, serie, inicio):
+    """Erro um passo a frente refazendo o fit do modelo em cada prefixo."""
+    return sum(
+        (serie[t] - criar_modelo().fit(serie[:t]).predict(1)[0]) ** 2
+        for t in range(inicio, len(serie))
+    )
+
+
+class TestAvaliarGrade:
+    """SSE da grade vetorizada igual ao refit escalar de cada modelo"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('metodo, criar, inicio, kwargs', [
+        ('ses', lambda p: SimpleExponentialSmoothing(*p), 1, {}),
+        ('holt', lambda p: HoltMethod(*p), 2, {}),
+        ('croston', lambda p: CrostonMethod(p[0], variant='sba'), 1, {'variant': 'sba'}),
+        ('holt_winters', lambda p: HoltWinters(4, *p), 8, {'season_period': 4}),
+    ])
+    def test_grade_igual_ao_refit_escalar(self, metodo, criar, inicio, kwargs):
+        series = gerar_series()
+        _, combinacoes, sse, n_erros = avaliar_grade(series, metodo, **kwargs)
+
+        for i, serie in enumerate(series):
+            if metodo == 'holt_winters' and len(serie) < 8:
+                continue  # Serie curta: avaliada como Holt
+            assert n_erros[i] == max(len(serie) - inicio, 0)
+            for j in range(0, len(combinacoes), 7):
+                esperado = sse_escalar(lambda: criar(combinacoes[j]), serie, inicio)
+                assert sse[i, j] == pytest.approx(esperado, rel=1e-9, abs=1e-9)
+
+
+class TestOtimizarParametros:
+    """Escolha por item e uso pelos modelos"""
+
+    @pytest.mark.unit
+    def test_escolhe_menor_erro_e_default_para_serie_curta(self):
+        series = gerar_series(seed=1) + [[3.0, 4.0]]
+        nomes, combinacoes, sse, _ = avaliar_grade(series, 'holt')
+
+        params = otimizar_parametros_lote(series, 'holt')
+
+        for i, p in enumerate(params[:-1]):
+            j = int(sse[i].argmin())
+            assert p == {nome: combinacoes[j, k] for k, nome in enumerate(nomes)}
+        assert params[-1] == PARAMETROS_PADRAO['holt']
+
+    @pytest.mark.unit
+    def test_modelo_com_optimize_usa_parametros_do_lote(self):
+        series = gerar_series(seed=2)
+        lote = otimizar_parametros_lote(series, 'ses')
+
+        for serie, params in zip(series, lote):
+            modelo = SimpleExponentialSmoothing(optimize=True).fit(serie)
+            referencia = SimpleExponentialSmoothing(**params).fit(serie)
+            assert modelo.alpha == params['alpha']
+            assert modelo.predict(3) == referencia.predict(3)
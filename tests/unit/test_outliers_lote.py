@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para AutoOutlierDetector.analyze_many (deteccao de outliers em lote)
+"""
+
+import math
+import pytest
+import numpy as np
+
+from core.outlier_detector import AutoOutlierDetector
+
+
+def gerar_series(seed=0, quantidade=300):
+    """Estaveis, com picos, intermitentes, constantes, assimetricas e inteiras, de varios tamanhos."""
+    rng = np.random.default_rng(seed)
+    series = []
+    for i in range(quantidade):
+        n = int(rng.choice([3, 6, 8, 11, 12, 13, 30, 60, 365]))
+        padrao = i % 6
+        if padrao == 0:
+            serie = list(rng.poisson(10, n).astype(float))
+        elif padrao == 1:
+            serie = rng.normal(100, 5, n)
+            serie[rng.integers(0, n, max(1, n // 20))] *= rng.uniform(3, 8)
+            serie = list(serie)
+        elif padrao == 2:
+            serie = list((rng.random(n) < 0.2) * rng.poisson(4, n).astype(float))
+        elif padrao == 3:
+            serie = [7.0] * n
+        elif padrao == 4:
+            serie = list(rng.lognormal(2, 1, n))
+        else:
+            serie = [int(v) for v in rng.poisson(20, n)]
+        series.append(serie)
+    return series
+
+
+def iguais(a, b):
+    """Igualdade estrita (inclusive tipos), tratando NaN == NaN"""
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(iguais(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(iguais(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == b and type(a) == type(b)
+
+
+class TestAnalyzeMany:
+    """Lote deve reproduzir analyze_and_clean serie a serie"""
+
+    @pytest.mark.unit
+    def test_lote_igual_ao_escalar(self):
+        """Serie limpa, indices, tratamento, razao, confianca e estatisticas identicos"""
+        series = gerar_series()
+
+        lote = AutoOutlierDetector().analyze_many(series)
+        escalar = [AutoOutlierDetector().analyze_and_clean(s) for s in series]
+
+        assert {r['treatment'] for r in escalar} >= {'NONE', 'REMOVE', 'REPLACE_MEDIAN'}
+        for obtido, esperado in zip(lote, escalar):
+            assert iguais(obtido, esperado)
+
+    @pytest.mark.unit
+    def test_matriz_com_comprimentos(self):
+        """Matriz alinhada a esquerda + comprimentos equivale a lista de series"""
+        series = [s for s in gerar_series(seed=1, quantidade=60) if not isinstance(s[0], int)]
+        comprimentos = [len(s) for s in series]
+        matriz = np.full((len(series), max(comprimentos)), -1.0)
+        for i, s in enumerate(series):
+            matriz[i, :len(s)] = s
+
+        lote = AutoOutlierDetector().analyze_many(matriz, comprimentos)
+
+        for obtido, esperado in zip(lote, AutoOutlierDetector().analyze_many(series)):
+            assert iguais(obtido, esperado)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitarios para core/pedido_lote.py e PedidoFornecedorIntegrado.processar_itens_lote
+(calculo de pedidos em lote igual ao processar_item item a item)
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from core.pedido_fornecedor_integrado import PedidoFornecedorIntegrado
+from core.pedido_lote import calcular_pedidos_lote, DECISOES_ARREDONDAMENTO
+
+
+class EventosFalsos:
+    """Um evento de +30% entre 40 e 45 dias a partir de hoje."""
+
+    def __init__(self):
+        hoje = datetime.now().date()
+        self.inicio = hoje + timedelta(days=40)
+        self.fim = hoje + timedelta(days=45)
+        self.chamadas = 0
+
+    def buscar_periodos_eventos(self, data_inicio, data_fim):
+        return [(self.inicio.isoformat(), self.fim.isoformat())]
+
+    def calcular_fator_eventos(self, codigo, cod_empresa, cod_fornecedor=None, linha1=None,
+                               linha3=None, data_inicio=None, data_fim=None):
+        self.chamadas += 1
+        dias = (data_fim - data_inicio).days + 1
+        dentro = sum(1 for k in range(dias)
+                     if self.inicio <= data_inicio + timedelta(days=k) <= self.fim)
+        eventos = [{'id': 1, 'nome': 'Promo', 'tipo': 'PROMO', 'impacto_percentual': 30}] if dentro else []
+        return {'fator_total': round((dentro * 1.3 + dias - dentro) / dias, 4), 'eventos_aplicados': eventos}
+
+
+def montar_processador(seed=0, quantidade=1500):
+    """Processador com caches preenchidos e itens cobrindo os ramos do calculo."""
+    rng = np.random.default_rng(seed)
+    processador = PedidoFornecedorIntegrado(None)
+    processador._regras_sit_compra = {
+        'FL': {'descricao': 'Fora de linha', 'bloqueia_compra_automatica': True,
+               'permite_compra_manual': False, 'cor_alerta': '#dc3545', 'icone': 'x'}
+    }
+    processador._cache_sit_compra_itens = {}
+    processador._cache_estoque = {}
+    processador._cache_produtos = {}
+    processador._cache_embalagem = {}
+    processador._event_manager = EventosFalsos()
+
+    itens = []
+    for i in range(quantidade):
+        codigo = int(rng.integers(1, 300))
+        loja = int(rng.integers(1, 5))
+        if codigo % 37:
+            processador._cache_produtos[codigo] = {
+                'codigo': str(codigo), 'descricao': f'Produto {codigo}', 'categoria': 'X',
+                'curva_abc': ['A', 'B', 'c', 'Z', None][codigo % 5], 'codigo_fornecedor': '123',
+                'nome_fornecedor': 'Fornecedor', 'lead_time_dias': [15, None, 0][codigo % 3],
+                'linha1': 'L1', 'linha3': 'L3'
+            }
+        if codigo % 4:
+            processador._cache_embalagem[codigo] = {
+                'qtd_embalagem': int(rng.choice([1, 6, 12, 24])), 'unidade_compra': 'CX', 'unidade_menor': 'UN'
+            }
+        if rng.random() < 0.9:
+            disponivel = float(rng.choice([0, rng.uniform(0, 300), rng.uniform(0, 5000)]))
+            transito = float(rng.choice([0, rng.uniform(0, 100)]))
+            processador._cache_estoque[(codigo, loja)] = {
+                'estoque_disponivel': disponivel, 'estoque_transito': transito,
+                'estoque_efetivo': disponivel + transito, 'cue': float(rng.uniform(0, 50)), 'curva_abc': 'B'
+            }
+        if rng.random() < 0.03:
+            processador._cache_sit_compra_itens[(codigo, loja)] = 'FL'
+
+        itens.append({
+            'codigo': codigo,
+            'cod_empresa': loja,
+            'previsao_diaria': rng.choice([0.0, float(rng.exponential(3)), float(rng.exponential(0.05)), None]),
+            'desvio_padrao': rng.choice([0.0, float(rng.exponential(2)), None]),
+            'cobertura_dias': [None, None, 30, 90][i % 4],
+            'lead_time_dias': [None, int(rng.integers(0, 40))][i % 2],
+            'ciclo_pedido_dias': [None, 7, 14, 0][i % 4],
+            'pedido_minimo_valor': 0.0,
+            'aplicar_limitador_cobertura': bool(rng.random() < 0.4),
+            'dias_ate_entrega': [None, None, int(rng.integers(0, 30))][i % 3],
+        })
+    return processador, itens
+
+
+def assert_identicos(esperado, obtido, caminho=''):
+    """Igualdade exata, inclusive tipos de dicionarios/listas e NaN."""
+    if isinstance(esperado, dict):
+        assert set(esperado) == set(obtido), (caminho, set(esperado) ^ set(obtido))
+        for chave in esperado:
+            assert_identicos(esperado[chave], obtido[chave], f'{caminho}.{chave}')
+    elif isinstance(esperado, list):
+        assert len(esperado) == len(obtido), caminho
+        for a, b in zip(esperado, obtido):
+            assert_identicos(a, b, caminho)
+    elif isinstance(esperado, float) and math.isnan(esperado):
+        assert isinstance(obtido, float) and math.isnan(obtido), caminho
+    else:
+        assert esperado == obtido, (caminho, esperado, obtido)
+
+
+class TestProcessarItensLote:
+    """Lote igual ao processar_item item a item"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('seed', [0, 1])
+    def test_lote_igual_item_a_item(self, seed):
+        processador, itens = montar_processador(seed)
+        esperado = [processador.processar_item(**item) for item in itens]
+
+        obtido = processador.processar_itens_lote(itens)
+
+        assert len(obtido) == len(itens)
+        for e, o in zip(esperado, obtido):
+            assert_identicos(e, o)
+        decisoes = {r['arredondamento_decisao'] for r in obtido if r.get('ajustado_multiplo')}
+        assert len(decisoes) > 1 and decisoes <= set(DECISOES_ARREDONDAMENTO)
+        assert any(r.get('bloqueado') for r in obtido)
+
+    @pytest.mark.unit
+    def test_eventos_consultados_so_na_janela_do_evento(self):
+        processador, itens = montar_processador(seed=2, quantidade=300)
+        for item in itens:
+            item['lead_time_dias'] = 0
+            item['cobertura_dias'] = 10  # Janela [hoje, hoje+10]: antes do evento
+
+        processador.processar_itens_lote(itens)
+
+        assert processador._event_manager.chamadas == 0
+
+    @pytest.mark.unit
+    def test_lista_vazia(self):
+        processador, _ = montar_processador(quantidade=0)
+        assert processador.processar_itens_lote([]) == []
+
+
+class TestCalcularPedidosLote:
+    """Motor colunar isolado"""
+
+    @pytest.mark.unit
+    def test_multiplo_de_caixa_e_sem_pedido_com_estoque_alto(self):
+        r = calcular_pedidos_lote(
+            previsao_diaria=np.array([10.0, 1.0]),
+            desvio_padrao=np.array([2.0, 0.5]),
+            estoque_disponivel=np.array([0.0, 1000.0]),
+            estoque_transito=np.array([0.0, 0.0]),
+            estoque_efetivo=np.array([0.0, 1000.0]),
+            lead_time=np.array([15, 15]),
+            ciclo_pedido=np.array([7, 7]),
+            curva_abc=np.array(['A', 'B'], dtype=object),
+            multiplo_caixa=np.array([12, 6]),
+            cobertura_dias=np.array([np.nan, np.nan]),
+            dias_consumo=np.array([0, 0]),
+        )
+
+        assert r['deve_pedir'].tolist() == [True, False]
+        assert r['quantidade_pedido'][0] % 12 == 0
+        assert r['quantidade_pedido'][0] >= r['necessidade_bruta'][0] - 12
+        assert r['quantidade_pedido'][1] == 0
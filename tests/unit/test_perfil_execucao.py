@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para jobs/perfil_execucao.py
+"""
+
+import json
+import pickle
+import pytest
+
+from jobs.perfil_execucao import PerfilEtapas, ETAPAS_CALCULO, memoria_pico_mb
+
+
+class TestPerfilEtapas:
+    """Testes do acumulador de tempo por etapa do cronjob"""
+
+    @pytest.mark.unit
+    def test_medir_acumula_tempo_itens_e_chamadas(self):
+        perfil = PerfilEtapas()
+        with perfil.medir('preload_historico', itens=10):
+            pass
+        with perfil.medir('preload_historico', itens=5):
+            pass
+
+        etapa = perfil.etapas['preload_historico']
+        assert etapa['itens'] == 15
+        assert etapa['chamadas'] == 2
+        assert etapa['tempo_ms'] >= 0
+
+    @pytest.mark.unit
+    def test_medir_registra_mesmo_com_excecao(self):
+        perfil = PerfilEtapas()
+        with pytest.raises(ValueError):
+            with perfil.medir('gravacao_mensal', itens=1):
+                raise ValueError('falha no banco')
+        assert perfil.etapas['gravacao_mensal']['chamadas'] == 1
+
+    @pytest.mark.unit
+    def test_somar_perfis_de_chunks_e_dict(self):
+        """Perfis de processos (objeto) e de checkpoints (dict JSON) se somam"""
+        a = PerfilEtapas(memoria_pico_mb=100.0)
+        a.registrar('correcao_censura', 10.0, itens=3)
+        b = PerfilEtapas(memoria_pico_mb=250.0)
+        b.registrar('correcao_censura', 5.0, itens=2)
+        b.registrar('fator_yoy', 1.0, itens=2)
+
+        total = PerfilEtapas().somar(a).somar(json.loads(json.dumps(b.como_dict())))
+
+        assert total.etapas['correcao_censura'] == {'tempo_ms': 15.0, 'itens': 5, 'chamadas': 2}
+        assert total.etapas['fator_yoy']['itens'] == 2
+        assert total.memoria_pico_mb == 250.0
+
+    @pytest.mark.unit
+    def test_como_dict_segue_ordem_das_etapas(self):
+        perfil = PerfilEtapas()
+        for etapa in reversed(ETAPAS_CALCULO):
+            perfil.registrar(etapa, 1.0)
+        perfil.registrar('etapa_nova', 1.0)
+
+        resultado = perfil.como_dict()
+        assert list(resultado['etapas']) == list(ETAPAS_CALCULO) + ['etapa_nova']
+        assert resultado['tempo_total_ms'] == len(ETAPAS_CALCULO) + 1
+
+    @pytest.mark.unit
+    def test_perfil_serializavel_entre_processos(self):
+        perfil = PerfilEtapas()
+        perfil.registrar('calculo_semanal', 2.5, itens=4)
+        perfil.atualizar_memoria()
+        copia = pickle.loads(pickle.dumps(perfil))
+        assert copia.como_dict() == perfil.como_dict()
+
+    @pytest.mark.unit
+    def test_memoria_pico_positiva(self):
+        memoria = memoria_pico_mb()
+        assert memoria is None or memoria > 0
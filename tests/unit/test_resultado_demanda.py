@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para core/resultado_demanda.py (resultados compactos com __slots__)
+"""
+
+import pickle
+import sys
+
+import pytest
+import numpy as np
+from datetime import date, timedelta
+
+from core.demand_calculator import DemandCalculator
+from core.resultado_demanda import RegistroDemanda, ResultadoDemanda, ResumoHistorico
+from jobs.calcular_demanda_diaria import calcular_demanda_item_com_cache
+
+
+def registro_mensal():
+    return {
+        'cod_produto': '10', 'cnpj_fornecedor': '123', 'cod_empresa': None,
+        'ano': 2026, 'mes': 3, 'demanda_prevista': 310.5, 'demanda_diaria_base': 10.0163,
+        'desvio_padrao': 2.1, 'fator_sazonal': 1.02, 'fator_tendencia_yoy': 1.0,
+        'classificacao_tendencia': 'estavel', 'valor_ano_anterior': 300.0,
+        'variacao_vs_aa': 1.035, 'limitador_aplicado': False, 'metodo_usado': 'sma',
+        'categoria_serie': 'media', 'dias_historico': 400, 'total_vendido_historico': 4000.0,
+        'taxa_disponibilidade': 0.95, 'dias_ruptura': 3, 'demanda_censurada_corrigida': True,
+    }
+
+
+class TestRegistroDemanda:
+    """RegistroDemanda se comporta como o dict que substitui"""
+
+    @pytest.mark.unit
+    def test_leitura_como_dict(self):
+        valores = registro_mensal()
+        registro = RegistroDemanda(valores)
+
+        assert registro == valores
+        assert registro.como_dict() == valores
+        assert registro['mes'] == 3
+        assert registro.get('tipo_granularidade') is None
+        assert 'semana' not in registro
+        with pytest.raises(KeyError):
+            registro['semana']
+        with pytest.raises(ValueError):
+            RegistroDemanda({**valores, 'campo_novo': 1})
+
+    @pytest.mark.unit
+    def test_menor_que_o_dict_e_serializavel(self):
+        valores = registro_mensal()
+        registro = RegistroDemanda(valores)
+
+        assert not hasattr(registro, '__dict__')
+        assert sys.getsizeof(registro) < sys.getsizeof(valores)
+        assert len(pickle.dumps(registro)) < len(pickle.dumps(valores))
+        assert pickle.loads(pickle.dumps(registro)) == valores
+
+
+class TestResultadoDemanda:
+    """ResultadoDemanda guarda os campos do calculo e materializa o diagnostico sob demanda"""
+
+    @pytest.mark.unit
+    def test_como_dict_igual_a_metadata(self):
+        serie = [float(v) for v in np.random.default_rng(0).poisson(5, 200)]
+        demanda, desvio, metadata = DemandCalculator.calcular_demanda_diaria_unificada(serie, 30, 'mensal')
+
+        resultado = ResultadoDemanda.de_calculo(demanda, desvio, metadata)
+
+        assert resultado.como_tupla() == (demanda, desvio, metadata)
+        assert resultado.demanda_diaria_base == metadata['demanda_diaria_base']
+        assert resultado['ranking'] == metadata['ranking']
+        assert resultado.diagnostico is not resultado.diagnostico
+        assert pickle.loads(pickle.dumps(resultado)).como_tupla() == (demanda, desvio, metadata)
+
+    @pytest.mark.unit
+    def test_sem_diagnostico_mantem_campos_do_calculo(self):
+        metadata = {'metodo_usado': 'sem_dados', 'confianca': 'muito_baixa',
+                    'demanda_diaria_base': 0, 'dias_periodo': 30}
+
+        resultado = ResultadoDemanda.de_calculo(0.0, 0.0, metadata, diagnostico=False)
+
+        assert resultado.diagnostico is None
+        assert resultado.get('categoria_serie', 'media') == 'media'
+        assert resultado.get('dias_periodo') is None
+        assert resultado.como_dict() == {'metodo_usado': 'sem_dados', 'confianca': 'muito_baixa',
+                                         'demanda_diaria_base': 0}
+
+
+class TestResumoHistorico:
+    """ResumoHistorico guarda vendas_por_data em arrays e devolve o mesmo dicionario"""
+
+    @pytest.mark.unit
+    def test_meta_hist_compacto_gera_mesmos_registros(self):
+        rng = np.random.default_rng(1)
+        inicio = date(2024, 1, 1)
+        vendas_por_data = {
+            inicio + timedelta(days=d): float(rng.poisson(4))
+            for d in range(420) if rng.random() < 0.8
+        }
+        datas = sorted(vendas_por_data)
+        serie = [vendas_por_data.get(datas[0] + timedelta(days=d), 0)
+                 for d in range((datas[-1] - datas[0]).days + 1)]
+        vendas_por_mes = {}
+        for data, qtd in vendas_por_data.items():
+            vendas_por_mes[(data.year, data.month)] = vendas_por_mes.get((data.year, data.month), 0) + qtd
+        meta_hist = {
+            'dias_historico': len(serie), 'dias_com_venda': len(vendas_por_data),
+            'total_vendido': sum(vendas_por_data.values()), 'vendas_por_mes': vendas_por_mes,
+            'vendas_por_data': vendas_por_data,
+        }
+
+        resumo = ResumoHistorico(meta_hist)
+
+        assert resumo == meta_hist
+        assert resumo['vendas_por_data'] == vendas_por_data
+        assert pickle.loads(pickle.dumps(resumo)) == meta_hist
+        assert calcular_demanda_item_com_cache(10, '123', serie, resumo, 2026) == \
+            calcular_demanda_item_com_cache(10, '123', serie, meta_hist, 2026)
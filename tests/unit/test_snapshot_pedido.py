@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitarios para app/utils/snapshot_pedido.py (pre-carregamento concorrente
+da tela de Pedido ao Fornecedor)
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+import app.utils.snapshot_pedido as snapshot_pedido
+from app.utils.demanda_pre_calculada import precarregar_demanda_fornecedores_em_lote
+from app.utils.snapshot_pedido import SnapshotPedido, carregar_snapshot_pedido
+from core.pedido_fornecedor_integrado import PedidoFornecedorIntegrado
+
+ESPERA = 0.2
+
+
+class CursorFalso:
+    def __init__(self, linhas=()):
+        self.linhas = list(linhas)
+        self.executados = []
+
+    def execute(self, query, params=None):
+        self.executados.append((query, params))
+
+    def fetchall(self):
+        return self.linhas
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    def __init__(self, linhas=()):
+        self.cursor_falso = CursorFalso(linhas)
+
+    def cursor(self, cursor_factory=None):
+        return self.cursor_falso
+
+
+@pytest.fixture
+def cargas_lentas(monkeypatch):
+    """Substitui conexao e consultas por cargas que so esperam ESPERA segundos."""
+    @contextmanager
+    def conexao_falsa():
+        yield ConexaoFalsa()
+
+    def carga(valor):
+        def executar(conn, *args):
+            time.sleep(ESPERA)
+            return valor(*args) if callable(valor) else valor
+        return executar
+
+    monkeypatch.setattr(snapshot_pedido, 'pooled_connection', conexao_falsa)
+    monkeypatch.setattr(snapshot_pedido, '_carregar_caches_processador', carga(
+        lambda metodo, *args: {'estoque': {(1, 1): {'estoque_disponivel': 5.0}}}
+        if metodo == 'precarregar_estoque' else {}))
+    monkeypatch.setattr(snapshot_pedido, 'precarregar_demanda_fornecedores_em_lote',
+                        carga({('1', None): {'demanda_diaria': 2.0}}))
+    monkeypatch.setattr(snapshot_pedido, 'calcular_proporcoes_vendas_por_loja', carga({('1', 1): 1.0}))
+    monkeypatch.setattr(snapshot_pedido, '_carregar_ultima_venda', carga({(1, 1): date(2020, 1, 1)}))
+    monkeypatch.setattr(snapshot_pedido, '_carregar_solis', carga([(1, 1, 2, 3.0)]))
+    monkeypatch.setattr(snapshot_pedido, '_carregar_estoque_cds', carga([]))
+    monkeypatch.setattr(snapshot_pedido, '_carregar_grupos_transferencia', carga({1: {'grupo_id': 7}}))
+    monkeypatch.setattr(snapshot_pedido, '_carregar_dias_transferencia', carga(15))
+
+
+class TestCarregarSnapshot:
+    """Consultas em paralelo e snapshot preenchido"""
+
+    @pytest.mark.unit
+    def test_tempo_limitado_pela_consulta_mais_lenta(self, cargas_lentas):
+        snapshot = carregar_snapshot_pedido(
+            [1, 2], [1, 2], [1, 2, 80], {'123': [1, 2]},
+            is_multiloja=True, ano=2026, mes=1, cod_destino_cd=80, workers=16
+        )
+
+        assert len(snapshot.tempos) == 12
+        assert snapshot.tempo_total < 3 * ESPERA < sum(snapshot.tempos.values())
+        assert snapshot.estoque == {(1, 1): {'estoque_disponivel': 5.0}}
+        assert snapshot.demanda == {('1', None): {'demanda_diaria': 2.0}}
+        assert snapshot.proporcoes == {('1', 1): 1.0}
+        assert snapshot.solis == [(1, 1, 2, 3.0)]
+        assert snapshot.grupos_por_loja == {1: {'grupo_id': 7}}
+        assert snapshot.dias_transferencia_cd == 15
+
+    @pytest.mark.unit
+    def test_mono_loja_sem_cargas_de_multiloja(self, cargas_lentas):
+        snapshot = carregar_snapshot_pedido([1], [1], [1], {'123': [1]}, is_multiloja=False)
+
+        assert set(snapshot.tempos) == {
+            'sit_compra', 'estoque', 'historico', 'embalagem', 'produtos',
+            'demanda', 'solis', 'estoque_cds', 'ultima_venda'
+        }
+        assert snapshot.proporcoes == {}
+        assert snapshot.dias_transferencia_cd == 0
+
+
+class TestSnapshotPedido:
+    """Uso do snapshot pelo endpoint"""
+
+    @pytest.mark.unit
+    def test_aplicar_no_processador(self):
+        snapshot = SnapshotPedido(estoque={(1, 1): {'estoque_disponivel': 1.0}}, produtos={1: {'descricao': 'X'}})
+        processador = PedidoFornecedorIntegrado(None)
+
+        snapshot.aplicar_no_processador(processador)
+
+        assert processador._cache_estoque is snapshot.estoque
+        assert processador._cache_produtos is snapshot.produtos
+        assert processador._regras_sit_compra is None  # Carregadas sob demanda
+
+    @pytest.mark.unit
+    def test_itens_sem_venda_desde(self):
+        snapshot = SnapshotPedido(ultima_venda={(1, 1): date(2026, 1, 10), (1, 2): date(2024, 5, 1)})
+
+        sem_venda = snapshot.itens_sem_venda_desde([1, 2], [1, 2], date(2025, 10, 1))
+
+        assert sem_venda == {(1, 2), (2, 1), (2, 2)}
+        assert SnapshotPedido().itens_sem_venda_desde([1], [1], date(2025, 10, 1)) == set()
+
+
+class TestDemandaFornecedoresEmLote:
+    """Uma query para todos os fornecedores"""
+
+    @pytest.mark.unit
+    def test_pares_produto_fornecedor_em_uma_query(self):
+        conn = ConexaoFalsa([{'cod_produto': '10', 'cod_empresa': None, 'demanda_diaria': 1.5}])
+
+        cache = precarregar_demanda_fornecedores_em_lote(
+            conn, {'111': [10, 11], '': [99], '222': ['12']}, cod_empresas=[1, None, 2], ano=2026, mes=3
+        )
+
+        (query, params), = conn.cursor_falso.executados
+        assert 'unnest' in query
+        assert params == [['10', '11', '12'], ['111', '111', '222'], 2026, 3, [1, 2]]
+        assert cache == {('10', None): {'cod_produto': '10', 'cod_empresa': None, 'demanda_diaria': 1.5}}
+
+    @pytest.mark.unit
+    def test_sem_produtos_nao_consulta(self):
+        conn = ConexaoFalsa()
+        assert precarregar_demanda_fornecedores_em_lote(conn, {None: [1]}) == {}
+        assert conn.cursor_falso.executados == []
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitários para a triagem de períodos em core/seasonality_detector.py
+"""
+
+import pytest
+import numpy as np
+
+from core.seasonality_detector import (
+    SeasonalityDetector,
+    detect_seasonality_batch,
+    screen_seasonality_batch,
+)
+
+
+def gerar_series(seed=0, quantidade=60):
+    """Series sazonais (periodos 2-14), com tendencia, aleatorias e intermitentes."""
+    rng = np.random.default_rng(seed)
+    series = []
+    for i in range(quantidade):
+        n = int(rng.choice([12, 16, 24, 36, 48, 104, 365]))
+        t = np.arange(n)
+        padrao = i % 4
+        if padrao == 0:
+            periodo = int(rng.choice([2, 4, 6, 7, 12, 14]))
+            perfil = rng.normal(0, 20, periodo)
+            serie = 100 + np.tile(perfil, n // periodo + 1)[:n] + rng.normal(0, 5, n)
+        elif padrao == 1:
+            periodo = int(rng.choice([4, 7, 12]))
+            serie = 50 + 0.5 * t + 15 * np.sin(2 * np.pi * t / periodo) + rng.normal(0, 5, n)
+        elif padrao == 2:
+            serie = rng.normal(100, 10, n)
+        else:
+            serie = (rng.random(n) < 0.3) * rng.poisson(5, n)
+        series.append([float(v) for v in serie])
+    return series
+
+
+class TestTriagemSazonalidade:
+    """Triagem NumPy antes da decomposicao completa"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('periodo, ciclos', [(12, 3), (4, 4), (7, 8)])
+    def test_periodo_igual_a_busca_completa(self, periodo, ciclos):
+        """Padroes dos testes de sazonalidade: mesmo resultado com e sem triagem"""
+        rng = np.random.default_rng(42)
+        perfil = rng.normal(0, 15, periodo)
+        serie = list(100 + np.tile(perfil, ciclos) + rng.normal(0, 4, periodo * ciclos))
+
+        detector = SeasonalityDetector(serie)
+        triagem = detector.detect()
+        completo = detector.detect(candidate_periods=detector._get_candidate_periods())
+
+        assert triagem['seasonal_period'] == completo['seasonal_period'] == periodo
+        assert triagem['strength'] == completo['strength']
+        assert len(detector.screen_candidates()) < len(detector._get_candidate_periods())
+
+    @pytest.mark.unit
+    def test_lote_igual_ao_escalar(self):
+        """Triagem em lote (series de tamanhos diferentes) = triagem serie a serie"""
+        series = gerar_series()
+
+        assert screen_seasonality_batch(series) == [SeasonalityDetector(s).screen_candidates() for s in series]
+        assert detect_seasonality_batch(series[:12]) == [SeasonalityDetector(s).detect() for s in series[:12]]
+
+    @pytest.mark.unit
+    def test_concordancia_com_busca_completa(self):
+        """Periodo e decisao iguais aos da busca completa na grande maioria das series"""
+        series = gerar_series(seed=1)
+        iguais = 0
+        for s in series:
+            detector = SeasonalityDetector(s)
+            triagem = detector.detect()
+            completo = detector.detect(candidate_periods=detector._get_candidate_periods())
+            iguais += (triagem['has_seasonality'], triagem['seasonal_period']) == \
+                (completo['has_seasonality'], completo['seasonal_period'])
+
+        assert iguais / len(series) >= 0.95
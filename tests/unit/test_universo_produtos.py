@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Testes unitarios para app/utils/universo_produtos.py (resolver de produtos
+compartilhado pelas telas de pedido)
+"""
+
+import pandas as pd
+import pytest
+
+import app.utils.universo_produtos as universo_produtos
+from app.utils.universo_produtos import resolver_universo_produtos, valores_filtro
+
+
+class CursorExiste:
+    def __init__(self, existe):
+        self.existe = existe
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return (self.existe,)
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    def __init__(self, tabela_parametros=True):
+        self.tabela_parametros = tabela_parametros
+
+    def cursor(self, cursor_factory=None):
+        return CursorExiste(self.tabela_parametros)
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    """Captura as queries executadas pelo resolver."""
+    executadas = []
+
+    def ler_sql(query, conn, params):
+        executadas.append((query, params))
+        return pd.DataFrame({'codigo': ['1'], 'nome_fornecedor': ['F'], 'ordem_fornecedor': [1]})
+
+    monkeypatch.setattr(universo_produtos, '_ler_sql', ler_sql)
+    monkeypatch.setattr(universo_produtos, '_tabela_parametros_existe', False)
+    return executadas
+
+
+class TestValoresFiltro:
+    """Normalizacao dos filtros das telas"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize('filtro, esperado', [
+        ('TODAS', None),
+        (None, None),
+        ([], None),
+        (['A', 'TODAS'], None),
+        ('A', ['A']),
+        ([1, 'B'], ['1', 'B']),
+    ])
+    def test_valores(self, filtro, esperado):
+        assert valores_filtro(filtro, 'TODAS') == esperado
+
+
+class TestResolverUniversoProdutos:
+    """Uma query para todos os fornecedores e linhas"""
+
+    @pytest.mark.unit
+    def test_lista_de_fornecedores_em_uma_query(self, consultas):
+        df = resolver_universo_produtos(
+            ConexaoFalsa(), fornecedores=['B', 'A'], linha1='L1', linha3=['3', '4'], cod_destino=80
+        )
+
+        (query, params), = consultas
+        assert 'parametros_fornecedor' in query
+        assert 'array_position' in query and 'nome_fornecedor = ANY(%s)' in query
+        assert params == [['B', 'A'], [80], ['B', 'A'], ['L1'], ['3', '4']]
+        assert list(df.columns) == ['codigo', 'nome_fornecedor']
+
+    @pytest.mark.unit
+    def test_todos_ordenado_por_fornecedor(self, consultas):
+        resolver_universo_produtos(ConexaoFalsa(), fornecedores='TODOS', cod_destino=[1, 2])
+
+        (query, params), = consultas
+        assert params == [[1, 2]]
+        assert 'TRIM(p.nome_fornecedor)' in query
+        assert 'd.cod_destino,' in query
+        assert query.rstrip().endswith('ORDER BY d.cod_destino, ordem_fornecedor, codigo')
+
+    @pytest.mark.unit
+    def test_sem_tabela_de_parametros_usa_padroes(self, consultas):
+        resolver_universo_produtos(ConexaoFalsa(tabela_parametros=False), somente_com_fornecedor=False)
+
+        (query, _), = consultas
+        assert 'parametros_fornecedor' not in query
+        assert 'FALSE as fornecedor_cadastrado' in query
+        assert 'TRIM(p.nome_fornecedor)' not in query